@@ -0,0 +1,29 @@
+from django.contrib.auth import get_user_model
+from django.contrib.auth.backends import ModelBackend
+
+from .principal import RELACIONES
+
+
+class PrincipalBackend(ModelBackend):
+    """
+    ModelBackend que carga el usuario de la sesión junto con su clínica y
+    sus perfiles (una consulta con JOIN): request.principal se arma desde
+    request.user sin volver a la base.
+    """
+
+    def _usuarios(self):
+        return get_user_model()._default_manager.select_related(*RELACIONES)
+
+    def get_user(self, user_id):
+        try:
+            user = self._usuarios().get(pk=user_id)
+        except get_user_model().DoesNotExist:
+            return None
+        return user if self.user_can_authenticate(user) else None
+
+    async def aget_user(self, user_id):
+        try:
+            user = await self._usuarios().aget(pk=user_id)
+        except get_user_model().DoesNotExist:
+            return None
+        return user if self.user_can_authenticate(user) else None
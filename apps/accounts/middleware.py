@@ -0,0 +1,35 @@
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.utils.functional import SimpleLazyObject
+
+from .principal import obtener_principal
+
+
+class PrincipalMiddleware:
+    """
+    Agrega `request.principal` (rol, clínica y perfiles del usuario), armado
+    desde request.user: PrincipalBackend ya lo carga con la clínica y los
+    perfiles, así que no agrega consultas. Va después de
+    AuthenticationMiddleware.
+
+    Soporta sync y async: bajo ASGI no agrega un salto a un hilo. Las vistas
+    async no deben evaluar este objeto perezoso (consulta sincrónica); usan
+    RolAsyncMixin, que lo reemplaza por uno obtenido con aobtener_principal.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        request.principal = SimpleLazyObject(lambda: obtener_principal(request.user))
+        return self.get_response(request)
+
+    async def __acall__(self, request):
+        request.principal = SimpleLazyObject(lambda: obtener_principal(request.user))
+        return await self.get_response(request)
@@ -0,0 +1,84 @@
+from typing import NamedTuple
+
+from django.contrib.auth import get_user_model
+
+
+class Principal(NamedTuple):
+    """Lo que las vistas necesitan saber del usuario autenticado"""
+
+    user_id: int
+    rol: str
+    clinica_id: int | None
+    clinica_slug: str | None
+    perfil_cliente_id: int | None
+    perfil_veterinario_id: int | None
+
+
+# Relaciones que PrincipalBackend trae junto con el usuario de la sesión
+RELACIONES = ("clinica", "perfilcliente", "perfilveterinario")
+
+
+def _consulta(user_id):
+    return (
+        get_user_model()
+        .objects.filter(pk=user_id)
+        .values_list(
+            "pk",
+            "rol",
+            "clinica_id",
+            "clinica__slug",
+            "perfilcliente__id",
+            "perfilveterinario__id",
+        )
+    )
+
+
+def _cargado(user):
+    """True si el usuario ya trae la clínica y los perfiles (select_related)"""
+    return all(user._meta.get_field(nombre).is_cached(user) for nombre in RELACIONES)
+
+
+def _desde_usuario(user):
+    # Los perfiles que no existen quedan cacheados como ausentes: sin consultas
+    perfil_cliente = getattr(user, "perfilcliente", None)
+    perfil_veterinario = getattr(user, "perfilveterinario", None)
+    return Principal(
+        user.pk,
+        user.rol,
+        user.clinica_id,
+        user.clinica.slug if user.clinica else None,
+        perfil_cliente.pk if perfil_cliente else None,
+        perfil_veterinario.pk if perfil_veterinario else None,
+    )
+
+
+def obtener_principal(user):
+    """
+    Principal del usuario. El de request.user (cargado por PrincipalBackend
+    con la clínica y los perfiles) se arma sin consultas; para otros
+    usuarios alcanza una sola consulta. None para usuarios anónimos.
+    """
+    if not user.is_authenticated:
+        return None
+    if _cargado(user):
+        return _desde_usuario(user)
+
+    datos = _consulta(user.pk).first()
+    return Principal(*datos) if datos else None
+
+
+async def aobtener_principal(user):
+    """Versión async de obtener_principal, para vistas async"""
+    if not user.is_authenticated:
+        return None
+    if _cargado(user):
+        return _desde_usuario(user)
+
+    datos = await _consulta(user.pk).afirst()
+    return Principal(*datos) if datos else None
+
+
+def tiene_rol(request, *roles):
+    """True si el usuario del request está autenticado y tiene alguno de los roles"""
+    principal = request.principal
+    return bool(principal) and principal.rol in roles
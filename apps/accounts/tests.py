@@ -1,10 +1,16 @@
 from datetime import time
-from django.test import TestCase
+from django.urls import reverse
+from django.test import TestCase, Client, override_settings
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
 from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
 from django.core.exceptions import ValidationError
 
 from apps.clinicas.models import Clinica
 from apps.accounts.models import PerfilCliente, CustomUser
+from apps.accounts.backends import PrincipalBackend
+from apps.accounts.principal import obtener_principal
 
 
 User = get_user_model()
@@ -230,3 +236,87 @@ class CustomUserModelTest(TestCase):
         self.assertNotEqual(user.password, "mypassword123")
         # Pero debe poder verificarse
         self.assertTrue(user.check_password("mypassword123"))
+
+
+class PrincipalTest(TestCase):
+    """Tests para el principal del usuario (request.principal)"""
+
+    def setUp(self):
+        self.admin_vet = User.objects.create_user(
+            username="adminvet",
+            email="adminvet@test.com",
+            password="12345",
+            rol="admin_veterinaria",
+        )
+        self.clinica = Clinica.objects.create(
+            nombre="Clinica Principal",
+            email="principal-clinica@test.com",
+            hora_apertura=time(8, 0),
+            hora_cierre=time(18, 0),
+            admin=self.admin_vet,
+        )
+        self.client_http = Client()
+        self.cliente = User.objects.create_user(
+            username="cli_principal",
+            email="principal@test.com",
+            password="pass1234",
+            rol="cliente",
+            clinica=self.clinica,
+        )
+
+    def test_principal_del_usuario_de_la_sesion_sin_consultas(self):
+        """El usuario que carga PrincipalBackend ya trae clínica y perfiles"""
+        usuario = PrincipalBackend().get_user(self.cliente.pk)
+        with CaptureQueriesContext(connection) as consultas:
+            principal = obtener_principal(usuario)
+        self.assertEqual(len(consultas), 0)
+        self.assertEqual(principal.rol, "cliente")
+        self.assertEqual(principal.clinica_slug, self.clinica.slug)
+        self.assertEqual(principal.perfil_cliente_id, self.cliente.perfilcliente.pk)
+        self.assertIsNone(principal.perfil_veterinario_id)
+
+    def test_principal_de_otro_usuario_en_una_consulta(self):
+        """Sin las relaciones cargadas alcanza una sola consulta"""
+        usuario = User.objects.get(pk=self.cliente.pk)
+        with CaptureQueriesContext(connection) as consultas:
+            principal = obtener_principal(usuario)
+        self.assertEqual(len(consultas), 1)
+        self.assertEqual(principal, obtener_principal(PrincipalBackend().get_user(usuario.pk)))
+
+    def test_vistas_usan_el_principal(self):
+        """Las vistas con mixins de rol no vuelven a buscar el usuario ni la clínica"""
+        self.admin_vet.clinica = self.clinica
+        self.admin_vet.save()
+        self.client_http.login(username="adminvet", password="12345")
+        url = reverse("mascotas:lista_mascotas_admin")
+        self.client_http.get(url)
+        with CaptureQueriesContext(connection) as consultas:
+            response = self.client_http.get(url)
+        self.assertEqual(response.status_code, 200)
+        usuarios = [q for q in consultas if 'FROM "accounts_customuser"' in q["sql"]]
+        self.assertEqual(len(usuarios), 1)
+        self.assertFalse(
+            [q for q in consultas if 'FROM "clinicas_clinica"' in q["sql"]]
+        )
+
+
+class HashersTest(TestCase):
+    """Tests para el perfil de hashers de contraseñas"""
+
+    @override_settings(
+        PASSWORD_HASHERS=[
+            "django.contrib.auth.hashers.MD5PasswordHasher",
+            "django.contrib.auth.hashers.PBKDF2PasswordHasher",
+        ]
+    )
+    def test_login_rehashea_con_el_hasher_preferido(self):
+        """Un hash viejo se actualiza al primer login correcto"""
+        user = User.objects.create_user(
+            username="viejo", email="viejo@test.com", rol="cliente"
+        )
+        user.password = make_password("pass1234", hasher="pbkdf2_sha256")
+        user.save()
+
+        self.assertTrue(Client().login(username="viejo", password="pass1234"))
+        user.refresh_from_db()
+        self.assertTrue(user.password.startswith("md5$"))
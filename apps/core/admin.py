@@ -1,3 +1,19 @@
 from django.contrib import admin
 
-# Register your models here.
+from .models import Blob, EmailSaliente
+
+
+@admin.register(Blob)
+class BlobAdmin(admin.ModelAdmin):
+    list_display = ["sha256", "nombre", "tamano", "referencias", "fecha_creacion"]
+    list_filter = ["fecha_creacion"]
+    search_fields = ["sha256", "nombre"]
+    readonly_fields = ["sha256", "nombre", "tamano", "fecha_creacion"]
+
+
+@admin.register(EmailSaliente)
+class EmailSalienteAdmin(admin.ModelAdmin):
+    list_display = ["tipo", "destinatario", "estado", "intentos", "fecha_creacion", "fecha_envio"]
+    list_filter = ["estado", "tipo"]
+    search_fields = ["destinatario", "asunto"]
+    readonly_fields = ["fecha_creacion", "fecha_envio"]
@@ -0,0 +1,56 @@
+import re
+
+from django.db import connection, transaction
+
+# SQLite: "SEARCH tabla USING [COVERING ]INDEX nombre (...)" o "SCAN tabla [USING ...]"
+_SQLITE_RE = re.compile(r"(SEARCH|SCAN) (\w+)(?: AS \w+)?(?: USING (?:COVERING )?INDEX (\w+))?")
+# PostgreSQL: "Index [Only ]Scan using nombre on tabla", "Bitmap Index Scan on nombre", "Seq Scan on tabla"
+_PG_INDICE_RE = re.compile(r"Index (?:Only )?Scan using (\w+) on (\w+)")
+_PG_SEQ_RE = re.compile(r"Seq Scan on (\w+)")
+
+
+def plan(queryset):
+    """Texto del EXPLAIN de la consulta (en PostgreSQL, sin permitir seq scans gratis)"""
+    if connection.vendor != "postgresql":
+        return queryset.explain()
+    with transaction.atomic():
+        with connection.cursor() as cursor:
+            # Con tablas chicas (tests) el planner preferiría recorrerlas enteras
+            cursor.execute("SET LOCAL enable_seqscan = off")
+        return queryset.explain()
+
+
+def accesos(queryset):
+    """
+    {tabla: índice o None} según el plan. None = la tabla se recorre completa.
+
+    Solo entiende los planes de SQLite y PostgreSQL.
+    """
+    texto = plan(queryset)
+    resultado = {}
+    if connection.vendor == "postgresql":
+        for indice, tabla in _PG_INDICE_RE.findall(texto):
+            resultado[tabla] = indice
+        for tabla in _PG_SEQ_RE.findall(texto):
+            resultado.setdefault(tabla, None)
+        return resultado
+
+    for operacion, tabla, indice in _SQLITE_RE.findall(texto):
+        # Un SCAN con índice recorre el índice entero: no cuenta como búsqueda
+        if operacion == "SEARCH" and indice:
+            resultado[tabla] = indice
+        else:
+            resultado.setdefault(tabla, None)
+    return resultado
+
+
+class PlanConsultaMixin:
+    """Aserciones sobre el plan de ejecución para TestCase"""
+
+    def assertUsaIndice(self, queryset, tabla, indice=None):
+        usado = accesos(queryset).get(tabla)
+        self.assertIsNotNone(
+            usado, f"{tabla} se recorre completa:\n{plan(queryset)}"
+        )
+        if indice:
+            self.assertEqual(usado, indice, plan(queryset))
@@ -0,0 +1,217 @@
+import re
+import csv
+import zipfile
+from datetime import date, datetime
+from decimal import Decimal
+from xml.sax.saxutils import escape
+
+from django.http import StreamingHttpResponse
+from django.utils import timezone
+from django.utils.dateparse import parse_date
+
+# Filas leídas por consulta al recorrer el queryset con .iterator()
+CHUNK_SIZE = 2000
+
+FORMATOS = ("csv", "xlsx")
+
+# Caracteres que no pueden aparecer en el XML de una hoja de cálculo
+_CONTROL_RE = re.compile(r"[\x00-\x08\x0b\x0c\x0e-\x1f]")
+
+# Excel interpreta como fórmula el texto que empieza con estos caracteres
+_INICIO_FORMULA = ("=", "+", "-", "@", "\t", "\r")
+
+
+class _Eco:
+    """Pseudo-archivo: devuelve lo escrito en lugar de guardarlo (csv.writer)"""
+
+    def write(self, valor):
+        return valor
+
+
+class _Buffer:
+    """Pseudo-archivo no posicionable donde zipfile deja los bytes a enviar"""
+
+    def __init__(self):
+        self.partes = []
+
+    def write(self, datos):
+        self.partes.append(bytes(datos))
+        return len(datos)
+
+    def flush(self):
+        pass
+
+    def vaciar(self):
+        datos = b"".join(self.partes)
+        self.partes = []
+        return datos
+
+
+def _valor(valor):
+    """Normaliza un valor de values_list para exportarlo como texto"""
+    if valor is None:
+        return ""
+    if isinstance(valor, datetime):
+        if timezone.is_aware(valor):
+            valor = timezone.localtime(valor)
+        return valor.strftime("%d/%m/%Y %H:%M")
+    if isinstance(valor, date):
+        return valor.strftime("%d/%m/%Y")
+    if isinstance(valor, bool):
+        return "Sí" if valor else "No"
+    if isinstance(valor, str) and valor.startswith(_INICIO_FORMULA):
+        # Texto cargado por usuarios: que Excel lo muestre y no lo ejecute
+        return "'" + valor
+    return valor
+
+
+def filas_csv(encabezados, filas):
+    """Generador de líneas CSV (con BOM para que Excel detecte UTF-8)"""
+    writer = csv.writer(_Eco())
+    yield "\ufeff" + writer.writerow(encabezados)
+    for fila in filas:
+        yield writer.writerow([_valor(v) for v in fila])
+
+
+def _columna(indice):
+    """0 -> A, 25 -> Z, 26 -> AA"""
+    letras = ""
+    indice += 1
+    while indice:
+        indice, resto = divmod(indice - 1, 26)
+        letras = chr(65 + resto) + letras
+    return letras
+
+
+def _fila_xml(numero, valores):
+    celdas = []
+    for i, valor in enumerate(valores):
+        ref = f"{_columna(i)}{numero}"
+        valor = _valor(valor)
+        if isinstance(valor, (int, float, Decimal)):
+            celdas.append(f'<c r="{ref}"><v>{valor}</v></c>')
+        else:
+            texto = escape(_CONTROL_RE.sub("", str(valor)))
+            celdas.append(
+                f'<c r="{ref}" t="inlineStr"><is><t xml:space="preserve">{texto}</t></is></c>'
+            )
+    return f'<row r="{numero}">{"".join(celdas)}</row>'
+
+
+_XLSX_ESTATICOS = {
+    "[Content_Types].xml": (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+        '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+        '<Default Extension="xml" ContentType="application/xml"/>'
+        '<Override PartName="/xl/workbook.xml" ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet.main+xml"/>'
+        '<Override PartName="/xl/worksheets/sheet1.xml" ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml"/>'
+        "</Types>"
+    ),
+    "_rels/.rels": (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+        '<Relationship Id="rId1" Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument" Target="xl/workbook.xml"/>'
+        "</Relationships>"
+    ),
+    "xl/_rels/workbook.xml.rels": (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+        '<Relationship Id="rId1" Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/worksheet" Target="worksheets/sheet1.xml"/>'
+        "</Relationships>"
+    ),
+}
+
+
+def filas_xlsx(encabezados, filas, hoja="Datos"):
+    """
+    Generador de un .xlsx de una hoja, escrito por partes.
+
+    El zip se arma sobre un buffer no posicionable (zipfile usa data
+    descriptors), así que cada bloque comprimido se envía apenas se produce
+    y nunca se mantiene el archivo completo en memoria.
+    """
+    buffer = _Buffer()
+    with zipfile.ZipFile(buffer, "w", compression=zipfile.ZIP_DEFLATED) as zf:
+        for nombre, contenido in _XLSX_ESTATICOS.items():
+            zf.writestr(nombre, contenido)
+        zf.writestr(
+            "xl/workbook.xml",
+            '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+            '<workbook xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main" '
+            'xmlns:r="http://schemas.openxmlformats.org/officeDocument/2006/relationships">'
+            f'<sheets><sheet name="{escape(hoja[:31])}" sheetId="1" r:id="rId1"/></sheets>'
+            "</workbook>",
+        )
+        yield buffer.vaciar()
+
+        with zf.open("xl/worksheets/sheet1.xml", "w", force_zip64=True) as destino:
+            destino.write(
+                b'<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+                b'<worksheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main">'
+                b"<sheetData>"
+            )
+            destino.write(_fila_xml(1, encabezados).encode())
+            for numero, fila in enumerate(filas, start=2):
+                destino.write(_fila_xml(numero, fila).encode())
+                if numero % 500 == 0:
+                    yield buffer.vaciar()
+            destino.write(b"</sheetData></worksheet>")
+    yield buffer.vaciar()
+
+
+class ExportacionMixin:
+    """
+    Mixin para vistas de exportación en CSV (por defecto) o XLSX (?formato=xlsx).
+
+    La subclase define `columnas` como lista de (encabezado, campo) y
+    `get_queryset_exportacion()`; las filas se leen con values_list + iterator, por lo
+    que el uso de memoria no depende de la cantidad de registros.
+    """
+
+    columnas = []
+    nombre_archivo = "exportacion"
+
+    def get_queryset(self):
+        return self.get_queryset_exportacion()
+
+    def filtrar_periodo(self, queryset, campo_fecha):
+        """Aplica los filtros ?desde=AAAA-MM-DD&hasta=AAAA-MM-DD&veterinario=<id>"""
+        desde = parse_date(self.request.GET.get("desde") or "")
+        hasta = parse_date(self.request.GET.get("hasta") or "")
+        veterinario = self.request.GET.get("veterinario", "")
+
+        if desde:
+            queryset = queryset.filter(**{f"{campo_fecha}__gte": desde})
+        if hasta:
+            queryset = queryset.filter(**{f"{campo_fecha}__lte": hasta})
+        if veterinario.isdigit():
+            queryset = queryset.filter(veterinario_id=veterinario)
+        return queryset
+
+    def get_filas(self):
+        campos = [campo for _, campo in self.columnas]
+        return self.get_queryset().values_list(*campos).iterator(chunk_size=CHUNK_SIZE)
+
+    def get(self, request, *args, **kwargs):
+        formato = request.GET.get("formato", "csv")
+        if formato not in FORMATOS:
+            formato = "csv"
+
+        encabezados = [titulo for titulo, _ in self.columnas]
+        nombre = f"{self.nombre_archivo}_{timezone.localdate():%Y%m%d}.{formato}"
+
+        if formato == "xlsx":
+            response = StreamingHttpResponse(
+                filas_xlsx(encabezados, self.get_filas(), hoja=self.nombre_archivo),
+                content_type=(
+                    "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+                ),
+            )
+        else:
+            response = StreamingHttpResponse(
+                filas_csv(encabezados, self.get_filas()),
+                content_type="text/csv; charset=utf-8",
+            )
+        response["Content-Disposition"] = f'attachment; filename="{nombre}"'
+        return response
@@ -238,6 +238,25 @@ class ClienteFiltroForm(forms.Form):
     )
 
 
+class ImportarClientesForm(forms.Form):
+    archivo = forms.FileField(
+        label="Archivo CSV",
+        widget=forms.ClearableFileInput(
+            attrs={"class": "form-control", "accept": ".csv,text/csv"}
+        ),
+        help_text=(
+            "Columnas: email, nombre, apellido, telefono, dni, direccion, mascota, "
+            "especie, raza, sexo, fecha_nacimiento, chip, color, peso"
+        ),
+    )
+
+    def clean_archivo(self):
+        archivo = self.cleaned_data["archivo"]
+        if not archivo.name.lower().endswith(".csv"):
+            raise forms.ValidationError("El archivo debe ser un CSV.")
+        return archivo
+
+
 class VeterinarioFiltroForm(forms.Form):
     """Formulario para filtrar veterinarios"""
 
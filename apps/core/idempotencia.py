@@ -0,0 +1,84 @@
+import uuid
+
+from django.conf import settings
+from django.contrib import messages
+from django.core.cache import cache
+from django.shortcuts import redirect
+
+# Campo oculto de los formularios; los clientes de la API pueden usar el header
+CAMPO = "clave_idempotencia"
+HEADER = "Idempotency-Key"
+
+_EN_CURSO = "en_curso"
+
+
+def nueva_clave():
+    """Clave para el campo oculto de un formulario (una por página renderizada)"""
+    return uuid.uuid4().hex
+
+
+def _segundos():
+    return getattr(settings, "IDEMPOTENCIA_SEGUNDOS", 900)
+
+
+def _mensajes(request):
+    """Mensajes pendientes del request, sin marcarlos como leídos"""
+    storage = messages.get_messages(request)
+    pendientes = list(storage)
+    storage.used = False
+    return pendientes
+
+
+class IdempotenciaMixin:
+    """
+    POST idempotentes: el resultado (redirect y mensajes) se guarda en el
+    cache bajo la clave que manda el formulario. Un reintento con la misma
+    clave (doble clic, red que reenvía) recibe ese resultado sin volver a
+    ejecutar la vista. Si el primero todavía no terminó, el reintento no
+    espera: se redirige a `url_en_curso`.
+
+    Va después de LoginRequiredMixin y de los mixins de rol. Sin clave, la
+    vista funciona como siempre.
+    """
+
+    url_en_curso = "core:dashboard"
+
+    def dispatch(self, request, *args, **kwargs):
+        clave = request.headers.get(HEADER) or request.POST.get(CAMPO)
+        if request.method != "POST" or not clave or not request.user.is_authenticated:
+            return super().dispatch(request, *args, **kwargs)
+
+        clave = f"idempotencia:{request.user.pk}:{request.path}:{clave[:64]}"
+        if not cache.add(clave, _EN_CURSO, _segundos()):
+            return self.repetir(request, cache.get(clave))
+
+        anteriores = len(_mensajes(request))
+        try:
+            response = super().dispatch(request, *args, **kwargs)
+        except Exception:
+            cache.delete(clave)
+            raise
+
+        if response.status_code in (301, 302, 303):
+            # Solo los mensajes que agregó esta vista, no los que ya estaban
+            guardados = _mensajes(request)[anteriores:]
+            cache.set(
+                clave,
+                (
+                    response["Location"],
+                    [(m.level, m.message, m.extra_tags) for m in guardados],
+                ),
+                _segundos(),
+            )
+        else:
+            cache.delete(clave)
+        return response
+
+    def repetir(self, request, resultado):
+        if resultado is None or resultado == _EN_CURSO:
+            messages.info(request, "Tu solicitud anterior todavía se está procesando.")
+            return redirect(self.url_en_curso)
+        destino, mensajes = resultado
+        for nivel, texto, etiquetas in mensajes:
+            messages.add_message(request, nivel, texto, extra_tags=etiquetas)
+        return redirect(destino)
@@ -0,0 +1,346 @@
+import csv
+from datetime import datetime
+from decimal import Decimal, InvalidOperation
+
+from django.contrib.auth.hashers import make_password
+from django.core.exceptions import ValidationError
+from django.core.validators import validate_email
+from django.db import IntegrityError, transaction
+from django.db.models.functions import Lower
+from django.utils import timezone
+
+from apps.accounts.models import CustomUser, PerfilCliente
+from apps.mascotas.models import Especie, Mascota, Raza
+
+SEXOS = {"m": "M", "macho": "M", "h": "H", "hembra": "H"}
+
+CAMPOS_CLIENTE_ACTUALIZABLES = ["first_name", "last_name", "telefono", "direccion", "dni"]
+CAMPOS_MASCOTA_ACTUALIZABLES = [
+    "especie",
+    "raza",
+    "sexo",
+    "fecha_nacimiento",
+    "color",
+    "peso",
+]
+
+
+class ErrorFila(Exception):
+    """Dato inválido en una fila del CSV"""
+
+
+def _fecha(valor):
+    if not valor:
+        return None
+    for formato in ("%Y-%m-%d", "%d/%m/%Y"):
+        try:
+            return datetime.strptime(valor, formato).date()
+        except ValueError:
+            continue
+    raise ErrorFila(f"Fecha inválida: {valor}")
+
+
+def _por_email(emails):
+    """Usuarios cuyo email coincide sin distinguir mayúsculas"""
+    return CustomUser.objects.annotate(email_normalizado=Lower("email")).filter(
+        email_normalizado__in=emails
+    )
+
+
+def _peso(valor):
+    if not valor:
+        return None
+    try:
+        peso = Decimal(valor.replace(",", "."))
+    except InvalidOperation:
+        raise ErrorFila(f"Peso inválido: {valor}")
+    if peso <= 0:
+        raise ErrorFila(f"Peso inválido: {valor}")
+    return peso
+
+
+class ImportadorClientes:
+    """
+    Importa clientes y mascotas de una clínica desde un CSV.
+
+    Cada fila es un cliente (identificado por email) y, opcionalmente, una
+    mascota suya; un cliente con varias mascotas ocupa varias filas. Las
+    filas se procesan en lotes: cada lote valida contra mapas en memoria,
+    hace upsert de usuarios y mascotas con bulk_create y crea los
+    PerfilCliente faltantes en bloque. No se disparan señales por fila.
+
+    Las filas con errores se saltean y quedan en `errores` como
+    (número de línea, mensaje); el resto del lote se importa igual.
+    """
+
+    def __init__(self, clinica, aprobado_por=None, tamano_lote=1000):
+        self.clinica = clinica
+        self.aprobado_por = aprobado_por
+        self.tamano_lote = tamano_lote
+
+        self.clientes_creados = 0
+        self.clientes_actualizados = 0
+        self.mascotas_creadas = 0
+        self.mascotas_actualizadas = 0
+        self.errores = []
+
+        self.especies = {
+            nombre.lower(): pk for pk, nombre in Especie.objects.values_list("id", "nombre")
+        }
+        self.razas = {
+            (especie_id, nombre.lower()): pk
+            for pk, especie_id, nombre in Raza.objects.values_list(
+                "id", "especie_id", "nombre"
+            )
+        }
+
+    # ---------------------------------------------------------------- lectura
+
+    def importar(self, archivo):
+        """`archivo` es un archivo de texto abierto; se lee fila por fila"""
+        lector = csv.DictReader(archivo)
+        if not lector.fieldnames or "email" not in [
+            c.strip().lower() for c in lector.fieldnames
+        ]:
+            raise ErrorFila("El CSV debe tener al menos la columna 'email'.")
+
+        lote = []
+        for fila in lector:
+            datos = {
+                (clave or "").strip().lower(): (valor or "").strip()
+                for clave, valor in fila.items()
+            }
+            lote.append((lector.line_num, datos))
+            if len(lote) >= self.tamano_lote:
+                self.procesar_lote(lote)
+                lote = []
+        if lote:
+            self.procesar_lote(lote)
+        return self
+
+    # ------------------------------------------------------------- validación
+
+    def validar_cliente(self, datos):
+        email = datos.get("email", "").lower()
+        try:
+            validate_email(email)
+        except ValidationError:
+            raise ErrorFila(f"Email inválido: {email or '(vacío)'}")
+        if not datos.get("nombre"):
+            raise ErrorFila("Falta el nombre del cliente.")
+        return {
+            "email": email,
+            "first_name": datos["nombre"][:150],
+            "last_name": datos.get("apellido", "")[:150],
+            "telefono": datos.get("telefono", "")[:15],
+            "dni": datos.get("dni") or None,
+            "direccion": datos.get("direccion", ""),
+        }
+
+    def validar_mascota(self, datos):
+        if not datos.get("mascota"):
+            return None
+
+        especie_id = self.especies.get(datos.get("especie", "").lower())
+        if not especie_id:
+            raise ErrorFila(f"Especie desconocida: {datos.get('especie') or '(vacía)'}")
+
+        raza_id = None
+        if datos.get("raza"):
+            raza_id = self.razas.get((especie_id, datos["raza"].lower()))
+            if not raza_id:
+                raise ErrorFila(f"Raza desconocida para la especie: {datos['raza']}")
+
+        sexo = SEXOS.get(datos.get("sexo", "").lower())
+        if not sexo:
+            raise ErrorFila(f"Sexo inválido: {datos.get('sexo') or '(vacío)'}")
+
+        return {
+            "nombre": datos["mascota"][:100],
+            "especie_id": especie_id,
+            "raza_id": raza_id,
+            "sexo": sexo,
+            "fecha_nacimiento": _fecha(datos.get("fecha_nacimiento")),
+            "numero_chip": datos.get("chip") or None,
+            "color": datos.get("color", "")[:100],
+            "peso": _peso(datos.get("peso")),
+        }
+
+    # ---------------------------------------------------------------- lotes
+
+    def procesar_lote(self, lote):
+        clientes = {}
+        mascotas = []
+
+        for linea, datos in lote:
+            try:
+                cliente = self.validar_cliente(datos)
+                mascota = self.validar_mascota(datos)
+            except ErrorFila as e:
+                self.errores.append((linea, str(e)))
+                continue
+            clientes.setdefault(cliente["email"], (linea, cliente))
+            if mascota:
+                mascotas.append((linea, cliente["email"], mascota))
+
+        try:
+            with transaction.atomic():
+                ids = self.guardar_clientes(clientes)
+                self.guardar_mascotas(mascotas, ids)
+        except IntegrityError as e:
+            # Un alta en paralelo con el mismo email, usuario o chip
+            raise ErrorFila(
+                f"No se pudo guardar el lote desde la línea {lote[0][0]}: {e}"
+            )
+
+    def guardar_clientes(self, clientes):
+        """Upsert de los clientes del lote; devuelve {email: id}"""
+        existentes = {
+            u["email_normalizado"]: u
+            for u in _por_email(clientes).values(
+                "id", "email", "username", "rol", "clinica_id", "email_normalizado"
+            )
+        }
+        # El username de un cliente nuevo es su email: no puede estar tomado
+        usernames_tomados = set(
+            CustomUser.objects.filter(
+                username__in=[e[:150] for e in clientes if e not in existentes]
+            ).values_list("username", flat=True)
+        )
+        dnis = [c["dni"] for _, c in clientes.values() if c["dni"]]
+        duenos_dni = dict(
+            CustomUser.objects.filter(dni__in=dnis).values_list("dni", "email")
+        )
+
+        ahora = timezone.now()
+        usuarios = []
+        dnis_lote = set()
+        for email, (linea, datos) in list(clientes.items()):
+            existente = existentes.get(email)
+            if existente and (
+                existente["rol"] != "cliente"
+                or existente["clinica_id"] not in (None, self.clinica.pk)
+            ):
+                self.errores.append((linea, f"{email} ya pertenece a otro usuario."))
+                del clientes[email]
+                continue
+            dni = datos["dni"]
+            if dni and (
+                dni in dnis_lote or duenos_dni.get(dni, email).lower() != email
+            ):
+                self.errores.append((linea, f"DNI {dni} ya registrado."))
+                del clientes[email]
+                continue
+            if existente:
+                # Mismo registro: se conservan el email y el username guardados
+                datos = {**datos, "email": existente["email"]}
+                username = existente["username"]
+            else:
+                username = email[:150]
+                if username in usernames_tomados:
+                    self.errores.append((linea, f"El usuario {username} ya existe."))
+                    del clientes[email]
+                    continue
+                usernames_tomados.add(username)
+            if dni:
+                dnis_lote.add(dni)
+
+            usuarios.append(
+                CustomUser(
+                    username=username,
+                    password=make_password(None),
+                    rol="cliente",
+                    clinica=self.clinica,
+                    is_active=True,
+                    pendiente_aprobacion=False,
+                    fecha_aprobacion=ahora,
+                    aprobado_por=self.aprobado_por,
+                    **datos,
+                )
+            )
+            if existente:
+                self.clientes_actualizados += 1
+            else:
+                self.clientes_creados += 1
+
+        CustomUser.objects.bulk_create(
+            usuarios,
+            update_conflicts=True,
+            unique_fields=["email"],
+            update_fields=CAMPOS_CLIENTE_ACTUALIZABLES + ["clinica"],
+        )
+
+        ids = dict(_por_email(clientes).values_list("email_normalizado", "id"))
+        # Las señales no corren con bulk_create: crear los perfiles faltantes
+        PerfilCliente.objects.bulk_create(
+            [PerfilCliente(user_id=pk) for pk in ids.values()], ignore_conflicts=True
+        )
+        # Ni la sincronización de Mascota.clinica: mascotas previas de clientes sin clínica
+        Mascota.objects.filter(dueno_id__in=ids.values()).exclude(
+            clinica=self.clinica
+        ).update(clinica=self.clinica)
+        return ids
+
+    def guardar_mascotas(self, mascotas, ids):
+        """Upsert por chip o, sin chip, por (dueño, nombre)"""
+        mascotas = [m for m in mascotas if m[1] in ids]
+        duenos = {ids[email] for _, email, _ in mascotas}
+        chips = [m["numero_chip"] for _, _, m in mascotas if m["numero_chip"]]
+
+        por_chip = dict(
+            Mascota.objects.filter(numero_chip__in=chips).values_list(
+                "numero_chip", "dueno_id"
+            )
+        )
+        por_nombre = {
+            (dueno_id, nombre.lower()): pk
+            for pk, dueno_id, nombre in Mascota.objects.filter(
+                dueno_id__in=duenos, numero_chip__isnull=True
+            ).values_list("id", "dueno_id", "nombre")
+        }
+
+        con_chip, nuevas, actualizar = [], [], []
+        vistas = set()
+        for linea, email, datos in mascotas:
+            dueno_id = ids[email]
+            chip = datos["numero_chip"]
+            clave = chip or (dueno_id, datos["nombre"].lower())
+            if clave in vistas:
+                self.errores.append((linea, f"Mascota repetida: {datos['nombre']}"))
+                continue
+            vistas.add(clave)
+
+            mascota = Mascota(
+                dueno_id=dueno_id, clinica=self.clinica, activo=True, **datos
+            )
+            if chip:
+                if por_chip.get(chip, dueno_id) != dueno_id:
+                    self.errores.append((linea, f"El chip {chip} ya es de otra mascota."))
+                    continue
+                con_chip.append(mascota)
+                if chip in por_chip:
+                    self.mascotas_actualizadas += 1
+                else:
+                    self.mascotas_creadas += 1
+            elif clave in por_nombre:
+                mascota.pk = por_nombre[clave]
+                actualizar.append(mascota)
+                self.mascotas_actualizadas += 1
+            else:
+                nuevas.append(mascota)
+                self.mascotas_creadas += 1
+
+        Mascota.objects.bulk_create(nuevas)
+        Mascota.objects.bulk_create(
+            con_chip,
+            update_conflicts=True,
+            unique_fields=["numero_chip"],
+            update_fields=CAMPOS_MASCOTA_ACTUALIZABLES + ["nombre"],
+        )
+        # Upsert por clave primaria: mucho más rápido que bulk_update (CASE WHEN)
+        Mascota.objects.bulk_create(
+            actualizar,
+            update_conflicts=True,
+            unique_fields=["id"],
+            update_fields=CAMPOS_MASCOTA_ACTUALIZABLES,
+        )
@@ -0,0 +1,57 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from apps.turnos.agenda import purgar_vencidos
+from apps.turnos.archivo import archivar, restar_meses
+
+
+class Command(BaseCommand):
+    help = (
+        "Borra los turnos libres vencidos y mueve a TurnoArchivado los turnos "
+        "con más de N meses, por lotes (se puede cortar y volver a correr)"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--meses",
+            type=int,
+            default=getattr(settings, "TURNOS_ARCHIVO_MESES", 12),
+            help="Antigüedad mínima de los turnos a archivar (por defecto TURNOS_ARCHIVO_MESES)",
+        )
+        parser.add_argument(
+            "--lote", type=int, default=2000, help="Turnos movidos por transacción"
+        )
+        parser.add_argument(
+            "--pausa",
+            type=float,
+            default=0,
+            help="Segundos de espera entre lotes",
+        )
+        parser.add_argument(
+            "--max-lotes",
+            type=int,
+            default=None,
+            help="Cortar después de estos lotes (la próxima corrida continúa)",
+        )
+
+    def handle(self, *args, **options):
+        hoy = timezone.localdate()
+
+        purgados = purgar_vencidos(hoy, lote=options["lote"])
+        self.stdout.write(
+            self.style.SUCCESS(f"✓ {purgados} turno(s) libre(s) vencido(s) eliminado(s)")
+        )
+
+        limite = restar_meses(hoy, options["meses"])
+        archivados = archivar(
+            limite,
+            tamano=options["lote"],
+            pausa=options["pausa"],
+            max_lotes=options["max_lotes"],
+        )
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"✓ {archivados} turno(s) anterior(es) al {limite:%d/%m/%Y} archivado(s)"
+            )
+        )
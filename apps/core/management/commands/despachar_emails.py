@@ -0,0 +1,97 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from apps.core.outbox import conexion_outbox, despachar_lote, reclamar_lote
+from apps.turnos.lista_espera import vencer_ofertas
+from apps.turnos.notificaciones import encolar_recordatorios
+
+
+class Command(BaseCommand):
+    help = "Envía por lotes los emails encolados en el outbox"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--lote", type=int, default=100, help="Emails por conexión al servidor"
+        )
+        parser.add_argument(
+            "--max-intentos",
+            type=int,
+            default=5,
+            help="Intentos antes de marcar un email como fallido",
+        )
+        parser.add_argument(
+            "--max-por-minuto",
+            type=int,
+            default=getattr(settings, "OUTBOX_MAX_POR_MINUTO", 0),
+            help="Límite de envíos por minuto (0 = sin límite)",
+        )
+        parser.add_argument(
+            "--backend",
+            default=None,
+            help="Backend de email (por defecto RECORDATORIOS_EMAIL_BACKEND o EMAIL_BACKEND)",
+        )
+        parser.add_argument(
+            "--recordatorios",
+            action="store_true",
+            help="Encolar antes los recordatorios de los turnos de mañana",
+        )
+        parser.add_argument(
+            "--lista-espera",
+            action="store_true",
+            help="Vencer ofertas de la lista de espera y ofrecer esos turnos al siguiente",
+        )
+        parser.add_argument(
+            "--continuo",
+            action="store_true",
+            help="No terminar: volver a revisar el outbox cada --intervalo segundos",
+        )
+        parser.add_argument(
+            "--intervalo",
+            type=int,
+            default=30,
+            help="Segundos de espera entre revisiones en modo continuo",
+        )
+
+    def handle(self, *args, **options):
+        if options["recordatorios"]:
+            total = encolar_recordatorios()
+            self.stdout.write(f"Recordatorios de mañana: {total} turno(s)")
+
+        connection = conexion_outbox(options["backend"])
+
+        while True:
+            if options["lista_espera"]:
+                vencidas, reofrecidas = vencer_ofertas()
+                if vencidas:
+                    self.stdout.write(
+                        f"Lista de espera: {vencidas} oferta(s) vencida(s), "
+                        f"{reofrecidas} turno(s) ofrecido(s) de nuevo"
+                    )
+            enviados, fallidos = self.vaciar(connection, options)
+            if enviados or fallidos or not options["continuo"]:
+                self.stdout.write(
+                    self.style.SUCCESS(
+                        f"✓ {enviados} email(s) enviado(s), {fallidos} con error"
+                    )
+                )
+            if not options["continuo"]:
+                break
+            time.sleep(options["intervalo"])
+
+    def vaciar(self, connection, options):
+        total_enviados = total_fallidos = 0
+        while True:
+            lote = reclamar_lote(options["lote"])
+            if not lote:
+                break
+            enviados, fallidos = despachar_lote(
+                lote,
+                connection,
+                max_intentos=options["max_intentos"],
+                max_por_minuto=options["max_por_minuto"],
+            )
+            total_enviados += enviados
+            total_fallidos += fallidos
+        return total_enviados, total_fallidos
@@ -0,0 +1,209 @@
+from datetime import timedelta
+from itertools import groupby
+
+from django.conf import settings
+from django.core.mail import EmailMessage, get_connection
+from django.core.management.base import BaseCommand
+from django.db.models import Exists, OuterRef, Q
+from django.template.loader import get_template
+from django.utils import timezone
+
+from apps.historiales.models import Vacuna, RecordatorioVacuna
+
+CAMPOS = (
+    "id",
+    "nombre",
+    "fecha_proxima_aplicacion",
+    "mascota__nombre",
+    "mascota__dueno_id",
+    "mascota__dueno__email",
+    "mascota__dueno__first_name",
+    "mascota__dueno__last_name",
+    "mascota__dueno__clinica_id",
+    "mascota__dueno__clinica__nombre",
+    "mascota__dueno__clinica__email",
+)
+
+
+class Command(BaseCommand):
+    help = "Envía recordatorios de vacunas próximas y vencidas, agrupados por cliente"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--dias-anticipacion",
+            type=int,
+            default=7,
+            help="Avisar vacunas que vencen dentro de estos días",
+        )
+        parser.add_argument(
+            "--dias-vencidas",
+            type=int,
+            default=30,
+            help="Avisar vacunas vencidas hace como máximo estos días",
+        )
+        parser.add_argument(
+            "--lote",
+            type=int,
+            default=200,
+            help="Emails enviados por cada conexión al servidor de correo",
+        )
+        parser.add_argument(
+            "--backend",
+            default=None,
+            help="Backend de email (por defecto RECORDATORIOS_EMAIL_BACKEND o EMAIL_BACKEND)",
+        )
+        parser.add_argument(
+            "--dry-run",
+            action="store_true",
+            help="Calcular los envíos sin mandar emails ni registrar nada",
+        )
+
+    def handle(self, *args, **options):
+        self.hoy = timezone.localdate()
+        self.dry_run = options["dry_run"]
+        self.tamano_lote = options["lote"]
+        self.plantilla = get_template("emails/recordatorio_vacunas.txt")
+        self.connection = get_connection(
+            backend=options["backend"]
+            or getattr(settings, "RECORDATORIOS_EMAIL_BACKEND", None)
+        )
+        self.enviados = 0
+        self.vacunas_avisadas = 0
+
+        desde = self.hoy - timedelta(days=options["dias_vencidas"])
+        hasta = self.hoy + timedelta(days=options["dias_anticipacion"])
+
+        # Una sola consulta por rango sobre el índice de fecha_proxima_aplicacion,
+        # ordenada por clínica y cliente para agrupar sin cargar todo en memoria
+        filas = self.vacunas_pendientes(desde, hasta).iterator(chunk_size=2000)
+
+        lote = []
+        for _, grupo in groupby(
+            filas,
+            key=lambda f: (f["mascota__dueno__clinica_id"], f["mascota__dueno_id"]),
+        ):
+            lote.append(self.armar_email(list(grupo)))
+            if len(lote) >= self.tamano_lote:
+                self.enviar_lote(lote)
+        self.enviar_lote(lote)
+
+        accion = "a enviar" if self.dry_run else "enviados"
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"✓ Recordatorios {accion}: {self.enviados} email(s), "
+                f"{self.vacunas_avisadas} vacuna(s)"
+            )
+        )
+
+    def vacunas_pendientes(self, desde, hasta):
+        ya_avisada = RecordatorioVacuna.objects.filter(
+            vacuna=OuterRef("pk"), fecha_objetivo=OuterRef("fecha_proxima_aplicacion")
+        )
+        # Si la mascota ya recibió una dosis posterior de la misma vacuna, no avisar
+        reaplicada = Vacuna.objects.filter(
+            mascota=OuterRef("mascota"),
+            nombre=OuterRef("nombre"),
+            fecha_aplicacion__gt=OuterRef("fecha_aplicacion"),
+        )
+
+        return (
+            Vacuna.objects.filter(
+                fecha_proxima_aplicacion__range=(desde, hasta),
+                mascota__activo=True,
+                mascota__dueno__is_active=True,
+            )
+            .exclude(mascota__dueno__email="")
+            .filter(
+                Q(
+                    ~Exists(ya_avisada.filter(tipo=RecordatorioVacuna.VENCIDA)),
+                    fecha_proxima_aplicacion__lt=self.hoy,
+                )
+                | Q(
+                    ~Exists(ya_avisada.filter(tipo=RecordatorioVacuna.PROXIMA)),
+                    fecha_proxima_aplicacion__gte=self.hoy,
+                )
+            )
+            .filter(~Exists(reaplicada))
+            .order_by(
+                "mascota__dueno__clinica_id",
+                "mascota__dueno_id",
+                "fecha_proxima_aplicacion",
+            )
+            .values(*CAMPOS)
+        )
+
+    def armar_email(self, filas):
+        """Un email por cliente y clínica con todas sus vacunas pendientes"""
+        primera = filas[0]
+        vencidas, proximas, recordatorios = [], [], []
+
+        for fila in filas:
+            vencida = fila["fecha_proxima_aplicacion"] < self.hoy
+            datos = {
+                "mascota": fila["mascota__nombre"],
+                "nombre": fila["nombre"],
+                "fecha": fila["fecha_proxima_aplicacion"],
+            }
+            (vencidas if vencida else proximas).append(datos)
+            recordatorios.append(
+                RecordatorioVacuna(
+                    vacuna_id=fila["id"],
+                    tipo=(
+                        RecordatorioVacuna.VENCIDA
+                        if vencida
+                        else RecordatorioVacuna.PROXIMA
+                    ),
+                    fecha_objetivo=fila["fecha_proxima_aplicacion"],
+                )
+            )
+
+        clinica_nombre = primera["mascota__dueno__clinica__nombre"] or "Tu veterinaria"
+        cuerpo = self.plantilla.render(
+            {
+                "cliente_nombre": " ".join(
+                    filter(
+                        None,
+                        [
+                            primera["mascota__dueno__first_name"],
+                            primera["mascota__dueno__last_name"],
+                        ],
+                    )
+                )
+                or "cliente",
+                "clinica_nombre": clinica_nombre,
+                "vencidas": vencidas,
+                "proximas": proximas,
+            }
+        )
+        asunto = (
+            f"{clinica_nombre}: vacunas vencidas de tus mascotas"
+            if vencidas
+            else f"{clinica_nombre}: próximas vacunas de tus mascotas"
+        )
+        clinica_email = primera["mascota__dueno__clinica__email"]
+        email = EmailMessage(
+            subject=asunto,
+            body=cuerpo,
+            to=[primera["mascota__dueno__email"]],
+            reply_to=[clinica_email] if clinica_email else None,
+            connection=self.connection,
+        )
+        return email, recordatorios
+
+    def enviar_lote(self, lote):
+        """Envía el lote por una única conexión y registra los recordatorios"""
+        if not lote:
+            return
+
+        emails = [email for email, _ in lote]
+        recordatorios = [r for _, grupo in lote for r in grupo]
+
+        if not self.dry_run:
+            self.connection.send_messages(emails)
+            RecordatorioVacuna.objects.bulk_create(
+                recordatorios, batch_size=1000, ignore_conflicts=True
+            )
+
+        self.enviados += len(emails)
+        self.vacunas_avisadas += len(recordatorios)
+        lote.clear()
@@ -0,0 +1,59 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from apps.accounts.models import CustomUser
+from apps.turnos.agenda import horizonte_dias, materializar, purgar_vencidos
+
+
+class Command(BaseCommand):
+    help = (
+        "Mantiene el horizonte de turnos libres: genera los días que faltan de "
+        "reglas y bloques de disponibilidad y purga los turnos libres vencidos "
+        "(pensado para correr cada noche)"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--dias",
+            type=int,
+            default=None,
+            help="Horizonte en días (por defecto AGENDA_HORIZONTE_DIAS)",
+        )
+        parser.add_argument(
+            "--veterinario",
+            type=int,
+            default=None,
+            help="ID de un veterinario (por defecto, todos)",
+        )
+        parser.add_argument(
+            "--sin-purgar",
+            action="store_true",
+            help="No borrar los turnos libres de días pasados",
+        )
+
+    def handle(self, *args, **options):
+        dias = options["dias"] if options["dias"] is not None else horizonte_dias()
+        hasta = timezone.localdate() + timedelta(days=dias)
+
+        veterinario = None
+        if options["veterinario"]:
+            veterinario = CustomUser.objects.filter(
+                pk=options["veterinario"], rol="veterinario"
+            ).first()
+            if not veterinario:
+                raise CommandError(f"No existe el veterinario {options['veterinario']}")
+
+        total = materializar(hasta, veterinario=veterinario)
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"✓ {total} turno(s) generado(s) hasta el {hasta:%d/%m/%Y}"
+            )
+        )
+
+        if not options["sin_purgar"]:
+            purgados = purgar_vencidos()
+            self.stdout.write(
+                self.style.SUCCESS(f"✓ {purgados} turno(s) libre(s) vencido(s) eliminado(s)")
+            )
@@ -0,0 +1,58 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import Q
+
+from apps.clinicas.models import Clinica
+from apps.core.importar import ErrorFila, ImportadorClientes
+
+
+class Command(BaseCommand):
+    help = "Importa clientes y mascotas de una clínica desde un CSV"
+
+    def add_arguments(self, parser):
+        parser.add_argument("archivo", help="Ruta del CSV (UTF-8)")
+        parser.add_argument(
+            "--clinica", required=True, help="ID o slug de la clínica destino"
+        )
+        parser.add_argument(
+            "--lote", type=int, default=1000, help="Filas procesadas por transacción"
+        )
+        parser.add_argument(
+            "--max-errores",
+            type=int,
+            default=50,
+            help="Cantidad de errores a mostrar (todos se cuentan)",
+        )
+
+    def handle(self, *args, **options):
+        filtro = Q(slug=options["clinica"])
+        if options["clinica"].isdigit():
+            filtro |= Q(pk=int(options["clinica"]))
+        clinica = Clinica.objects.filter(filtro).select_related("admin").first()
+        if not clinica:
+            raise CommandError(f"No existe la clínica {options['clinica']}")
+
+        importador = ImportadorClientes(
+            clinica, aprobado_por=clinica.admin, tamano_lote=options["lote"]
+        )
+        inicio = time.monotonic()
+        try:
+            with open(options["archivo"], encoding="utf-8-sig", newline="") as archivo:
+                importador.importar(archivo)
+        except (OSError, ErrorFila) as e:
+            raise CommandError(str(e))
+
+        for linea, mensaje in importador.errores[: options["max_errores"]]:
+            self.stdout.write(self.style.WARNING(f"Línea {linea}: {mensaje}"))
+
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"✓ Clientes: {importador.clientes_creados} creados, "
+                f"{importador.clientes_actualizados} actualizados | "
+                f"Mascotas: {importador.mascotas_creadas} creadas, "
+                f"{importador.mascotas_actualizadas} actualizadas | "
+                f"{len(importador.errores)} fila(s) con error "
+                f"({time.monotonic() - inicio:.1f}s)"
+            )
+        )
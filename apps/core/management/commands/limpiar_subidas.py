@@ -0,0 +1,30 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from apps.historiales.models import SubidaArchivo
+from apps.historiales.subidas import descartar_subida
+
+
+class Command(BaseCommand):
+    help = "Elimina subidas por partes abandonadas y sus archivos temporales"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--horas",
+            type=int,
+            default=24,
+            help="Antigüedad mínima (sin actividad) para descartar una subida",
+        )
+
+    def handle(self, *args, **options):
+        limite = timezone.now() - timedelta(hours=options["horas"])
+        abandonadas = SubidaArchivo.objects.filter(fecha_actualizacion__lt=limite)
+
+        total = 0
+        for subida in abandonadas.iterator():
+            descartar_subida(subida)
+            total += 1
+
+        self.stdout.write(self.style.SUCCESS(f"✓ {total} subida(s) descartada(s)"))
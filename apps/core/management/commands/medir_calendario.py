@@ -0,0 +1,83 @@
+import asyncio
+import time
+from concurrent.futures import ThreadPoolExecutor
+from statistics import quantiles
+
+from django.core.management.base import BaseCommand, CommandError
+from django.test import AsyncClient, Client
+from django.urls import reverse
+
+from apps.accounts.models import CustomUser
+
+
+class Command(BaseCommand):
+    help = (
+        "Compara N consultas simultáneas al calendario del veterinario "
+        "(turnos:turnos_json) atendidas con un pool de hilos (como un worker "
+        "WSGI) y con el handler ASGI async, dentro del mismo proceso."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--veterinario", type=int, required=True, help="ID del veterinario"
+        )
+        parser.add_argument(
+            "--solicitudes", type=int, default=1000, help="Consultas simultáneas"
+        )
+        parser.add_argument(
+            "--hilos",
+            type=int,
+            default=40,
+            help="Hilos del modo sync (los que tendría el worker)",
+        )
+
+    def handle(self, *args, **options):
+        veterinario = CustomUser.objects.filter(
+            pk=options["veterinario"], rol="veterinario"
+        ).first()
+        if not veterinario:
+            raise CommandError(f"No existe el veterinario {options['veterinario']}")
+
+        cliente = Client()
+        cliente.force_login(veterinario)
+        self.cookies = cliente.cookies
+        self.url = reverse("turnos:turnos_json")
+        n = options["solicitudes"]
+
+        self.informar("sync", *self.medir_sync(n, options["hilos"]))
+        self.informar("async", *asyncio.run(self.medir_async(n)))
+
+    def medir_sync(self, n, hilos):
+        def consulta(_):
+            cliente = Client()
+            cliente.cookies = self.cookies
+            inicio = time.perf_counter()
+            cliente.get(self.url)
+            return time.perf_counter() - inicio
+
+        inicio = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=hilos) as pool:
+            latencias = list(pool.map(consulta, range(n)))
+        return latencias, time.perf_counter() - inicio
+
+    async def medir_async(self, n):
+        cliente = AsyncClient()
+        cliente.cookies = self.cookies
+
+        async def consulta():
+            inicio = time.perf_counter()
+            await cliente.get(self.url)
+            return time.perf_counter() - inicio
+
+        inicio = time.perf_counter()
+        latencias = await asyncio.gather(*(consulta() for _ in range(n)))
+        return latencias, time.perf_counter() - inicio
+
+    def informar(self, modo, latencias, total):
+        p95 = quantiles(latencias, n=100)[94] if len(latencias) > 1 else latencias[0]
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"✓ {modo}: {len(latencias)} consultas en {total:.2f} s "
+                f"({len(latencias) / total:.0f}/s, p95 {p95 * 1000:.0f} ms)"
+            )
+        )
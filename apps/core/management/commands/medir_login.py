@@ -0,0 +1,74 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+from statistics import quantiles
+
+from django.conf import settings
+from django.contrib.auth.hashers import check_password, get_hasher, make_password
+from django.core.management.base import BaseCommand, CommandError
+
+
+class Command(BaseCommand):
+    help = (
+        "Mide cuántos logins por segundo soporta un proceso con el hasher de "
+        "contraseñas configurado, con N verificaciones concurrentes (el costo "
+        "del login es casi todo el hash). Sirve para dimensionar workers."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--hasher",
+            default=None,
+            help="Algoritmo a medir (por defecto el primero de PASSWORD_HASHERS)",
+        )
+        parser.add_argument(
+            "--concurrencia", type=int, default=8, help="Logins simultáneos"
+        )
+        parser.add_argument(
+            "--intentos", type=int, default=200, help="Total de logins a medir"
+        )
+        parser.add_argument(
+            "--objetivo",
+            type=int,
+            default=None,
+            help="Logins por segundo esperados en el pico (estima procesos necesarios)",
+        )
+
+    def handle(self, *args, **options):
+        try:
+            hasher = get_hasher(options["hasher"] or "default")
+        except ValueError as e:
+            raise CommandError(str(e))
+        encoded = make_password("contraseña-de-prueba", hasher=hasher.algorithm)
+
+        def login(_):
+            inicio = time.perf_counter()
+            if not check_password("contraseña-de-prueba", encoded):
+                raise CommandError("La verificación falló")
+            return time.perf_counter() - inicio
+
+        inicio = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=options["concurrencia"]) as pool:
+            latencias = list(pool.map(login, range(options["intentos"])))
+        total = time.perf_counter() - inicio
+
+        por_segundo = len(latencias) / total
+        if len(latencias) > 1:
+            percentiles = quantiles(latencias, n=100)
+            p50, p95 = percentiles[49], percentiles[94]
+        else:
+            p50 = p95 = latencias[0]
+
+        self.stdout.write(f"Perfil: {getattr(settings, 'HASHERS_PERFIL', '-')}")
+        self.stdout.write(f"Hasher: {hasher.algorithm}")
+        self.stdout.write(
+            f"Concurrencia: {options['concurrencia']} · Logins: {len(latencias)}"
+        )
+        self.stdout.write(f"Latencia p50: {p50 * 1000:.1f} ms · p95: {p95 * 1000:.1f} ms")
+        self.stdout.write(self.style.SUCCESS(f"✓ {por_segundo:.1f} login(s) por segundo"))
+
+        if options["objetivo"]:
+            procesos = -(-options["objetivo"] // max(int(por_segundo), 1))
+            self.stdout.write(
+                f"Para {options['objetivo']} logins/s hacen falta ~{procesos} "
+                f"proceso(s) como este"
+            )
@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand
+
+from apps.turnos.retenciones import purgar_vencidas
+
+
+class Command(BaseCommand):
+    help = (
+        "Borra por lotes las retenciones de turnos ya vencidas (las vencidas "
+        "no bloquean reservas; esto solo mantiene chica la tabla)"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--lote", type=int, default=1000, help="Retenciones borradas por consulta"
+        )
+
+    def handle(self, *args, **options):
+        total = purgar_vencidas(options["lote"])
+        self.stdout.write(self.style.SUCCESS(f"✓ {total} retención(es) vencida(s) eliminada(s)"))
@@ -0,0 +1,49 @@
+import time
+from importlib import import_module
+
+from django.conf import settings
+from django.contrib.sessions.backends.db import SessionStore as DBStore
+from django.contrib.sessions.models import Session
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+
+class Command(BaseCommand):
+    help = (
+        "Borra por lotes las sesiones vencidas de django_session (a diferencia "
+        "de clearsessions, sin un único DELETE sobre toda la tabla)"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--lote", type=int, default=5000, help="Sesiones borradas por consulta"
+        )
+        parser.add_argument(
+            "--pausa",
+            type=float,
+            default=0,
+            help="Segundos de espera entre lotes",
+        )
+
+    def handle(self, *args, **options):
+        engine = import_module(settings.SESSION_ENGINE)
+        if not issubclass(engine.SessionStore, DBStore):
+            self.stdout.write(
+                f"Las sesiones no se guardan en la base ({settings.SESSION_ENGINE}); "
+                "vencen solas."
+            )
+            return
+
+        vencidas = Session.objects.filter(expire_date__lt=timezone.now())
+        total = 0
+        while True:
+            claves = list(
+                vencidas.values_list("session_key", flat=True)[: options["lote"]]
+            )
+            if not claves:
+                break
+            total += Session.objects.filter(session_key__in=claves).delete()[0]
+            if options["pausa"]:
+                time.sleep(options["pausa"])
+
+        self.stdout.write(self.style.SUCCESS(f"✓ {total} sesión(es) vencida(s) eliminada(s)"))
@@ -0,0 +1,58 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import Max, Min
+from django.utils.dateparse import parse_date
+
+from apps.turnos.estadisticas import recalcular_rango
+from apps.turnos.models import Turno, TurnoArchivado
+
+
+class Command(BaseCommand):
+    help = (
+        "Vuelve a calcular los resúmenes diarios de turnos (estadísticas de "
+        "ocupación) desde Turno y TurnoArchivado, por lotes de días"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--desde", help="Fecha AAAA-MM-DD (por defecto, el primer turno)")
+        parser.add_argument("--hasta", help="Fecha AAAA-MM-DD (por defecto, el último turno)")
+        parser.add_argument(
+            "--clinica", type=int, default=None, help="ID de una clínica (por defecto, todas)"
+        )
+        parser.add_argument(
+            "--dias-por-lote", type=int, default=31, help="Días recalculados por transacción"
+        )
+
+    def _fecha(self, texto, opcion):
+        fecha = parse_date(texto) if texto else None
+        if texto and fecha is None:
+            raise CommandError(f"Fecha inválida en --{opcion}: {texto}")
+        return fecha
+
+    def handle(self, *args, **options):
+        desde = self._fecha(options["desde"], "desde")
+        hasta = self._fecha(options["hasta"], "hasta")
+
+        if desde is None or hasta is None:
+            limites = [
+                modelo.objects.aggregate(Min("fecha"), Max("fecha"))
+                for modelo in (Turno, TurnoArchivado)
+            ]
+            primeros = [l["fecha__min"] for l in limites if l["fecha__min"]]
+            ultimos = [l["fecha__max"] for l in limites if l["fecha__max"]]
+            if not primeros:
+                self.stdout.write("No hay turnos.")
+                return
+            desde = desde or min(primeros)
+            hasta = hasta or max(ultimos)
+
+        total = recalcular_rango(
+            desde,
+            hasta,
+            clinica_id=options["clinica"],
+            dias_por_lote=options["dias_por_lote"],
+        )
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"✓ {total} resumen(es) diario(s) del {desde:%d/%m/%Y} al {hasta:%d/%m/%Y}"
+            )
+        )
@@ -0,0 +1,143 @@
+import os
+from datetime import timedelta
+
+from django.db.models import Count, F, Sum
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from apps.core.models import Blob
+from apps.core.storage import DIRECTORIO_BLOBS, AlmacenamientoDeduplicado
+from apps.historiales.models import ArchivoAdjunto, SubidaArchivo
+from apps.mascotas.models import Mascota
+
+TAMANO_LOTE = 1000
+
+
+class Command(BaseCommand):
+    help = "Elimina blobs sin referencias y muestra cuánto espacio ahorra la deduplicación"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--recalcular",
+            action="store_true",
+            help="Recalcula los contadores de referencias desde las tablas",
+        )
+        parser.add_argument(
+            "--gracia",
+            type=int,
+            default=1,
+            help="Horas que un blob sin referencias se conserva antes de borrarlo",
+        )
+        parser.add_argument(
+            "--dry-run",
+            action="store_true",
+            help="Solo informar, sin borrar nada",
+        )
+
+    def handle(self, *args, **options):
+        storage = AlmacenamientoDeduplicado()
+
+        if options["recalcular"]:
+            self.recalcular_referencias()
+
+        limite = timezone.now() - timedelta(hours=options["gracia"])
+        huerfanos = Blob.objects.filter(referencias__lte=0, fecha_actualizacion__lt=limite)
+
+        eliminados = 0
+        bytes_liberados = 0
+        for blob in huerfanos.iterator(chunk_size=TAMANO_LOTE):
+            if not options["dry_run"]:
+                # Se vuelve a comprobar al borrar la fila: una subida del mismo
+                # contenido pudo sumarle una referencia desde que se leyó
+                if not huerfanos.filter(pk=blob.pk).delete()[0]:
+                    continue
+                storage.eliminar_blob(blob.nombre)
+            eliminados += 1
+            bytes_liberados += blob.tamano
+
+        if not options["dry_run"]:
+            self.limpiar_temporales(storage, limite)
+
+        accion = "a eliminar" if options["dry_run"] else "eliminados"
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"✓ Blobs huérfanos {accion}: {eliminados} ({self.formatear(bytes_liberados)})"
+            )
+        )
+        self.reporte()
+
+    def recalcular_referencias(self):
+        """Cuenta cuántas filas apuntan a cada blob y corrige los contadores"""
+        conteos = {}
+        fuentes = [
+            (ArchivoAdjunto.objects.all(), "archivo"),
+            (Mascota.objects.all(), "foto"),
+            (SubidaArchivo.objects.filter(completada=True), "archivo"),
+        ]
+        for queryset, campo in fuentes:
+            filas = (
+                queryset.filter(**{f"{campo}__startswith": f"{DIRECTORIO_BLOBS}/"})
+                .values_list(campo)
+                .annotate(total=Count("pk"))
+                .order_by()
+            )
+            for nombre, total in filas.iterator():
+                conteos[nombre] = conteos.get(nombre, 0) + total
+
+        cambios = []
+        corregidos = 0
+        for blob in Blob.objects.only("id", "nombre", "referencias").iterator(
+            chunk_size=TAMANO_LOTE
+        ):
+            real = conteos.get(blob.nombre, 0)
+            if blob.referencias != real:
+                blob.referencias = real
+                blob.fecha_actualizacion = timezone.now()
+                cambios.append(blob)
+            if len(cambios) >= TAMANO_LOTE:
+                corregidos += self.guardar(cambios)
+        corregidos += self.guardar(cambios)
+
+        self.stdout.write(f"• Contadores corregidos: {corregidos}")
+
+    def guardar(self, cambios):
+        total = len(cambios)
+        if cambios:
+            Blob.objects.bulk_update(cambios, ["referencias", "fecha_actualizacion"])
+            cambios.clear()
+        return total
+
+    def limpiar_temporales(self, storage, limite):
+        """Borra temporales de escrituras interrumpidas"""
+        directorio = storage.path(os.path.join(DIRECTORIO_BLOBS, "tmp"))
+        if not os.path.isdir(directorio):
+            return
+        for nombre in os.listdir(directorio):
+            ruta = os.path.join(directorio, nombre)
+            if os.path.getmtime(ruta) < limite.timestamp():
+                os.remove(ruta)
+
+    def reporte(self):
+        datos = Blob.objects.filter(referencias__gt=0).aggregate(
+            blobs=Count("id"),
+            fisicos=Sum("tamano"),
+            logicos=Sum(F("tamano") * F("referencias")),
+        )
+        fisicos = datos["fisicos"] or 0
+        logicos = datos["logicos"] or 0
+
+        self.stdout.write("\n📦 Almacenamiento deduplicado")
+        self.stdout.write(f"• Blobs en uso: {datos['blobs']}")
+        self.stdout.write(f"• Ocupado en disco: {self.formatear(fisicos)}")
+        self.stdout.write(f"• Sin deduplicar ocuparía: {self.formatear(logicos)}")
+        self.stdout.write(
+            self.style.SUCCESS(f"• Ahorro: {self.formatear(logicos - fisicos)}")
+        )
+
+    @staticmethod
+    def formatear(cantidad):
+        for unidad in ["B", "KB", "MB", "GB"]:
+            if cantidad < 1024:
+                return f"{cantidad:.1f} {unidad}"
+            cantidad /= 1024
+        return f"{cantidad:.1f} TB"
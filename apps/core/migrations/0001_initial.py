@@ -0,0 +1,31 @@
+# Generated by Django 5.2.6 on 2026-10-19 15:33
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Blob',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('sha256', models.CharField(max_length=64, unique=True)),
+                ('nombre', models.CharField(help_text='Ruta del blob en el storage', max_length=255, unique=True)),
+                ('tamano', models.PositiveBigIntegerField(help_text='Tamaño en bytes')),
+                ('referencias', models.IntegerField(default=0)),
+                ('fecha_creacion', models.DateTimeField(auto_now_add=True)),
+                ('fecha_actualizacion', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'verbose_name': 'Blob',
+                'verbose_name_plural': 'Blobs',
+                'indexes': [models.Index(fields=['referencias', 'fecha_actualizacion'], name='core_blob_referen_4f9aea_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,37 @@
+# Generated by Django 5.2.6 on 2026-10-19 15:40
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='EmailSaliente',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('tipo', models.CharField(max_length=30)),
+                ('destinatario', models.EmailField(max_length=254)),
+                ('asunto', models.CharField(max_length=255)),
+                ('cuerpo', models.TextField()),
+                ('clave', models.CharField(blank=True, help_text='Evita encolar dos veces el mismo aviso', max_length=100, null=True, unique=True)),
+                ('estado', models.CharField(choices=[('pendiente', 'Pendiente'), ('enviado', 'Enviado'), ('fallido', 'Fallido')], default='pendiente', max_length=10)),
+                ('intentos', models.PositiveIntegerField(default=0)),
+                ('proximo_intento', models.DateTimeField(default=django.utils.timezone.now)),
+                ('ultimo_error', models.TextField(blank=True)),
+                ('fecha_creacion', models.DateTimeField(auto_now_add=True)),
+                ('fecha_envio', models.DateTimeField(blank=True, null=True)),
+            ],
+            options={
+                'verbose_name': 'Email saliente',
+                'verbose_name_plural': 'Emails salientes',
+                'ordering': ['id'],
+                'indexes': [models.Index(fields=['estado', 'proximo_intento'], name='core_emails_estado_e1a709_idx')],
+            },
+        ),
+    ]
@@ -1,3 +1,73 @@
 from django.db import models
+from django.utils import timezone
 
-# Create your models here.
+
+class Blob(models.Model):
+    """
+    Contenido almacenado una sola vez, direccionado por su hash SHA-256.
+    Varios ArchivoAdjunto / Mascota.foto pueden apuntar al mismo blob.
+    """
+
+    sha256 = models.CharField(max_length=64, unique=True)
+    nombre = models.CharField(
+        max_length=255, unique=True, help_text="Ruta del blob en el storage"
+    )
+    tamano = models.PositiveBigIntegerField(help_text="Tamaño en bytes")
+    referencias = models.IntegerField(default=0)
+
+    fecha_creacion = models.DateTimeField(auto_now_add=True)
+    fecha_actualizacion = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        verbose_name = "Blob"
+        verbose_name_plural = "Blobs"
+        indexes = [models.Index(fields=["referencias", "fecha_actualizacion"])]
+
+    def __str__(self):
+        return f"{self.sha256[:12]} ({self.referencias} ref.)"
+
+
+class EmailSaliente(models.Model):
+    """
+    Outbox de emails: las vistas encolan filas dentro de su transacción y el
+    comando `despachar_emails` las envía por lotes, fuera del request.
+    """
+
+    PENDIENTE = "pendiente"
+    ENVIADO = "enviado"
+    FALLIDO = "fallido"
+
+    ESTADO_CHOICES = [
+        (PENDIENTE, "Pendiente"),
+        (ENVIADO, "Enviado"),
+        (FALLIDO, "Fallido"),
+    ]
+
+    tipo = models.CharField(max_length=30)
+    destinatario = models.EmailField()
+    asunto = models.CharField(max_length=255)
+    cuerpo = models.TextField()
+    clave = models.CharField(
+        max_length=100,
+        unique=True,
+        null=True,
+        blank=True,
+        help_text="Evita encolar dos veces el mismo aviso",
+    )
+
+    estado = models.CharField(max_length=10, choices=ESTADO_CHOICES, default=PENDIENTE)
+    intentos = models.PositiveIntegerField(default=0)
+    proximo_intento = models.DateTimeField(default=timezone.now)
+    ultimo_error = models.TextField(blank=True)
+
+    fecha_creacion = models.DateTimeField(auto_now_add=True)
+    fecha_envio = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        verbose_name = "Email saliente"
+        verbose_name_plural = "Emails salientes"
+        ordering = ["id"]
+        indexes = [models.Index(fields=["estado", "proximo_intento"])]
+
+    def __str__(self):
+        return f"{self.tipo} → {self.destinatario} ({self.estado})"
@@ -0,0 +1,119 @@
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.mail import EmailMessage, get_connection
+from django.db import transaction
+from django.utils import timezone
+
+from .models import EmailSaliente
+
+
+def encolar(tipo, destinatario, asunto, cuerpo, clave=None):
+    """
+    Agrega un email al outbox. Debe llamarse dentro de la transacción que
+    produce el aviso: si esa transacción se revierte, el email tampoco sale.
+    """
+    if not destinatario:
+        return None
+    return EmailSaliente.objects.create(
+        tipo=tipo,
+        destinatario=destinatario,
+        asunto=asunto,
+        cuerpo=cuerpo,
+        clave=clave,
+    )
+
+
+def encolar_varios(emails):
+    """Encola muchos EmailSaliente en bloque; los de clave repetida se ignoran"""
+    return EmailSaliente.objects.bulk_create(
+        [e for e in emails if e.destinatario], batch_size=500, ignore_conflicts=True
+    )
+
+
+def reclamar_lote(tamano, reserva_minutos=10):
+    """
+    Toma hasta `tamano` emails listos para enviar. Se posterga su
+    proximo_intento para que otro worker no los tome mientras se envían;
+    si el proceso muere, vuelven a quedar disponibles al vencer la reserva.
+    """
+    ahora = timezone.now()
+    with transaction.atomic():
+        lote = list(
+            EmailSaliente.objects.select_for_update(skip_locked=True)
+            .filter(estado=EmailSaliente.PENDIENTE, proximo_intento__lte=ahora)
+            .order_by("proximo_intento", "id")[:tamano]
+        )
+        if lote:
+            EmailSaliente.objects.filter(pk__in=[e.pk for e in lote]).update(
+                proximo_intento=ahora + timedelta(minutes=reserva_minutos)
+            )
+    return lote
+
+
+def _reprogramar(email, error, max_intentos):
+    email.intentos += 1
+    email.ultimo_error = str(error)[:1000]
+    if email.intentos >= max_intentos:
+        email.estado = EmailSaliente.FALLIDO
+    else:
+        # Reintento con espera exponencial: 2, 4, 8... minutos
+        email.proximo_intento = timezone.now() + timedelta(minutes=2**email.intentos)
+    return email
+
+
+def despachar_lote(lote, connection, max_intentos=5, max_por_minuto=0):
+    """
+    Envía un lote por una única conexión abierta. Cada email se envía por
+    separado para que un destinatario rechazado no haga fallar al resto; si
+    la conexión no se puede abrir (servidor caído), todo el lote se
+    reprograma con la misma espera. Devuelve (enviados, fallidos).
+    """
+    intervalo = 60 / max_por_minuto if max_por_minuto else 0
+    enviados, fallidos = [], []
+    remitente = settings.DEFAULT_FROM_EMAIL
+
+    try:
+        connection.open()
+    except Exception as e:
+        fallidos = [_reprogramar(email, e, max_intentos) for email in lote]
+    else:
+        try:
+            for email in lote:
+                inicio = time.monotonic()
+                mensaje = EmailMessage(
+                    subject=email.asunto,
+                    body=email.cuerpo,
+                    from_email=remitente,
+                    to=[email.destinatario],
+                    connection=connection,
+                )
+                try:
+                    connection.send_messages([mensaje])
+                    enviados.append(email)
+                except Exception as e:
+                    fallidos.append(_reprogramar(email, e, max_intentos))
+
+                if intervalo:
+                    espera = intervalo - (time.monotonic() - inicio)
+                    if espera > 0:
+                        time.sleep(espera)
+        finally:
+            connection.close()
+
+    if enviados:
+        EmailSaliente.objects.filter(pk__in=[e.pk for e in enviados]).update(
+            estado=EmailSaliente.ENVIADO, fecha_envio=timezone.now(), ultimo_error=""
+        )
+    if fallidos:
+        EmailSaliente.objects.bulk_update(
+            fallidos, ["intentos", "ultimo_error", "estado", "proximo_intento"]
+        )
+    return len(enviados), len(fallidos)
+
+
+def conexion_outbox(backend=None):
+    return get_connection(
+        backend=backend or getattr(settings, "RECORDATORIOS_EMAIL_BACKEND", None)
+    )
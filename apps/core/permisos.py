@@ -0,0 +1,70 @@
+from django.contrib import messages
+from django.contrib.auth.views import redirect_to_login
+from django.shortcuts import redirect
+from django.views.generic.detail import SingleObjectMixin
+
+from apps.accounts.principal import aobtener_principal
+
+
+class ObjetoPermisoMixin(SingleObjectMixin):
+    """
+    Carga una sola vez por request el objeto de la vista y evalúa sobre él
+    las reglas de acceso (dueño, clínica, veterinario...).
+
+    El objeto queda en `self.object` antes de llegar al handler, y
+    `get_object()` devuelve siempre esa misma instancia: la vista genérica
+    (DetailView, UpdateView, DeleteView...) no vuelve a consultarlo. Las
+    relaciones que usan las reglas y el template se piden en `get_queryset()`.
+
+    Va después de LoginRequiredMixin y de los mixins de rol, así las reglas
+    solo se evalúan para usuarios autenticados con el rol correcto.
+    """
+
+    mensaje_permiso_denegado = "No tienes permiso para acceder a esta página."
+    url_permiso_denegado = "core:dashboard"
+
+    def tiene_permiso(self, objeto):
+        """Regla de acceso sobre el objeto; las vistas la redefinen"""
+        return True
+
+    def permiso_denegado(self, objeto):
+        messages.error(self.request, self.mensaje_permiso_denegado)
+        return redirect(self.url_permiso_denegado)
+
+    def get_object(self, queryset=None):
+        if queryset is not None:
+            return super().get_object(queryset)
+        if not hasattr(self, "_objeto_permiso"):
+            self._objeto_permiso = super().get_object()
+        return self._objeto_permiso
+
+    def dispatch(self, request, *args, **kwargs):
+        if not request.user.is_authenticated:
+            return super().dispatch(request, *args, **kwargs)
+        self.object = self.get_object()
+        if not self.tiene_permiso(self.object):
+            return self.permiso_denegado(self.object)
+        return super().dispatch(request, *args, **kwargs)
+
+
+class RolAsyncMixin:
+    """
+    Equivalente de LoginRequiredMixin + los mixins de rol para vistas con
+    handlers `async def`. El usuario y el principal se obtienen con
+    request.auser() y el ORM async, así la vista no ocupa un hilo.
+
+    `roles` vacío solo exige usuario autenticado.
+    """
+
+    roles = ()
+
+    async def dispatch(self, request, *args, **kwargs):
+        user = await request.auser()
+        if not user.is_authenticated:
+            return redirect_to_login(request.get_full_path())
+
+        principal = request.principal = await aobtener_principal(user)
+        if self.roles and not (principal and principal.rol in self.roles):
+            messages.error(request, "No tienes permiso para acceder a esta página.")
+            return redirect("core:dashboard")
+        return await super().dispatch(request, *args, **kwargs)
@@ -0,0 +1,132 @@
+import os
+import re
+import hashlib
+import tempfile
+
+from django.db import IntegrityError, transaction
+from django.db.models import F
+from django.core.files.move import file_move_safe
+from django.core.files.storage import FileSystemStorage
+from django.utils import timezone
+
+TAMANO_BLOQUE = 64 * 1024
+DIRECTORIO_BLOBS = "blobs"
+
+_BLOB_RE = re.compile(rf"^{DIRECTORIO_BLOBS}/[0-9a-f]{{2}}/[0-9a-f]{{2}}/([0-9a-f]{{64}})")
+
+
+def sha256_de_nombre(nombre):
+    """Devuelve el hash de un nombre de blob, o None si es un archivo común"""
+    coincidencia = _BLOB_RE.match(nombre or "")
+    return coincidencia.group(1) if coincidencia else None
+
+
+class AlmacenamientoDeduplicado(FileSystemStorage):
+    """
+    Storage direccionado por contenido.
+
+    Cada archivo se guarda en blobs/ab/cd/<sha256><ext>; si el contenido ya
+    existe no se vuelve a escribir y solo se incrementa el contador de
+    referencias del Blob. `delete()` decrementa el contador; los blobs sin
+    referencias los elimina el comando `recolectar_blobs`.
+
+    Los archivos guardados antes de usar este storage siguen funcionando:
+    sus rutas son relativas a MEDIA_ROOT como en FileSystemStorage.
+    """
+
+    def get_available_name(self, name, max_length=None):
+        # El nombre final lo decide el hash, nunca se sobreescribe nada
+        return name
+
+    def _save(self, name, content):
+        from apps.core.models import Blob
+
+        extension = os.path.splitext(name)[1].lower()
+        directorio_tmp = self.path(os.path.join(DIRECTORIO_BLOBS, "tmp"))
+        os.makedirs(directorio_tmp, exist_ok=True)
+
+        sha = hashlib.sha256()
+        tamano = 0
+
+        if hasattr(content, "temporary_file_path"):
+            # Archivo ya en disco: hashear leyendo y luego moverlo sin copiar
+            ruta_origen = content.temporary_file_path()
+            with open(ruta_origen, "rb") as f:
+                for bloque in iter(lambda: f.read(TAMANO_BLOQUE), b""):
+                    sha.update(bloque)
+                    tamano += len(bloque)
+            ruta_tmp = None
+        else:
+            # Hashear mientras se escribe a un temporal (una sola pasada)
+            fd, ruta_tmp = tempfile.mkstemp(dir=directorio_tmp)
+            with os.fdopen(fd, "wb") as destino:
+                for bloque in content.chunks(TAMANO_BLOQUE):
+                    sha.update(bloque)
+                    tamano += len(bloque)
+                    destino.write(bloque)
+            ruta_origen = ruta_tmp
+
+        digest = sha.hexdigest()
+        existente = Blob.objects.filter(sha256=digest).values_list("nombre", flat=True)
+        nombre = existente.first()
+
+        if nombre and self.exists(nombre):
+            # Contenido repetido: no se escribe de nuevo
+            if ruta_tmp:
+                os.remove(ruta_tmp)
+            self._sumar_referencia(Blob, digest)
+            return nombre
+
+        nombre = nombre or (
+            f"{DIRECTORIO_BLOBS}/{digest[:2]}/{digest[2:4]}/{digest}{extension}"
+        )
+        ruta_final = self.path(nombre)
+        os.makedirs(os.path.dirname(ruta_final), exist_ok=True)
+        file_move_safe(ruta_origen, ruta_final, allow_overwrite=True)
+        if self.file_permissions_mode is not None:
+            os.chmod(ruta_final, self.file_permissions_mode)
+
+        try:
+            with transaction.atomic():
+                Blob.objects.create(
+                    sha256=digest, nombre=nombre, tamano=tamano, referencias=1
+                )
+        except IntegrityError:
+            # El blob ya existía (archivo perdido y restaurado, o carrera entre procesos)
+            self._sumar_referencia(Blob, digest)
+        return nombre
+
+    def _sumar_referencia(self, Blob, digest):
+        Blob.objects.filter(sha256=digest).update(
+            referencias=F("referencias") + 1, fecha_actualizacion=timezone.now()
+        )
+
+    def delete(self, name):
+        from apps.core.models import Blob
+
+        if not name:
+            raise ValueError("The name must be given to delete().")
+
+        if sha256_de_nombre(name):
+            # El archivo físico queda para el recolector (puede estar compartido)
+            # update() no toca el auto_now: la gracia del recolector se cuenta desde acá
+            Blob.objects.filter(nombre=name, referencias__gt=0).update(
+                referencias=F("referencias") - 1, fecha_actualizacion=timezone.now()
+            )
+        else:
+            super().delete(name)
+
+    def eliminar_blob(self, name):
+        """Borra físicamente un blob (solo lo usa el recolector)"""
+        super().delete(name)
+
+
+def storage_deduplicado():
+    """Callable usado en los FileField para no serializar el storage en migraciones"""
+    return AlmacenamientoDeduplicado()
+
+
+def liberar_referencia(storage, nombre):
+    """Descuenta una referencia si el nombre apunta a un blob"""
+    if nombre and sha256_de_nombre(nombre):
+        storage.delete(nombre)
@@ -1,3 +1,427 @@
-from django.test import TestCase
+import io
+import csv
+import shutil
+import zipfile
+import tempfile
+from datetime import date, time, timedelta
+from io import StringIO
 
-# Create your tests here.
+from django.conf import settings
+from django.urls import reverse
+from django.db import connection
+from django.utils import timezone
+from django.contrib.sessions.models import Session
+from django.test.utils import CaptureQueriesContext
+from django.core.management import call_command
+from django.test import TestCase, Client, override_settings
+from django.core.files.uploadedfile import SimpleUploadedFile
+
+from apps.core.models import Blob
+from apps.clinicas.models import Clinica
+from apps.accounts.models import CustomUser, PerfilCliente
+from apps.mascotas.models import Mascota, Especie, Raza
+
+MEDIA_TEST = tempfile.mkdtemp()
+
+
+@override_settings(MEDIA_ROOT=MEDIA_TEST)
+class AlmacenamientoDeduplicadoTest(TestCase):
+    """Tests para el storage direccionado por contenido"""
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(MEDIA_TEST, ignore_errors=True)
+
+    def setUp(self):
+        self.cliente = CustomUser.objects.create_user(
+            username="cli_test",
+            email="cliente@test.com",
+            password="test",
+            rol="cliente",
+        )
+        self.especie = Especie.objects.create(nombre="Perro")
+
+    def crear_mascota(self, nombre, contenido):
+        return Mascota.objects.create(
+            nombre=nombre,
+            especie=self.especie,
+            dueno=self.cliente,
+            fecha_nacimiento=date(2020, 1, 1),
+            sexo="M",
+            foto=SimpleUploadedFile(f"{nombre}.jpg", contenido),
+        )
+
+    def test_contenido_repetido_comparte_blob(self):
+        """Test: Dos fotos idénticas apuntan al mismo blob con 2 referencias"""
+        uno = self.crear_mascota("Uno", b"foto-identica")
+        dos = self.crear_mascota("Dos", b"foto-identica")
+
+        self.assertEqual(uno.foto.name, dos.foto.name)
+        self.assertTrue(uno.foto.name.startswith("blobs/"))
+        blob = Blob.objects.get()
+        self.assertEqual(blob.referencias, 2)
+
+    def test_eliminar_descuenta_referencia(self):
+        """Test: Borrar una mascota libera su referencia sin borrar el archivo"""
+        uno = self.crear_mascota("Uno", b"foto-identica")
+        dos = self.crear_mascota("Dos", b"foto-identica")
+
+        uno.delete()
+
+        blob = Blob.objects.get()
+        self.assertEqual(blob.referencias, 1)
+        self.assertTrue(dos.foto.storage.exists(blob.nombre))
+
+    def test_reemplazar_foto_libera_blob_anterior(self):
+        """Test: Cambiar la foto descuenta la referencia de la anterior"""
+        mascota = self.crear_mascota("Uno", b"foto-vieja")
+        mascota.foto = SimpleUploadedFile("nueva.jpg", b"foto-nueva")
+        mascota.save()
+
+        self.assertEqual(Blob.objects.get(referencias=0).tamano, len(b"foto-vieja"))
+        self.assertEqual(Blob.objects.get(referencias=1).tamano, len(b"foto-nueva"))
+
+    def test_volver_a_subir_la_misma_foto_no_suma_referencias(self):
+        """Test: Reemplazar la foto por una idéntica deja una sola referencia"""
+        mascota = self.crear_mascota("Uno", b"foto-igual")
+        mascota.foto = SimpleUploadedFile("otra.jpg", b"foto-igual")
+        mascota.save()
+
+        self.assertEqual(Blob.objects.get().referencias, 1)
+
+    def test_recolector_elimina_blobs_huerfanos(self):
+        """Test: recolectar_blobs borra blobs sin referencias y reporta el ahorro"""
+        mascota = self.crear_mascota("Uno", b"foto-huerfana")
+        nombre = mascota.foto.name
+        storage = mascota.foto.storage
+        mascota.delete()
+
+        salida = StringIO()
+        call_command("recolectar_blobs", gracia=0, stdout=salida)
+
+        self.assertFalse(Blob.objects.exists())
+        self.assertFalse(storage.exists(nombre))
+        self.assertIn("Ahorro", salida.getvalue())
+
+    def test_gracia_se_cuenta_desde_la_ultima_referencia(self):
+        """Test: Un blob que recién quedó sin referencias no se recolecta"""
+        mascota = self.crear_mascota("Uno", b"foto-reciente")
+        Blob.objects.update(fecha_actualizacion=timezone.now() - timedelta(days=2))
+        mascota.delete()
+
+        call_command("recolectar_blobs", gracia=1, stdout=StringIO())
+
+        blob = Blob.objects.get()
+        self.assertEqual(blob.referencias, 0)
+        self.assertTrue(mascota.foto.storage.exists(blob.nombre))
+
+    def test_recalcular_corrige_contadores(self):
+        """Test: --recalcular ajusta los contadores a las filas reales"""
+        self.crear_mascota("Uno", b"foto")
+        Blob.objects.update(referencias=7)
+
+        call_command("recolectar_blobs", recalcular=True, stdout=StringIO())
+
+        self.assertEqual(Blob.objects.get().referencias, 1)
+
+
+class ClinicaTestBase(TestCase):
+    """Datos comunes: admin con su clínica"""
+
+    def setUp(self):
+        self.client_http = Client()
+        self.admin = CustomUser.objects.create_user(
+            username="admin_test",
+            email="admin@test.com",
+            password="test",
+            rol="admin_veterinaria",
+        )
+        self.clinica = Clinica.objects.create(
+            nombre="Veterinaria Test",
+            email="test@vet.com",
+            hora_apertura=time(9, 0),
+            hora_cierre=time(18, 0),
+            admin=self.admin,
+        )
+        self.admin.clinica = self.clinica
+        self.admin.save()
+
+
+class ExportacionTest(ClinicaTestBase):
+    """Tests para las exportaciones CSV / XLSX"""
+
+    def setUp(self):
+        super().setUp()
+        for nombre in ["Ana", "Beto", "Carla"]:
+            CustomUser.objects.create_user(
+                username=nombre.lower(),
+                email=f"{nombre.lower()}@test.com",
+                password="test",
+                first_name=nombre,
+                rol="cliente",
+                clinica=self.clinica,
+            )
+        self.client_http.login(username="admin_test", password="test")
+
+    def test_csv_aplica_filtros_de_la_lista(self):
+        """Test: El CSV respeta el filtro buscar de la lista de clientes"""
+        response = self.client_http.get(
+            reverse("core:exportar_clientes"), {"buscar": "beto"}
+        )
+
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.streaming)
+        lineas = b"".join(response.streaming_content).decode("utf-8-sig").splitlines()
+        self.assertEqual(len(lineas), 2)
+        self.assertIn("beto@test.com", lineas[1])
+
+    def test_csv_neutraliza_formulas(self):
+        """Test: El texto que empieza con =, +, -, @ no queda como fórmula"""
+        CustomUser.objects.filter(username="beto").update(
+            first_name='=HYPERLINK("http://x","y")', last_name="@SUM(A1)"
+        )
+        response = self.client_http.get(
+            reverse("core:exportar_clientes"), {"buscar": "beto"}
+        )
+        fila = next(
+            csv.reader(
+                b"".join(response.streaming_content)
+                .decode("utf-8-sig")
+                .splitlines()[1:]
+            )
+        )
+        self.assertIn('\'=HYPERLINK("http://x","y")', " ".join(fila))
+        self.assertIn("'@SUM(A1)", " ".join(fila))
+        self.assertFalse([v for v in fila if v.startswith(("=", "+", "-", "@"))])
+
+    def test_xlsx_es_un_libro_valido(self):
+        """Test: La exportación XLSX genera un zip con la hoja de datos"""
+        response = self.client_http.get(
+            reverse("core:exportar_clientes"), {"formato": "xlsx"}
+        )
+        contenido = b"".join(response.streaming_content)
+
+        with zipfile.ZipFile(io.BytesIO(contenido)) as libro:
+            self.assertIsNone(libro.testzip())
+            hoja = libro.read("xl/worksheets/sheet1.xml").decode()
+        self.assertIn("ana@test.com", hoja)
+        self.assertEqual(hoja.count("<row "), 4)
+
+    def test_cliente_no_puede_exportar(self):
+        """Test: Solo el admin de la clínica puede exportar"""
+        self.client_http.logout()
+        self.client_http.login(username="ana", password="test")
+        response = self.client_http.get(reverse("core:exportar_clientes"))
+
+        self.assertNotEqual(response.status_code, 200)
+
+
+CSV_IMPORTACION = """email,nombre,apellido,telefono,dni,mascota,especie,raza,sexo,fecha_nacimiento,chip
+ana@test.com,Ana,Gómez,111,30111222,Luna,Perro,Labrador,H,2020-05-01,CHIP-1
+ana@test.com,Ana,Gómez,111,30111222,Michi,gato,,macho,01/02/2019,
+beto@test.com,Beto,Ruiz,222,,Rex,Dinosaurio,,M,,
+correo-invalido,Carla,,,,,,,,,
+"""
+
+
+class ImportacionClientesTest(ClinicaTestBase):
+    """Tests para el comando importar_clientes"""
+
+    def setUp(self):
+        super().setUp()
+        perro = Especie.objects.create(nombre="Perro")
+        Especie.objects.create(nombre="Gato")
+        Raza.objects.create(nombre="Labrador", especie=perro)
+
+        self.archivo = tempfile.NamedTemporaryFile(
+            "w", suffix=".csv", delete=False, encoding="utf-8"
+        )
+        self.archivo.write(CSV_IMPORTACION)
+        self.archivo.close()
+
+    def importar(self):
+        salida = StringIO()
+        call_command(
+            "importar_clientes",
+            self.archivo.name,
+            clinica=str(self.clinica.pk),
+            stdout=salida,
+        )
+        return salida.getvalue()
+
+    def test_importa_clientes_mascotas_y_perfiles(self):
+        """Test: Crea clientes aprobados, sus mascotas y los perfiles"""
+        salida = self.importar()
+
+        ana = CustomUser.objects.get(email="ana@test.com")
+        self.assertEqual(ana.clinica, self.clinica)
+        self.assertFalse(ana.pendiente_aprobacion)
+        self.assertFalse(ana.has_usable_password())
+        self.assertEqual(
+            set(ana.mascotas.values_list("nombre", flat=True)), {"Luna", "Michi"}
+        )
+        self.assertTrue(PerfilCliente.objects.filter(user=ana).exists())
+        self.assertIn("Línea 4: Especie desconocida", salida)
+        self.assertIn("Línea 5: Email inválido", salida)
+
+    def test_reimportar_actualiza_sin_duplicar(self):
+        """Test: Importar dos veces el mismo archivo no duplica registros"""
+        self.importar()
+        Mascota.objects.filter(numero_chip="CHIP-1").update(color="")
+        self.importar()
+
+        self.assertEqual(CustomUser.objects.filter(email="ana@test.com").count(), 1)
+        self.assertEqual(Mascota.objects.filter(dueno__email="ana@test.com").count(), 2)
+
+
+    def test_email_existente_con_otras_mayusculas(self):
+        """Test: Un cliente guardado como Ana@Test.com se actualiza, no se duplica"""
+        CustomUser.objects.create_user(
+            username="ana", email="Ana@Test.com", rol="cliente", clinica=self.clinica
+        )
+        self.importar()
+
+        ana = CustomUser.objects.get(email__iexact="ana@test.com")
+        self.assertEqual((ana.username, ana.first_name), ("ana", "Ana"))
+        self.assertEqual(ana.mascotas.count(), 2)
+
+    def test_username_tomado_es_error_de_fila(self):
+        """Test: Si el username del cliente nuevo ya existe, la fila se informa"""
+        CustomUser.objects.create_user(
+            username="ana@test.com", email="otra@test.com", rol="cliente"
+        )
+        salida = self.importar()
+
+        self.assertIn("Línea 2: El usuario ana@test.com ya existe.", salida)
+        self.assertFalse(CustomUser.objects.filter(email="ana@test.com").exists())
+
+
+class ModerarClientesTest(ClinicaTestBase):
+    """Tests para la aprobación / rechazo de clientes en bloque"""
+
+    def setUp(self):
+        super().setUp()
+        self.pendientes = [
+            CustomUser.objects.create_user(
+                username=f"pend{i}",
+                email=f"pend{i}@test.com",
+                password="test",
+                first_name="Campaña" if i < 3 else "Otro",
+                rol="cliente",
+                clinica=self.clinica,
+                pendiente_aprobacion=True,
+                is_active=False,
+            )
+            for i in range(5)
+        ]
+        self.client_http.login(username="admin_test", password="test")
+        self.url = reverse("core:moderar_clientes")
+
+    def test_aprobar_seleccionados_registra_auditoria(self):
+        """Test: Aprueba solo los seleccionados con fecha y admin"""
+        ids = [c.pk for c in self.pendientes[:2]]
+        self.client_http.post(self.url, {"accion": "aprobar", "clientes": ids})
+
+        aprobados = CustomUser.objects.filter(pk__in=ids)
+        for cliente in aprobados:
+            self.assertTrue(cliente.is_active)
+            self.assertFalse(cliente.pendiente_aprobacion)
+            self.assertEqual(cliente.aprobado_por, self.admin)
+            self.assertIsNotNone(cliente.fecha_aprobacion)
+        self.assertEqual(
+            CustomUser.objects.filter(pendiente_aprobacion=True).count(), 3
+        )
+
+    def test_rechazar_todos_los_que_coinciden(self):
+        """Test: Con todos=1 se eliminan los pendientes que coinciden con el filtro"""
+        self.client_http.post(
+            self.url, {"accion": "rechazar", "todos": "1", "buscar": "Campaña"}
+        )
+
+        self.assertEqual(
+            list(
+                CustomUser.objects.filter(pendiente_aprobacion=True).values_list(
+                    "first_name", flat=True
+                )
+            ),
+            ["Otro", "Otro"],
+        )
+
+    def test_no_modera_clientes_de_otra_clinica(self):
+        """Test: Los IDs de otra clínica se ignoran"""
+        otro_admin = CustomUser.objects.create_user(
+            username="otro_admin",
+            email="otro_admin@test.com",
+            password="test",
+            rol="admin_veterinaria",
+        )
+        otra = Clinica.objects.create(
+            nombre="Otra",
+            email="otra@vet.com",
+            hora_apertura=time(9, 0),
+            hora_cierre=time(18, 0),
+            admin=otro_admin,
+        )
+        ajeno = CustomUser.objects.create_user(
+            username="ajeno",
+            email="ajeno@test.com",
+            password="test",
+            rol="cliente",
+            clinica=otra,
+            pendiente_aprobacion=True,
+            is_active=False,
+        )
+
+        self.client_http.post(self.url, {"accion": "aprobar", "clientes": [ajeno.pk]})
+
+        ajeno.refresh_from_db()
+        self.assertTrue(ajeno.pendiente_aprobacion)
+
+
+class SesionesTest(ClinicaTestBase):
+    """Tests para el perfil de sesiones y el comando purgar_sesiones"""
+
+    @override_settings(SESSION_ENGINE="django.contrib.sessions.backends.cached_db")
+    def test_requests_autenticados_no_consultan_django_session(self):
+        """Test: con cached_db la sesión se lee del cache"""
+        self.client_http.login(username="admin_test", password="test")
+        url = reverse("mascotas:lista_mascotas_admin")
+        self.client_http.get(url)
+        with CaptureQueriesContext(connection) as consultas:
+            response = self.client_http.get(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse([q for q in consultas if "django_session" in q["sql"]])
+
+    def test_purgar_sesiones_vencidas(self):
+        """Test: Borra por lotes solo las sesiones vencidas"""
+        ahora = timezone.now()
+        for i in range(5):
+            Session.objects.create(
+                session_key=f"vencida{i}",
+                session_data="",
+                expire_date=ahora - timedelta(days=1),
+            )
+        Session.objects.create(
+            session_key="vigente", session_data="", expire_date=ahora + timedelta(days=1)
+        )
+
+        call_command("purgar_sesiones", lote=2, stdout=open("/dev/null", "w"))
+        self.assertEqual(
+            list(Session.objects.values_list("session_key", flat=True)), ["vigente"]
+        )
+
+
+class MedirLoginTest(TestCase):
+    """Tests para el comando medir_login"""
+
+    @override_settings(PASSWORD_HASHERS=settings.PERFILES_HASHERS["rapido"])
+    def test_informa_throughput_y_procesos(self):
+        """Test: Con el perfil rápido mide el hasher MD5"""
+        salida = StringIO()
+        call_command(
+            "medir_login", concurrencia=2, intentos=10, objetivo=100, stdout=salida
+        )
+        self.assertIn("Hasher: md5", salida.getvalue())
+        self.assertIn("login(s) por segundo", salida.getvalue())
+        self.assertIn("proceso(s)", salida.getvalue())
@@ -9,8 +9,11 @@ from .views import (
     PerfilClienteUpdateView,
     AprobarClienteView,
     RechazarClienteView,
+    ModerarClientesView,
     VeterinarioCreateView,
     ListaClientesView,
+    ExportarClientesView,
+    ImportarClientesView,
     ListaVeterinariosView,
     ConfiguracionVeterinarioView,
 )
@@ -30,6 +33,12 @@ urlpatterns = [
         "dashboard/cliente/", DashboardClienteView.as_view(), name="dashboard_cliente"
     ),
     path("clientes/", ListaClientesView.as_view(), name="lista_clientes"),
+    path(
+        "clientes/exportar/", ExportarClientesView.as_view(), name="exportar_clientes"
+    ),
+    path(
+        "clientes/importar/", ImportarClientesView.as_view(), name="importar_clientes"
+    ),
     path("veterinarios/", ListaVeterinariosView.as_view(), name="lista_veterinarios"),
     # Perfil Cliente
     path("perfil/cliente/", PerfilClienteView.as_view(), name="perfil_cliente"),
@@ -49,6 +58,9 @@ urlpatterns = [
         RechazarClienteView.as_view(),
         name="rechazar_cliente",
     ),
+    path(
+        "clientes/moderar/", ModerarClientesView.as_view(), name="moderar_clientes"
+    ),
     # Crear Veterinario
     path(
         "veterinarios/crear/", VeterinarioCreateView.as_view(), name="crear_veterinario"
@@ -1,16 +1,31 @@
+import io
+import csv
+
 from django.utils import timezone
 from django.db.models import Q
 from django.contrib import messages
 from django.urls import reverse_lazy
 from django.shortcuts import redirect
-from django.views.generic import ListView, TemplateView, UpdateView, CreateView
+from django.views.generic import (
+    ListView,
+    TemplateView,
+    UpdateView,
+    CreateView,
+    FormView,
+    View,
+)
 from django.contrib.auth.mixins import LoginRequiredMixin, UserPassesTestMixin
 
+from apps.accounts.principal import tiene_rol
+
+from .exportar import ExportacionMixin
+from .importar import ErrorFila, ImportadorClientes
 from .forms import (
     PerfilClienteForm,
     CrearVeterinarioForm,
     VeterinarioFiltroForm,
     ClienteFiltroForm,
+    ImportarClientesForm,
     PerfilVeterinario,
     PerfilVeterinarioForm,
 )
@@ -27,10 +42,7 @@ class AdminVeterinariaRequiredMixin(UserPassesTestMixin):
     """Mixin que verifica que el usuario sea administrador de veterinaria"""
 
     def test_func(self):
-        return (
-            self.request.user.is_authenticated
-            and self.request.user.is_admin_veterinaria
-        )
+        return tiene_rol(self.request, "admin_veterinaria")
 
     def handle_no_permission(self):
         messages.error(self.request, "No tienes permisos de administrador")
@@ -41,7 +53,7 @@ class VeterinarioRequiredMixin(UserPassesTestMixin):
     """Mixin que verifica que el usuario sea veterinario"""
 
     def test_func(self):
-        return self.request.user.is_authenticated and self.request.user.is_veterinario
+        return tiene_rol(self.request, "veterinario")
 
     def handle_no_permission(self):
         messages.error(self.request, "No tienes permisos de veterinario")
@@ -52,7 +64,7 @@ class ClienteRequiredMixin(UserPassesTestMixin):
     """Mixin que verifica que el usuario sea cliente"""
 
     def test_func(self):
-        return self.request.user.is_authenticated and self.request.user.is_cliente
+        return tiene_rol(self.request, "cliente")
 
     def handle_no_permission(self):
         messages.error(self.request, "No tienes permisos de cliente")
@@ -133,12 +145,12 @@ class DashboardAdminView(
         ).count()
 
         # Estadísticas de mascotas
-        total_mascotas = Mascota.objects.filter(dueno__clinica=clinica).count()
+        total_mascotas = Mascota.objects.filter(clinica=clinica).count()
         mascotas_activas = Mascota.objects.filter(
-            dueno__clinica=clinica, activo=True
+            clinica=clinica, activo=True
         ).count()
         mascotas_inactivas = Mascota.objects.filter(
-            dueno__clinica=clinica, activo=False
+            clinica=clinica, activo=False
         ).count()
 
         context.update(
@@ -213,7 +225,7 @@ class DashboardVeterinarioView(
         # Si no se atendio a nadie, mostramos las últimas registradas en la clínica como fallback
         if not mascotas_vistas_recientemente:
             mascotas_vistas_recientemente = Mascota.objects.filter(
-                dueno__clinica=clinica, activo=True
+                clinica=clinica, activo=True
             ).order_by("-fecha_registro")[:5]
 
         # ---------------------------------------------------------
@@ -232,7 +244,7 @@ class DashboardVeterinarioView(
                 "turnos_completados_hoy": count_completados,  # Para la Card Success
                 "turnos_pendientes_hoy": count_pendientes,  # Para la Card Warning (Sala de Espera)
                 "total_mascotas": Mascota.objects.filter(
-                    dueno__clinica=clinica, activo=True
+                    clinica=clinica, activo=True
                 ).count(),
             }
         )
@@ -408,6 +420,75 @@ class RechazarClienteView(
         return redirect("core:dashboard_admin")
 
 
+class ModerarClientesView(LoginRequiredMixin, AdminVeterinariaRequiredMixin, View):
+    """
+    Aprobar o rechazar clientes pendientes en bloque.
+
+    Recibe `accion` (aprobar / rechazar) y los `clientes` seleccionados, o
+    `todos=1` para aplicar la acción a todos los pendientes que coincidan
+    con `buscar`. Se procesa por lotes: un UPDATE (con los datos de
+    auditoría) o un DELETE por lote, sin señales por cliente.
+    """
+
+    TAMANO_LOTE = 500
+
+    def post(self, request):
+        accion = request.POST.get("accion")
+        if accion not in ("aprobar", "rechazar"):
+            messages.error(request, "Acción no válida")
+            return redirect("core:dashboard_admin")
+
+        pendientes = CustomUser.objects.filter(
+            rol="cliente", clinica__admin=request.user, pendiente_aprobacion=True
+        )
+
+        if request.POST.get("todos") == "1":
+            buscar = request.POST.get("buscar", "").strip()
+            if buscar:
+                pendientes = pendientes.filter(
+                    Q(first_name__icontains=buscar)
+                    | Q(last_name__icontains=buscar)
+                    | Q(email__icontains=buscar)
+                    | Q(dni__icontains=buscar)
+                )
+        else:
+            ids = [i for i in request.POST.getlist("clientes") if i.isdigit()]
+            if not ids:
+                messages.error(request, "No seleccionaste ningún cliente")
+                return redirect("core:dashboard_admin")
+            pendientes = pendientes.filter(pk__in=ids)
+
+        total = 0
+        ahora = timezone.now()
+        ultimo = 0
+        while True:
+            lote = list(
+                pendientes.filter(pk__gt=ultimo)
+                .order_by("pk")
+                .values_list("pk", flat=True)[: self.TAMANO_LOTE]
+            )
+            if not lote:
+                break
+            ultimo = lote[-1]
+
+            clientes = CustomUser.objects.filter(pk__in=lote)
+            if accion == "aprobar":
+                total += clientes.update(
+                    pendiente_aprobacion=False,
+                    is_active=True,
+                    fecha_aprobacion=ahora,
+                    aprobado_por=request.user,
+                )
+            else:
+                total += clientes.delete()[1].get(CustomUser._meta.label, 0)
+
+        if accion == "aprobar":
+            messages.success(request, f"✅ {total} cliente(s) aprobado(s)")
+        else:
+            messages.warning(request, f"{total} solicitud(es) rechazada(s) y eliminada(s)")
+        return redirect("core:dashboard_admin")
+
+
 # ==================== CREAR VETERINARIO ====================
 
 
@@ -436,12 +517,35 @@ class AdminRequiredMixin(LoginRequiredMixin, UserPassesTestMixin):
     """Mixin para verificar que el usuario sea administrador de veterinaria"""
 
     def test_func(self):
-        return self.request.user.is_admin_veterinaria
+        return tiene_rol(self.request, "admin_veterinaria")
 
 
 # ==================== LISTAR CLIENTES Y VETERINARIOS ====================
 
 
+def filtrar_clientes(queryset, params):
+    """Filtros de la lista de clientes (buscar / estado), compartidos con la exportación"""
+    buscar = params.get("buscar", "")
+    estado = params.get("estado", "")
+
+    if buscar:
+        queryset = queryset.filter(
+            Q(first_name__icontains=buscar)
+            | Q(last_name__icontains=buscar)
+            | Q(email__icontains=buscar)
+            | Q(telefono__icontains=buscar)
+        )
+
+    if estado == "activo":
+        queryset = queryset.filter(is_active=True, aprobado_por=True)
+    elif estado == "inactivo":
+        queryset = queryset.filter(is_active=False)
+    elif estado == "pendiente":
+        queryset = queryset.filter(aprobado_por=False)
+
+    return queryset
+
+
 class ListaClientesView(AdminRequiredMixin, ListView):
     """Vista para listar clientes (solo para admin)"""
 
@@ -452,31 +556,14 @@ class ListaClientesView(AdminRequiredMixin, ListView):
 
     def get_queryset(self):
         queryset = (
-            CustomUser.objects.filter(rol="cliente", clinica=self.request.user.clinica)
+            CustomUser.objects.filter(
+                rol="cliente", clinica_id=self.request.principal.clinica_id
+            )
             .select_related("clinica")
             .order_by("-date_joined")
         )
 
-        # Aplicar filtros del formulario
-        buscar = self.request.GET.get("buscar", "")
-        estado = self.request.GET.get("estado", "")
-
-        if buscar:
-            queryset = queryset.filter(
-                Q(first_name__icontains=buscar)
-                | Q(last_name__icontains=buscar)
-                | Q(email__icontains=buscar)
-                | Q(telefono__icontains=buscar)
-            )
-
-        if estado == "activo":
-            queryset = queryset.filter(is_active=True, aprobado_por=True)
-        elif estado == "inactivo":
-            queryset = queryset.filter(is_active=False)
-        elif estado == "pendiente":
-            queryset = queryset.filter(aprobado_por=False)
-
-        return queryset
+        return filtrar_clientes(queryset, self.request.GET)
 
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
@@ -486,7 +573,7 @@ class ListaClientesView(AdminRequiredMixin, ListView):
 
         # Estadísticas
         all_clientes = CustomUser.objects.filter(
-            rol="cliente", clinica=self.request.user.clinica
+            rol="cliente", clinica_id=self.request.principal.clinica_id
         )
         context["total_clientes"] = all_clientes.count()
         context["activos"] = all_clientes.filter(
@@ -498,6 +585,58 @@ class ListaClientesView(AdminRequiredMixin, ListView):
         return context
 
 
+class ExportarClientesView(AdminRequiredMixin, ExportacionMixin, View):
+    """Exporta los clientes filtrados en CSV / XLSX (solo para admin)"""
+
+    nombre_archivo = "clientes"
+    columnas = [
+        ("Nombre", "first_name"),
+        ("Apellido", "last_name"),
+        ("Email", "email"),
+        ("Teléfono", "telefono"),
+        ("DNI", "dni"),
+        ("Dirección", "direccion"),
+        ("Activo", "is_active"),
+        ("Pendiente de aprobación", "pendiente_aprobacion"),
+        ("Fecha de registro", "date_joined"),
+    ]
+
+    def get_queryset_exportacion(self):
+        queryset = CustomUser.objects.filter(
+            rol="cliente", clinica_id=self.request.principal.clinica_id
+        ).order_by("-date_joined")
+        return filtrar_clientes(queryset, self.request.GET)
+
+
+class ImportarClientesView(AdminRequiredMixin, FormView):
+    """Alta masiva de clientes y mascotas desde un CSV (solo para admin)"""
+
+    form_class = ImportarClientesForm
+    template_name = "core/importar_clientes.html"
+
+    def form_valid(self, form):
+        importador = ImportadorClientes(
+            self.request.user.clinica, aprobado_por=self.request.user
+        )
+        archivo = io.TextIOWrapper(
+            form.cleaned_data["archivo"].file, encoding="utf-8-sig", newline=""
+        )
+        try:
+            importador.importar(archivo)
+        except (ErrorFila, UnicodeDecodeError, csv.Error) as e:
+            form.add_error("archivo", f"No se pudo leer el CSV: {e}")
+            return self.form_invalid(form)
+
+        messages.success(
+            self.request,
+            f"Importación terminada: {importador.clientes_creados} cliente(s) y "
+            f"{importador.mascotas_creadas} mascota(s) nuevos.",
+        )
+        return self.render_to_response(
+            self.get_context_data(form=self.form_class(), resultado=importador)
+        )
+
+
 class ListaVeterinariosView(AdminRequiredMixin, ListView):
     """Vista para listar veterinarios (solo para admin)"""
 
@@ -510,7 +649,7 @@ class ListaVeterinariosView(AdminRequiredMixin, ListView):
         # Filtrar solo veterinarios de la clínica del admin
         queryset = (
             CustomUser.objects.filter(
-                rol="veterinario", clinica=self.request.user.clinica
+                rol="veterinario", clinica_id=self.request.principal.clinica_id
             )
             .select_related("clinica")
             .order_by("last_name", "first_name")
@@ -542,7 +681,7 @@ class ListaVeterinariosView(AdminRequiredMixin, ListView):
 
         # Estadísticas
         all_veterinarios = CustomUser.objects.filter(
-            rol="veterinario", clinica=self.request.user.clinica
+            rol="veterinario", clinica_id=self.request.principal.clinica_id
         )
         context["total_veterinarios"] = all_veterinarios.count()
         context["activos"] = all_veterinarios.filter(is_active=True).count()
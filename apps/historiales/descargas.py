@@ -0,0 +1,149 @@
+import os
+import hashlib
+import mimetypes
+
+from django.conf import settings
+from django.http import (
+    FileResponse,
+    HttpResponse,
+    HttpResponseNotModified,
+    StreamingHttpResponse,
+)
+from django.utils.http import content_disposition_header, parse_etags, quote_etag
+
+# Tamaño de cada bloque leído del disco (el worker nunca carga el archivo entero)
+TAMANO_BLOQUE = 64 * 1024
+
+
+def calcular_etag(archivo_field, tamano):
+    """ETag a partir del nombre, tamaño y fecha de modificación"""
+    storage = archivo_field.storage
+    try:
+        modificado = int(storage.get_modified_time(archivo_field.name).timestamp())
+    except (NotImplementedError, OSError):
+        modificado = 0
+    nombre = hashlib.md5(archivo_field.name.encode(), usedforsecurity=False)
+    return quote_etag(f"{tamano:x}-{modificado:x}-{nombre.hexdigest()[:12]}")
+
+
+def parsear_rango(header, tamano):
+    """
+    Interpreta un header Range de un solo tramo ("bytes=inicio-fin").
+    Devuelve (inicio, fin) inclusivo, None si no aplica o "invalido" si no es satisfacible.
+    Los pedidos multi-rango se ignoran y se sirve el archivo completo.
+    """
+    if not header or not header.startswith("bytes="):
+        return None
+
+    rango = header[len("bytes=") :].strip()
+    if "," in rango or "-" not in rango:
+        return None
+
+    inicio, fin = (parte.strip() for parte in rango.split("-", 1))
+    try:
+        if inicio == "":
+            # Sufijo: los últimos N bytes
+            sufijo = int(fin)
+            if sufijo <= 0:
+                return "invalido"
+            inicio, fin = max(tamano - sufijo, 0), tamano - 1
+        else:
+            inicio = int(inicio)
+            fin = int(fin) if fin else tamano - 1
+    except ValueError:
+        return None
+
+    if inicio >= tamano or inicio > fin:
+        return "invalido"
+    return inicio, min(fin, tamano - 1)
+
+
+def leer_tramo(archivo, inicio, longitud):
+    """Generador que lee `longitud` bytes desde `inicio` en bloques"""
+    try:
+        archivo.seek(inicio)
+        restante = longitud
+        while restante > 0:
+            bloque = archivo.read(min(TAMANO_BLOQUE, restante))
+            if not bloque:
+                break
+            restante -= len(bloque)
+            yield bloque
+    finally:
+        archivo.close()
+
+
+def respuesta_offload(archivo_field, modo):
+    """Delegar el envío de bytes al proxy (nginx / apache)"""
+    response = HttpResponse()
+    if modo == "x-accel-redirect":
+        prefijo = getattr(settings, "ARCHIVOS_PROTEGIDOS_PREFIJO", "/protected-media/")
+        response["X-Accel-Redirect"] = prefijo.rstrip("/") + "/" + archivo_field.name
+    else:
+        response["X-Sendfile"] = archivo_field.storage.path(archivo_field.name)
+    return response
+
+
+def servir_archivo(request, archivo_field, nombre_descarga=None, as_attachment=False):
+    """
+    Devuelve una respuesta que transmite un FileField por bloques.
+
+    Soporta If-None-Match (304), Range de un tramo (206/416) y, según
+    settings.ARCHIVOS_OFFLOAD ("x-accel-redirect" o "x-sendfile"),
+    delega la transferencia al servidor web.
+    """
+    storage = archivo_field.storage
+    tamano = storage.size(archivo_field.name)
+    etag = calcular_etag(archivo_field, tamano)
+    nombre_descarga = nombre_descarga or os.path.basename(archivo_field.name)
+    content_type = mimetypes.guess_type(nombre_descarga)[0] or "application/octet-stream"
+
+    if_none_match = request.headers.get("If-None-Match")
+    if if_none_match:
+        etags = parse_etags(if_none_match)
+        if "*" in etags or etag in etags:
+            response = HttpResponseNotModified()
+            response["ETag"] = etag
+            return response
+
+    modo_offload = getattr(settings, "ARCHIVOS_OFFLOAD", None)
+    if modo_offload in ("x-accel-redirect", "x-sendfile"):
+        response = respuesta_offload(archivo_field, modo_offload)
+        response["Content-Type"] = content_type
+    else:
+        rango = parsear_rango(request.headers.get("Range"), tamano)
+
+        # If-Range: solo aplicar el rango si el ETag no cambió
+        if_range = request.headers.get("If-Range")
+        if rango and if_range and if_range.strip() != etag:
+            rango = None
+
+        if rango == "invalido":
+            response = HttpResponse(status=416)
+            response["Content-Range"] = f"bytes */{tamano}"
+            return response
+
+        if rango:
+            inicio, fin = rango
+            longitud = fin - inicio + 1
+            response = StreamingHttpResponse(
+                leer_tramo(storage.open(archivo_field.name, "rb"), inicio, longitud),
+                status=206,
+                content_type=content_type,
+            )
+            response["Content-Range"] = f"bytes {inicio}-{fin}/{tamano}"
+            response["Content-Length"] = str(longitud)
+        else:
+            response = FileResponse(
+                storage.open(archivo_field.name, "rb"), content_type=content_type
+            )
+            response.block_size = TAMANO_BLOQUE
+            response["Content-Length"] = str(tamano)
+
+    response["Accept-Ranges"] = "bytes"
+    response["ETag"] = etag
+    response["Cache-Control"] = "private, max-age=0, must-revalidate"
+    response["Content-Disposition"] = content_disposition_header(
+        as_attachment, nombre_descarga
+    )
+    return response
@@ -0,0 +1,45 @@
+# Generated by Django 5.2.6 on 2026-10-19 15:29
+
+import django.db.models.deletion
+import uuid
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('clinicas', '0001_initial'),
+        ('historiales', '0001_initial'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='archivoadjunto',
+            name='sha256',
+            field=models.CharField(blank=True, db_index=True, max_length=64),
+        ),
+        migrations.CreateModel(
+            name='SubidaArchivo',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('token', models.UUIDField(default=uuid.uuid4, editable=False, unique=True)),
+                ('nombre_original', models.CharField(max_length=255)),
+                ('descripcion', models.CharField(blank=True, max_length=100)),
+                ('tamano_total', models.PositiveBigIntegerField()),
+                ('recibido', models.PositiveBigIntegerField(default=0)),
+                ('sha256', models.CharField(blank=True, db_index=True, max_length=64)),
+                ('archivo', models.CharField(blank=True, help_text='Nombre del archivo en el storage', max_length=255)),
+                ('completada', models.BooleanField(default=False)),
+                ('fecha_creacion', models.DateTimeField(auto_now_add=True)),
+                ('fecha_actualizacion', models.DateTimeField(auto_now=True)),
+                ('clinica', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='clinicas.clinica')),
+                ('usuario', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='subidas', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'Subida de Archivo',
+                'verbose_name_plural': 'Subidas de Archivos',
+            },
+        ),
+    ]
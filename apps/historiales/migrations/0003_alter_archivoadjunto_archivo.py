@@ -0,0 +1,20 @@
+# Generated by Django 5.2.6 on 2026-10-19 15:33
+
+import apps.core.storage
+import apps.historiales.models
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('historiales', '0002_subidas_por_partes'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='archivoadjunto',
+            name='archivo',
+            field=models.FileField(storage=apps.core.storage.storage_deduplicado, upload_to=apps.historiales.models.historia_clinica_upload_path),
+        ),
+    ]
@@ -0,0 +1,34 @@
+# Generated by Django 5.2.6 on 2026-10-19 15:35
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('historiales', '0003_alter_archivoadjunto_archivo'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='vacuna',
+            name='fecha_proxima_aplicacion',
+            field=models.DateField(db_index=True, help_text='Fecha para el recordatorio automático'),
+        ),
+        migrations.CreateModel(
+            name='RecordatorioVacuna',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('tipo', models.CharField(choices=[('proxima', 'Próxima aplicación'), ('vencida', 'Vacuna vencida')], max_length=10)),
+                ('fecha_objetivo', models.DateField()),
+                ('fecha_envio', models.DateTimeField(auto_now_add=True)),
+                ('vacuna', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='recordatorios', to='historiales.vacuna')),
+            ],
+            options={
+                'verbose_name': 'Recordatorio de Vacuna',
+                'verbose_name_plural': 'Recordatorios de Vacunas',
+                'unique_together': {('vacuna', 'tipo', 'fecha_objetivo')},
+            },
+        ),
+    ]
@@ -0,0 +1,20 @@
+# Generated by Django 5.2.6 on 2026-10-19 16:11
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('historiales', '0004_recordatorios_vacunas'),
+        ('turnos', '0006_turnos_archivados'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='historiaclinica',
+            name='turno_archivado',
+            field=models.OneToOneField(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='historia_clinica', to='turnos.turnoarchivado'),
+        ),
+    ]
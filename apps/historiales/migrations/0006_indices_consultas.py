@@ -0,0 +1,26 @@
+# Generated by Django 5.2.6 on 2026-10-19 16:16
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('clinicas', '0001_initial'),
+        ('historiales', '0005_historia_turno_archivado'),
+        ('mascotas', '0002_alter_mascota_foto'),
+        ('turnos', '0006_turnos_archivados'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='historiaclinica',
+            index=models.Index(fields=['mascota', '-fecha'], name='historia_mascota_fecha_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='historiaclinica',
+            index=models.Index(fields=['clinica', '-fecha'], name='historia_clinica_fecha_idx'),
+        ),
+    ]
@@ -1,8 +1,13 @@
 # Create your models here.
 import os
+import uuid
 from django.db import models
 from django.conf import settings
 from django.utils import timezone
+from django.db.models.signals import post_delete
+from django.dispatch import receiver
+
+from apps.core.storage import storage_deduplicado, sha256_de_nombre, liberar_referencia
 
 from apps.mascotas.models import Mascota
 from apps.turnos.models import Turno
@@ -33,6 +38,14 @@ class HistoriaClinica(models.Model):
         blank=True,
         related_name="historia_clinica",
     )
+    # Mismo id que `turno` cuando ese turno se movió al archivo
+    turno_archivado = models.OneToOneField(
+        "turnos.TurnoArchivado",
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name="historia_clinica",
+    )
 
     # 2. Datos de la Consulta (Signos Vitales)
     fecha = models.DateTimeField(default=timezone.now)
@@ -64,6 +77,11 @@ class HistoriaClinica(models.Model):
         ordering = ["-fecha"]
         verbose_name = "Historia Clínica"
         verbose_name_plural = "Historias Clínicas"
+        indexes = [
+            # Historial de una mascota y listado de la clínica, más recientes primero
+            models.Index(fields=["mascota", "-fecha"], name="historia_mascota_fecha_idx"),
+            models.Index(fields=["clinica", "-fecha"], name="historia_clinica_fecha_idx"),
+        ]
 
     def __str__(self):
         return f"{self.mascota} - {self.fecha.strftime('%d/%m/%Y')}"
@@ -96,7 +114,7 @@ class Vacuna(models.Model):
 
     fecha_aplicacion = models.DateField(default=timezone.now)
     fecha_proxima_aplicacion = models.DateField(
-        help_text="Fecha para el recordatorio automático"
+        help_text="Fecha para el recordatorio automático", db_index=True
     )
 
     veterinario = models.ForeignKey(
@@ -119,6 +137,34 @@ class Vacuna(models.Model):
         return self.fecha_proxima_aplicacion < timezone.now().date()
 
 
+class RecordatorioVacuna(models.Model):
+    """Registro de recordatorios enviados (evita reenviar al re-ejecutar el comando)"""
+
+    PROXIMA = "proxima"
+    VENCIDA = "vencida"
+
+    TIPO_CHOICES = [
+        (PROXIMA, "Próxima aplicación"),
+        (VENCIDA, "Vacuna vencida"),
+    ]
+
+    vacuna = models.ForeignKey(
+        Vacuna, on_delete=models.CASCADE, related_name="recordatorios"
+    )
+    tipo = models.CharField(max_length=10, choices=TIPO_CHOICES)
+    # Fecha de aplicación recordada: si se reprograma la vacuna, se vuelve a avisar
+    fecha_objetivo = models.DateField()
+    fecha_envio = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        verbose_name = "Recordatorio de Vacuna"
+        verbose_name_plural = "Recordatorios de Vacunas"
+        unique_together = [["vacuna", "tipo", "fecha_objetivo"]]
+
+    def __str__(self):
+        return f"{self.vacuna} - {self.get_tipo_display()} ({self.fecha_objetivo})"
+
+
 # Archivos Adjuntos
 
 
@@ -129,15 +175,20 @@ def historia_clinica_upload_path(instance, filename):
     return f"clinicas/{clinica_slug}/mascotas/{mascota_id}/historias/{filename}"
 
 
+
 class ArchivoAdjunto(models.Model):
     historia = models.ForeignKey(
         HistoriaClinica, on_delete=models.CASCADE, related_name="archivos"
     )
-    archivo = models.FileField(upload_to=historia_clinica_upload_path)
+    archivo = models.FileField(
+        upload_to=historia_clinica_upload_path, storage=storage_deduplicado
+    )
     descripcion = models.CharField(
         max_length=100, blank=True, help_text="Ej: Radiografía tórax"
     )
     fecha_subida = models.DateTimeField(auto_now_add=True)
+    # Hash del contenido, para deduplicar archivos idénticos
+    sha256 = models.CharField(max_length=64, blank=True, db_index=True)
 
     class Meta:
         verbose_name = "Archivo Adjunto"
@@ -146,6 +197,55 @@ class ArchivoAdjunto(models.Model):
     def __str__(self):
         return f"Archivo {self.id} de {self.historia}"
 
+    def save(self, *args, **kwargs):
+        # Archivos subidos por el formulario clásico: guardar el blob primero
+        # para tomar el hash del nombre (el storage ya lo calculó al escribir)
+        if self.archivo and not self.archivo._committed:
+            self.archivo.save(self.archivo.name, self.archivo.file, save=False)
+        if not self.sha256 and self.archivo:
+            self.sha256 = sha256_de_nombre(self.archivo.name) or ""
+        super().save(*args, **kwargs)
+
     def extension(self):
         name, extension = os.path.splitext(self.archivo.name)
         return extension.lower()
+
+
+class SubidaArchivo(models.Model):
+    """Subida por partes (reanudable) de un archivo adjunto"""
+
+    token = models.UUIDField(default=uuid.uuid4, unique=True, editable=False)
+    usuario = models.ForeignKey(
+        settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name="subidas"
+    )
+    clinica = models.ForeignKey("clinicas.Clinica", on_delete=models.CASCADE)
+    nombre_original = models.CharField(max_length=255)
+    descripcion = models.CharField(max_length=100, blank=True)
+    tamano_total = models.PositiveBigIntegerField()
+    recibido = models.PositiveBigIntegerField(default=0)
+
+    # Se completan al ensamblar el archivo
+    sha256 = models.CharField(max_length=64, blank=True, db_index=True)
+    archivo = models.CharField(
+        max_length=255, blank=True, help_text="Nombre del archivo en el storage"
+    )
+    completada = models.BooleanField(default=False)
+
+    fecha_creacion = models.DateTimeField(auto_now_add=True)
+    fecha_actualizacion = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        verbose_name = "Subida de Archivo"
+        verbose_name_plural = "Subidas de Archivos"
+
+    def __str__(self):
+        return f"{self.nombre_original} ({self.recibido}/{self.tamano_total})"
+
+    @property
+    def extension(self):
+        return os.path.splitext(self.nombre_original)[1].lower()
+
+
+@receiver(post_delete, sender=ArchivoAdjunto)
+def liberar_archivo_adjunto(sender, instance, **kwargs):
+    liberar_referencia(instance.archivo.storage, instance.archivo.name)
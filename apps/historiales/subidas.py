@@ -0,0 +1,141 @@
+import os
+import uuid
+from pathlib import Path
+
+from django.conf import settings
+from django.core.files import File
+
+from apps.core.storage import sha256_de_nombre, liberar_referencia
+from .models import ArchivoAdjunto, SubidaArchivo
+
+TAMANO_BLOQUE = 64 * 1024
+
+
+class ErrorSubida(Exception):
+    """Error de protocolo en una subida por partes"""
+
+    def __init__(self, mensaje, status=400):
+        super().__init__(mensaje)
+        self.status = status
+
+
+def directorio_subidas():
+    return Path(
+        getattr(settings, "SUBIDAS_TMP_DIR", Path(settings.MEDIA_ROOT) / "subidas_tmp")
+    )
+
+
+def ruta_parte(subida):
+    """Archivo temporal donde se acumulan las partes de una subida"""
+    return directorio_subidas() / f"{subida.token}.part"
+
+
+def escribir_parte(subida, stream, offset):
+    """
+    Agrega al archivo temporal los bytes recibidos en `stream` a partir de `offset`.
+
+    Solo se acepta la parte que continúa exactamente donde terminó la anterior;
+    si el cliente se desfasó recibe 409 y debe reanudar desde `recibido`.
+    El cuerpo se copia por bloques, nunca se carga completo en memoria.
+    """
+    if subida.completada:
+        raise ErrorSubida("La subida ya fue completada.", status=409)
+    if offset != subida.recibido:
+        raise ErrorSubida("Offset inesperado.", status=409)
+
+    ruta = ruta_parte(subida)
+    ruta.parent.mkdir(parents=True, exist_ok=True)
+
+    with open(ruta, "a+b") as destino:
+        # Descartar restos de una parte anterior que no llegó a confirmarse
+        destino.truncate(subida.recibido)
+        destino.seek(subida.recibido)
+        while True:
+            bloque = stream.read(TAMANO_BLOQUE)
+            if not bloque:
+                break
+            if destino.tell() + len(bloque) > subida.tamano_total:
+                destino.truncate(subida.recibido)
+                raise ErrorSubida("La parte excede el tamaño declarado.")
+            destino.write(bloque)
+        subida.recibido = destino.tell()
+
+    subida.save(update_fields=["recibido", "fecha_actualizacion"])
+
+    if subida.recibido == subida.tamano_total:
+        finalizar_subida(subida)
+    return subida
+
+
+class ArchivoEnDisco(File):
+    """File ya escrito en disco: el storage puede moverlo en vez de copiarlo"""
+
+    def temporary_file_path(self):
+        return self.file.name
+
+
+def finalizar_subida(subida):
+    """
+    Ensambla la subida en el storage deduplicado: el hash se calcula por
+    bloques y, si el contenido ya existe, se reutiliza el blob existente.
+    """
+    ruta = ruta_parte(subida)
+    storage = ArchivoAdjunto._meta.get_field("archivo").storage
+
+    with open(ruta, "rb") as f:
+        nombre = storage.save(subida.nombre_original, ArchivoEnDisco(f))
+
+    if ruta.exists():
+        os.remove(ruta)
+
+    subida.sha256 = sha256_de_nombre(nombre) or ""
+    subida.archivo = nombre
+    subida.completada = True
+    subida.save(update_fields=["sha256", "archivo", "completada", "fecha_actualizacion"])
+    return subida
+
+
+def _tokens_validos(tokens):
+    """UUIDs de los tokens recibidos; los mal formados se descartan"""
+    validos = []
+    for token in tokens:
+        try:
+            validos.append(uuid.UUID(str(token)))
+        except ValueError:
+            continue
+    return validos
+
+
+def adjuntar_subidas(historia, tokens, usuario):
+    """
+    Crea los ArchivoAdjunto de la historia a partir de subidas completadas.
+    Los tokens vienen del POST: los que no son UUID se ignoran, igual que
+    los de subidas ajenas o sin terminar.
+    """
+    subidas = SubidaArchivo.objects.filter(
+        token__in=_tokens_validos(tokens), usuario=usuario, completada=True
+    )
+    adjuntos = ArchivoAdjunto.objects.bulk_create(
+        [
+            ArchivoAdjunto(
+                historia=historia,
+                archivo=subida.archivo,
+                descripcion=subida.descripcion,
+                sha256=subida.sha256,
+            )
+            for subida in subidas
+        ]
+    )
+    subidas.delete()
+    return adjuntos
+
+
+def descartar_subida(subida):
+    """Elimina una subida (y su temporal, o su referencia al blob si ya terminó)"""
+    ruta = ruta_parte(subida)
+    if ruta.exists():
+        os.remove(ruta)
+    if subida.completada:
+        storage = ArchivoAdjunto._meta.get_field("archivo").storage
+        liberar_referencia(storage, subida.archivo)
+    subida.delete()
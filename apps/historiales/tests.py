@@ -1,3 +1,391 @@
-from django.test import TestCase
+import shutil
+import hashlib
+import tempfile
+from datetime import time, date, timedelta
 
-# Create your tests here.
+from django.core import mail
+from django.urls import reverse
+from django.utils import timezone
+from django.core.management import call_command
+from django.test import TestCase, Client, override_settings
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+
+from apps.core.explain import PlanConsultaMixin
+from apps.clinicas.models import Clinica
+from apps.accounts.models import CustomUser
+from apps.mascotas.models import Mascota, Especie
+from apps.historiales.models import (
+    HistoriaClinica,
+    ArchivoAdjunto,
+    SubidaArchivo,
+    Vacuna,
+    RecordatorioVacuna,
+)
+from apps.historiales.subidas import adjuntar_subidas
+
+MEDIA_TEST = tempfile.mkdtemp()
+
+
+@override_settings(MEDIA_ROOT=MEDIA_TEST, SUBIDAS_TMP_DIR=f"{MEDIA_TEST}/tmp")
+class HistorialesTestBase(TestCase):
+    """Datos comunes: clínica, veterinario, clientes, mascota e historia"""
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(MEDIA_TEST, ignore_errors=True)
+
+    def setUp(self):
+        self.client_http = Client()
+
+        self.admin = CustomUser.objects.create_user(
+            username="admin_test",
+            email="admin@test.com",
+            password="test",
+            rol="admin_veterinaria",
+        )
+        self.clinica = Clinica.objects.create(
+            nombre="Veterinaria Test",
+            email="test@vet.com",
+            hora_apertura=time(9, 0),
+            hora_cierre=time(18, 0),
+            admin=self.admin,
+        )
+        self.admin.clinica = self.clinica
+        self.admin.save()
+
+        self.veterinario = CustomUser.objects.create_user(
+            username="vet_test",
+            email="vet@test.com",
+            password="testpass123",
+            rol="veterinario",
+            clinica=self.clinica,
+        )
+        self.cliente = CustomUser.objects.create_user(
+            username="cli_test",
+            email="cliente@test.com",
+            password="testpass123",
+            rol="cliente",
+            clinica=self.clinica,
+        )
+        self.otro_cliente = CustomUser.objects.create_user(
+            username="otro_cli",
+            email="otro@test.com",
+            password="testpass123",
+            rol="cliente",
+            clinica=self.clinica,
+        )
+
+        especie = Especie.objects.create(nombre="Perro")
+        self.mascota = Mascota.objects.create(
+            nombre="Firulais",
+            especie=especie,
+            dueno=self.cliente,
+            fecha_nacimiento=date(2020, 1, 1),
+            sexo="M",
+        )
+        self.historia = HistoriaClinica.objects.create(
+            clinica=self.clinica,
+            mascota=self.mascota,
+            veterinario=self.veterinario,
+            motivo_consulta="Control",
+            peso_actual=10,
+            anamnesis="-",
+            diagnostico="Sano",
+            tratamiento_realizado="-",
+            indicaciones_dueno="-",
+            es_borrador=False,
+        )
+
+
+class ArchivoAdjuntoDescargarViewTest(HistorialesTestBase):
+    """Tests para la descarga controlada de archivos adjuntos"""
+
+    def setUp(self):
+        super().setUp()
+        self.contenido = bytes(range(256)) * 40
+        self.adjunto = ArchivoAdjunto.objects.create(
+            historia=self.historia,
+            archivo=SimpleUploadedFile("rx.pdf", self.contenido),
+            descripcion="Radiografía",
+        )
+        self.url = reverse("historias:descargar_archivo", args=[self.adjunto.pk])
+
+    def test_veterinario_descarga_archivo_completo(self):
+        """Test: El veterinario de la clínica recibe el archivo por streaming"""
+        self.client_http.login(username="vet_test", password="testpass123")
+        response = self.client_http.get(self.url)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(b"".join(response.streaming_content), self.contenido)
+        self.assertEqual(response["Accept-Ranges"], "bytes")
+        self.assertIn("ETag", response)
+
+    def test_rango_parcial(self):
+        """Test: Un header Range devuelve 206 con el tramo pedido"""
+        self.client_http.login(username="vet_test", password="testpass123")
+        response = self.client_http.get(self.url, HTTP_RANGE="bytes=100-199")
+
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(response["Content-Range"], f"bytes 100-199/{len(self.contenido)}")
+        self.assertEqual(b"".join(response.streaming_content), self.contenido[100:200])
+
+    def test_rango_invalido(self):
+        """Test: Un rango fuera del archivo devuelve 416"""
+        self.client_http.login(username="vet_test", password="testpass123")
+        response = self.client_http.get(self.url, HTTP_RANGE="bytes=999999-")
+
+        self.assertEqual(response.status_code, 416)
+
+    def test_if_none_match_devuelve_304(self):
+        """Test: Un ETag vigente evita reenviar el archivo"""
+        self.client_http.login(username="vet_test", password="testpass123")
+        etag = self.client_http.get(self.url)["ETag"]
+
+        response = self.client_http.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+
+    @override_settings(ARCHIVOS_OFFLOAD="x-accel-redirect")
+    def test_offload_x_accel_redirect(self):
+        """Test: En modo offload el proxy recibe la ruta interna"""
+        self.client_http.login(username="vet_test", password="testpass123")
+        response = self.client_http.get(self.url)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(
+            response["X-Accel-Redirect"].endswith(self.adjunto.archivo.name)
+        )
+        self.assertEqual(response.content, b"")
+
+    def test_dueno_puede_descargar(self):
+        """Test: El dueño de la mascota puede descargar sus archivos"""
+        self.client_http.login(username="cli_test", password="testpass123")
+        response = self.client_http.get(self.url)
+
+        self.assertEqual(response.status_code, 200)
+
+    def test_otro_cliente_no_puede_descargar(self):
+        """Test: Un cliente ajeno recibe 404"""
+        self.client_http.login(username="otro_cli", password="testpass123")
+        response = self.client_http.get(self.url)
+
+        self.assertEqual(response.status_code, 404)
+
+
+class SubidaPorPartesTest(HistorialesTestBase):
+    """Tests para la subida reanudable de archivos adjuntos"""
+
+    def setUp(self):
+        super().setUp()
+        self.client_http.login(username="vet_test", password="testpass123")
+        self.contenido = b"radiografia" * 1000
+
+    def iniciar(self, nombre="rx.png"):
+        response = self.client_http.post(
+            reverse("historias:subida_iniciar"),
+            {"nombre": nombre, "tamano": len(self.contenido), "descripcion": "Rx"},
+        )
+        self.assertEqual(response.status_code, 201)
+        return response.json()["token"]
+
+    def enviar(self, token, offset, datos):
+        return self.client_http.post(
+            reverse("historias:subida_parte", args=[token]),
+            data=datos,
+            content_type="application/octet-stream",
+            HTTP_UPLOAD_OFFSET=str(offset),
+        )
+
+    def subir_completo(self, nombre="rx.png"):
+        token = self.iniciar(nombre)
+        mitad = len(self.contenido) // 2
+        self.enviar(token, 0, self.contenido[:mitad])
+        response = self.enviar(token, mitad, self.contenido[mitad:])
+        self.assertTrue(response.json()["completada"])
+        return token
+
+    def test_subida_en_partes_y_reanudacion(self):
+        """Test: Un offset desfasado devuelve 409 con la posición para reanudar"""
+        token = self.iniciar()
+        self.enviar(token, 0, self.contenido[:4000])
+
+        response = self.enviar(token, 0, self.contenido[:4000])
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(response.json()["recibido"], 4000)
+
+        response = self.enviar(token, 4000, self.contenido[4000:])
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.json()["completada"])
+
+        subida = SubidaArchivo.objects.get(token=token)
+        with default_storage.open(subida.archivo) as f:
+            self.assertEqual(f.read(), self.contenido)
+        self.assertEqual(subida.sha256, hashlib.sha256(self.contenido).hexdigest())
+
+    def test_archivos_identicos_se_deduplican(self):
+        """Test: Dos subidas con el mismo contenido comparten el archivo"""
+        primera = SubidaArchivo.objects.get(token=self.subir_completo("a.png"))
+        segunda = SubidaArchivo.objects.get(token=self.subir_completo("b.png"))
+
+        self.assertEqual(primera.archivo, segunda.archivo)
+
+    def test_adjuntar_al_guardar_historia(self):
+        """Test: Los tokens enviados con la consulta crean los ArchivoAdjunto"""
+        token = self.subir_completo()
+        historia = HistoriaClinica.objects.create(
+            clinica=self.clinica,
+            mascota=self.mascota,
+            veterinario=self.veterinario,
+            motivo_consulta="Rx",
+            peso_actual=10,
+            anamnesis="-",
+            diagnostico="-",
+            tratamiento_realizado="-",
+            indicaciones_dueno="-",
+        )
+
+        adjuntar_subidas(historia, [token], self.veterinario)
+
+        adjunto = historia.archivos.get()
+        self.assertEqual(adjunto.descripcion, "Rx")
+        self.assertEqual(adjunto.sha256, hashlib.sha256(self.contenido).hexdigest())
+        self.assertFalse(SubidaArchivo.objects.filter(token=token).exists())
+
+    def test_token_mal_formado_se_ignora(self):
+        """Test: Un token que no es UUID no rompe el guardado de la consulta"""
+        token = self.subir_completo()
+        response = self.client_http.post(
+            reverse("historias:crear_historia", args=[self.mascota.pk]),
+            {
+                "motivo_consulta": "Rx",
+                "peso_actual": "10",
+                "anamnesis": "-",
+                "diagnostico": "-",
+                "tratamiento_realizado": "-",
+                "indicaciones_dueno": "-",
+                "vacunas_aplicadas-TOTAL_FORMS": "0",
+                "vacunas_aplicadas-INITIAL_FORMS": "0",
+                "archivos-TOTAL_FORMS": "0",
+                "archivos-INITIAL_FORMS": "0",
+                "subidas": ["nope", token],
+            },
+        )
+
+        self.assertEqual(response.status_code, 302)
+        historia = HistoriaClinica.objects.get(motivo_consulta="Rx")
+        self.assertEqual(historia.archivos.get().descripcion, "Rx")
+
+    def test_cliente_no_puede_subir(self):
+        """Test: Solo veterinarios pueden iniciar subidas"""
+        self.client_http.logout()
+        self.client_http.login(username="cli_test", password="testpass123")
+        response = self.client_http.post(
+            reverse("historias:subida_iniciar"), {"nombre": "x.pdf", "tamano": 10}
+        )
+        self.assertEqual(response.status_code, 403)
+
+
+class RecordatoriosVacunasTest(HistorialesTestBase):
+    """Tests para el comando enviar_recordatorios_vacunas"""
+
+    def setUp(self):
+        super().setUp()
+        hoy = timezone.localdate()
+        self.proxima = Vacuna.objects.create(
+            mascota=self.mascota,
+            nombre="Quintuple",
+            fecha_aplicacion=hoy - timedelta(days=360),
+            fecha_proxima_aplicacion=hoy + timedelta(days=3),
+        )
+        self.vencida = Vacuna.objects.create(
+            mascota=self.mascota,
+            nombre="Antirrábica",
+            fecha_aplicacion=hoy - timedelta(days=370),
+            fecha_proxima_aplicacion=hoy - timedelta(days=5),
+        )
+        # Fuera de la ventana de aviso
+        Vacuna.objects.create(
+            mascota=self.mascota,
+            nombre="Giardia",
+            fecha_aplicacion=hoy,
+            fecha_proxima_aplicacion=hoy + timedelta(days=90),
+        )
+
+    def enviar(self):
+        call_command(
+            "enviar_recordatorios_vacunas",
+            backend="django.core.mail.backends.locmem.EmailBackend",
+            stdout=open("/dev/null", "w"),
+        )
+
+    def test_un_email_por_cliente_con_todas_sus_vacunas(self):
+        """Test: Las vacunas del cliente se agrupan en un único email"""
+        self.enviar()
+
+        self.assertEqual(len(mail.outbox), 1)
+        email = mail.outbox[0]
+        self.assertEqual(email.to, ["cliente@test.com"])
+        self.assertIn("Quintuple", email.body)
+        self.assertIn("Antirrábica", email.body)
+        self.assertNotIn("Giardia", email.body)
+        self.assertEqual(RecordatorioVacuna.objects.count(), 2)
+
+    def test_reejecutar_no_duplica_envios(self):
+        """Test: Un segundo envío no repite recordatorios ya mandados"""
+        self.enviar()
+        self.enviar()
+
+        self.assertEqual(len(mail.outbox), 1)
+
+    def test_cuerpo_sin_escapar_html(self):
+        """Test: El email de texto no escapa comillas ni &"""
+        self.clinica.nombre = "O'Brien & Co"
+        self.clinica.save()
+        self.enviar()
+
+        cuerpo = mail.outbox[0].body
+        self.assertIn("Te escribimos desde O'Brien & Co para", cuerpo)
+        self.assertIn("Saludos,\nO'Brien & Co", cuerpo)
+
+    def test_vacuna_reaplicada_no_se_avisa(self):
+        """Test: Si ya se aplicó una dosis posterior no se envía recordatorio"""
+        Vacuna.objects.create(
+            mascota=self.mascota,
+            nombre="Antirrábica",
+            fecha_aplicacion=timezone.localdate(),
+            fecha_proxima_aplicacion=timezone.localdate() + timedelta(days=365),
+        )
+        self.enviar()
+
+        self.assertNotIn("Antirrábica", mail.outbox[0].body)
+
+
+class IndicesHistorialesTest(PlanConsultaMixin, TestCase):
+    """Tests: las consultas frecuentes de historiales usan un índice (EXPLAIN)"""
+
+    def test_historias_de_la_mascota(self):
+        """Test: historial de una mascota, más reciente primero"""
+        self.assertUsaIndice(
+            HistoriaClinica.objects.filter(mascota_id=1).order_by("-fecha"),
+            "historiales_historiaclinica",
+            "historia_mascota_fecha_idx",
+        )
+
+    def test_historias_de_la_clinica(self):
+        """Test: listado de historias de la clínica"""
+        self.assertUsaIndice(
+            HistoriaClinica.objects.filter(clinica_id=1).order_by("-fecha"),
+            "historiales_historiaclinica",
+            "historia_clinica_fecha_idx",
+        )
+
+    def test_vacunas_proximas(self):
+        """Test: recordatorios por rango de fecha_proxima_aplicacion"""
+        hoy = timezone.localdate()
+        self.assertUsaIndice(
+            Vacuna.objects.filter(
+                fecha_proxima_aplicacion__range=(hoy, hoy + timedelta(days=7))
+            ),
+            "historiales_vacuna",
+        )
@@ -1,5 +1,13 @@
 from django.urls import path
-from .views import HistoriaClinicaCreateView, HistoriaDetailView, MisHistoriasListView
+from .views import (
+    HistoriaClinicaCreateView,
+    HistoriaDetailView,
+    MisHistoriasListView,
+    ArchivoAdjuntoDescargarView,
+    SubidaIniciarView,
+    SubidaParteView,
+    ExportarHistoriasView,
+)
 
 app_name = "historias"
 urlpatterns = [
@@ -10,4 +18,13 @@ urlpatterns = [
     ),
     path("detalle/<int:pk>/", HistoriaDetailView.as_view(), name="historia_detalle"),
     path("mis-registros/", MisHistoriasListView.as_view(), name="mis_historias"),
+    path("exportar/", ExportarHistoriasView.as_view(), name="exportar_historias"),
+    path(
+        "archivo/<int:pk>/",
+        ArchivoAdjuntoDescargarView.as_view(),
+        name="descargar_archivo",
+    ),
+    # Subidas por partes (archivos grandes)
+    path("subidas/", SubidaIniciarView.as_view(), name="subida_iniciar"),
+    path("subidas/<uuid:token>/", SubidaParteView.as_view(), name="subida_parte"),
 ]
@@ -1,12 +1,18 @@
+from django.conf import settings
 from django.db import transaction
 from django.urls import reverse
+from django.http import Http404, JsonResponse
 from django.shortcuts import get_object_or_404
-from django.views.generic import CreateView, DetailView, ListView
+from django.views.generic import CreateView, DetailView, ListView, View
 from django.contrib import messages
 from django.contrib.auth.mixins import LoginRequiredMixin
 
-from .models import HistoriaClinica
+from .models import HistoriaClinica, ArchivoAdjunto, SubidaArchivo
+from .descargas import servir_archivo
+from .subidas import ErrorSubida, escribir_parte, adjuntar_subidas, descartar_subida
 from apps.mascotas.models import Mascota
+from apps.core.exportar import ExportacionMixin
+from apps.core.views import AdminVeterinariaRequiredMixin
 from .forms import HistoriaClinicaForm, VacunaFormSet, ArchivoAdjuntoFormSet
 
 
@@ -41,7 +47,7 @@ class HistoriaClinicaCreateView(LoginRequiredMixin, CreateView):
 
         with transaction.atomic():
             form.instance.mascota = mascota
-            form.instance.clinica = self.request.user.clinica
+            form.instance.clinica_id = self.request.principal.clinica_id
             form.instance.veterinario = self.request.user
             self.object = form.save()
 
@@ -50,6 +56,7 @@ class HistoriaClinicaCreateView(LoginRequiredMixin, CreateView):
                 try:
                     # Importamos aquí para evitar referencias circulares
                     from apps.turnos.models import Turno, EstadoTurno
+                    from apps.turnos.estadisticas import registrar
 
                     turno = Turno.objects.get(
                         pk=turno_id, veterinario=self.request.user
@@ -65,6 +72,7 @@ class HistoriaClinicaCreateView(LoginRequiredMixin, CreateView):
                     )
                     turno.estado = estado_completado
                     turno.save()
+                    registrar(turno)
 
                     messages.success(
                         self.request,
@@ -85,6 +93,11 @@ class HistoriaClinicaCreateView(LoginRequiredMixin, CreateView):
                 archivos.instance = self.object
                 archivos.save()
 
+            # Archivos grandes subidos previamente por partes
+            tokens = self.request.POST.getlist("subidas")
+            if tokens:
+                adjuntar_subidas(self.object, tokens, self.request.user)
+
         return super().form_valid(form)
 
     def get_success_url(self):
@@ -123,3 +136,156 @@ class MisHistoriasListView(LoginRequiredMixin, ListView):
             .select_related("mascota", "veterinario")
             .order_by("-fecha")
         )
+
+
+class ArchivoAdjuntoDescargarView(LoginRequiredMixin, View):
+    """Descarga controlada de un archivo adjunto (streaming, Range y ETag)"""
+
+    def puede_ver(self, adjunto):
+        user = self.request.user
+        historia = adjunto.historia
+
+        if user.rol in ["admin_veterinaria", "veterinario"]:
+            return user.clinica_id == historia.clinica_id
+        if user.rol == "cliente":
+            return historia.mascota.dueno_id == user.id and not historia.es_borrador
+        return False
+
+    def get(self, request, pk):
+        adjunto = get_object_or_404(
+            ArchivoAdjunto.objects.select_related("historia__mascota"), pk=pk
+        )
+
+        # 404 en lugar de 403 para no revelar la existencia del archivo
+        if not self.puede_ver(adjunto) or not adjunto.archivo:
+            raise Http404("Archivo no encontrado")
+
+        try:
+            return servir_archivo(
+                request,
+                adjunto.archivo,
+                as_attachment=request.GET.get("descargar") == "1",
+            )
+        except FileNotFoundError:
+            raise Http404("Archivo no encontrado")
+
+
+# ==================== SUBIDAS POR PARTES ====================
+
+
+class SubidaVeterinarioMixin(LoginRequiredMixin):
+    """Solo veterinarios pueden subir archivos a historias clínicas"""
+
+    def dispatch(self, request, *args, **kwargs):
+        if request.principal and request.principal.rol != "veterinario":
+            return JsonResponse({"error": "No autorizado"}, status=403)
+        return super().dispatch(request, *args, **kwargs)
+
+
+class SubidaIniciarView(SubidaVeterinarioMixin, View):
+    """Inicia una subida reanudable y devuelve su token"""
+
+    def post(self, request):
+        nombre = request.POST.get("nombre", "").strip()
+        descripcion = request.POST.get("descripcion", "").strip()[:100]
+        try:
+            tamano = int(request.POST.get("tamano", ""))
+        except ValueError:
+            return JsonResponse({"error": "Tamaño inválido"}, status=400)
+
+        tamano_maximo = getattr(settings, "SUBIDAS_TAMANO_MAXIMO", 500 * 1024 * 1024)
+        if not nombre or tamano <= 0 or tamano > tamano_maximo:
+            return JsonResponse({"error": "Archivo inválido o demasiado grande"}, status=400)
+
+        subida = SubidaArchivo.objects.create(
+            usuario=request.user,
+            clinica_id=request.principal.clinica_id,
+            nombre_original=nombre[:255],
+            descripcion=descripcion,
+            tamano_total=tamano,
+        )
+        return JsonResponse(
+            {
+                "token": str(subida.token),
+                "recibido": 0,
+                "tamano_parte": getattr(settings, "SUBIDAS_TAMANO_PARTE", 1024 * 1024),
+            },
+            status=201,
+        )
+
+
+class SubidaParteView(SubidaVeterinarioMixin, View):
+    """
+    GET: estado de la subida (para reanudar).
+    POST: agrega una parte; el cuerpo es binario y el header Upload-Offset
+    indica la posición. DELETE: descarta la subida.
+    """
+
+    def get_subida(self, token):
+        return get_object_or_404(SubidaArchivo, token=token, usuario=self.request.user)
+
+    def estado(self, subida, status=200):
+        return JsonResponse(
+            {
+                "token": str(subida.token),
+                "recibido": subida.recibido,
+                "tamano": subida.tamano_total,
+                "completada": subida.completada,
+                "sha256": subida.sha256,
+            },
+            status=status,
+        )
+
+    def get(self, request, token):
+        return self.estado(self.get_subida(token))
+
+    def post(self, request, token):
+        try:
+            offset = int(request.headers.get("Upload-Offset", ""))
+        except ValueError:
+            return JsonResponse({"error": "Falta Upload-Offset"}, status=400)
+
+        with transaction.atomic():
+            subida = SubidaArchivo.objects.select_for_update().get(
+                pk=self.get_subida(token).pk
+            )
+            try:
+                escribir_parte(subida, request, offset)
+            except ErrorSubida as e:
+                return self.estado(subida, status=e.status)
+
+        return self.estado(subida)
+
+    def delete(self, request, token):
+        subida = self.get_subida(token)
+        if not subida.completada:
+            descartar_subida(subida)
+        return JsonResponse({"ok": True})
+
+
+class ExportarHistoriasView(
+    LoginRequiredMixin, AdminVeterinariaRequiredMixin, ExportacionMixin, View
+):
+    """Exporta las historias clínicas de la clínica (filtros: desde, hasta, veterinario)"""
+
+    nombre_archivo = "historias"
+    columnas = [
+        ("Fecha", "fecha"),
+        ("Mascota", "mascota__nombre"),
+        ("Especie", "mascota__especie__nombre"),
+        ("Dueño - Nombre", "mascota__dueno__first_name"),
+        ("Dueño - Apellido", "mascota__dueno__last_name"),
+        ("Veterinario - Nombre", "veterinario__first_name"),
+        ("Veterinario - Apellido", "veterinario__last_name"),
+        ("Motivo", "motivo_consulta"),
+        ("Peso (kg)", "peso_actual"),
+        ("Temperatura", "temperatura"),
+        ("Diagnóstico", "diagnostico"),
+        ("Tratamiento", "tratamiento_realizado"),
+    ]
+
+    def get_queryset_exportacion(self):
+        queryset = HistoriaClinica.objects.filter(
+            clinica_id=self.request.principal.clinica_id, es_borrador=False
+        ).order_by("-fecha")
+        return self.filtrar_periodo(queryset, "fecha__date")
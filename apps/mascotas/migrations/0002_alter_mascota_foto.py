@@ -0,0 +1,19 @@
+# Generated by Django 5.2.6 on 2026-10-19 15:33
+
+import apps.core.storage
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('mascotas', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='mascota',
+            name='foto',
+            field=models.ImageField(blank=True, null=True, storage=apps.core.storage.storage_deduplicado, upload_to='mascotas/fotos/'),
+        ),
+    ]
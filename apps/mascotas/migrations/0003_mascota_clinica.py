@@ -0,0 +1,26 @@
+# Generated by Django 5.2.6 on 2026-10-19 16:22
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('clinicas', '0001_initial'),
+        ('mascotas', '0002_alter_mascota_foto'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='mascota',
+            name='clinica',
+            field=models.ForeignKey(blank=True, editable=False, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='mascotas', to='clinicas.clinica'),
+        ),
+        migrations.AddIndex(
+            model_name='mascota',
+            index=models.Index(fields=['clinica', '-fecha_registro'], name='mascota_clinica_registro_idx'),
+        ),
+    ]
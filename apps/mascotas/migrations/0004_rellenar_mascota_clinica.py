@@ -0,0 +1,32 @@
+from django.db import migrations
+from django.db.models import Max, OuterRef, Subquery
+
+LOTE = 5000
+
+
+def rellenar_clinica(apps, schema_editor):
+    # Copia dueno.clinica por rangos de id para no bloquear la tabla entera
+    Mascota = apps.get_model("mascotas", "Mascota")
+    CustomUser = apps.get_model("accounts", "CustomUser")
+    clinica_dueno = CustomUser.objects.filter(pk=OuterRef("dueno_id")).values(
+        "clinica_id"
+    )[:1]
+
+    ultimo = Mascota.objects.aggregate(ultimo=Max("pk"))["ultimo"] or 0
+    for desde in range(0, ultimo, LOTE):
+        Mascota.objects.filter(pk__gt=desde, pk__lte=desde + LOTE).update(
+            clinica_id=Subquery(clinica_dueno)
+        )
+
+
+class Migration(migrations.Migration):
+    # Cada lote se confirma por separado
+    atomic = False
+
+    dependencies = [
+        ("mascotas", "0003_mascota_clinica"),
+    ]
+
+    operations = [
+        migrations.RunPython(rellenar_clinica, migrations.RunPython.noop),
+    ]
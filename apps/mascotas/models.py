@@ -1,6 +1,9 @@
 from django.db import models
 from django.core.validators import MinValueValidator
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
 from apps.accounts.models import CustomUser
+from apps.core.storage import storage_deduplicado, liberar_referencia
 from django.utils import timezone
 
 
@@ -62,6 +65,16 @@ class Mascota(models.Model):
         related_name="mascotas",
         limit_choices_to={"rol": "cliente"},
     )
+    # Copia de dueno.clinica para filtrar por clínica sin join con CustomUser.
+    # Se completa en save() y se sincroniza cuando cambia la clínica del dueño.
+    clinica = models.ForeignKey(
+        "clinicas.Clinica",
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        editable=False,
+        related_name="mascotas",
+    )
 
     # Características físicas
     sexo = models.CharField(max_length=1, choices=SEXO_CHOICES)
@@ -86,7 +99,12 @@ class Mascota(models.Model):
         null=True,
         help_text="Número de microchip",
     )
-    foto = models.ImageField(upload_to="mascotas/fotos/", blank=True, null=True)
+    foto = models.ImageField(
+        upload_to="mascotas/fotos/",
+        storage=storage_deduplicado,
+        blank=True,
+        null=True,
+    )
 
     # Información médica básica
     esterilizado = models.BooleanField(
@@ -119,6 +137,9 @@ class Mascota(models.Model):
         indexes = [
             models.Index(fields=["dueno", "activo"]),
             models.Index(fields=["numero_chip"]),
+            models.Index(
+                fields=["clinica", "-fecha_registro"], name="mascota_clinica_registro_idx"
+            ),
         ]
 
     def __str__(self):
@@ -183,4 +204,35 @@ class Mascota(models.Model):
         if self.numero_chip == "":
             self.numero_chip = None
 
+        if self.dueno_id:
+            self.clinica_id = self.dueno.clinica_id
+
+        # Si se reemplazó o quitó la foto, liberar la referencia al blob anterior
+        foto_anterior = None
+        if self.pk and (not self.foto or not self.foto._committed):
+            foto_anterior = (
+                Mascota.objects.filter(pk=self.pk).values_list("foto", flat=True).first()
+            )
+
         super().save(*args, **kwargs)
+
+        # Aunque sea la misma foto (mismo blob): al guardarla se sumó una referencia
+        if foto_anterior:
+            liberar_referencia(self.foto.storage, foto_anterior)
+
+
+@receiver(post_delete, sender=Mascota)
+def liberar_foto_mascota(sender, instance, **kwargs):
+    liberar_referencia(instance.foto.storage, instance.foto.name)
+
+
+@receiver(post_save, sender=CustomUser)
+def sincronizar_clinica_mascotas(sender, instance, created, update_fields=None, **kwargs):
+    """Mantiene Mascota.clinica igual a la clínica del dueño"""
+    if created or instance.rol != "cliente":
+        return
+    if update_fields is not None and "clinica" not in update_fields:
+        return
+    Mascota.objects.filter(dueno=instance).exclude(clinica_id=instance.clinica_id).update(
+        clinica_id=instance.clinica_id
+    )
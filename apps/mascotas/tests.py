@@ -1,3 +1,155 @@
-from django.test import TestCase
+from datetime import time
 
-# Create your tests here.
+from django.urls import reverse
+from django.db import connection
+from django.test import TestCase, Client
+from django.test.utils import CaptureQueriesContext
+
+from apps.clinicas.models import Clinica
+from apps.accounts.models import CustomUser
+from apps.core.explain import PlanConsultaMixin
+from apps.mascotas.models import Mascota, Especie
+
+
+class MascotasTestBase(TestCase):
+    """Datos comunes: dos clínicas, un cliente y su mascota"""
+
+    def setUp(self):
+        self.client_http = Client()
+
+        self.admin = CustomUser.objects.create_user(
+            username="admin_test",
+            email="admin@test.com",
+            password="testpass123",
+            rol="admin_veterinaria",
+        )
+        self.clinica = Clinica.objects.create(
+            nombre="Veterinaria Test",
+            email="test@vet.com",
+            hora_apertura=time(9, 0),
+            hora_cierre=time(18, 0),
+            admin=self.admin,
+        )
+        self.otra_clinica = Clinica.objects.create(
+            nombre="Otra Veterinaria",
+            email="otra@vet.com",
+            hora_apertura=time(9, 0),
+            hora_cierre=time(18, 0),
+            admin=CustomUser.objects.create_user(
+                username="otro_admin",
+                email="otro_admin@test.com",
+                password="testpass123",
+                rol="admin_veterinaria",
+            ),
+        )
+        self.admin.clinica = self.clinica
+        self.admin.save()
+
+        self.cliente = CustomUser.objects.create_user(
+            username="cli_test",
+            email="cliente@test.com",
+            password="testpass123",
+            rol="cliente",
+            clinica=self.clinica,
+        )
+        self.especie = Especie.objects.create(nombre="Perro")
+        self.mascota = Mascota.objects.create(
+            nombre="Firulais", especie=self.especie, dueno=self.cliente, sexo="M"
+        )
+
+
+class MascotaClinicaTest(PlanConsultaMixin, MascotasTestBase):
+    """Tests para la clínica desnormalizada en Mascota"""
+
+    def test_mascota_toma_la_clinica_del_dueno(self):
+        """Test: al guardar, la mascota copia la clínica del dueño"""
+        self.assertEqual(self.mascota.clinica, self.clinica)
+
+    def test_cambio_de_clinica_del_dueno_se_propaga(self):
+        """Test: si el dueño cambia de clínica, sus mascotas lo acompañan"""
+        self.cliente.clinica = self.otra_clinica
+        self.cliente.save()
+        self.mascota.refresh_from_db()
+        self.assertEqual(self.mascota.clinica, self.otra_clinica)
+
+        # Guardados parciales que no tocan la clínica no actualizan mascotas
+        self.cliente.clinica = self.clinica
+        self.cliente.save(update_fields=["last_login"])
+        self.mascota.refresh_from_db()
+        self.assertEqual(self.mascota.clinica, self.otra_clinica)
+
+    def test_lista_admin_filtra_por_clinica(self):
+        """Test: la lista del admin solo muestra mascotas de su clínica"""
+        otro = CustomUser.objects.create_user(
+            username="otro_cli",
+            email="otro@test.com",
+            password="testpass123",
+            rol="cliente",
+            clinica=self.otra_clinica,
+        )
+        Mascota.objects.create(nombre="Michi", especie=self.especie, dueno=otro, sexo="H")
+
+        self.client_http.login(username="admin_test", password="testpass123")
+        response = self.client_http.get(reverse("mascotas:lista_mascotas_admin"))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([m.nombre for m in response.context["page_obj"]], ["Firulais"])
+
+    def test_consultas_por_clinica_sin_join(self):
+        """Test: las consultas por clínica usan el índice de Mascota"""
+        self.assertUsaIndice(
+            Mascota.objects.filter(clinica_id=1, activo=True),
+            "mascotas_mascota",
+        )
+        self.assertUsaIndice(
+            Mascota.objects.filter(clinica_id=1).order_by("-fecha_registro"),
+            "mascotas_mascota",
+            "mascota_clinica_registro_idx",
+        )
+
+
+class PermisosMascotaTest(MascotasTestBase):
+    """Tests para los permisos por objeto de las vistas de mascotas"""
+
+    def consultas_mascota(self, url):
+        with CaptureQueriesContext(connection) as consultas:
+            response = self.client_http.get(url)
+        return response, [
+            q["sql"] for q in consultas if 'FROM "mascotas_mascota"' in q["sql"]
+        ]
+
+    def test_detalle_carga_la_mascota_una_vez(self):
+        """Test: el permiso y la vista comparten la misma consulta"""
+        self.client_http.login(username="cli_test", password="testpass123")
+        response, consultas = self.consultas_mascota(
+            reverse("mascotas:detalle_mascota", args=[self.mascota.pk])
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(consultas), 1)
+
+        response, consultas = self.consultas_mascota(
+            reverse("mascotas:editar_mascota", args=[self.mascota.pk])
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(consultas), 1)
+
+    def test_cliente_no_ve_mascota_ajena(self):
+        """Test: otro cliente es redirigido a sus mascotas"""
+        CustomUser.objects.create_user(
+            username="intruso",
+            email="intruso@test.com",
+            password="testpass123",
+            rol="cliente",
+            clinica=self.clinica,
+        )
+        self.client_http.login(username="intruso", password="testpass123")
+        for nombre in ["mascotas:detalle_mascota", "mascotas:editar_mascota"]:
+            response = self.client_http.get(reverse(nombre, args=[self.mascota.pk]))
+            self.assertRedirects(response, reverse("mascotas:mis_mascotas"))
+
+    def test_admin_de_otra_clinica_no_edita(self):
+        """Test: la mascota debe ser de la clínica del admin"""
+        self.client_http.login(username="otro_admin", password="testpass123")
+        response = self.client_http.get(
+            reverse("mascotas:editar_mascota_admin", args=[self.mascota.pk])
+        )
+        self.assertRedirects(response, reverse("mascotas:lista_mascotas_admin"))
@@ -7,6 +7,7 @@ from .views import (
     DetalleMascotaView,
     # Vistas de Admin
     ListaMascotasAdminView,
+    ExportarMascotasView,
     CrearMascotaAdminView,
     EditarMascotaAdminView,
     InactivarMascotaView,
@@ -27,6 +28,9 @@ urlpatterns = [
     path("detalle/<int:pk>/", DetalleMascotaView.as_view(), name="detalle_mascota"),
     # Admin
     path("admin/lista/", ListaMascotasAdminView.as_view(), name="lista_mascotas_admin"),
+    path(
+        "admin/exportar/", ExportarMascotasView.as_view(), name="exportar_mascotas"
+    ),
     path("admin/crear/", CrearMascotaAdminView.as_view(), name="crear_mascota_admin"),
     path(
         "admin/editar/<int:pk>/",
@@ -3,7 +3,7 @@ from django.contrib import messages
 from django.http import JsonResponse
 from django.urls import reverse_lazy
 from django.http import HttpResponseForbidden
-from django.shortcuts import redirect, get_object_or_404, render
+from django.shortcuts import redirect, render
 from django.views.generic import (
     ListView,
     CreateView,
@@ -13,6 +13,10 @@ from django.views.generic import (
     View,
 )
 from django.contrib.auth.mixins import LoginRequiredMixin, UserPassesTestMixin
+
+from apps.accounts.principal import tiene_rol
+from apps.core.exportar import ExportacionMixin
+from apps.core.permisos import ObjetoPermisoMixin, RolAsyncMixin
 from apps.turnos.models import Turno, EstadoTurno
 from .models import Mascota, Raza
 from .forms import (
@@ -30,7 +34,7 @@ class ClienteRequiredMixin(UserPassesTestMixin):
     """Mixin que verifica que el usuario sea cliente"""
 
     def test_func(self):
-        return self.request.user.is_authenticated and self.request.user.rol == "cliente"
+        return tiene_rol(self.request, "cliente")
 
     def handle_no_permission(self):
         messages.error(self.request, "No tienes permiso para acceder a esta página.")
@@ -41,10 +45,7 @@ class AdminVeterinariaRequiredMixin(UserPassesTestMixin):
     """Mixin que verifica que el usuario sea administrador de veterinaria"""
 
     def test_func(self):
-        return (
-            self.request.user.is_authenticated
-            and self.request.user.rol == "admin_veterinaria"
-        )
+        return tiene_rol(self.request, "admin_veterinaria")
 
     def handle_no_permission(self):
         messages.error(self.request, "No tienes permiso para acceder a esta página.")
@@ -55,36 +56,33 @@ class VeterinarioRequiredMixin(UserPassesTestMixin):
     """Mixin que verifica que el usuario sea veterinario"""
 
     def test_func(self):
-        return (
-            self.request.user.is_authenticated
-            and self.request.user.rol == "veterinario"
-        )
+        return tiene_rol(self.request, "veterinario")
 
     def handle_no_permission(self):
         messages.error(self.request, "No tienes permiso para acceder a esta página.")
         return redirect("core:dashboard")
 
 
-class MascotaOwnerMixin:
+class MascotaOwnerMixin(ObjetoPermisoMixin):
     """Mixin que verifica que el usuario sea dueño de la mascota"""
 
-    def dispatch(self, request, *args, **kwargs):
-        mascota = self.get_object()
-        if request.user != mascota.dueno:
-            messages.error(request, "No tienes permiso para editar esta mascota.")
-            return redirect("mascotas:mis_mascotas")
-        return super().dispatch(request, *args, **kwargs)
+    queryset = Mascota.objects.select_related("dueno")
+    mensaje_permiso_denegado = "No tienes permiso para editar esta mascota."
+    url_permiso_denegado = "mascotas:mis_mascotas"
 
+    def tiene_permiso(self, mascota):
+        return mascota.dueno_id == self.request.user.pk
 
-class MascotaClinicaMixin:
+
+class MascotaClinicaMixin(ObjetoPermisoMixin):
     """Mixin que verifica que la mascota pertenezca a la clínica del usuario"""
 
-    def dispatch(self, request, *args, **kwargs):
-        mascota = self.get_object()
-        if mascota.dueno.clinica != request.user.clinica:
-            messages.error(request, "Esta mascota no pertenece a tu clínica.")
-            return redirect("mascotas:lista_mascotas_admin")
-        return super().dispatch(request, *args, **kwargs)
+    queryset = Mascota.objects.select_related("dueno")
+    mensaje_permiso_denegado = "Esta mascota no pertenece a tu clínica."
+    url_permiso_denegado = "mascotas:lista_mascotas_admin"
+
+    def tiene_permiso(self, mascota):
+        return mascota.clinica_id == self.request.user.clinica_id
 
 
 class FiltroMascotasMixin:
@@ -243,7 +241,7 @@ class EditarMascotaView(
         return context
 
 
-class DetalleMascotaView(LoginRequiredMixin, DetailView):
+class DetalleMascotaView(LoginRequiredMixin, ObjetoPermisoMixin, DetailView):
     """Muestra los detalles de una mascota"""
 
     model = Mascota
@@ -253,6 +251,18 @@ class DetalleMascotaView(LoginRequiredMixin, DetailView):
     def get_queryset(self):
         return Mascota.objects.select_related("especie", "raza", "dueno")
 
+    def tiene_permiso(self, mascota):
+        rol = self.request.user.rol
+        if rol == "cliente":
+            return mascota.dueno_id == self.request.user.pk
+        return rol in ["admin_veterinaria", "veterinario"]
+
+    def permiso_denegado(self, mascota):
+        if self.request.user.rol != "cliente":
+            return HttpResponseForbidden("No tienes permiso para acceder.")
+        messages.error(self.request, "No tienes permiso para ver esta mascota.")
+        return redirect("mascotas:mis_mascotas")
+
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
         if self.request.user.rol == "veterinario":
@@ -265,20 +275,6 @@ class DetalleMascotaView(LoginRequiredMixin, DetailView):
 
         return context
 
-    def dispatch(self, request, *args, **kwargs):
-        try:
-            mascota = self.get_object()
-        except Mascota.DoesNotExist:
-            return super().dispatch(request, *args, **kwargs)
-        if request.user.rol == "cliente":
-            if mascota.dueno != request.user:
-                messages.error(request, "No tienes permiso para ver esta mascota.")
-                return redirect("mascotas:mis_mascotas")
-        elif request.user.rol not in ["admin_veterinaria", "veterinario"]:
-            return HttpResponseForbidden("No tienes permiso para acceder.")
-
-        return super().dispatch(request, *args, **kwargs)
-
 
 # ==================== VISTAS PARA ADMIN ====================
 
@@ -296,7 +292,7 @@ class ListaMascotasAdminView(
 
     def get_queryset(self):
         queryset = (
-            Mascota.objects.filter(dueno__clinica=self.request.user.clinica)
+            Mascota.objects.filter(clinica_id=self.request.principal.clinica_id)
             .select_related("dueno")
             .order_by("-fecha_registro")
         )
@@ -329,21 +325,56 @@ class ListaMascotasAdminView(
 
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
-        clinica = self.request.user.clinica
+        clinica_id = self.request.principal.clinica_id
         context.update(
             {
                 "total_mascotas": self.get_queryset().count(),
                 "activas": Mascota.objects.filter(
-                    dueno__clinica=clinica, activo=True
+                    clinica_id=clinica_id, activo=True
                 ).count(),
                 "inactivas": Mascota.objects.filter(
-                    dueno__clinica=clinica, activo=False
+                    clinica_id=clinica_id, activo=False
                 ).count(),
             }
         )
         return context
 
 
+class ExportarMascotasView(
+    LoginRequiredMixin,
+    AdminVeterinariaRequiredMixin,
+    FiltroMascotasMixin,
+    ExportacionMixin,
+    View,
+):
+    """Exporta las mascotas de la clínica en CSV / XLSX con los filtros de la lista"""
+
+    nombre_archivo = "mascotas"
+    buscar_por_dueno = True
+    columnas = [
+        ("Nombre", "nombre"),
+        ("Especie", "especie__nombre"),
+        ("Raza", "raza__nombre"),
+        ("Sexo", "sexo"),
+        ("Fecha de nacimiento", "fecha_nacimiento"),
+        ("Color", "color"),
+        ("Peso (kg)", "peso"),
+        ("Chip", "numero_chip"),
+        ("Esterilizado", "esterilizado"),
+        ("Dueño - Nombre", "dueno__first_name"),
+        ("Dueño - Apellido", "dueno__last_name"),
+        ("Dueño - Email", "dueno__email"),
+        ("Dueño - Teléfono", "dueno__telefono"),
+        ("Activa", "activo"),
+        ("Fecha de registro", "fecha_registro"),
+    ]
+
+    def get_queryset_exportacion(self):
+        return Mascota.objects.filter(
+            clinica_id=self.request.principal.clinica_id
+        ).order_by("-fecha_registro")
+
+
 class CrearMascotaAdminView(
     LoginRequiredMixin, AdminVeterinariaRequiredMixin, CreateView
 ):
@@ -402,14 +433,8 @@ class InactivarMascotaView(
     template_name = "mascotas/inactivar_mascota.html"
     success_url = reverse_lazy("mascotas:lista_mascotas_admin")
 
-    def get_object(self):
-        """Obtener la mascota a inactivar"""
-        if not hasattr(self, "_object"):
-            self._object = get_object_or_404(Mascota, pk=self.kwargs["pk"])
-        return self._object
-
     def form_valid(self, form):
-        mascota = self.get_object()
+        mascota = self.object
         fecha_fallecimiento = form.cleaned_data.get("fecha_fallecimiento")
         mascota.inactivar(fecha_fallecimiento)
 
@@ -422,29 +447,21 @@ class InactivarMascotaView(
         messages.success(self.request, mensaje)
         return super().form_valid(form)
 
-    def get_context_data(self, **kwargs):
-        context = super().get_context_data(**kwargs)
-        context["mascota"] = self.get_object()
-        return context
-
 
 class ActivarMascotaView(
     LoginRequiredMixin, AdminVeterinariaRequiredMixin, MascotaClinicaMixin, View
 ):
     """Permite al admin reactivar una mascota"""
 
-    def get_object(self):
-        """Obtener la mascota a activar"""
-        return get_object_or_404(Mascota, pk=self.kwargs["pk"])
+    queryset = Mascota.objects.select_related("dueno", "especie")
 
     def get(self, request, *args, **kwargs):
         """Mostrar confirmación"""
-        mascota = self.get_object()
-        return render(request, "mascotas/activar_mascota.html", {"mascota": mascota})
+        return render(request, "mascotas/activar_mascota.html", {"mascota": self.object})
 
     def post(self, request, *args, **kwargs):
         """Activar la mascota"""
-        mascota = self.get_object()
+        mascota = self.object
         mascota.activar()
         messages.success(
             request, f'Mascota "{mascota.nombre}" reactivada exitosamente.'
@@ -468,7 +485,7 @@ class ListaMascotasVeterinarioView(
 
     def get_queryset(self):
         queryset = (
-            Mascota.objects.filter(dueno__clinica=self.request.user.clinica)
+            Mascota.objects.filter(clinica_id=self.request.principal.clinica_id)
             .select_related("dueno")
             .order_by("-fecha_registro")
         )
@@ -503,10 +520,10 @@ class ListaMascotasVeterinarioView(
 # ==================== AJAX / API VIEWS ====================
 
 
-class CargarRazasView(LoginRequiredMixin, View):
+class CargarRazasView(RolAsyncMixin, View):
     """Devuelve las razas en formato JSON según la especie seleccionada"""
 
-    def get(self, request, *args, **kwargs):
+    async def get(self, request, *args, **kwargs):
         especie_id = request.GET.get("especie_id")
 
         if especie_id:
@@ -515,6 +532,6 @@ class CargarRazasView(LoginRequiredMixin, View):
                 .values("id", "nombre")
                 .order_by("nombre")
             )
-            return JsonResponse(list(razas), safe=False)
+            return JsonResponse([raza async for raza in razas], safe=False)
 
         return JsonResponse([], safe=False)
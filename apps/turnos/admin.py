@@ -1,5 +1,16 @@
 from django.contrib import admin
-from .models import EstadoTurno, DisponibilidadVeterinario, Turno
+from .agenda import eliminar_libres, fecha_horizonte, materializar
+from .estadisticas import registrar
+from .models import (
+    EstadoTurno,
+    DisponibilidadVeterinario,
+    ReglaDisponibilidad,
+    ExcepcionDisponibilidad,
+    Turno,
+    TurnoArchivado,
+    EsperaTurno,
+    ResumenDiarioTurnos,
+)
 
 
 # Estados de Turno
@@ -24,17 +35,19 @@ class DisponibilidadVeterinarioAdmin(admin.ModelAdmin):
         "hora_inicio",
         "hora_fin",
         "duracion_turno",
+        "generado_hasta",
     ]
     list_filter = ["clinica", "veterinario", "fecha_inicio", "fecha_fin"]
     search_fields = ["veterinario__nombre_completo", "veterinario__email"]
     date_hierarchy = "fecha_inicio"
     ordering = ["-fecha_inicio", "hora_inicio"]
+    readonly_fields = ["generado_hasta"]
 
     fieldsets = (
         ("Veterinario", {"fields": ("veterinario", "clinica")}),
         (
             "Rango de Fechas",
-            {"fields": ("fecha_inicio", "fecha_fin")},
+            {"fields": ("fecha_inicio", "fecha_fin", "generado_hasta")},
         ),
         (
             "Horario",
@@ -53,6 +66,59 @@ class DisponibilidadVeterinarioAdmin(admin.ModelAdmin):
             obj.generar_turnos_rango()
 
 
+# Reglas de disponibilidad recurrentes
+@admin.register(ReglaDisponibilidad)
+class ReglaDisponibilidadAdmin(admin.ModelAdmin):
+    list_display = [
+        "veterinario",
+        "clinica",
+        "dias_display",
+        "hora_inicio",
+        "hora_fin",
+        "duracion_turno",
+        "vigente_desde",
+        "vigente_hasta",
+        "activa",
+        "generado_hasta",
+    ]
+    list_filter = ["clinica", "veterinario", "activa"]
+    search_fields = ["veterinario__first_name", "veterinario__last_name", "veterinario__email"]
+    readonly_fields = ["generado_hasta", "fecha_creacion"]
+
+    fieldsets = (
+        ("Veterinario", {"fields": ("veterinario", "clinica", "activa")}),
+        (
+            "Días y Horario",
+            {
+                "fields": ("dias_semana", "hora_inicio", "hora_fin", "duracion_turno"),
+            },
+        ),
+        ("Vigencia", {"fields": ("vigente_desde", "vigente_hasta", "generado_hasta")}),
+    )
+
+    def get_queryset(self, request):
+        return super().get_queryset(request).select_related("veterinario", "clinica")
+
+    def save_model(self, request, obj, form, change):
+        """Generar los turnos del horizonte al guardar"""
+        if change:
+            # Regenerar desde cero los turnos libres de la versión anterior
+            eliminar_libres(
+                ReglaDisponibilidad.objects.get(pk=obj.pk).turnos_libres_futuros()
+            )
+            obj.generado_hasta = None
+        super().save_model(request, obj, form, change)
+        materializar(fecha_horizonte(), veterinario=obj.veterinario)
+
+
+@admin.register(ExcepcionDisponibilidad)
+class ExcepcionDisponibilidadAdmin(admin.ModelAdmin):
+    list_display = ["veterinario", "fecha", "hora_inicio", "hora_fin", "motivo"]
+    list_filter = ["veterinario"]
+    date_hierarchy = "fecha"
+    ordering = ["-fecha"]
+
+
 # Administrar Turnos
 @admin.register(Turno)
 class TurnoAdmin(admin.ModelAdmin):
@@ -161,7 +227,9 @@ class TurnoAdmin(admin.ModelAdmin):
     def marcar_como_completado(self, request, queryset):
         """Marca turnos seleccionados como completados"""
         estado_completado = EstadoTurno.objects.get(codigo=EstadoTurno.COMPLETADO)
+        turnos = list(queryset.filter(reservado=True))
         count = queryset.filter(reservado=True).update(estado=estado_completado)
+        registrar(*turnos)
         self.message_user(request, f"{count} turno(s) marcado(s) como completado.")
 
     marcar_como_completado.short_description = "✅ Marcar como completado"
@@ -169,7 +237,66 @@ class TurnoAdmin(admin.ModelAdmin):
     def marcar_como_no_asistio(self, request, queryset):
         """Marca turnos como 'no asistió'"""
         estado_no_asistio = EstadoTurno.objects.get(codigo=EstadoTurno.NO_ASISTIO)
+        turnos = list(queryset.filter(reservado=True))
         count = queryset.filter(reservado=True).update(estado=estado_no_asistio)
+        registrar(*turnos)
         self.message_user(request, f"{count} turno(s) marcado(s) como 'No asistió'.")
 
     marcar_como_no_asistio.short_description = "❌ Marcar como 'No asistió'"
+
+
+# Turnos archivados (solo lectura)
+@admin.register(TurnoArchivado)
+class TurnoArchivadoAdmin(admin.ModelAdmin):
+    list_display = ["id", "fecha", "hora_inicio", "veterinario", "cliente", "mascota", "estado"]
+    list_filter = ["clinica", "estado", "reservado"]
+    search_fields = ["mascota__nombre", "cliente__email", "motivo"]
+    date_hierarchy = "fecha"
+    list_select_related = ["veterinario", "cliente", "mascota", "estado"]
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+
+# Lista de espera
+@admin.register(EsperaTurno)
+class EsperaTurnoAdmin(admin.ModelAdmin):
+    list_display = [
+        "cliente",
+        "veterinario",
+        "fecha_desde",
+        "fecha_hasta",
+        "activa",
+        "turno_ofrecido",
+        "oferta_vence",
+    ]
+    list_filter = ["clinica", "activa"]
+    search_fields = ["cliente__email", "cliente__last_name"]
+    raw_id_fields = ["turno_ofrecido"]
+    list_select_related = ["cliente", "veterinario", "turno_ofrecido__veterinario"]
+
+
+# Estadísticas (solo lectura; las mantiene apps.turnos.estadisticas)
+@admin.register(ResumenDiarioTurnos)
+class ResumenDiarioTurnosAdmin(admin.ModelAdmin):
+    list_display = [
+        "fecha",
+        "veterinario",
+        "estado",
+        "tipo_consulta",
+        "reservado",
+        "turnos",
+        "minutos",
+    ]
+    list_filter = ["clinica", "estado", "reservado"]
+    date_hierarchy = "fecha"
+    list_select_related = ["veterinario"]
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
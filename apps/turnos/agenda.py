@@ -0,0 +1,312 @@
+import unicodedata
+from collections import defaultdict
+from datetime import datetime, time, timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F, Max, Min, Q
+from django.utils import timezone
+
+from apps.clinicas.models import HorarioEspecial
+from .estadisticas import recalcular_dias, recalcular_rango
+from .models import (
+    DisponibilidadVeterinario,
+    EstadoTurno,
+    ExcepcionDisponibilidad,
+    ReglaDisponibilidad,
+    Turno,
+)
+
+# Índice = date.weekday(); los nombres de Clinica.dias_atencion se comparan sin acentos
+DIAS_SEMANA = ["lunes", "martes", "miercoles", "jueves", "viernes", "sabado", "domingo"]
+
+TAMANO_LOTE = 1000
+
+
+def _normalizar(texto):
+    texto = unicodedata.normalize("NFKD", str(texto))
+    return texto.encode("ascii", "ignore").decode().strip().lower()
+
+
+def dias_habiles(clinica):
+    """Días de la semana (date.weekday()) en que atiende la clínica; sin datos = todos"""
+    dias = {
+        DIAS_SEMANA.index(dia)
+        for dia in map(_normalizar, clinica.dias_atencion or [])
+        if dia in DIAS_SEMANA
+    }
+    return dias or set(range(7))
+
+
+def horario_del_dia(clinica, fecha, especial=None, dias=None):
+    """
+    (apertura, cierre) de la clínica en la fecha, o None si está cerrada.
+
+    Un HorarioEspecial manda sobre los días de atención: puede cerrar un
+    día hábil o abrir uno que normalmente no lo es.
+    """
+    if especial:
+        if especial.cerrado:
+            return None
+        return (
+            especial.hora_apertura_especial or clinica.hora_apertura,
+            especial.hora_cierre_especial or clinica.hora_cierre,
+        )
+    if fecha.weekday() not in (dias if dias is not None else dias_habiles(clinica)):
+        return None
+    return clinica.hora_apertura, clinica.hora_cierre
+
+
+def _solapa(intervalos, inicio, fin):
+    return any(desde < fin and inicio < hasta for desde, hasta in intervalos)
+
+
+def turnos_del_dia(regla, fecha, horario, ocupados):
+    """(inicio, fin) de cada turno libre de la regla en la fecha, recortada al horario"""
+    inicio = datetime.combine(fecha, max(regla.hora_inicio, horario[0]))
+    limite = datetime.combine(fecha, min(regla.hora_fin, horario[1]))
+    paso = timedelta(minutes=regla.duracion_turno)
+
+    while inicio + paso <= limite:
+        fin = inicio + paso
+        if not _solapa(ocupados, inicio.time(), fin.time()):
+            yield inicio.time(), fin.time()
+        inicio = fin
+
+
+def _ocupados(veterinarios, desde, hasta):
+    """{(veterinario, fecha): [(inicio, fin), ...]} con turnos y excepciones del rango"""
+    ocupados = defaultdict(list)
+
+    turnos = Turno.objects.filter(
+        veterinario_id__in=veterinarios, fecha__range=(desde, hasta)
+    ).values_list("veterinario_id", "fecha", "hora_inicio", "hora_fin", "duracion_minutos")
+    for vet, fecha, inicio, fin, duracion in turnos.iterator(chunk_size=2000):
+        if fin is None:
+            fin = (
+                datetime.combine(fecha, inicio) + timedelta(minutes=duracion)
+            ).time()
+        ocupados[(vet, fecha)].append((inicio, fin))
+
+    excepciones = ExcepcionDisponibilidad.objects.filter(
+        veterinario_id__in=veterinarios, fecha__range=(desde, hasta)
+    ).values_list("veterinario_id", "fecha", "hora_inicio", "hora_fin")
+    for vet, fecha, inicio, fin in excepciones:
+        if inicio and fin:
+            ocupados[(vet, fecha)].append((inicio, fin))
+        else:
+            ocupados[(vet, fecha)].append((time.min, time.max))
+
+    return ocupados
+
+
+def horizonte_dias():
+    return getattr(settings, "AGENDA_HORIZONTE_DIAS", 60)
+
+
+def fecha_horizonte():
+    """Último día que debe tener turnos libres generados (hoy + AGENDA_HORIZONTE_DIAS)"""
+    return timezone.localdate() + timedelta(days=horizonte_dias())
+
+
+def _pendiente(fuente, vigente_desde, vigente_hasta, hoy, hasta):
+    """(fuente, desde, fin) con el tramo que falta expandir, o None si no falta nada"""
+    desde = max(vigente_desde, hoy)
+    if fuente.generado_hasta:
+        desde = max(desde, fuente.generado_hasta + timedelta(days=1))
+    fin = min(hasta, vigente_hasta or hasta)
+    return (fuente, desde, fin) if desde <= fin else None
+
+
+def materializar(hasta, veterinario=None):
+    """
+    Genera los turnos libres de las reglas activas y de los bloques de
+    disponibilidad hasta `hasta` inclusive.
+
+    Es incremental: cada regla o bloque continúa desde el día siguiente a su
+    `generado_hasta`, así que correrlo todas las noches solo agrega los días
+    nuevos del horizonte. Devuelve la cantidad de turnos generados.
+    """
+    hoy = timezone.localdate()
+    reglas = (
+        ReglaDisponibilidad.objects.filter(activa=True, vigente_desde__lte=hasta)
+        .filter(Q(vigente_hasta__isnull=True) | Q(vigente_hasta__gte=hoy))
+        .filter(Q(generado_hasta__isnull=True) | Q(generado_hasta__lt=hasta))
+        .select_related("clinica")
+    )
+    bloques = (
+        DisponibilidadVeterinario.objects.filter(
+            fecha_inicio__lte=hasta, fecha_fin__gte=hoy
+        )
+        .filter(
+            Q(generado_hasta__isnull=True)
+            | (Q(generado_hasta__lt=hasta) & Q(generado_hasta__lt=F("fecha_fin")))
+        )
+        .select_related("clinica")
+    )
+    if veterinario is not None:
+        reglas = reglas.filter(veterinario=veterinario)
+        bloques = bloques.filter(veterinario=veterinario)
+
+    pendientes = [
+        _pendiente(regla, regla.vigente_desde, regla.vigente_hasta, hoy, hasta)
+        for regla in reglas
+    ] + [
+        _pendiente(bloque, bloque.fecha_inicio, bloque.fecha_fin, hoy, hasta)
+        for bloque in bloques
+    ]
+    return expandir([p for p in pendientes if p])
+
+
+def materializar_bloque(bloque, hasta=None):
+    """Genera los turnos de un bloque de disponibilidad hasta el horizonte"""
+    hoy = timezone.localdate()
+    pendiente = _pendiente(
+        bloque, bloque.fecha_inicio, bloque.fecha_fin, hoy, hasta or fecha_horizonte()
+    )
+    return expandir([pendiente] if pendiente else [])
+
+
+def expandir(pendientes):
+    """
+    Inserta los turnos de cada (regla o bloque, desde, hasta) y actualiza su
+    `generado_hasta`. Respeta los días de atención y horarios especiales de
+    la clínica, las excepciones del veterinario y los turnos existentes (se
+    cargan con una consulta cada uno para todo el rango). Los turnos se
+    insertan con bulk_create por lotes y después se recalculan los hechos
+    de los días que cambiaron.
+    """
+    if not pendientes:
+        return 0
+    try:
+        estado = EstadoTurno.objects.get(codigo=EstadoTurno.PENDIENTE)
+    except EstadoTurno.DoesNotExist:
+        return 0
+
+    rango = (min(p[1] for p in pendientes), max(p[2] for p in pendientes))
+    clinicas = {fuente.clinica_id: fuente.clinica for fuente, _, _ in pendientes}
+    dias = {pk: dias_habiles(clinica) for pk, clinica in clinicas.items()}
+    especiales = {
+        (h.clinica_id, h.fecha): h
+        for h in HorarioEspecial.objects.filter(
+            clinica_id__in=clinicas, fecha__range=rango
+        )
+    }
+    ocupados = _ocupados({f.veterinario_id for f, _, _ in pendientes}, *rango)
+
+    creados = 0
+    nuevos = []
+    dias_generados = set()
+    actualizar = defaultdict(list)
+    with transaction.atomic():
+        for fuente, desde, fin in pendientes:
+            fecha = desde
+            while fecha <= fin:
+                horario = fuente.aplica_el(fecha) and horario_del_dia(
+                    fuente.clinica,
+                    fecha,
+                    especiales.get((fuente.clinica_id, fecha)),
+                    dias[fuente.clinica_id],
+                )
+                if horario:
+                    ocupados_dia = ocupados[(fuente.veterinario_id, fecha)]
+                    for inicio, hora_fin in turnos_del_dia(
+                        fuente, fecha, horario, ocupados_dia
+                    ):
+                        # Reglas que se pisan no generan turnos superpuestos
+                        ocupados_dia.append((inicio, hora_fin))
+                        dias_generados.add((fuente.veterinario_id, fecha))
+                        nuevos.append(
+                            Turno(
+                                clinica_id=fuente.clinica_id,
+                                veterinario_id=fuente.veterinario_id,
+                                fecha=fecha,
+                                hora_inicio=inicio,
+                                hora_fin=hora_fin,
+                                duracion_minutos=fuente.duracion_turno,
+                                estado=estado,
+                                creado_por_id=fuente.veterinario_id,
+                            )
+                        )
+                if len(nuevos) >= TAMANO_LOTE:
+                    creados += _insertar(nuevos)
+                fecha += timedelta(days=1)
+            fuente.generado_hasta = fin
+            actualizar[type(fuente)].append(fuente)
+
+        creados += _insertar(nuevos)
+        for modelo, fuentes in actualizar.items():
+            modelo.objects.bulk_update(fuentes, ["generado_hasta"], batch_size=500)
+        recalcular_dias(dias_generados)
+    return creados
+
+
+def eliminar_libres(turnos):
+    """
+    Borra los turnos libres del queryset `turnos` (reglas o bloques dados de
+    baja, ausencias, horarios especiales) y recalcula los hechos de los
+    días afectados. Devuelve la cantidad eliminada.
+    """
+    with transaction.atomic():
+        dias = set(
+            turnos.order_by().values_list("veterinario_id", "fecha").distinct()
+        )
+        eliminados = turnos.delete()[0]
+        recalcular_dias(dias)
+    return eliminados
+
+
+def purgar_vencidos(antes_de=None, lote=5000):
+    """
+    Borra por lotes los turnos libres (no reservados) anteriores a `antes_de`
+    (por defecto hoy). Los reservados quedan como historial. Devuelve la
+    cantidad eliminada.
+    """
+    antes_de = antes_de or timezone.localdate()
+    vencidos = Turno.objects.filter(reservado=False, fecha__lt=antes_de)
+
+    # Los hechos de esos días quedan con los turnos libres que se van a borrar
+    primero = vencidos.aggregate(Min("fecha"))["fecha__min"]
+    if primero:
+        recalcular_rango(primero, antes_de - timedelta(days=1))
+
+    total = 0
+    while True:
+        ids = list(vencidos.values_list("pk", flat=True)[:lote])
+        if not ids:
+            return total
+        total += Turno.objects.filter(pk__in=ids).delete()[0]
+
+
+def _insertar(turnos):
+    """Inserta el lote y devuelve cuántos turnos se crearon realmente"""
+    if not turnos:
+        return 0
+    # ignore_conflicts: un turno cargado a mano en paralelo no frena la expansión;
+    # los que chocan no se cuentan, por eso se cuenta el rango antes y después
+    en_rango = Turno.objects.filter(
+        veterinario_id__in={t.veterinario_id for t in turnos},
+        fecha__range=(min(t.fecha for t in turnos), max(t.fecha for t in turnos)),
+    )
+    antes = en_rango.count()
+    Turno.objects.bulk_create(turnos, batch_size=TAMANO_LOTE, ignore_conflicts=True)
+    turnos.clear()
+    return en_rango.count() - antes
+
+
+def regenerar_desde(veterinario, fecha):
+    """
+    Vuelve a expandir las reglas y bloques del veterinario a partir de `fecha`
+    (por ejemplo al quitar una ausencia). Los turnos existentes no se tocan:
+    solo se completan los huecos, hasta el horizonte ya generado.
+    """
+    hasta = None
+    for modelo in (ReglaDisponibilidad, DisponibilidadVeterinario):
+        fuentes = modelo.objects.filter(veterinario=veterinario, generado_hasta__gte=fecha)
+        ultimo = fuentes.aggregate(hasta=Max("generado_hasta"))["hasta"]
+        if ultimo:
+            hasta = max(hasta or ultimo, ultimo)
+            fuentes.update(generado_hasta=fecha - timedelta(days=1))
+    if not hasta:
+        return 0
+    return materializar(hasta, veterinario=veterinario)
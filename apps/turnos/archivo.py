@@ -0,0 +1,59 @@
+import calendar
+import time
+from datetime import date
+
+from django.db import transaction
+from django.db.models import F
+
+from apps.historiales.models import HistoriaClinica
+from .models import Turno, TurnoArchivado
+
+# Columnas copiadas tal cual (mismo orden y nombres en ambas tablas)
+CAMPOS = [campo.attname for campo in TurnoArchivado._meta.concrete_fields]
+
+
+def restar_meses(fecha, meses):
+    anio, mes = divmod(fecha.year * 12 + fecha.month - 1 - meses, 12)
+    mes += 1
+    return date(anio, mes, min(fecha.day, calendar.monthrange(anio, mes)[1]))
+
+
+def archivar_lote(limite, tamano=2000):
+    """
+    Mueve al archivo hasta `tamano` turnos anteriores a `limite`, en una
+    transacción corta. Es idempotente: si una corrida se corta, la siguiente
+    retoma desde donde quedó (ignore_conflicts por id). Devuelve la cantidad movida.
+    """
+    with transaction.atomic():
+        filas = list(
+            Turno.objects.filter(fecha__lt=limite)
+            .order_by("pk")
+            .values(*CAMPOS)[:tamano]
+        )
+        if not filas:
+            return 0
+        ids = [fila["id"] for fila in filas]
+
+        TurnoArchivado.objects.bulk_create(
+            [TurnoArchivado(**fila) for fila in filas], ignore_conflicts=True
+        )
+        # Conservar el vínculo de la historia clínica con el turno atendido
+        HistoriaClinica.objects.filter(turno_id__in=ids).update(
+            turno_archivado_id=F("turno_id"), turno=None
+        )
+        Turno.objects.filter(pk__in=ids).delete()
+    return len(filas)
+
+
+def archivar(limite, tamano=2000, pausa=0, max_lotes=None):
+    """Archiva por lotes; `pausa` (segundos) deja respirar a la base entre lotes"""
+    total = lotes = 0
+    while max_lotes is None or lotes < max_lotes:
+        movidos = archivar_lote(limite, tamano)
+        if not movidos:
+            break
+        total += movidos
+        lotes += 1
+        if pausa:
+            time.sleep(pausa)
+    return total
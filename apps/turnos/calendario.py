@@ -0,0 +1,116 @@
+"""
+Serialización de los eventos de los calendarios (FullCalendar).
+
+Las vistas leen solo las columnas que muestran con values() y arman
+cada evento como una tupla; acá se codifican directo a bytes, con orjson si
+está instalado. Con ?formato=columnas la respuesta viaja por columnas (un
+array por campo) y calendario.js / agenda_admin.js la expanden a eventos.
+"""
+
+import json
+from datetime import datetime, time
+
+from django.http import HttpResponse
+from django.urls import reverse
+from django.utils import timezone
+from django.utils.dateparse import parse_date
+
+try:
+    import orjson
+except ImportError:  # opcional: sin orjson se usa el módulo json
+    orjson = None
+
+# Campos de primer nivel de cada evento, en el orden de las tuplas
+CAMPOS = ("id", "title", "start", "end", "color")
+
+FORMATO_COLUMNAS = "columnas"
+
+# pk imposible de confundir con el resto de la URL al armar la plantilla
+_PK_PLANTILLA = 2147483647
+
+
+def dumps(datos):
+    """JSON compacto en bytes"""
+    if orjson is not None:
+        return orjson.dumps(datos)
+    return json.dumps(datos, ensure_ascii=False, separators=(",", ":")).encode()
+
+
+def plantilla_url(nombre):
+    """URL de detalle resuelta una sola vez, con {id} en lugar del pk"""
+    return reverse(nombre, kwargs={"pk": _PK_PLANTILLA}).replace(
+        str(_PK_PLANTILLA), "{id}"
+    )
+
+
+def rango_fechas(request):
+    """Filtro de fechas a partir de los parámetros start/end que envía FullCalendar"""
+    filtro = {}
+    inicio = parse_date(request.GET.get("start", "")[:10])
+    fin = parse_date(request.GET.get("end", "")[:10])
+    if inicio:
+        filtro["fecha__gte"] = inicio
+    if fin:
+        filtro["fecha__lt"] = fin
+    return filtro
+
+
+def horarios_iso(con_zona=False):
+    """
+    Devuelve f(fecha, hora) -> isoformat, igual que datetime.isoformat().
+    Fechas, horas y el offset de la zona (que solo cambia en horas en punto)
+    se formatean una sola vez: en un mes se repiten pocos valores.
+    """
+    fechas = {}
+    horas = {}
+    offsets = {}
+
+    def iso(fecha, hora):
+        if hora is None:
+            return None
+        texto_fecha = fechas.get(fecha)
+        if texto_fecha is None:
+            texto_fecha = fechas[fecha] = fecha.isoformat()
+        texto_hora = horas.get(hora)
+        if texto_hora is None:
+            texto_hora = horas[hora] = hora.isoformat()
+        if not con_zona:
+            return f"{texto_fecha}T{texto_hora}"
+
+        clave = (fecha, hora.hour)
+        offset = offsets.get(clave)
+        if offset is None:
+            momento = timezone.make_aware(datetime.combine(fecha, time(hora.hour)))
+            offset = offsets[clave] = momento.isoformat()[19:]
+        return f"{texto_fecha}T{texto_hora}{offset}"
+
+    return iso
+
+
+def nombre_completo(nombre, apellido):
+    """Igual que CustomUser.get_full_name(), sobre columnas sueltas"""
+    return f"{nombre or ''} {apellido or ''}".strip()
+
+
+def respuesta_eventos(eventos, props, formato=None, url=None):
+    """
+    `eventos` son tuplas con los CAMPOS seguidos de los `props`
+    (extendedProps). `url` es una plantilla de plantilla_url().
+    """
+    n = len(CAMPOS)
+    if formato == FORMATO_COLUMNAS:
+        columnas = list(zip(*eventos)) or [()] * (n + len(props))
+        datos = dict(zip(CAMPOS, map(list, columnas[:n])))
+        datos["extendedProps"] = dict(zip(props, map(list, columnas[n:])))
+        datos["url"] = url
+    else:
+        datos = []
+        if url:
+            prefijo, sufijo = url.split("{id}")
+        for evento in eventos:
+            objeto = dict(zip(CAMPOS, evento))
+            if url:
+                objeto["url"] = f"{prefijo}{evento[0]}{sufijo}"
+            objeto["extendedProps"] = dict(zip(props, evento[n:]))
+            datos.append(objeto)
+    return HttpResponse(dumps(datos), content_type="application/json")
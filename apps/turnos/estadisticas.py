@@ -0,0 +1,216 @@
+"""
+Estadísticas de ocupación de la agenda (ResumenDiarioTurnos).
+
+Los hechos de un veterinario en un día se recalculan enteros, desde Turno y
+TurnoArchivado, cada vez que cambia el estado de uno de sus turnos (después
+del commit, fuera de la reserva): son pocas filas y así no se acumulan
+diferencias; lo mismo al generar o borrar turnos libres (agenda.expandir /
+agenda.eliminar_libres). Los turnos libres de días pasados los borra
+generar_agenda; antes de purgarlos se recalculan esos días, y desde
+entonces sus hechos de turnos libres quedan congelados.
+
+Los totales por semana o mes salen de una sola consulta agrupada sobre los
+hechos, sin leer la tabla de turnos.
+"""
+
+import operator
+from collections import defaultdict
+from datetime import datetime, timedelta
+from functools import reduce
+
+from django.db import transaction
+from django.db.models import Min, Q, Sum
+from django.db.models.functions import TruncDay, TruncMonth, TruncWeek
+from django.utils import timezone
+
+from .models import EstadoTurno, ResumenDiarioTurnos, Turno, TurnoArchivado
+
+TAMANO_LOTE = 2000
+
+PERIODOS = {"dia": TruncDay, "semana": TruncWeek, "mes": TruncMonth}
+
+_DIMENSIONES = (
+    "clinica_id",
+    "veterinario_id",
+    "fecha",
+    "estado__codigo",
+    "tipo_consulta",
+    "reservado",
+)
+
+
+def _primer_dia_con_libres():
+    """
+    Desde qué fecha se recalculan también los hechos de turnos libres: hoy,
+    o antes si quedan turnos libres de días pasados sin purgar.
+    """
+    hoy = timezone.localdate()
+    primero = Turno.objects.filter(reservado=False).aggregate(Min("fecha"))
+    return min(hoy, primero["fecha__min"] or hoy)
+
+
+def _anticipacion(fecha, hora_inicio, fecha_reserva):
+    reserva = timezone.localtime(fecha_reserva).replace(tzinfo=None)
+    minutos = (datetime.combine(fecha, hora_inicio) - reserva).total_seconds() // 60
+    return max(int(minutos), 0)
+
+
+def recalcular(filtro):
+    """
+    Vuelve a calcular los hechos de los turnos que cumplen `filtro` (un Q
+    sobre campos comunes a Turno y ResumenDiarioTurnos: clinica_id,
+    veterinario_id, fecha, reservado). Devuelve cuántos hechos escribió.
+    """
+    alcance = filtro & (Q(reservado=True) | Q(fecha__gte=_primer_dia_con_libres()))
+    hechos = defaultdict(lambda: [0, 0, 0, 0])
+    with transaction.atomic():
+        ResumenDiarioTurnos.objects.filter(alcance).delete()
+        for modelo in (Turno, TurnoArchivado):
+            filas = (
+                modelo.objects.filter(alcance)
+                .order_by()
+                .values_list(
+                    *_DIMENSIONES, "duracion_minutos", "hora_inicio", "fecha_reserva"
+                )
+            )
+            for *clave, minutos, hora_inicio, fecha_reserva in filas.iterator(
+                chunk_size=TAMANO_LOTE
+            ):
+                hecho = hechos[tuple(clave)]
+                hecho[0] += 1
+                hecho[1] += minutos
+                if fecha_reserva is not None:
+                    hecho[2] += _anticipacion(clave[2], hora_inicio, fecha_reserva)
+                    hecho[3] += 1
+
+        ResumenDiarioTurnos.objects.bulk_create(
+            [
+                ResumenDiarioTurnos(
+                    clinica_id=clinica_id,
+                    veterinario_id=veterinario_id,
+                    fecha=fecha,
+                    estado=estado,
+                    tipo_consulta=tipo_consulta,
+                    reservado=reservado,
+                    turnos=turnos,
+                    minutos=minutos,
+                    anticipacion_minutos=anticipacion,
+                    con_anticipacion=con_anticipacion,
+                )
+                for (
+                    clinica_id,
+                    veterinario_id,
+                    fecha,
+                    estado,
+                    tipo_consulta,
+                    reservado,
+                ), (turnos, minutos, anticipacion, con_anticipacion) in hechos.items()
+            ],
+            batch_size=500,
+        )
+    return len(hechos)
+
+
+def recalcular_dias(dias):
+    """Recalcula los hechos de cada (veterinario_id, fecha) de `dias`"""
+    fechas = defaultdict(set)
+    for vet, fecha in dias:
+        fechas[vet].add(fecha)
+    if fechas:
+        recalcular(
+            reduce(
+                operator.or_,
+                (Q(veterinario_id=vet, fecha__in=f) for vet, f in fechas.items()),
+            )
+        )
+
+
+def registrar(*turnos):
+    """
+    Actualiza los hechos de los días de estos turnos, después de cambiar su
+    estado. Se llama dentro de la transacción que los cambia, pero el
+    recálculo corre recién cuando esa transacción se confirma, fuera de la
+    reserva o cancelación (y no corre si se revierte).
+    """
+    dias = {(turno.veterinario_id, turno.fecha) for turno in turnos}
+    if dias:
+        transaction.on_commit(lambda: recalcular_dias(dias))
+
+
+def recalcular_rango(desde, hasta, clinica_id=None, dias_por_lote=31):
+    """Recalcula de `desde` a `hasta` (inclusive) en transacciones cortas"""
+    total = 0
+    while desde <= hasta:
+        fin = min(desde + timedelta(days=dias_por_lote - 1), hasta)
+        filtro = Q(fecha__range=(desde, fin))
+        if clinica_id:
+            filtro &= Q(clinica_id=clinica_id)
+        total += recalcular(filtro)
+        desde = fin + timedelta(days=1)
+    return total
+
+
+def resumen(clinica_id, desde, hasta, periodo="semana", veterinario_id=None):
+    """
+    Totales por período, como columnas listas para un gráfico. Ocupación =
+    minutos reservados (sin cancelados) / minutos de agenda; ausentismo =
+    no asistió / (completados + no asistió); anticipación = horas promedio
+    entre la reserva y el turno.
+    """
+    hechos = ResumenDiarioTurnos.objects.filter(
+        clinica_id=clinica_id, fecha__range=(desde, hasta)
+    )
+    if veterinario_id:
+        hechos = hechos.filter(veterinario_id=veterinario_id)
+
+    ocupado = Q(reservado=True) & ~Q(estado=EstadoTurno.CANCELADO)
+    filas = list(
+        hechos.annotate(periodo=PERIODOS[periodo]("fecha"))
+        .values("periodo")
+        .annotate(
+            capacidad=Sum("minutos"),
+            ocupados=Sum("minutos", filter=ocupado),
+            reservados=Sum("turnos", filter=Q(reservado=True)),
+            completados=Sum("turnos", filter=Q(estado=EstadoTurno.COMPLETADO)),
+            ausentes=Sum("turnos", filter=Q(estado=EstadoTurno.NO_ASISTIO)),
+            cancelados=Sum("turnos", filter=Q(estado=EstadoTurno.CANCELADO)),
+            anticipacion=Sum("anticipacion_minutos"),
+            con_anticipacion=Sum("con_anticipacion"),
+        )
+        .order_by("periodo")
+    )
+    por_tipo = (
+        hechos.filter(ocupado)
+        .values("tipo_consulta")
+        .annotate(turnos=Sum("turnos"))
+        .order_by("-turnos")
+    )
+
+    def columna(campo):
+        return [fila[campo] or 0 for fila in filas]
+
+    def tasa(numerador, denominador, escala=1):
+        return [
+            round(n / d * escala, 4) if d else None
+            for n, d in zip(numerador, denominador)
+        ]
+
+    completados, ausentes = columna("completados"), columna("ausentes")
+    return {
+        "periodo": periodo,
+        "desde": desde.isoformat(),
+        "hasta": hasta.isoformat(),
+        "periodos": [fila["periodo"].isoformat()[:10] for fila in filas],
+        "capacidad_minutos": columna("capacidad"),
+        "ocupados_minutos": columna("ocupados"),
+        "ocupacion": tasa(columna("ocupados"), columna("capacidad")),
+        "reservados": columna("reservados"),
+        "completados": completados,
+        "ausentes": ausentes,
+        "cancelados": columna("cancelados"),
+        "ausentismo": tasa(ausentes, [c + a for c, a in zip(completados, ausentes)]),
+        "anticipacion_horas": tasa(
+            columna("anticipacion"), columna("con_anticipacion"), 1 / 60
+        ),
+        "por_tipo_consulta": {fila["tipo_consulta"]: fila["turnos"] for fila in por_tipo},
+    }
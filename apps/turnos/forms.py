@@ -3,7 +3,12 @@ from django import forms
 from django.utils import timezone
 
 from apps.accounts.models import CustomUser
-from .models import Turno
+from .models import (
+    Turno,
+    ReglaDisponibilidad,
+    ExcepcionDisponibilidad,
+    EsperaTurno,
+)
 
 
 class TurnoCrearAdminForm(forms.ModelForm):
@@ -53,3 +58,131 @@ class TurnoCrearAdminForm(forms.ModelForm):
             self.fields["veterinario"].queryset = CustomUser.objects.filter(
                 rol="veterinario", clinica=user.clinica, is_active=True
             )
+
+
+class ReglaDisponibilidadForm(forms.ModelForm):
+    """Franja semanal recurrente; los días se eligen con checkboxes y se guardan como máscara"""
+
+    dias = forms.TypedMultipleChoiceField(
+        choices=ReglaDisponibilidad.DIAS_CHOICES,
+        coerce=int,
+        widget=forms.CheckboxSelectMultiple,
+        label="Días de la semana",
+    )
+
+    class Meta:
+        model = ReglaDisponibilidad
+        fields = [
+            "hora_inicio",
+            "hora_fin",
+            "duracion_turno",
+            "vigente_desde",
+            "vigente_hasta",
+        ]
+        widgets = {
+            "hora_inicio": forms.TimeInput(
+                attrs={"type": "time", "class": "form-control"}
+            ),
+            "hora_fin": forms.TimeInput(attrs={"type": "time", "class": "form-control"}),
+            "duracion_turno": forms.NumberInput(
+                attrs={"class": "form-control", "min": 15, "max": 120}
+            ),
+            "vigente_desde": forms.DateInput(
+                attrs={"type": "date", "class": "form-control"}
+            ),
+            "vigente_hasta": forms.DateInput(
+                attrs={"type": "date", "class": "form-control"}
+            ),
+        }
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.fields["vigente_desde"].initial = timezone.localdate()
+        if self.instance.pk:
+            self.fields["dias"].initial = [
+                bit for bit, _ in ReglaDisponibilidad.DIAS_CHOICES
+                if self.instance.dias_semana & bit
+            ]
+
+    def clean(self):
+        cleaned_data = super().clean()
+        self.instance.dias_semana = sum(cleaned_data.get("dias") or [])
+        return cleaned_data
+
+
+class ExcepcionDisponibilidadForm(forms.ModelForm):
+    """Ausencia puntual: todo el día o una franja"""
+
+    class Meta:
+        model = ExcepcionDisponibilidad
+        fields = ["fecha", "hora_inicio", "hora_fin", "motivo"]
+        widgets = {
+            "fecha": forms.DateInput(attrs={"type": "date", "class": "form-control"}),
+            "hora_inicio": forms.TimeInput(
+                attrs={"type": "time", "class": "form-control"}
+            ),
+            "hora_fin": forms.TimeInput(attrs={"type": "time", "class": "form-control"}),
+            "motivo": forms.TextInput(attrs={"class": "form-control"}),
+        }
+
+
+class EsperaTurnoForm(forms.ModelForm):
+    """Anotarse en la lista de espera de la clínica"""
+
+    class Meta:
+        model = EsperaTurno
+        fields = ["veterinario", "fecha_desde", "fecha_hasta"]
+        widgets = {
+            "veterinario": forms.Select(attrs={"class": "form-select"}),
+            "fecha_desde": forms.DateInput(
+                attrs={"type": "date", "class": "form-control"}
+            ),
+            "fecha_hasta": forms.DateInput(
+                attrs={"type": "date", "class": "form-control"}
+            ),
+        }
+
+    def __init__(self, *args, **kwargs):
+        clinica_id = kwargs.pop("clinica_id", None)
+        super().__init__(*args, **kwargs)
+        self.fields["veterinario"].empty_label = "Cualquier veterinario"
+        self.fields["veterinario"].queryset = CustomUser.objects.filter(
+            rol="veterinario", clinica_id=clinica_id, is_active=True
+        )
+
+    def clean_fecha_desde(self):
+        fecha = self.cleaned_data["fecha_desde"]
+        if fecha < timezone.localdate():
+            raise forms.ValidationError("La fecha no puede ser anterior a hoy.")
+        return fecha
+
+
+class SerieTurnosForm(forms.Form):
+    """Serie de turnos de un tratamiento (API de reserva por lotes)"""
+
+    cliente_id = forms.IntegerField()
+    mascota_id = forms.IntegerField()
+    veterinario = forms.ModelChoiceField(queryset=CustomUser.objects.none())
+    fecha_inicio = forms.DateField()
+    hora_inicio = forms.TimeField()
+    duracion_minutos = forms.IntegerField(min_value=15, max_value=120, initial=30)
+    frecuencia = forms.ChoiceField(
+        choices=[("diaria", "Diaria"), ("semanal", "Semanal")], initial="semanal"
+    )
+    intervalo = forms.IntegerField(min_value=1, max_value=4, initial=1)
+    repeticiones = forms.IntegerField(min_value=2, max_value=52)
+    motivo = forms.CharField(required=False)
+    todo_o_nada = forms.BooleanField(required=False)
+
+    def __init__(self, *args, **kwargs):
+        clinica_id = kwargs.pop("clinica_id", None)
+        super().__init__(*args, **kwargs)
+        self.fields["veterinario"].queryset = CustomUser.objects.filter(
+            rol="veterinario", clinica_id=clinica_id, is_active=True
+        )
+
+    def clean_fecha_inicio(self):
+        fecha = self.cleaned_data["fecha_inicio"]
+        if fecha < timezone.localdate():
+            raise forms.ValidationError("La fecha no puede ser anterior a hoy.")
+        return fecha
@@ -0,0 +1,98 @@
+from datetime import datetime, timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from .models import EsperaTurno, Turno
+from .notificaciones import encolar_oferta
+from .retenciones import guardar, liberar
+
+TAMANO_LOTE = 500
+
+
+def minutos_oferta():
+    return getattr(settings, "LISTA_ESPERA_OFERTA_MINUTOS", 30)
+
+
+def ofrecer_turno(turno):
+    """
+    Ofrece un turno recién liberado a la primera espera que coincide
+    (clínica, franja de fechas y veterinario), por orden de llegada. El
+    turno queda retenido para ese cliente unos minutos y el aviso se encola
+    en el outbox. Llamar dentro de la transacción que libera el turno.
+
+    Devuelve la EsperaTurno a la que se ofreció, o None.
+    """
+    if turno.reservado:
+        return None
+    if datetime.combine(turno.fecha, turno.hora_inicio) < datetime.now():
+        return None
+
+    espera = (
+        EsperaTurno.objects.select_for_update(skip_locked=True)
+        .filter(
+            clinica_id=turno.clinica_id,
+            activa=True,
+            turno_ofrecido__isnull=True,
+            fecha_hasta__gte=turno.fecha,
+            fecha_desde__lte=turno.fecha,
+        )
+        .filter(Q(veterinario__isnull=True) | Q(veterinario_id=turno.veterinario_id))
+        .select_related("cliente")
+        .order_by("fecha_creacion")
+        .first()
+    )
+    if espera is None:
+        return None
+
+    vence = timezone.now() + timedelta(minutes=minutos_oferta())
+    guardar(turno.pk, espera.cliente_id, vence)
+    espera.turno_ofrecido = turno
+    espera.oferta_vence = vence
+    espera.save(update_fields=["turno_ofrecido", "oferta_vence"])
+    encolar_oferta(turno, espera)
+    return espera
+
+
+def cerrar_espera(turno, cliente):
+    """El cliente reservó el turno que se le ofreció: sale de la lista"""
+    EsperaTurno.objects.filter(
+        cliente=cliente, turno_ofrecido=turno, activa=True
+    ).update(activa=False, oferta_vence=None)
+
+
+def vencer_ofertas(tamano=TAMANO_LOTE):
+    """
+    Da de baja las esperas con ofertas vencidas sin respuesta y ofrece cada
+    turno, si sigue libre, al siguiente de la lista. Procesa por lotes en
+    transacciones cortas. Devuelve (vencidas, reofrecidas).
+    """
+    vencidas = reofrecidas = 0
+    while True:
+        with transaction.atomic():
+            lote = list(
+                EsperaTurno.objects.select_for_update(skip_locked=True)
+                .filter(
+                    activa=True,
+                    turno_ofrecido__isnull=False,
+                    oferta_vence__lte=timezone.now(),
+                )
+                .order_by("oferta_vence")[:tamano]
+            )
+            if not lote:
+                break
+            turno_ids = [espera.turno_ofrecido_id for espera in lote]
+            EsperaTurno.objects.filter(pk__in=[e.pk for e in lote]).update(
+                activa=False
+            )
+            liberar(*turno_ids)
+            vencidas += len(lote)
+
+            for turno in Turno.objects.filter(
+                pk__in=turno_ids, reservado=False
+            ).select_related("clinica", "veterinario"):
+                if ofrecer_turno(turno):
+                    reofrecidas += 1
+    return vencidas, reofrecidas
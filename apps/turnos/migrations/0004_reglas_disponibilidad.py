@@ -0,0 +1,56 @@
+# Generated by Django 5.2.6 on 2026-10-19 16:01
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('clinicas', '0001_initial'),
+        ('turnos', '0003_alter_disponibilidadveterinario_options_and_more'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ReglaDisponibilidad',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('dias_semana', models.PositiveSmallIntegerField(help_text='Máscara de días: lunes=1, martes=2, miércoles=4, ... domingo=64')),
+                ('hora_inicio', models.TimeField()),
+                ('hora_fin', models.TimeField()),
+                ('duracion_turno', models.PositiveIntegerField(default=30, help_text='Duración en minutos')),
+                ('vigente_desde', models.DateField()),
+                ('vigente_hasta', models.DateField(blank=True, null=True)),
+                ('activa', models.BooleanField(default=True)),
+                ('generado_hasta', models.DateField(blank=True, help_text='Último día con turnos ya generados', null=True)),
+                ('fecha_creacion', models.DateTimeField(auto_now_add=True)),
+                ('clinica', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='clinicas.clinica')),
+                ('veterinario', models.ForeignKey(limit_choices_to={'rol': 'veterinario'}, on_delete=django.db.models.deletion.CASCADE, related_name='reglas_disponibilidad', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'Regla de Disponibilidad',
+                'verbose_name_plural': 'Reglas de Disponibilidad',
+                'ordering': ['veterinario', 'hora_inicio'],
+            },
+        ),
+        migrations.CreateModel(
+            name='ExcepcionDisponibilidad',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('fecha', models.DateField()),
+                ('hora_inicio', models.TimeField(blank=True, help_text='Vacío = todo el día', null=True)),
+                ('hora_fin', models.TimeField(blank=True, null=True)),
+                ('motivo', models.CharField(blank=True, max_length=200)),
+                ('veterinario', models.ForeignKey(limit_choices_to={'rol': 'veterinario'}, on_delete=django.db.models.deletion.CASCADE, related_name='excepciones_disponibilidad', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'Excepción de Disponibilidad',
+                'verbose_name_plural': 'Excepciones de Disponibilidad',
+                'ordering': ['fecha', 'hora_inicio'],
+                'indexes': [models.Index(fields=['veterinario', 'fecha'], name='turnos_exce_veterin_443aa8_idx')],
+            },
+        ),
+    ]
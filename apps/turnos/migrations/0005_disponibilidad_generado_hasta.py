@@ -0,0 +1,28 @@
+# Generated by Django 5.2.6 on 2026-10-19 16:05
+
+from django.db import migrations, models
+from django.db.models import F
+
+
+def marcar_generadas(apps, schema_editor):
+    # Los bloques existentes ya se generaron completos al crearse
+    DisponibilidadVeterinario = apps.get_model("turnos", "DisponibilidadVeterinario")
+    DisponibilidadVeterinario.objects.filter(fecha_fin__isnull=False).update(
+        generado_hasta=F("fecha_fin")
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('turnos', '0004_reglas_disponibilidad'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='disponibilidadveterinario',
+            name='generado_hasta',
+            field=models.DateField(blank=True, help_text='Último día con turnos ya generados', null=True),
+        ),
+        migrations.RunPython(marcar_generadas, migrations.RunPython.noop),
+    ]
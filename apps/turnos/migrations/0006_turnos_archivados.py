@@ -0,0 +1,44 @@
+# Generated by Django 5.2.6 on 2026-10-19 16:11
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('clinicas', '0001_initial'),
+        ('mascotas', '0002_alter_mascota_foto'),
+        ('turnos', '0005_disponibilidad_generado_hasta'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TurnoArchivado',
+            fields=[
+                ('id', models.BigIntegerField(primary_key=True, serialize=False)),
+                ('fecha', models.DateField()),
+                ('hora_inicio', models.TimeField()),
+                ('hora_fin', models.TimeField(blank=True, null=True)),
+                ('duracion_minutos', models.PositiveIntegerField(default=30)),
+                ('tipo_consulta', models.CharField(default='consulta', max_length=50)),
+                ('motivo', models.TextField(blank=True)),
+                ('reservado', models.BooleanField(default=False)),
+                ('fecha_creacion', models.DateTimeField()),
+                ('cliente', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to=settings.AUTH_USER_MODEL)),
+                ('clinica', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='clinicas.clinica')),
+                ('creado_por', models.ForeignKey(null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to=settings.AUTH_USER_MODEL)),
+                ('estado', models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, related_name='+', to='turnos.estadoturno')),
+                ('mascota', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='mascotas.mascota')),
+                ('veterinario', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'Turno Archivado',
+                'verbose_name_plural': 'Turnos Archivados',
+                'ordering': ['-fecha', '-hora_inicio'],
+                'indexes': [models.Index(fields=['clinica', 'fecha'], name='turnos_turn_clinica_99877c_idx'), models.Index(fields=['veterinario', 'fecha'], name='turnos_turn_veterin_2796ec_idx'), models.Index(fields=['cliente', 'fecha'], name='turnos_turn_cliente_74d745_idx')],
+            },
+        ),
+    ]
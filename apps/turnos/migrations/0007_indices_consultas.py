@@ -0,0 +1,33 @@
+# Generated by Django 5.2.6 on 2026-10-19 16:16
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('clinicas', '0001_initial'),
+        ('mascotas', '0002_alter_mascota_foto'),
+        ('turnos', '0006_turnos_archivados'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='turno',
+            index=models.Index(condition=models.Q(('reservado', False)), fields=['clinica', 'fecha', 'hora_inicio'], name='turno_libres_clinica_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='turno',
+            index=models.Index(condition=models.Q(('reservado', True)), fields=['clinica', 'fecha', 'hora_inicio'], name='turno_reservados_clinica_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='turno',
+            index=models.Index(condition=models.Q(('cliente__isnull', False)), fields=['cliente', 'fecha', 'hora_inicio'], name='turno_cliente_fecha_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='turno',
+            index=models.Index(condition=models.Q(('reservado', False)), fields=['fecha'], name='turno_libres_fecha_idx'),
+        ),
+    ]
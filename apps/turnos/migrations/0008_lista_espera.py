@@ -0,0 +1,52 @@
+# Generated by Django 5.2.6 on 2026-10-19 16:53
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('clinicas', '0001_initial'),
+        ('turnos', '0007_indices_consultas'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='EsperaTurno',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('fecha_desde', models.DateField()),
+                ('fecha_hasta', models.DateField()),
+                ('activa', models.BooleanField(default=True)),
+                ('oferta_vence', models.DateTimeField(blank=True, null=True)),
+                ('fecha_creacion', models.DateTimeField(auto_now_add=True)),
+                ('cliente', models.ForeignKey(limit_choices_to={'rol': 'cliente'}, on_delete=django.db.models.deletion.CASCADE, related_name='esperas_turno', to=settings.AUTH_USER_MODEL)),
+                ('clinica', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='clinicas.clinica')),
+                ('turno_ofrecido', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='turnos.turno')),
+                ('veterinario', models.ForeignKey(blank=True, help_text='Vacío = cualquier veterinario', limit_choices_to={'rol': 'veterinario'}, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='+', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'Lista de Espera',
+                'verbose_name_plural': 'Lista de Espera',
+                'ordering': ['fecha_creacion'],
+                'indexes': [models.Index(condition=models.Q(('activa', True), ('turno_ofrecido__isnull', True)), fields=['clinica', 'fecha_hasta', 'fecha_creacion'], name='espera_pendiente_idx'), models.Index(condition=models.Q(('activa', True), ('turno_ofrecido__isnull', False)), fields=['oferta_vence'], name='espera_oferta_idx')],
+            },
+        ),
+        migrations.CreateModel(
+            name='RetencionTurno',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('vence', models.DateTimeField()),
+                ('cliente', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to=settings.AUTH_USER_MODEL)),
+                ('turno', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='retencion', to='turnos.turno')),
+            ],
+            options={
+                'verbose_name': 'Retención de Turno',
+                'verbose_name_plural': 'Retenciones de Turnos',
+                'indexes': [models.Index(fields=['vence'], name='turnos_rete_vence_595a69_idx')],
+            },
+        ),
+    ]
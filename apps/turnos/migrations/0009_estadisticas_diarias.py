@@ -0,0 +1,49 @@
+# Generated by Django 5.2.6 on 2026-10-19 17:02
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('clinicas', '0001_initial'),
+        ('turnos', '0008_lista_espera'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='turno',
+            name='fecha_reserva',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='turnoarchivado',
+            name='fecha_reserva',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.CreateModel(
+            name='ResumenDiarioTurnos',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('fecha', models.DateField()),
+                ('estado', models.CharField(choices=[('pendiente', 'Pendiente'), ('confirmado', 'Confirmado'), ('en_curso', 'En curso'), ('completado', 'Completado'), ('cancelado', 'Cancelado'), ('no_asistio', 'No asistió')], max_length=20)),
+                ('tipo_consulta', models.CharField(max_length=50)),
+                ('reservado', models.BooleanField()),
+                ('turnos', models.PositiveIntegerField(default=0)),
+                ('minutos', models.PositiveIntegerField(default=0)),
+                ('anticipacion_minutos', models.BigIntegerField(default=0)),
+                ('con_anticipacion', models.PositiveIntegerField(default=0)),
+                ('clinica', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='clinicas.clinica')),
+                ('veterinario', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'Resumen Diario de Turnos',
+                'verbose_name_plural': 'Resúmenes Diarios de Turnos',
+                'indexes': [models.Index(fields=['clinica', 'fecha'], name='turnos_resu_clinica_9a05a9_idx')],
+                'unique_together': {('veterinario', 'fecha', 'estado', 'tipo_consulta', 'reservado')},
+            },
+        ),
+    ]
@@ -1,9 +1,13 @@
 from django.db import models
 from datetime import datetime, timedelta
 
+from django.db.models import Q, Value
+from django.db.models.signals import post_save
+from django.dispatch import receiver
 from django.forms import ValidationError
+from django.utils import timezone
 from apps.accounts.models import CustomUser
-from apps.clinicas.models import Clinica
+from apps.clinicas.models import Clinica, HorarioEspecial
 from apps.mascotas.models import Mascota
 
 
@@ -52,6 +56,9 @@ class DisponibilidadVeterinario(models.Model):
     duracion_turno = models.PositiveIntegerField(
         default=30, help_text="Duración en minutos"
     )
+    generado_hasta = models.DateField(
+        null=True, blank=True, help_text="Último día con turnos ya generados"
+    )
 
     class Meta:
         verbose_name = "Disponibilidad del Veterinario"
@@ -77,54 +84,18 @@ class DisponibilidadVeterinario(models.Model):
         """Devuelve solo los turnos reservados en este rango"""
         return self.turnos_generados.filter(reservado=True)
 
-    def generar_turnos_rango(self):
-        """Genera turnos desde fecha_inicio hasta fecha_fin"""
-        try:
-            estado_pendiente = EstadoTurno.objects.get(codigo=EstadoTurno.PENDIENTE)
-        except EstadoTurno.DoesNotExist:
-            return 0
-
-        fecha_actual = self.fecha_inicio
-        turnos_creados = 0
-
-        while fecha_actual <= self.fecha_fin:
-            hora_actual = datetime.combine(fecha_actual, self.hora_inicio)
-            hora_fin_dt = datetime.combine(fecha_actual, self.hora_fin)
-
-            while hora_actual + timedelta(minutes=self.duracion_turno) <= hora_fin_dt:
-                nuevo_inicio = hora_actual.time()
-                nuevo_fin = (
-                    hora_actual + timedelta(minutes=self.duracion_turno)
-                ).time()
-
-                # Verificar solapamiento
-                if not Turno.objects.filter(
-                    veterinario=self.veterinario,
-                    clinica=self.clinica,
-                    fecha=fecha_actual,
-                    hora_inicio__lt=nuevo_fin,
-                    hora_fin__gt=nuevo_inicio,
-                ).exists():
-                    try:
-                        Turno.objects.create(
-                            clinica=self.clinica,
-                            veterinario=self.veterinario,
-                            fecha=fecha_actual,
-                            hora_inicio=nuevo_inicio,
-                            hora_fin=nuevo_fin,
-                            duracion_minutos=self.duracion_turno,
-                            estado=estado_pendiente,
-                            creado_por=self.veterinario,
-                        )
-                        turnos_creados += 1
-                    except Exception:
-                        pass
-
-                hora_actual += timedelta(minutes=self.duracion_turno)
-
-            fecha_actual += timedelta(days=1)
-
-        return turnos_creados
+    def aplica_el(self, fecha):
+        return self.fecha_inicio <= fecha <= self.fecha_fin
+
+    def generar_turnos_rango(self, hasta=None):
+        """
+        Genera los turnos del rango, pero solo hasta el horizonte de la agenda
+        (AGENDA_HORIZONTE_DIAS); los días siguientes los agrega el comando
+        generar_agenda a medida que entran en el horizonte.
+        """
+        from .agenda import materializar_bloque
+
+        return materializar_bloque(self, hasta)
 
     def clean(self):
         # Validaciones básicas
@@ -143,6 +114,187 @@ class DisponibilidadVeterinario(models.Model):
         return self.turnos_generados.filter(reservado=True)
 
 
+class ReglaDisponibilidad(models.Model):
+    """
+    Disponibilidad semanal recurrente: una franja horaria en ciertos días de la semana.
+
+    Varias franjas en un mismo día se cargan como varias reglas. Los turnos
+    se generan de forma incremental (ver apps.turnos.agenda); `generado_hasta`
+    guarda el último día ya expandido.
+    """
+
+    # Máscara de días: bit 0 = lunes ... bit 6 = domingo (date.weekday())
+    DIAS_CHOICES = [
+        (1, "Lunes"),
+        (2, "Martes"),
+        (4, "Miércoles"),
+        (8, "Jueves"),
+        (16, "Viernes"),
+        (32, "Sábado"),
+        (64, "Domingo"),
+    ]
+
+    veterinario = models.ForeignKey(
+        CustomUser,
+        on_delete=models.CASCADE,
+        limit_choices_to={"rol": "veterinario"},
+        related_name="reglas_disponibilidad",
+    )
+    clinica = models.ForeignKey(Clinica, on_delete=models.CASCADE)
+    dias_semana = models.PositiveSmallIntegerField(
+        help_text="Máscara de días: lunes=1, martes=2, miércoles=4, ... domingo=64"
+    )
+    hora_inicio = models.TimeField()
+    hora_fin = models.TimeField()
+    duracion_turno = models.PositiveIntegerField(
+        default=30, help_text="Duración en minutos"
+    )
+    vigente_desde = models.DateField()
+    vigente_hasta = models.DateField(null=True, blank=True)
+    activa = models.BooleanField(default=True)
+    generado_hasta = models.DateField(
+        null=True, blank=True, help_text="Último día con turnos ya generados"
+    )
+    fecha_creacion = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        verbose_name = "Regla de Disponibilidad"
+        verbose_name_plural = "Reglas de Disponibilidad"
+        ordering = ["veterinario", "hora_inicio"]
+
+    def __str__(self):
+        return f"{self.veterinario} | {self.dias_display} ({self.hora_inicio}-{self.hora_fin})"
+
+    @property
+    def dias_display(self):
+        return ", ".join(
+            nombre for bit, nombre in self.DIAS_CHOICES if self.dias_semana & bit
+        )
+
+    def turnos_libres_futuros(self):
+        """Turnos libres desde hoy que caen en los días y la franja de la regla"""
+        # fecha__week_day de Django: 1 = domingo ... 7 = sábado
+        dias = [(dia + 1) % 7 + 1 for dia in range(7) if self.dias_semana & (1 << dia)]
+        turnos = Turno.objects.filter(
+            veterinario_id=self.veterinario_id,
+            clinica_id=self.clinica_id,
+            fecha__gte=max(self.vigente_desde, timezone.localdate()),
+            fecha__week_day__in=dias,
+            hora_inicio__gte=self.hora_inicio,
+            hora_inicio__lt=self.hora_fin,
+            reservado=False,
+        )
+        if self.vigente_hasta:
+            turnos = turnos.filter(fecha__lte=self.vigente_hasta)
+        return turnos
+
+    def aplica_el(self, fecha):
+        """Indica si la regla genera turnos en la fecha dada"""
+        if not self.dias_semana & (1 << fecha.weekday()):
+            return False
+        if fecha < self.vigente_desde:
+            return False
+        return not self.vigente_hasta or fecha <= self.vigente_hasta
+
+    def clean(self):
+        if self.hora_inicio and self.hora_fin and self.hora_inicio >= self.hora_fin:
+            raise ValidationError(
+                "La hora de inicio debe ser menor que la hora de fin."
+            )
+        if not self.dias_semana:
+            raise ValidationError("Seleccioná al menos un día de la semana.")
+        if (
+            self.vigente_desde
+            and self.vigente_hasta
+            and self.vigente_desde > self.vigente_hasta
+        ):
+            raise ValidationError(
+                "La fecha de inicio no puede ser mayor que la fecha de fin."
+            )
+
+
+class ExcepcionDisponibilidad(models.Model):
+    """Ausencia puntual de un veterinario (todo el día o una franja)"""
+
+    veterinario = models.ForeignKey(
+        CustomUser,
+        on_delete=models.CASCADE,
+        limit_choices_to={"rol": "veterinario"},
+        related_name="excepciones_disponibilidad",
+    )
+    fecha = models.DateField()
+    hora_inicio = models.TimeField(
+        null=True, blank=True, help_text="Vacío = todo el día"
+    )
+    hora_fin = models.TimeField(null=True, blank=True)
+    motivo = models.CharField(max_length=200, blank=True)
+
+    class Meta:
+        verbose_name = "Excepción de Disponibilidad"
+        verbose_name_plural = "Excepciones de Disponibilidad"
+        ordering = ["fecha", "hora_inicio"]
+        indexes = [models.Index(fields=["veterinario", "fecha"])]
+
+    def __str__(self):
+        if self.todo_el_dia:
+            return f"{self.veterinario} - {self.fecha} (todo el día)"
+        return f"{self.veterinario} - {self.fecha} ({self.hora_inicio}-{self.hora_fin})"
+
+    @property
+    def todo_el_dia(self):
+        return not (self.hora_inicio and self.hora_fin)
+
+    def turnos_libres_afectados(self):
+        """Turnos libres ya generados que caen dentro de la ausencia"""
+        turnos = Turno.objects.filter(
+            veterinario_id=self.veterinario_id, fecha=self.fecha, reservado=False
+        )
+        if self.todo_el_dia:
+            return turnos
+        return turnos.filter(hora_inicio__lt=self.hora_fin, hora_fin__gt=self.hora_inicio)
+
+    def clean(self):
+        if bool(self.hora_inicio) != bool(self.hora_fin):
+            raise ValidationError(
+                "Indicá hora de inicio y de fin, o ninguna para todo el día."
+            )
+        if self.hora_inicio and self.hora_fin and self.hora_inicio >= self.hora_fin:
+            raise ValidationError(
+                "La hora de inicio debe ser menor que la hora de fin."
+            )
+
+
+class HistorialTurnosManager(models.Manager):
+    """
+    Lectura unificada de turnos vigentes y archivados (ver TurnoArchivado).
+
+    `Turno.historial.filtrar(...)` arma un UNION ALL de las dos tablas con
+    los mismos filtros y devuelve instancias de Turno con el atributo
+    `archivado`; el resultado admite order_by, slicing y count().
+    """
+
+    def filtrar(self, *args, **kwargs):
+        # Sin el ordering de Meta: SQLite no admite ORDER BY dentro de un UNION
+        vigentes = (
+            Turno.objects.filter(*args, **kwargs)
+            .annotate(archivado=Value(False))
+            .order_by()
+        )
+        archivados = (
+            TurnoArchivado.objects.filter(*args, **kwargs)
+            .annotate(archivado=Value(True))
+            .order_by()
+        )
+        return vigentes.union(archivados, all=True)
+
+    def obtener(self, **kwargs):
+        """Turno vigente o, si ya se archivó, el TurnoArchivado"""
+        turno = Turno.objects.filter(**kwargs).first()
+        if turno is None:
+            return TurnoArchivado.objects.get(**kwargs)
+        return turno
+
+
 class Turno(models.Model):
     """Turno disponible o reservado"""
 
@@ -177,10 +329,42 @@ class Turno(models.Model):
         CustomUser, on_delete=models.SET_NULL, null=True, related_name="+"
     )
     fecha_creacion = models.DateTimeField(auto_now_add=True)
+    # Cuándo lo tomó el cliente (anticipación de las reservas, ver estadisticas)
+    fecha_reserva = models.DateTimeField(null=True, blank=True)
+
+    objects = models.Manager()
+    historial = HistorialTurnosManager()
 
     class Meta:
         ordering = ["fecha", "hora_inicio"]
+        # También es el índice de las consultas por veterinario y fecha (agenda,
+        # atendidos por estado)
         unique_together = [["veterinario", "fecha", "hora_inicio"]]
+        indexes = [
+            # Turnos libres de la clínica (reserva) y reservados (agenda de la clínica)
+            models.Index(
+                fields=["clinica", "fecha", "hora_inicio"],
+                condition=Q(reservado=False),
+                name="turno_libres_clinica_idx",
+            ),
+            models.Index(
+                fields=["clinica", "fecha", "hora_inicio"],
+                condition=Q(reservado=True),
+                name="turno_reservados_clinica_idx",
+            ),
+            # Turnos de un cliente (mis turnos, historial)
+            models.Index(
+                fields=["cliente", "fecha", "hora_inicio"],
+                condition=Q(cliente__isnull=False),
+                name="turno_cliente_fecha_idx",
+            ),
+            # Purga de turnos libres vencidos
+            models.Index(
+                fields=["fecha"],
+                condition=Q(reservado=False),
+                name="turno_libres_fecha_idx",
+            ),
+        ]
 
     def __str__(self):
         return f"{self.veterinario} - {self.fecha} {self.hora_inicio}"
@@ -225,11 +409,21 @@ class Turno(models.Model):
         if datetime.combine(self.fecha, self.hora_inicio) < datetime.now():
             raise ValueError("No se puede reservar un turno en el pasado.")
 
+        retenciones = RetencionTurno.objects.filter(turno=self)
+        if retenciones.vigentes().exclude(cliente=cliente).exists():
+            raise ValueError("El turno está reservado temporalmente para otro cliente.")
+
         self.cliente = cliente
         self.mascota = mascota
         self.reservado = True
         self.estado = EstadoTurno.objects.get(codigo=EstadoTurno.CONFIRMADO)
+        self.fecha_reserva = timezone.now()
         self.save()
+        retenciones.delete()
+
+        from .estadisticas import registrar
+
+        registrar(self)
 
     def cancelar(self):
         """Cancela una reserva de turno"""
@@ -242,4 +436,218 @@ class Turno(models.Model):
         self.motivo = ""
         self.reservado = False
         self.estado = EstadoTurno.objects.get(codigo=EstadoTurno.PENDIENTE)
+        self.fecha_reserva = None
         self.save()
+
+        from .estadisticas import registrar
+
+        registrar(self)
+
+
+class RetencionQuerySet(models.QuerySet):
+    def vigentes(self):
+        return self.filter(vence__gt=timezone.now())
+
+
+class RetencionTurno(models.Model):
+    """
+    Retención temporal y exclusiva de un turno libre: hasta `vence` solo
+    `cliente` puede reservarlo. Vencida, no tiene efecto aunque la fila siga.
+    """
+
+    turno = models.OneToOneField(
+        Turno, on_delete=models.CASCADE, related_name="retencion"
+    )
+    cliente = models.ForeignKey(CustomUser, on_delete=models.CASCADE, related_name="+")
+    vence = models.DateTimeField()
+
+    objects = RetencionQuerySet.as_manager()
+
+    class Meta:
+        verbose_name = "Retención de Turno"
+        verbose_name_plural = "Retenciones de Turnos"
+        indexes = [models.Index(fields=["vence"])]
+
+    def __str__(self):
+        return f"{self.turno} → {self.cliente} hasta {self.vence:%H:%M}"
+
+
+class EsperaTurno(models.Model):
+    """
+    Cliente anotado en la lista de espera: quiere un turno en la franja de
+    fechas, con un veterinario o con cualquiera. Cuando se libera un turno
+    que coincide se le ofrece, retenido por unos minutos (ver lista_espera).
+    """
+
+    clinica = models.ForeignKey(Clinica, on_delete=models.CASCADE, related_name="+")
+    cliente = models.ForeignKey(
+        CustomUser,
+        on_delete=models.CASCADE,
+        limit_choices_to={"rol": "cliente"},
+        related_name="esperas_turno",
+    )
+    veterinario = models.ForeignKey(
+        CustomUser,
+        on_delete=models.CASCADE,
+        null=True,
+        blank=True,
+        limit_choices_to={"rol": "veterinario"},
+        related_name="+",
+        help_text="Vacío = cualquier veterinario",
+    )
+    fecha_desde = models.DateField()
+    fecha_hasta = models.DateField()
+    activa = models.BooleanField(default=True)
+
+    # Oferta en curso
+    turno_ofrecido = models.ForeignKey(
+        Turno, on_delete=models.SET_NULL, null=True, blank=True, related_name="+"
+    )
+    oferta_vence = models.DateTimeField(null=True, blank=True)
+
+    fecha_creacion = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        verbose_name = "Lista de Espera"
+        verbose_name_plural = "Lista de Espera"
+        ordering = ["fecha_creacion"]
+        indexes = [
+            # Esperas sin oferta de la clínica, por orden de llegada (al liberar un turno)
+            models.Index(
+                fields=["clinica", "fecha_hasta", "fecha_creacion"],
+                condition=Q(activa=True, turno_ofrecido__isnull=True),
+                name="espera_pendiente_idx",
+            ),
+            # Ofertas en curso, para vencerlas
+            models.Index(
+                fields=["oferta_vence"],
+                condition=Q(activa=True, turno_ofrecido__isnull=False),
+                name="espera_oferta_idx",
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.cliente} | {self.fecha_desde} → {self.fecha_hasta}"
+
+    def clean(self):
+        if (
+            self.fecha_desde
+            and self.fecha_hasta
+            and self.fecha_desde > self.fecha_hasta
+        ):
+            raise ValidationError(
+                "La fecha de inicio no puede ser mayor que la fecha de fin."
+            )
+
+
+class TurnoArchivado(models.Model):
+    """
+    Turno pasado movido fuera de la tabla activa por el comando archivar_turnos.
+
+    Conserva el id original y las mismas columnas, en el mismo orden, que
+    Turno: así la unión de Turno.historial devuelve filas compatibles.
+    """
+
+    # Mismo atributo que agrega Turno.historial, para usarlo en templates
+    archivado = True
+
+    id = models.BigIntegerField(primary_key=True)
+    clinica = models.ForeignKey(Clinica, on_delete=models.CASCADE, related_name="+")
+    veterinario = models.ForeignKey(
+        CustomUser, on_delete=models.CASCADE, related_name="+"
+    )
+    cliente = models.ForeignKey(
+        CustomUser, on_delete=models.SET_NULL, null=True, blank=True, related_name="+"
+    )
+    mascota = models.ForeignKey(
+        Mascota, on_delete=models.SET_NULL, null=True, blank=True, related_name="+"
+    )
+
+    fecha = models.DateField()
+    hora_inicio = models.TimeField()
+    hora_fin = models.TimeField(null=True, blank=True)
+    duracion_minutos = models.PositiveIntegerField(default=30)
+    tipo_consulta = models.CharField(max_length=50, default="consulta")
+    motivo = models.TextField(blank=True)
+    estado = models.ForeignKey(EstadoTurno, on_delete=models.PROTECT, related_name="+")
+    reservado = models.BooleanField(default=False)
+    creado_por = models.ForeignKey(
+        CustomUser, on_delete=models.SET_NULL, null=True, related_name="+"
+    )
+    fecha_creacion = models.DateTimeField()
+    fecha_reserva = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        verbose_name = "Turno Archivado"
+        verbose_name_plural = "Turnos Archivados"
+        ordering = ["-fecha", "-hora_inicio"]
+        indexes = [
+            models.Index(fields=["clinica", "fecha"]),
+            models.Index(fields=["veterinario", "fecha"]),
+            models.Index(fields=["cliente", "fecha"]),
+        ]
+
+    def __str__(self):
+        return f"{self.veterinario} - {self.fecha} {self.hora_inicio} (archivado)"
+
+
+class ResumenDiarioTurnos(models.Model):
+    """
+    Hechos diarios de la agenda para las estadísticas de la clínica: turnos
+    y minutos por veterinario, día, estado, tipo de consulta y si estaban
+    reservados. Se recalculan al cambiar el estado de un turno (ver
+    estadisticas) y con el comando recalcular_estadisticas.
+    """
+
+    clinica = models.ForeignKey(Clinica, on_delete=models.CASCADE, related_name="+")
+    veterinario = models.ForeignKey(
+        CustomUser, on_delete=models.CASCADE, related_name="+"
+    )
+    fecha = models.DateField()
+    estado = models.CharField(max_length=20, choices=EstadoTurno.CODIGO_CHOICES)
+    tipo_consulta = models.CharField(max_length=50)
+    reservado = models.BooleanField()
+
+    turnos = models.PositiveIntegerField(default=0)
+    minutos = models.PositiveIntegerField(default=0)
+    # Suma de (inicio del turno - fecha_reserva) de los que la tienen
+    anticipacion_minutos = models.BigIntegerField(default=0)
+    con_anticipacion = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        verbose_name = "Resumen Diario de Turnos"
+        verbose_name_plural = "Resúmenes Diarios de Turnos"
+        # También es el índice del recálculo por veterinario y día
+        unique_together = [
+            ["veterinario", "fecha", "estado", "tipo_consulta", "reservado"]
+        ]
+        indexes = [models.Index(fields=["clinica", "fecha"])]
+
+    def __str__(self):
+        return f"{self.veterinario} - {self.fecha} {self.estado}: {self.turnos}"
+
+
+# ==================== SEÑALES ====================
+
+
+@receiver(post_save, sender=ExcepcionDisponibilidad)
+def liberar_turnos_excepcion(sender, instance, **kwargs):
+    """Quita los turnos libres ya generados que caen en una nueva ausencia"""
+    from .agenda import eliminar_libres
+
+    eliminar_libres(instance.turnos_libres_afectados())
+
+
+@receiver(post_save, sender=HorarioEspecial)
+def aplicar_horario_especial(sender, instance, **kwargs):
+    """Quita los turnos libres que quedan fuera del horario especial de la clínica"""
+    from .agenda import eliminar_libres
+
+    turnos = Turno.objects.filter(
+        clinica_id=instance.clinica_id, fecha=instance.fecha, reservado=False
+    )
+    if not instance.cerrado:
+        apertura = instance.hora_apertura_especial or instance.clinica.hora_apertura
+        cierre = instance.hora_cierre_especial or instance.clinica.hora_cierre
+        turnos = turnos.filter(Q(hora_inicio__lt=apertura) | Q(hora_fin__gt=cierre))
+    eliminar_libres(turnos)
@@ -0,0 +1,159 @@
+from datetime import timedelta
+
+from django.template.loader import get_template
+from django.utils import timezone
+
+from apps.core.models import EmailSaliente
+from apps.core.outbox import encolar, encolar_varios
+from .models import Turno, EstadoTurno
+
+RESERVA = "turno_reserva"
+CANCELACION = "turno_cancelacion"
+RECORDATORIO = "turno_recordatorio"
+OFERTA = "turno_oferta"
+SERIE = "turno_serie"
+
+ASUNTOS = {
+    RESERVA: "Turno confirmado",
+    CANCELACION: "Turno cancelado",
+    RECORDATORIO: "Recordatorio de turno",
+    OFERTA: "Se liberó un turno",
+    SERIE: "Turnos del tratamiento confirmados",
+}
+
+
+def veterinario_recibe_emails(veterinario):
+    """Respeta PerfilVeterinario.recibir_emails_reservas (por defecto sí)"""
+    perfil = getattr(veterinario, "perfilveterinario", None)
+    return perfil is None or perfil.recibir_emails_reservas
+
+
+def _contexto(turno, cliente, mascota, para_veterinario):
+    return {
+        "turno": turno,
+        "cliente": cliente,
+        "mascota": mascota,
+        "clinica": turno.clinica,
+        "veterinario": turno.veterinario,
+        "para_veterinario": para_veterinario,
+    }
+
+
+def _armar(tipo, turno, cliente, mascota, para_veterinario):
+    plantilla = get_template(f"emails/{tipo}.txt")
+    destinatario = turno.veterinario.email if para_veterinario else cliente.email
+    asunto = (
+        f"{turno.clinica.nombre}: {ASUNTOS[tipo]} "
+        f"{turno.fecha.strftime('%d/%m/%Y')} {turno.hora_inicio.strftime('%H:%M')}"
+    )
+    cuerpo = plantilla.render(_contexto(turno, cliente, mascota, para_veterinario))
+    return destinatario, asunto, cuerpo
+
+
+def _encolar_aviso(tipo, turno, cliente, mascota):
+    """Avisa al cliente y, si lo acepta, al veterinario del turno"""
+    encolar(tipo, *_armar(tipo, turno, cliente, mascota, para_veterinario=False))
+    if veterinario_recibe_emails(turno.veterinario):
+        encolar(tipo, *_armar(tipo, turno, cliente, mascota, para_veterinario=True))
+
+
+def encolar_reserva(turno):
+    """Encolar confirmación de una reserva (llamar dentro de la transacción)"""
+    _encolar_aviso(RESERVA, turno, turno.cliente, turno.mascota)
+
+
+def encolar_cancelacion(turno, cliente, mascota):
+    """
+    Encolar aviso de cancelación. Recibe cliente y mascota explícitamente
+    porque `Turno.cancelar()` los desvincula del turno.
+    """
+    _encolar_aviso(CANCELACION, turno, cliente, mascota)
+
+
+def encolar_oferta(turno, espera):
+    """Avisa al cliente de la lista de espera que tiene un turno retenido"""
+    plantilla = get_template(f"emails/{OFERTA}.txt")
+    cliente = espera.cliente
+    encolar(
+        OFERTA,
+        cliente.email,
+        (
+            f"{turno.clinica.nombre}: {ASUNTOS[OFERTA]} "
+            f"{turno.fecha.strftime('%d/%m/%Y')} {turno.hora_inicio.strftime('%H:%M')}"
+        ),
+        plantilla.render(
+            {**_contexto(turno, cliente, None, False), "vence": espera.oferta_vence}
+        ),
+        clave=f"{OFERTA}:{espera.pk}:{turno.pk}",
+    )
+
+
+def encolar_serie(turnos):
+    """
+    Un solo aviso (al cliente y, si lo acepta, al veterinario) por todos los
+    turnos de una serie, en lugar de uno por turno.
+    """
+    if not turnos:
+        return
+    plantilla = get_template(f"emails/{SERIE}.txt")
+    primero = turnos[0]
+    asunto = (
+        f"{primero.clinica.nombre}: {ASUNTOS[SERIE]} "
+        f"({len(turnos)} desde el {primero.fecha.strftime('%d/%m/%Y')})"
+    )
+    destinos = [(primero.cliente.email, False)]
+    if veterinario_recibe_emails(primero.veterinario):
+        destinos.append((primero.veterinario.email, True))
+    for destinatario, para_veterinario in destinos:
+        contexto = _contexto(primero, primero.cliente, primero.mascota, para_veterinario)
+        encolar(
+            SERIE,
+            destinatario,
+            asunto,
+            plantilla.render({**contexto, "turnos": turnos}),
+        )
+
+
+def encolar_recordatorios(fecha=None):
+    """
+    Encola el recordatorio del día anterior para todos los turnos reservados
+    de `fecha` (mañana por defecto). La clave evita duplicados si se ejecuta
+    más de una vez el mismo día.
+    """
+    fecha = fecha or timezone.localdate() + timedelta(days=1)
+    plantilla = get_template(f"emails/{RECORDATORIO}.txt")
+
+    turnos = (
+        Turno.objects.filter(
+            fecha=fecha,
+            reservado=True,
+            estado__codigo__in=[EstadoTurno.PENDIENTE, EstadoTurno.CONFIRMADO],
+        )
+        .exclude(cliente__email="")
+        .select_related("clinica", "veterinario", "cliente", "mascota")
+        .order_by("id")
+    )
+
+    emails = []
+    total = 0
+    for turno in turnos.iterator(chunk_size=500):
+        emails.append(
+            EmailSaliente(
+                tipo=RECORDATORIO,
+                destinatario=turno.cliente.email,
+                asunto=(
+                    f"{turno.clinica.nombre}: {ASUNTOS[RECORDATORIO]} "
+                    f"mañana a las {turno.hora_inicio.strftime('%H:%M')}"
+                ),
+                cuerpo=plantilla.render(
+                    _contexto(turno, turno.cliente, turno.mascota, False)
+                ),
+                clave=f"{RECORDATORIO}:{turno.pk}:{fecha.isoformat()}",
+            )
+        )
+        total += 1
+        if len(emails) >= 500:
+            encolar_varios(emails)
+            emails = []
+    encolar_varios(emails)
+    return total
@@ -0,0 +1,137 @@
+"""
+Retenciones temporales de turnos libres (RetencionTurno).
+
+La fila en la base es la que vale: Turno.reservar() la respeta dentro de
+la transacción. El cache guarda además quién retiene cada turno, para que
+los pedidos que chocan con una retención ajena se respondan sin escribir
+en la base; se actualiza recién cuando la transacción confirma, así un
+rollback no deja claves sin fila detrás. Con varios procesos el cache
+tiene que ser compartido.
+"""
+
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from .models import EsperaTurno, RetencionTurno
+
+
+def segundos_retencion():
+    return getattr(settings, "RETENCION_TURNO_SEGUNDOS", 180)
+
+
+def _clave(turno_id):
+    return f"retencion_turno:{turno_id}"
+
+
+def guardar(turno_id, cliente_id, vence):
+    """Crea o renueva la retención (llamar dentro de una transacción)"""
+    RetencionTurno.objects.update_or_create(
+        turno_id=turno_id, defaults={"cliente_id": cliente_id, "vence": vence}
+    )
+
+    def actualizar_cache():
+        segundos = (vence - timezone.now()).total_seconds()
+        if segundos > 0:
+            cache.set(_clave(turno_id), cliente_id, segundos)
+
+    transaction.on_commit(actualizar_cache)
+
+
+def liberar(*turno_ids):
+    """Quita las retenciones de los turnos (reservados, ofertas vencidas...)"""
+    RetencionTurno.objects.filter(turno_id__in=turno_ids).delete()
+    claves = [_clave(pk) for pk in turno_ids]
+    transaction.on_commit(lambda: cache.delete_many(claves))
+
+
+def _propias(cliente_id):
+    """
+    Retenciones que el cliente tomó al abrir un turno. Las ofertas de la
+    lista de espera también son retenciones suyas, pero no se sueltan así.
+    """
+    ofertas = EsperaTurno.objects.filter(
+        cliente_id=cliente_id, activa=True, turno_ofrecido__isnull=False
+    ).values("turno_ofrecido")
+    return RetencionTurno.objects.filter(cliente_id=cliente_id).exclude(
+        turno__in=ofertas
+    )
+
+
+def soltar(turno_id, cliente_id):
+    """El cliente cerró la confirmación sin reservar: libera su retención"""
+    if _propias(cliente_id).filter(turno_id=turno_id).exists():
+        liberar(turno_id)
+
+
+def retenido_por_otro(turno_id, cliente_id):
+    """Consulta rápida, solo en el cache"""
+    titular = cache.get(_clave(turno_id))
+    return titular is not None and titular != cliente_id
+
+
+def retener(turno_id, cliente_id):
+    """
+    Retiene un turno libre para el cliente por RETENCION_TURNO_SEGUNDOS (o
+    renueva la suya). Cada cliente retiene un solo turno a la vez: se
+    sueltan los que tenía retenidos antes. cache.add() es atómico: si otro
+    cliente ya lo tiene, se responde sin tocar la base. Devuelve el
+    vencimiento, o None si el turno está retenido por otro.
+    """
+    segundos = segundos_retencion()
+    clave = _clave(turno_id)
+    if not cache.add(clave, cliente_id, segundos) and cache.get(clave) != cliente_id:
+        return None
+
+    vence = timezone.now() + timedelta(seconds=segundos)
+    try:
+        with transaction.atomic():
+            ajena = (
+                RetencionTurno.objects.select_for_update()
+                .vigentes()
+                .filter(turno_id=turno_id)
+                .exclude(cliente_id=cliente_id)
+                .first()
+            )
+            if ajena:
+                # Retención que el cache no conocía (p. ej. una oferta de la lista de espera)
+                cache.set(
+                    clave,
+                    ajena.cliente_id,
+                    (ajena.vence - timezone.now()).total_seconds(),
+                )
+                return None
+            anteriores = _propias(cliente_id).exclude(turno_id=turno_id)
+            anteriores = list(anteriores.values_list("turno_id", flat=True))
+            if anteriores:
+                liberar(*anteriores)
+            guardar(turno_id, cliente_id, vence)
+    except Exception:
+        # Sin la fila, la clave tomada con cache.add() bloquearía a los demás
+        cache.delete(clave)
+        raise
+    return vence
+
+
+def sin_retencion_ajena(turnos, cliente):
+    """Excluye de un queryset de Turno los retenidos por otros clientes"""
+    return turnos.filter(
+        Q(retencion__isnull=True)
+        | Q(retencion__vence__lte=timezone.now())
+        | Q(retencion__cliente=cliente)
+    )
+
+
+def purgar_vencidas(tamano=1000):
+    """Borra por lotes las filas de retenciones ya vencidas. Devuelve cuántas"""
+    vencidas = RetencionTurno.objects.filter(vence__lte=timezone.now())
+    total = 0
+    while True:
+        ids = list(vencidas.values_list("pk", flat=True)[:tamano])
+        if not ids:
+            return total
+        total += RetencionTurno.objects.filter(pk__in=ids).delete()[0]
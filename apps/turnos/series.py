@@ -0,0 +1,158 @@
+"""
+Reserva de series de turnos (tratamientos: kinesiología, aplicaciones
+semanales...). Todas las fechas se validan con una consulta de turnos
+solapados y otra de ausencias del veterinario; lo que se puede reservar se
+escribe con bulk_create / bulk_update en una sola transacción.
+"""
+
+from collections import defaultdict
+from datetime import datetime, timedelta
+
+from django.db import transaction
+from django.db.models import Exists, OuterRef
+from django.utils import timezone
+
+from .estadisticas import registrar
+from .models import EstadoTurno, ExcepcionDisponibilidad, RetencionTurno, Turno
+from .notificaciones import encolar_serie
+from .retenciones import liberar
+
+# Días entre repeticiones (multiplicados por el intervalo)
+FRECUENCIAS = {"diaria": 1, "semanal": 7}
+
+CREADO = "creado"
+RESERVADO = "reservado"
+CONFLICTO = "conflicto"
+
+
+def fechas_serie(inicio, frecuencia, intervalo, repeticiones):
+    paso = timedelta(days=FRECUENCIAS[frecuencia] * intervalo)
+    return [inicio + paso * i for i in range(repeticiones)]
+
+
+def _conflicto(fecha, hora_inicio, fin, solapados, ausencias, ahora):
+    """Motivo por el que no se puede reservar la fecha, o None"""
+    if datetime.combine(fecha, hora_inicio) < ahora:
+        return "El horario ya pasó."
+    for ausencia in ausencias:
+        if ausencia.todo_el_dia or (
+            ausencia.hora_inicio < fin and ausencia.hora_fin > hora_inicio
+        ):
+            return "El veterinario no atiende ese día."
+    if any(t.reservado for t in solapados):
+        return "Se solapa con un turno reservado."
+    if any(t.retenido for t in solapados):
+        return "Otro cliente está reservando ese horario."
+    if len(solapados) > 1 or (
+        solapados
+        and (solapados[0].hora_inicio, solapados[0].hora_fin) != (hora_inicio, fin)
+    ):
+        return "Se solapa con otro turno de la agenda."
+    return None
+
+
+def reservar_serie(
+    *,
+    clinica_id,
+    veterinario_id,
+    cliente,
+    mascota,
+    fechas,
+    hora_inicio,
+    duracion_minutos,
+    motivo="",
+    creado_por=None,
+    todo_o_nada=False,
+):
+    """
+    Reserva `hora_inicio` en cada una de las `fechas`. Si ya existe el turno
+    libre de la agenda con ese mismo horario se reserva; si no hay nada en
+    ese horario se crea. Las fechas ocupadas se informan como conflicto y,
+    con `todo_o_nada`, no se escribe nada si hay alguno.
+
+    Devuelve una lista de {"fecha", "resultado", "turno_id", "motivo"}.
+    Si otro proceso crea un turno en el mismo horario mientras tanto,
+    bulk_create levanta IntegrityError y no se guarda nada.
+    """
+    fin = (
+        datetime.combine(fechas[0], hora_inicio) + timedelta(minutes=duracion_minutos)
+    ).time()
+    if fin <= hora_inicio:
+        raise ValueError("El turno no puede terminar después de medianoche.")
+    ahora = timezone.localtime().replace(tzinfo=None)
+
+    with transaction.atomic():
+        # Una consulta: los turnos del veterinario que se pisan con el horario
+        # en cualquiera de las fechas, marcando los retenidos por otro cliente
+        retenido = RetencionTurno.objects.vigentes().filter(turno=OuterRef("pk"))
+        solapados = defaultdict(list)
+        for turno in (
+            Turno.objects.select_for_update()
+            .filter(
+                veterinario_id=veterinario_id,
+                fecha__in=fechas,
+                hora_inicio__lt=fin,
+                hora_fin__gt=hora_inicio,
+            )
+            .annotate(retenido=Exists(retenido.exclude(cliente=cliente)))
+        ):
+            solapados[turno.fecha].append(turno)
+
+        ausencias = defaultdict(list)
+        for ausencia in ExcepcionDisponibilidad.objects.filter(
+            veterinario_id=veterinario_id, fecha__in=fechas
+        ):
+            ausencias[ausencia.fecha].append(ausencia)
+
+        estado = EstadoTurno.objects.get(codigo=EstadoTurno.CONFIRMADO)
+        informe, nuevos, libres = [], [], []
+        for fecha in fechas:
+            motivo_conflicto = _conflicto(
+                fecha, hora_inicio, fin, solapados[fecha], ausencias[fecha], ahora
+            )
+            if motivo_conflicto:
+                informe.append(
+                    {"fecha": fecha, "resultado": CONFLICTO, "motivo": motivo_conflicto}
+                )
+            elif solapados[fecha]:
+                libres.append(solapados[fecha][0])
+                informe.append({"fecha": fecha, "resultado": RESERVADO})
+            else:
+                nuevos.append(
+                    Turno(
+                        clinica_id=clinica_id,
+                        veterinario_id=veterinario_id,
+                        fecha=fecha,
+                        hora_inicio=hora_inicio,
+                        hora_fin=fin,
+                        duracion_minutos=duracion_minutos,
+                        creado_por=creado_por,
+                    )
+                )
+                informe.append({"fecha": fecha, "resultado": CREADO})
+
+        if todo_o_nada and any(i["resultado"] == CONFLICTO for i in informe):
+            return informe
+
+        ahora = timezone.now()
+        for turno in nuevos + libres:
+            turno.fecha_reserva = ahora
+            turno.cliente = cliente
+            turno.mascota = mascota
+            turno.motivo = motivo
+            turno.reservado = True
+            turno.estado = estado
+        Turno.objects.bulk_create(nuevos)
+        Turno.objects.bulk_update(
+            libres,
+            ["cliente", "mascota", "motivo", "reservado", "estado", "fecha_reserva"],
+        )
+        liberar(*[t.pk for t in libres])
+        registrar(*nuevos, *libres)
+
+        turnos = {t.fecha: t for t in nuevos + libres}
+        for item in informe:
+            if item["fecha"] in turnos:
+                item["turno_id"] = turnos[item["fecha"]].pk
+        encolar_serie(sorted(turnos.values(), key=lambda t: t.fecha))
+    return informe
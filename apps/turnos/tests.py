@@ -1,14 +1,170 @@
+import json
+
+from django.core import mail
+from django.core.mail import get_connection
 from django.urls import reverse
 from django.utils import timezone
-from django.test import TestCase, Client
-from datetime import timedelta, time, date
+from io import StringIO
+
+from django.test import (
+    AsyncClient,
+    Client,
+    TestCase,
+    TransactionTestCase,
+    override_settings,
+)
+from django.contrib.messages import get_messages
+from django.core.cache import cache
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
+from django.core.management import call_command
+from datetime import datetime, timedelta, time, date
 from django.core.exceptions import ValidationError
+from django.db.models import Count
 
-from apps.clinicas.models import Clinica
-from apps.accounts.models import CustomUser
+from apps.clinicas.models import Clinica, HorarioEspecial
+from apps.core.models import EmailSaliente
+from apps.core.outbox import despachar_lote, reclamar_lote
+from apps.accounts.models import CustomUser, PerfilVeterinario
 from apps.turnos.forms import TurnoCrearAdminForm
 from apps.mascotas.models import Mascota, Especie, Raza
-from apps.turnos.models import Turno, EstadoTurno, DisponibilidadVeterinario
+from apps.historiales.models import HistoriaClinica
+from apps.core.explain import PlanConsultaMixin
+from apps.turnos.agenda import _insertar, materializar, purgar_vencidos
+from apps.turnos.archivo import archivar
+from apps.turnos.calendario import horarios_iso
+from apps.turnos.retenciones import guardar, retenido_por_otro
+from apps.turnos.models import (
+    Turno,
+    EstadoTurno,
+    DisponibilidadVeterinario,
+    ReglaDisponibilidad,
+    ExcepcionDisponibilidad,
+    TurnoArchivado,
+    EsperaTurno,
+    RetencionTurno,
+    ResumenDiarioTurnos,
+)
+
+
+# ==================== DATOS COMPARTIDOS ====================
+
+
+class DatosClinicaMixin:
+    """Clínica con admin, veterinario, cliente con mascota y estados de turno"""
+
+    def setUp(self):
+        super().setUp()
+        self.client_http = Client()
+
+        # Crear admin
+        self.admin = CustomUser.objects.create_user(
+            username="admin_test",
+            email="admin@test.com",
+            password="test",
+            first_name="Admin",
+            last_name="Test",
+            rol="admin_veterinaria",
+        )
+
+        # Crear clínica con admin
+        self.clinica = Clinica.objects.create(
+            nombre="Veterinaria Test",
+            email="test@vet.com",
+            hora_apertura=time(9, 0),
+            hora_cierre=time(18, 0),
+            admin=self.admin,
+        )
+
+        self.admin.clinica = self.clinica
+        self.admin.save()
+
+        self.veterinario = CustomUser.objects.create_user(
+            username="vet_test",
+            email="vet@test.com",
+            password="testpass123",
+            first_name="Carlos",
+            last_name="Vet",
+            rol="veterinario",
+            clinica=self.clinica,
+        )
+
+        self.cliente = CustomUser.objects.create_user(
+            username="cli_test",
+            email="cliente@test.com",
+            password="testpass123",
+            first_name="Juan",
+            last_name="Cliente",
+            rol="cliente",
+            clinica=self.clinica,
+        )
+        self.cliente.is_active = True
+        self.cliente.save()
+
+        self.especie = Especie.objects.create(nombre="Perro")
+        self.mascota = Mascota.objects.create(
+            nombre="Firulais",
+            especie=self.especie,
+            dueno=self.cliente,
+            fecha_nacimiento=date(2020, 1, 1),
+            sexo="macho",
+        )
+
+        self.estado_pendiente = EstadoTurno.objects.create(
+            nombre="Pendiente", codigo=EstadoTurno.PENDIENTE
+        )
+
+        self.estado_confirmado = EstadoTurno.objects.create(
+            nombre="Confirmado", codigo=EstadoTurno.CONFIRMADO
+        )
+
+
+class TurnoLibreMixin(DatosClinicaMixin):
+    """Un turno libre para mañana, con el cliente logueado"""
+
+    def setUp(self):
+        super().setUp()
+        self.turno = Turno.objects.create(
+            clinica=self.clinica,
+            veterinario=self.veterinario,
+            fecha=timezone.now().date() + timedelta(days=1),
+            hora_inicio=time(10, 0),
+            duracion_minutos=30,
+            estado=self.estado_pendiente,
+            creado_por=self.veterinario,
+        )
+        self.client_http.login(username="cli_test", password="testpass123")
+
+    def reservar(self):
+        self.client_http.post(
+            reverse("turnos:reservar_turno", args=[self.turno.id]),
+            {"mascota": self.mascota.id},
+        )
+
+    def despachar(self, **opciones):
+        call_command(
+            "despachar_emails",
+            backend="django.core.mail.backends.locmem.EmailBackend",
+            stdout=open("/dev/null", "w"),
+            **opciones,
+        )
+
+
+class TurnoReservadoMixin(DatosClinicaMixin):
+    """Un turno reservado por el cliente para mañana"""
+
+    def setUp(self):
+        super().setUp()
+        self.turno = Turno.objects.create(
+            clinica=self.clinica,
+            veterinario=self.veterinario,
+            cliente=self.cliente,
+            mascota=self.mascota,
+            fecha=timezone.localdate() + timedelta(days=1),
+            hora_inicio=time(10, 0),
+            estado=self.estado_confirmado,
+            reservado=True,
+        )
 
 
 # ==================== TESTS DE MODELOS ====================
@@ -425,6 +581,47 @@ class DisponibilidadVeterinarioTest(TestCase):
         self.assertEqual(turnos_creados, 1)
         self.assertEqual(Turno.objects.filter(veterinario=self.veterinario).count(), 2)
 
+    @override_settings(AGENDA_HORIZONTE_DIAS=10)
+    def test_generar_turnos_solo_hasta_horizonte(self):
+        """Test: Un bloque largo solo genera el horizonte; el comando lo extiende y purga"""
+        hoy = timezone.localdate()
+        disp = DisponibilidadVeterinario.objects.create(
+            veterinario=self.veterinario,
+            clinica=self.clinica,
+            fecha_inicio=hoy + timedelta(days=1),
+            fecha_fin=hoy + timedelta(days=365),
+            hora_inicio=time(10, 0),
+            hora_fin=time(11, 0),
+            duracion_turno=30,
+        )
+
+        self.assertEqual(disp.generar_turnos_rango(), 20)
+        disp.refresh_from_db()
+        self.assertEqual(disp.generado_hasta, hoy + timedelta(days=10))
+
+        # Turnos de ayer: el libre se purga, el reservado queda como historial
+        for hora, reservado in [(time(10, 0), False), (time(10, 30), True)]:
+            Turno.objects.create(
+                clinica=self.clinica,
+                veterinario=self.veterinario,
+                fecha=hoy - timedelta(days=1),
+                hora_inicio=hora,
+                estado=self.estado_pendiente,
+                reservado=reservado,
+            )
+
+        call_command("generar_agenda", dias=11, stdout=open("/dev/null", "w"))
+
+        self.assertEqual(
+            Turno.objects.filter(fecha=hoy + timedelta(days=11)).count(), 2
+        )
+        self.assertEqual(
+            list(
+                Turno.objects.filter(fecha__lt=hoy).values_list("reservado", flat=True)
+            ),
+            [True],
+        )
+
 
 # # ==================== TESTS DE FORMULARIOS ====================
 
@@ -677,3 +874,1424 @@ class TurnoReservarViewTest(TestCase):
         turno.refresh_from_db()
         self.assertEqual(turno.cliente, self.cliente)
         self.assertEqual(turno.mascota, self.mascota)
+
+
+class OutboxEmailsTest(TurnoLibreMixin, TestCase):
+    """Tests para el outbox de avisos de turnos"""
+
+    def test_reserva_encola_sin_enviar(self):
+        """Test: Reservar encola los avisos pero no envía emails en el request"""
+        self.reservar()
+
+        self.assertEqual(len(mail.outbox), 0)
+        self.assertEqual(
+            set(EmailSaliente.objects.values_list("destinatario", flat=True)),
+            {"cliente@test.com", "vet@test.com"},
+        )
+
+    def test_worker_envia_y_marca_enviados(self):
+        """Test: El comando vacía el outbox y no reenvía en otra corrida"""
+        self.reservar()
+        self.despachar()
+        self.despachar()
+
+        self.assertEqual(len(mail.outbox), 2)
+        self.assertFalse(
+            EmailSaliente.objects.exclude(estado=EmailSaliente.ENVIADO).exists()
+        )
+
+    def test_respeta_preferencia_del_veterinario(self):
+        """Test: Un veterinario sin emails de reservas no recibe avisos"""
+        PerfilVeterinario.objects.create(
+            user=self.veterinario, matricula="MP-1", recibir_emails_reservas=False
+        )
+        self.reservar()
+
+        self.assertEqual(
+            list(EmailSaliente.objects.values_list("destinatario", flat=True)),
+            ["cliente@test.com"],
+        )
+
+    def test_cancelacion_avisa_al_cliente(self):
+        """Test: Cancelar encola el aviso aunque el turno quede sin cliente"""
+        self.turno.fecha = timezone.now().date() + timedelta(days=3)
+        self.turno.save()
+        self.reservar()
+        EmailSaliente.objects.all().delete()
+
+        self.client_http.post(reverse("turnos:cancelar_turno_cliente", args=[self.turno.id]))
+
+        self.assertTrue(
+            EmailSaliente.objects.filter(
+                tipo="turno_cancelacion", destinatario="cliente@test.com"
+            ).exists()
+        )
+
+    def test_cuerpo_sin_escapar_html(self):
+        """Test: Los emails de texto no escapan comillas, & ni <"""
+        self.clinica.nombre = "O'Brien & Co"
+        self.clinica.save()
+        self.client_http.post(
+            reverse("turnos:reservar_turno", args=[self.turno.id]),
+            {"mascota": self.mascota.id, "motivo": 'Control <anual> "urgente"'},
+        )
+
+        email = EmailSaliente.objects.get(destinatario="cliente@test.com")
+        self.assertIn("Tu turno en O'Brien & Co quedó confirmado", email.cuerpo)
+        self.assertIn('Motivo: Control <anual> "urgente"', email.cuerpo)
+        self.assertTrue(email.cuerpo.endswith("Saludos,\nO'Brien & Co\n"))
+
+    def test_servidor_caido_reprograma_el_lote(self):
+        """Test: Si no se puede abrir la conexión, todo el lote se reintenta después"""
+        self.reservar()
+        conexion = get_connection(
+            "django.core.mail.backends.smtp.EmailBackend",
+            host="127.0.0.1",
+            port=1,
+            timeout=1,
+        )
+
+        enviados, fallidos = despachar_lote(reclamar_lote(10), conexion)
+
+        self.assertEqual((enviados, fallidos), (0, 2))
+        for email in EmailSaliente.objects.all():
+            self.assertEqual(email.estado, EmailSaliente.PENDIENTE)
+            self.assertEqual(email.intentos, 1)
+            self.assertTrue(email.ultimo_error)
+            self.assertGreater(email.proximo_intento, timezone.now())
+        self.assertEqual(reclamar_lote(10), [])
+
+    def test_recordatorios_del_dia_anterior_no_se_duplican(self):
+        """Test: El recordatorio de mañana se encola una sola vez"""
+        self.reservar()
+        self.despachar(recordatorios=True)
+        self.despachar(recordatorios=True)
+
+        self.assertEqual(
+            EmailSaliente.objects.filter(tipo="turno_recordatorio").count(), 1
+        )
+
+
+class ListaEsperaTest(TurnoLibreMixin, PlanConsultaMixin, TestCase):
+    """Tests para la lista de espera y la oferta de turnos liberados"""
+
+    def setUp(self):
+        super().setUp()
+        self.turno.fecha = timezone.localdate() + timedelta(days=3)
+        self.turno.save()
+
+        self.otro_cliente = CustomUser.objects.create_user(
+            username="cli_2",
+            email="cliente2@test.com",
+            password="testpass123",
+            rol="cliente",
+            clinica=self.clinica,
+        )
+        self.otra_mascota = Mascota.objects.create(
+            nombre="Michi", especie=self.especie, dueno=self.otro_cliente, sexo="H"
+        )
+        self.tercero = CustomUser.objects.create_user(
+            username="cli_3",
+            email="cliente3@test.com",
+            password="testpass123",
+            rol="cliente",
+            clinica=self.clinica,
+        )
+
+    def tearDown(self):
+        # Las retenciones quedan en el cache por id de turno, que se reutiliza
+        cache.clear()
+
+    def anotar(self, cliente, veterinario=None, dias=(0, 7)):
+        hoy = timezone.localdate()
+        return EsperaTurno.objects.create(
+            clinica=self.clinica,
+            cliente=cliente,
+            veterinario=veterinario,
+            fecha_desde=hoy + timedelta(days=dias[0]),
+            fecha_hasta=hoy + timedelta(days=dias[1]),
+        )
+
+    def cancelar(self):
+        self.reservar()
+        self.client_http.post(
+            reverse("turnos:cancelar_turno_cliente", args=[self.turno.id])
+        )
+
+    def test_anotarse(self):
+        """Test: El cliente se anota desde la página de lista de espera"""
+        hoy = timezone.localdate()
+        response = self.client_http.post(
+            reverse("turnos:lista_espera"),
+            {
+                "veterinario": self.veterinario.pk,
+                "fecha_desde": hoy,
+                "fecha_hasta": hoy + timedelta(days=5),
+            },
+        )
+        self.assertRedirects(response, reverse("turnos:lista_espera"))
+        espera = EsperaTurno.objects.get()
+        self.assertEqual(
+            (espera.cliente, espera.clinica), (self.cliente, self.clinica)
+        )
+
+        response = self.client_http.post(
+            reverse("turnos:lista_espera"),
+            {"fecha_desde": hoy + timedelta(days=5), "fecha_hasta": hoy},
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(EsperaTurno.objects.count(), 1)
+
+    def test_cancelacion_ofrece_al_primero_que_coincide(self):
+        """Test: El turno liberado se retiene para el primero de la lista"""
+        self.anotar(self.tercero, dias=(10, 20))  # fuera de la franja
+        self.anotar(self.tercero, veterinario=self.admin)  # otro veterinario
+        espera = self.anotar(self.otro_cliente)
+        self.anotar(self.tercero)  # llegó después
+
+        self.cancelar()
+
+        espera.refresh_from_db()
+        self.assertEqual(espera.turno_ofrecido, self.turno)
+        self.assertEqual(
+            RetencionTurno.objects.get(turno=self.turno).cliente, self.otro_cliente
+        )
+        self.assertTrue(
+            EmailSaliente.objects.filter(
+                tipo="turno_oferta", destinatario="cliente2@test.com"
+            ).exists()
+        )
+        self.assertEqual(EsperaTurno.objects.filter(turno_ofrecido=self.turno).count(), 1)
+
+    def test_oferta_sin_escapar_html(self):
+        """Test: El email de la oferta no escapa comillas ni &"""
+        self.clinica.nombre = "O'Brien & Co"
+        self.clinica.save()
+        self.anotar(self.otro_cliente)
+        self.cancelar()
+
+        email = EmailSaliente.objects.get(tipo="turno_oferta")
+        self.assertIn("Se liberó un turno en O'Brien & Co que", email.cuerpo)
+
+    def test_retencion_exclusiva(self):
+        """Test: Mientras dura la oferta solo el cliente ofrecido puede reservar"""
+        espera = self.anotar(self.otro_cliente)
+        self.cancelar()
+
+        # El cliente que canceló ya no puede volver a tomarlo
+        self.reservar()
+        self.turno.refresh_from_db()
+        self.assertFalse(self.turno.reservado)
+
+        self.client_http.login(username="cli_2", password="testpass123")
+        self.client_http.post(
+            reverse("turnos:reservar_turno", args=[self.turno.id]),
+            {"mascota": self.otra_mascota.id},
+        )
+        self.turno.refresh_from_db()
+        self.assertEqual(self.turno.cliente, self.otro_cliente)
+        espera.refresh_from_db()
+        self.assertFalse(espera.activa)
+        self.assertFalse(RetencionTurno.objects.exists())
+
+    def test_oferta_vencida_pasa_al_siguiente(self):
+        """Test: Al vencer la oferta, el turno se ofrece al siguiente"""
+        primera = self.anotar(self.otro_cliente)
+        segunda = self.anotar(self.tercero)
+        self.cancelar()
+        EsperaTurno.objects.filter(pk=primera.pk).update(
+            oferta_vence=timezone.now() - timedelta(minutes=1)
+        )
+        RetencionTurno.objects.update(vence=timezone.now() - timedelta(minutes=1))
+
+        self.despachar(lista_espera=True)
+
+        primera.refresh_from_db()
+        segunda.refresh_from_db()
+        self.assertFalse(primera.activa)
+        self.assertEqual(segunda.turno_ofrecido, self.turno)
+        self.assertEqual(
+            RetencionTurno.objects.get(turno=self.turno).cliente, self.tercero
+        )
+        self.assertIn("cliente3@test.com", [m.to[0] for m in mail.outbox])
+
+    def test_salir_de_la_lista_libera_la_oferta(self):
+        """Test: Salir de la lista ofrece el turno retenido al siguiente"""
+        primera = self.anotar(self.otro_cliente)
+        segunda = self.anotar(self.tercero)
+        self.cancelar()
+
+        self.client_http.login(username="cli_2", password="testpass123")
+        self.client_http.post(reverse("turnos:cancelar_espera", args=[primera.pk]))
+
+        segunda.refresh_from_db()
+        self.assertEqual(segunda.turno_ofrecido, self.turno)
+
+    def test_busqueda_de_espera_usa_indice(self):
+        """Test: La espera a ofrecer se busca en el índice parcial"""
+        self.assertUsaIndice(
+            EsperaTurno.objects.filter(
+                clinica_id=1,
+                activa=True,
+                turno_ofrecido__isnull=True,
+                fecha_hasta__gte=date.today(),
+                fecha_desde__lte=date.today(),
+            ).order_by("fecha_creacion")[:1],
+            "turnos_esperaturno",
+            "espera_pendiente_idx",
+        )
+
+
+class RetencionTurnoTest(TurnoLibreMixin, TestCase):
+    """Tests para la retención temporal de turnos al reservar"""
+
+    def setUp(self):
+        super().setUp()
+        self.otro_cliente = CustomUser.objects.create_user(
+            username="cli_2",
+            email="cliente2@test.com",
+            password="testpass123",
+            rol="cliente",
+            clinica=self.clinica,
+        )
+        self.otra_mascota = Mascota.objects.create(
+            nombre="Michi", especie=self.especie, dueno=self.otro_cliente, sexo="H"
+        )
+        self.otro_http = Client()
+        self.otro_http.login(username="cli_2", password="testpass123")
+
+    def tearDown(self):
+        cache.clear()
+
+    def retener(self, cliente_http):
+        return cliente_http.post(reverse("turnos:retener_turno", args=[self.turno.pk]))
+
+    def test_retencion_exclusiva_mientras_dura(self):
+        """Test: Con el turno retenido, otro cliente no lo ve ni lo reserva"""
+        response = self.retener(self.client_http)
+        self.assertTrue(response.json()["retenido"])
+
+        with CaptureQueriesContext(connection) as consultas:
+            response = self.retener(self.otro_http)
+        self.assertEqual(response.status_code, 409)
+        # El conflicto se resuelve en el cache, sin tocar las tablas de turnos
+        self.assertFalse([q for q in consultas if "turnos_" in q["sql"]])
+
+        disponibles = reverse("turnos:turnos_disponibles")
+        self.assertEqual(list(self.otro_http.get(disponibles).context["turnos"]), [])
+        self.assertEqual(
+            list(self.client_http.get(disponibles).context["turnos"]), [self.turno]
+        )
+
+        self.otro_http.post(
+            reverse("turnos:reservar_turno", args=[self.turno.pk]),
+            {"mascota": self.otra_mascota.pk},
+        )
+        self.turno.refresh_from_db()
+        self.assertFalse(self.turno.reservado)
+
+        self.reservar()
+        self.turno.refresh_from_db()
+        self.assertEqual(self.turno.cliente, self.cliente)
+        self.assertFalse(RetencionTurno.objects.exists())
+
+    def test_retencion_vencida_no_bloquea(self):
+        """Test: Vencida la retención, otro cliente puede tomar el turno"""
+        self.retener(self.client_http)
+        RetencionTurno.objects.update(vence=timezone.now() - timedelta(seconds=1))
+        cache.clear()
+
+        response = self.retener(self.otro_http)
+        self.assertTrue(response.json()["retenido"])
+        self.assertEqual(
+            RetencionTurno.objects.get(turno=self.turno).cliente, self.otro_cliente
+        )
+
+    def test_retencion_que_el_cache_no_conoce(self):
+        """Test: La fila en la base manda aunque el cache no la tenga"""
+        RetencionTurno.objects.create(
+            turno=self.turno,
+            cliente=self.otro_cliente,
+            vence=timezone.now() + timedelta(minutes=5),
+        )
+        self.assertEqual(self.retener(self.client_http).status_code, 409)
+        # El segundo intento ya se corta en el cache
+        self.assertTrue(retenido_por_otro(self.turno.pk, self.cliente.pk))
+
+    def test_una_retencion_por_cliente(self):
+        """Test: Retener otro turno suelta el anterior, salvo una oferta de la lista"""
+        segundo = Turno.objects.create(
+            clinica=self.clinica,
+            veterinario=self.veterinario,
+            fecha=self.turno.fecha,
+            hora_inicio=time(11, 0),
+            estado=self.estado_pendiente,
+        )
+        ofrecido = Turno.objects.create(
+            clinica=self.clinica,
+            veterinario=self.veterinario,
+            fecha=self.turno.fecha,
+            hora_inicio=time(12, 0),
+            estado=self.estado_pendiente,
+        )
+        EsperaTurno.objects.create(
+            clinica=self.clinica,
+            cliente=self.cliente,
+            fecha_desde=self.turno.fecha,
+            fecha_hasta=self.turno.fecha,
+            turno_ofrecido=ofrecido,
+        )
+        RetencionTurno.objects.create(
+            turno=ofrecido,
+            cliente=self.cliente,
+            vence=timezone.now() + timedelta(minutes=30),
+        )
+
+        self.retener(self.client_http)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client_http.post(reverse("turnos:retener_turno", args=[segundo.pk]))
+
+        self.assertEqual(
+            set(RetencionTurno.objects.values_list("turno_id", flat=True)),
+            {segundo.pk, ofrecido.pk},
+        )
+        self.assertEqual(self.retener(self.otro_http).status_code, 200)
+
+    def test_cerrar_la_confirmacion_suelta_el_turno(self):
+        """Test: DELETE libera la retención propia y no la de otro cliente"""
+        self.retener(self.client_http)
+        url = reverse("turnos:retener_turno", args=[self.turno.pk])
+
+        self.otro_http.delete(url)
+        self.assertTrue(retenido_por_otro(self.turno.pk, self.otro_cliente.pk))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client_http.delete(url)
+        self.assertFalse(RetencionTurno.objects.exists())
+        self.assertEqual(self.retener(self.otro_http).status_code, 200)
+
+    def test_rollback_no_deja_la_retencion_en_el_cache(self):
+        """Test: El cache se actualiza solo si la transacción confirma"""
+        vence = timezone.now() + timedelta(minutes=30)
+        with self.assertRaises(RuntimeError):
+            with transaction.atomic():
+                guardar(self.turno.pk, self.otro_cliente.pk, vence)
+                raise RuntimeError
+        self.assertFalse(retenido_por_otro(self.turno.pk, self.cliente.pk))
+        self.assertEqual(self.retener(self.client_http).status_code, 200)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            guardar(self.turno.pk, self.otro_cliente.pk, vence)
+        self.assertTrue(retenido_por_otro(self.turno.pk, self.cliente.pk))
+
+    def test_turno_reservado_no_se_retiene(self):
+        """Test: Solo se retienen turnos libres"""
+        self.reservar()
+        self.assertEqual(self.retener(self.otro_http).status_code, 404)
+
+    def test_purgar_retenciones_vencidas(self):
+        """Test: El comando borra solo las retenciones vencidas"""
+        otro_turno = Turno.objects.create(
+            clinica=self.clinica,
+            veterinario=self.veterinario,
+            fecha=self.turno.fecha,
+            hora_inicio=time(11, 0),
+            estado=self.estado_pendiente,
+        )
+        ahora = timezone.now()
+        RetencionTurno.objects.create(
+            turno=self.turno, cliente=self.cliente, vence=ahora - timedelta(minutes=1)
+        )
+        RetencionTurno.objects.create(
+            turno=otro_turno, cliente=self.cliente, vence=ahora + timedelta(minutes=1)
+        )
+        call_command("purgar_retenciones", lote=1, stdout=StringIO())
+        self.assertEqual(
+            list(RetencionTurno.objects.values_list("turno_id", flat=True)),
+            [otro_turno.pk],
+        )
+
+
+class IdempotenciaTest(TurnoLibreMixin, TestCase):
+    """Tests para los reintentos de reservar y cancelar"""
+
+    def setUp(self):
+        super().setUp()
+        self.turno.fecha = timezone.localdate() + timedelta(days=3)
+        self.turno.save()
+        self.url_reservar = reverse("turnos:reservar_turno", args=[self.turno.pk])
+
+    def tearDown(self):
+        cache.clear()
+
+    def post(self, url, clave, **datos):
+        response = self.client_http.post(url, {"clave_idempotencia": clave, **datos})
+        # Sin seguir el redirect los mensajes anteriores siguen pendientes
+        return response, [str(m) for m in get_messages(response.wsgi_request)][-1:]
+
+    def test_reintento_de_reserva_repite_el_resultado(self):
+        """Test: El reintento devuelve el mismo resultado sin tocar Turno"""
+        datos = {"mascota": self.mascota.pk}
+        primera, mensajes = self.post(self.url_reservar, "abc", **datos)
+        self.assertIn("reservado exitosamente", mensajes[0])
+
+        with CaptureQueriesContext(connection) as consultas:
+            segunda, repetidos = self.post(self.url_reservar, "abc", **datos)
+        self.assertEqual(segunda["Location"], primera["Location"])
+        self.assertEqual(repetidos, mensajes)
+        self.assertFalse([q for q in consultas if "turnos_turno" in q["sql"]])
+        self.assertEqual(EmailSaliente.objects.filter(tipo="turno_reserva").count(), 2)
+
+        # Otra clave sí vuelve a ejecutar la vista
+        _, mensajes = self.post(self.url_reservar, "otra", **datos)
+        self.assertIn("ya fue reservado", mensajes[0])
+
+    def test_reintento_de_cancelacion(self):
+        """Test: Cancelar dos veces no termina en un 404"""
+        self.reservar()
+        url = reverse("turnos:cancelar_turno_cliente", args=[self.turno.pk])
+        _, mensajes = self.post(url, "xyz")
+        # El mensaje de la reserva, todavía sin leer, no forma parte del resultado
+        _, guardados = cache.get(f"idempotencia:{self.cliente.pk}:{url}:xyz")
+        self.assertEqual([texto for _, texto, _ in guardados], mensajes)
+        response, repetidos = self.post(url, "xyz")
+        self.assertRedirects(response, reverse("turnos:mis_turnos"))
+        self.assertEqual(repetidos, mensajes)
+        self.assertEqual(
+            EmailSaliente.objects.filter(tipo="turno_cancelacion").count(), 2
+        )
+
+    def test_solicitud_en_curso(self):
+        """Test: Un doble clic mientras corre la primera no la ejecuta de nuevo"""
+        cache.add(
+            f"idempotencia:{self.cliente.pk}:{self.url_reservar}:abc", "en_curso"
+        )
+        response, mensajes = self.post(
+            self.url_reservar, "abc", mascota=self.mascota.pk
+        )
+        self.assertRedirects(response, reverse("turnos:mis_turnos"))
+        self.assertIn("se está procesando", mensajes[0])
+        self.turno.refresh_from_db()
+        self.assertFalse(self.turno.reservado)
+
+    def test_clave_por_header(self):
+        """Test: Los clientes de la API mandan la clave en Idempotency-Key"""
+        for _ in range(2):
+            self.client_http.post(
+                self.url_reservar,
+                {"mascota": self.mascota.pk},
+                headers={"Idempotency-Key": "k1"},
+            )
+        self.assertEqual(EmailSaliente.objects.filter(tipo="turno_reserva").count(), 2)
+
+    def test_formularios_llevan_la_clave(self):
+        """Test: Las páginas del cliente incluyen la clave en sus formularios"""
+        response = self.client_http.get(reverse("turnos:turnos_disponibles"))
+        self.assertContains(
+            response,
+            f'name="clave_idempotencia" value="{response.context["clave_idempotencia"]}"',
+        )
+
+
+class SerieTurnosTest(TurnoLibreMixin, TestCase):
+    """Tests para la reserva de series de turnos (tratamientos)"""
+
+    def setUp(self):
+        super().setUp()
+        self.client_http.login(username="admin_test", password="test")
+        self.inicio = self.turno.fecha
+
+    def tearDown(self):
+        cache.clear()
+
+    def reservar_serie(self, **datos):
+        datos = {
+            "cliente_id": self.cliente.pk,
+            "mascota_id": self.mascota.pk,
+            "veterinario": self.veterinario.pk,
+            "fecha_inicio": self.inicio.isoformat(),
+            "hora_inicio": "10:00",
+            "duracion_minutos": 30,
+            "frecuencia": "semanal",
+            "intervalo": 1,
+            "repeticiones": 4,
+            "motivo": "Kinesiología",
+            **datos,
+        }
+        return self.client_http.post(
+            reverse("turnos:reservar_serie"),
+            json.dumps(datos),
+            content_type="application/json",
+        )
+
+    def ocupar(self, dias, hora=time(10, 15)):
+        return Turno.objects.create(
+            clinica=self.clinica,
+            veterinario=self.veterinario,
+            cliente=self.otro_cliente,
+            fecha=self.inicio + timedelta(days=dias),
+            hora_inicio=hora,
+            estado=self.estado_pendiente,
+            reservado=True,
+        )
+
+    def crear_otro_cliente(self):
+        self.otro_cliente = CustomUser.objects.create_user(
+            username="cli_2", password="x", rol="cliente", clinica=self.clinica
+        )
+
+    def test_serie_reserva_libres_y_crea_faltantes(self):
+        """Test: Reserva el turno libre existente y crea el resto en bloque"""
+        response = self.reservar_serie()
+        self.assertEqual(response.status_code, 200)
+        datos = response.json()
+        self.assertEqual((datos["reservados"], datos["conflictos"]), (4, 0))
+        self.assertEqual(
+            [f["resultado"] for f in datos["fechas"]],
+            ["reservado", "creado", "creado", "creado"],
+        )
+
+        turnos = Turno.objects.filter(cliente=self.cliente).order_by("fecha")
+        self.assertEqual(
+            [t.fecha for t in turnos],
+            [self.inicio + timedelta(weeks=i) for i in range(4)],
+        )
+        self.assertEqual(turnos[0].pk, self.turno.pk)
+        self.assertEqual([f["turno_id"] for f in datos["fechas"]], [t.pk for t in turnos])
+        for turno in turnos:
+            self.assertTrue(turno.reservado)
+            self.assertEqual(turno.hora_fin, time(10, 30))
+            self.assertEqual(turno.estado.codigo, EstadoTurno.CONFIRMADO)
+            self.assertEqual(turno.mascota, self.mascota)
+
+        # Un solo aviso por serie (cliente y veterinario)
+        self.assertEqual(
+            sorted(EmailSaliente.objects.values_list("destinatario", flat=True)),
+            ["cliente@test.com", "vet@test.com"],
+        )
+
+    def test_aviso_sin_escapar_html(self):
+        """Test: El motivo escrito por el admin llega tal cual en el email"""
+        self.reservar_serie(motivo='Kine "fase 2" <rodilla> & cadera')
+
+        email = EmailSaliente.objects.get(destinatario="cliente@test.com")
+        self.assertIn('Motivo: Kine "fase 2" <rodilla> & cadera', email.cuerpo)
+
+    def test_serie_informa_conflictos(self):
+        """Test: Las fechas solapadas quedan en conflicto y el resto se reserva"""
+        self.crear_otro_cliente()
+        self.ocupar(dias=7)
+
+        with CaptureQueriesContext(connection) as consultas:
+            datos = self.reservar_serie().json()
+        self.assertEqual(
+            [f["resultado"] for f in datos["fechas"]],
+            ["reservado", "conflicto", "creado", "creado"],
+        )
+        self.assertEqual(datos["fechas"][1]["motivo"], "Se solapa con un turno reservado.")
+        self.assertEqual(Turno.objects.filter(cliente=self.cliente).count(), 3)
+        # Los turnos solapados de todas las fechas se leen en una sola consulta
+        solapados = '"turnos_turno"."hora_fin" >'
+        self.assertEqual(len([q for q in consultas if solapados in q["sql"]]), 1)
+
+    def test_todo_o_nada_no_guarda_con_conflictos(self):
+        """Test: Con todo_o_nada, un conflicto evita reservar toda la serie"""
+        self.crear_otro_cliente()
+        self.ocupar(dias=14, hora=time(9, 45))
+
+        response = self.reservar_serie(todo_o_nada=True)
+        self.assertEqual(response.status_code, 409)
+        self.assertFalse(response.json()["guardado"])
+        self.assertFalse(Turno.objects.filter(cliente=self.cliente).exists())
+        self.assertFalse(EmailSaliente.objects.exists())
+
+    def test_turno_retenido_por_otro_cliente(self):
+        """Test: Un turno retenido por otro cliente no entra en la serie"""
+        self.crear_otro_cliente()
+        RetencionTurno.objects.create(
+            turno=self.turno,
+            cliente=self.otro_cliente,
+            vence=timezone.now() + timedelta(minutes=2),
+        )
+
+        datos = self.reservar_serie(repeticiones=2).json()
+        self.assertEqual(
+            [f["resultado"] for f in datos["fechas"]], ["conflicto", "creado"]
+        )
+        self.turno.refresh_from_db()
+        self.assertFalse(self.turno.reservado)
+
+    def test_horario_pasado_de_hoy_es_conflicto(self):
+        """Test: Una serie que empieza hoy a una hora ya pasada no la reserva"""
+        self.inicio = timezone.localdate()
+        datos = self.reservar_serie(
+            hora_inicio="00:00", frecuencia="diaria", repeticiones=2
+        ).json()
+        self.assertEqual(
+            [(f["resultado"], f.get("motivo")) for f in datos["fechas"]],
+            [("conflicto", "El horario ya pasó."), ("creado", None)],
+        )
+        self.assertFalse(Turno.objects.filter(fecha=self.inicio).exists())
+
+    def test_turno_creado_en_paralelo_devuelve_409(self):
+        """Test: Si el alta choca con la restricción única no se guarda nada"""
+        # Un turno sin hora_fin no aparece como solapado: el insert choca
+        # como con un turno creado por otro request en el mismo instante
+        fecha = self.inicio + timedelta(days=7)
+        choque = Turno.objects.create(
+            clinica=self.clinica,
+            veterinario=self.veterinario,
+            fecha=fecha,
+            hora_inicio=time(10, 0),
+            estado=self.estado_pendiente,
+        )
+        Turno.objects.filter(pk=choque.pk).update(hora_fin=None)
+
+        response = self.reservar_serie()
+        self.assertEqual(response.status_code, 409)
+        self.assertFalse(Turno.objects.filter(reservado=True).exists())
+        self.assertFalse(EmailSaliente.objects.exists())
+
+    def test_datos_invalidos(self):
+        """Test: Errores de validación y mascota ajena devuelven 400"""
+        response = self.reservar_serie(repeticiones=1)
+        self.assertEqual(response.status_code, 400)
+        self.assertIn("repeticiones", response.json()["errores"])
+
+        self.crear_otro_cliente()
+        response = self.reservar_serie(cliente_id=self.otro_cliente.pk)
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(Turno.objects.filter(reservado=True).exists())
+
+
+class ReglasDisponibilidadTest(DatosClinicaMixin, TestCase):
+    """Tests para las reglas semanales y la expansión incremental de turnos"""
+
+    def setUp(self):
+        super().setUp()
+        self.clinica.dias_atencion = ["lunes", "martes", "miércoles", "jueves", "viernes"]
+        self.clinica.save()
+
+        hoy = timezone.localdate()
+        self.lunes = hoy + timedelta(days=7 - hoy.weekday())
+        # Lunes y miércoles, mañana y tarde (dos reglas), más un sábado que la clínica no atiende
+        for inicio, fin in [(time(9, 0), time(11, 0)), (time(14, 0), time(15, 0))]:
+            ReglaDisponibilidad.objects.create(
+                veterinario=self.veterinario,
+                clinica=self.clinica,
+                dias_semana=1 | 4 | 32,
+                hora_inicio=inicio,
+                hora_fin=fin,
+                duracion_turno=30,
+                vigente_desde=self.lunes,
+            )
+
+    def test_expande_respetando_clinica_y_excepciones(self):
+        """Test: Se saltean días no hábiles, cierres especiales y ausencias"""
+        miercoles = self.lunes + timedelta(days=2)
+        HorarioEspecial.objects.create(
+            clinica=self.clinica,
+            fecha=miercoles,
+            hora_apertura_especial=time(10, 0),
+            hora_cierre_especial=time(14, 30),
+        )
+        ExcepcionDisponibilidad.objects.create(
+            veterinario=self.veterinario,
+            fecha=self.lunes,
+            hora_inicio=time(9, 0),
+            hora_fin=time(10, 0),
+        )
+
+        creados = materializar(self.lunes + timedelta(days=6))
+
+        turnos = Turno.objects.filter(veterinario=self.veterinario)
+        self.assertEqual(creados, turnos.count())
+        # Lunes: 10:00-11:00 (2) + tarde (2); miércoles: 10:00-11:00 (2) + 14:00 (1)
+        self.assertEqual(turnos.filter(fecha=self.lunes).count(), 4)
+        self.assertEqual(turnos.filter(fecha=miercoles).count(), 3)
+        self.assertFalse(turnos.filter(fecha=self.lunes + timedelta(days=5)).exists())
+
+    def test_generar_y_quitar_turnos_actualiza_capacidad(self):
+        """Test: Los turnos libres generados o quitados se reflejan en el resumen"""
+        materializar(self.lunes + timedelta(days=6))
+        capacidad = ResumenDiarioTurnos.objects.filter(
+            veterinario=self.veterinario, fecha=self.lunes, reservado=False
+        )
+        self.assertEqual(capacidad.get().minutos, 180)
+
+        ExcepcionDisponibilidad.objects.create(
+            veterinario=self.veterinario,
+            fecha=self.lunes,
+            hora_inicio=time(14, 0),
+            hora_fin=time(15, 0),
+        )
+        self.assertEqual(capacidad.get().minutos, 120)
+
+        HorarioEspecial.objects.create(
+            clinica=self.clinica, fecha=self.lunes, cerrado=True
+        )
+        self.assertFalse(capacidad.exists())
+        self.assertTrue(
+            ResumenDiarioTurnos.objects.filter(
+                fecha=self.lunes + timedelta(days=2)
+            ).exists()
+        )
+
+    def test_eliminar_bloque_quita_turnos_libres_y_recalcula(self):
+        """Test: Borrar un bloque quita sus turnos libres y su capacidad"""
+        bloque = DisponibilidadVeterinario.objects.create(
+            veterinario=self.veterinario,
+            clinica=self.clinica,
+            fecha_inicio=self.lunes,
+            fecha_fin=self.lunes + timedelta(days=1),
+            hora_inicio=time(16, 0),
+            hora_fin=time(17, 0),
+            duracion_turno=30,
+        )
+        self.assertEqual(bloque.generar_turnos_rango(), 4)
+        self.assertEqual(ResumenDiarioTurnos.objects.get(fecha=self.lunes).minutos, 60)
+
+        vet = Client()
+        vet.login(username="vet_test", password="testpass123")
+        url = reverse("turnos:eliminar_disponibilidad", args=[bloque.pk])
+
+        reservado = Turno.objects.filter(fecha=self.lunes).first()
+        Turno.objects.filter(pk=reservado.pk).update(reservado=True)
+        vet.post(url)
+        self.assertTrue(DisponibilidadVeterinario.objects.filter(pk=bloque.pk).exists())
+        self.assertEqual(Turno.objects.count(), 4)
+
+        Turno.objects.filter(pk=reservado.pk).update(reservado=False)
+        response = vet.post(url)
+        self.assertRedirects(response, reverse("turnos:disponibilidades"))
+        self.assertFalse(DisponibilidadVeterinario.objects.filter(pk=bloque.pk).exists())
+        self.assertFalse(Turno.objects.exists())
+        self.assertFalse(ResumenDiarioTurnos.objects.exists())
+
+    def test_insertar_no_cuenta_turnos_en_conflicto(self):
+        """Test: Los turnos que ya existían no se cuentan como creados"""
+        datos = dict(
+            clinica=self.clinica,
+            veterinario=self.veterinario,
+            fecha=self.lunes,
+            duracion_minutos=30,
+            estado=self.estado_pendiente,
+        )
+        Turno.objects.create(hora_inicio=time(9, 0), **datos)
+        lote = [Turno(hora_inicio=time(9, 0), **datos), Turno(hora_inicio=time(9, 30), **datos)]
+        self.assertEqual(_insertar(lote), 1)
+        self.assertEqual(lote, [])
+        self.assertEqual(Turno.objects.filter(fecha=self.lunes).count(), 2)
+
+    def test_expansion_incremental(self):
+        """Test: Correr de nuevo solo agrega los días nuevos del horizonte"""
+        materializar(self.lunes + timedelta(days=6))
+        self.assertEqual(materializar(self.lunes + timedelta(days=6)), 0)
+
+        creados = materializar(self.lunes + timedelta(days=7))
+        self.assertEqual(creados, 6)
+        self.assertEqual(
+            ReglaDisponibilidad.objects.filter(
+                generado_hasta=self.lunes + timedelta(days=7)
+            ).count(),
+            2,
+        )
+
+        call_command("generar_agenda", dias=30, stdout=open("/dev/null", "w"))
+        self.assertTrue(
+            Turno.objects.filter(fecha__gt=self.lunes + timedelta(days=7)).exists()
+        )
+
+    def test_ausencia_y_cierre_posteriores_liberan_turnos(self):
+        """Test: Una ausencia o cierre cargados después quitan los turnos libres"""
+        materializar(self.lunes + timedelta(days=6))
+        miercoles = self.lunes + timedelta(days=2)
+
+        ExcepcionDisponibilidad.objects.create(veterinario=self.veterinario, fecha=self.lunes)
+        HorarioEspecial.objects.create(clinica=self.clinica, fecha=miercoles, cerrado=True)
+
+        self.assertFalse(Turno.objects.filter(fecha=self.lunes).exists())
+        self.assertFalse(Turno.objects.filter(fecha=miercoles).exists())
+
+    def test_veterinario_crea_regla_y_quita_ausencia(self):
+        """Test: Vistas del veterinario para reglas y ausencias"""
+        ReglaDisponibilidad.objects.all().delete()
+        self.client_http = Client()
+        self.client_http.login(username="vet_test", password="testpass123")
+
+        response = self.client_http.post(
+            reverse("turnos:crear_regla"),
+            {
+                "dias": ["1", "8"],
+                "hora_inicio": "09:00",
+                "hora_fin": "10:00",
+                "duracion_turno": 30,
+                "vigente_desde": self.lunes.isoformat(),
+            },
+        )
+        self.assertRedirects(response, reverse("turnos:disponibilidades"))
+        regla = ReglaDisponibilidad.objects.get()
+        self.assertEqual(regla.dias_semana, 9)
+        self.assertEqual(Turno.objects.filter(fecha=self.lunes).count(), 2)
+
+        excepcion = ExcepcionDisponibilidad.objects.create(
+            veterinario=self.veterinario, fecha=self.lunes
+        )
+        self.assertFalse(Turno.objects.filter(fecha=self.lunes).exists())
+
+        self.client_http.post(reverse("turnos:eliminar_excepcion", args=[excepcion.pk]))
+        self.assertEqual(Turno.objects.filter(fecha=self.lunes).count(), 2)
+
+        self.client_http.post(reverse("turnos:eliminar_regla", args=[regla.pk]))
+        self.assertFalse(Turno.objects.filter(veterinario=self.veterinario).exists())
+
+
+class ArchivoTurnosTest(DatosClinicaMixin, TestCase):
+    """Tests para el archivo de turnos viejos y la lectura unificada"""
+
+    def setUp(self):
+        super().setUp()
+        hoy = timezone.localdate()
+        self.viejo = Turno.objects.create(
+            clinica=self.clinica,
+            veterinario=self.veterinario,
+            cliente=self.cliente,
+            mascota=self.mascota,
+            fecha=hoy - timedelta(days=400),
+            hora_inicio=time(10, 0),
+            estado=self.estado_confirmado,
+            reservado=True,
+            motivo="Control anual",
+        )
+        # Libre y vencido: se borra, no se archiva
+        Turno.objects.create(
+            clinica=self.clinica,
+            veterinario=self.veterinario,
+            fecha=hoy - timedelta(days=400),
+            hora_inicio=time(11, 0),
+            estado=self.estado_pendiente,
+        )
+        self.reciente = Turno.objects.create(
+            clinica=self.clinica,
+            veterinario=self.veterinario,
+            cliente=self.cliente,
+            mascota=self.mascota,
+            fecha=hoy - timedelta(days=10),
+            hora_inicio=time(10, 0),
+            estado=self.estado_confirmado,
+            reservado=True,
+        )
+        self.historia = HistoriaClinica.objects.create(
+            clinica=self.clinica,
+            mascota=self.mascota,
+            veterinario=self.veterinario,
+            turno=self.viejo,
+            motivo_consulta="Control",
+            peso_actual=10,
+            anamnesis="-",
+            diagnostico="Sano",
+            tratamiento_realizado="-",
+            indicaciones_dueno="-",
+        )
+
+    def archivar(self, **opciones):
+        call_command("archivar_turnos", meses=12, stdout=open("/dev/null", "w"), **opciones)
+
+    def test_archiva_turnos_viejos_y_borra_libres_vencidos(self):
+        """Test: Los turnos viejos pasan al archivo conservando id e historia"""
+        self.archivar(lote=1)
+
+        self.assertEqual(list(Turno.objects.values_list("pk", flat=True)), [self.reciente.pk])
+        archivado = TurnoArchivado.objects.get()
+        self.assertEqual(archivado.pk, self.viejo.pk)
+        self.assertEqual(archivado.motivo, "Control anual")
+
+        self.historia.refresh_from_db()
+        self.assertIsNone(self.historia.turno_id)
+        self.assertEqual(self.historia.turno_archivado_id, self.viejo.pk)
+
+        # Volver a correrlo no cambia nada
+        self.archivar()
+        self.assertEqual(TurnoArchivado.objects.count(), 1)
+
+    def test_lectura_unificada(self):
+        """Test: El historial y las vistas del cliente ven los turnos archivados"""
+        self.archivar()
+
+        historial = Turno.historial.filtrar(cliente=self.cliente).order_by("-fecha")
+        self.assertEqual(historial.count(), 2)
+        self.assertEqual(
+            [(t.pk, t.archivado) for t in historial],
+            [(self.reciente.pk, False), (self.viejo.pk, True)],
+        )
+        self.assertEqual(Turno.historial.obtener(pk=self.viejo.pk).motivo, "Control anual")
+
+        self.client_http.login(username="cli_test", password="testpass123")
+        response = self.client_http.get(reverse("turnos:mis_turnos"))
+        self.assertEqual(len(response.context["turnos_pasados"]), 2)
+
+        response = self.client_http.get(
+            reverse("turnos:turno_detalle_cliente", args=[self.viejo.pk])
+        )
+        self.assertEqual(response.status_code, 200)
+
+    def test_detalle_solo_para_el_cliente_del_turno(self):
+        """Test: Los detalles de turno aplican la regla de acceso sobre el objeto"""
+        CustomUser.objects.create_user(
+            username="otro_cli",
+            email="otro@test.com",
+            password="testpass123",
+            rol="cliente",
+            clinica=self.clinica,
+        )
+        self.client_http.login(username="otro_cli", password="testpass123")
+        for pk in [self.reciente.pk, self.viejo.pk]:
+            response = self.client_http.get(
+                reverse("turnos:turno_detalle_cliente", args=[pk])
+            )
+            self.assertRedirects(response, reverse("core:dashboard"), target_status_code=302)
+
+        self.archivar()
+        self.client_http.login(username="vet_test", password="testpass123")
+        response = self.client_http.get(
+            reverse("turnos:turno_detalle_vet", args=[self.viejo.pk])
+        )
+        self.assertEqual(response.status_code, 200)
+
+
+class VistasAsyncTest(TurnoReservadoMixin, TestCase):
+    """Tests para los endpoints JSON async"""
+
+    def test_calendarios_json(self):
+        """Test: Calendario del veterinario y de la clínica"""
+        self.client_http.login(username="vet_test", password="testpass123")
+        eventos = self.client_http.get(reverse("turnos:turnos_json")).json()
+        self.assertEqual([e["id"] for e in eventos], [self.turno.pk])
+        self.assertEqual(eventos[0]["title"], "Firulais - Juan Cliente")
+
+        # El veterinario no ve el calendario de la clínica
+        response = self.client_http.get(reverse("turnos:turnos_clinica_json"))
+        self.assertRedirects(response, reverse("core:dashboard"), target_status_code=302)
+
+        self.client_http.login(username="admin_test", password="test")
+        eventos = self.client_http.get(reverse("turnos:turnos_clinica_json")).json()
+        self.assertEqual(eventos[0]["extendedProps"]["veterinario"], "Carlos Vet")
+
+    def test_formato_columnas_equivale_a_eventos(self):
+        """Test: La respuesta por columnas trae los mismos eventos"""
+        self.client_http.login(username="vet_test", password="testpass123")
+        url = reverse("turnos:turnos_json")
+        eventos = self.client_http.get(url).json()
+        datos = self.client_http.get(url, {"formato": "columnas"}).json()
+
+        self.assertEqual(datos["id"], [self.turno.pk])
+        self.assertEqual(
+            datos["url"].replace("{id}", str(self.turno.pk)), eventos[0]["url"]
+        )
+        self.assertEqual(
+            eventos[0]["url"],
+            reverse("turnos:turno_detalle_vet", kwargs={"pk": self.turno.pk}),
+        )
+        for campo in ("title", "start", "end", "color"):
+            self.assertEqual(datos[campo], [eventos[0][campo]])
+        for prop, valores in datos["extendedProps"].items():
+            self.assertEqual(valores, [eventos[0]["extendedProps"][prop]])
+
+    def test_rango_de_fechas(self):
+        """Test: Se respetan los parámetros start/end de FullCalendar"""
+        self.client_http.login(username="vet_test", password="testpass123")
+        dia = self.turno.fecha
+        response = self.client_http.get(
+            reverse("turnos:turnos_json"),
+            {"start": f"{dia + timedelta(days=1)}T00:00:00-03:00"},
+        )
+        self.assertEqual(response.json(), [])
+        response = self.client_http.get(
+            reverse("turnos:turnos_json"),
+            {"start": str(dia), "end": str(dia + timedelta(days=1))},
+        )
+        self.assertEqual(len(response.json()), 1)
+
+    def test_horarios_iso_igual_a_datetime(self):
+        """Test: Los horarios formateados coinciden con datetime.isoformat()"""
+        iso = horarios_iso(con_zona=True)
+        fecha, hora = date(2025, 3, 10), time(9, 45)
+        esperado = timezone.make_aware(datetime.combine(fecha, hora)).isoformat()
+        self.assertEqual(iso(fecha, hora), esperado)
+        self.assertEqual(iso(fecha, hora), esperado)
+        self.assertEqual(horarios_iso()(fecha, hora), "2025-03-10T09:45:00")
+        self.assertIsNone(iso(fecha, None))
+
+    async def test_apis_con_cliente_async(self):
+        """Test: Las APIs corren bajo el handler ASGI"""
+        cliente = AsyncClient()
+        response = await cliente.get(reverse("turnos:buscar_clientes"), {"q": "Juan"})
+        self.assertEqual(response.status_code, 302)
+
+        await cliente.aforce_login(self.admin)
+        response = await cliente.get(reverse("turnos:buscar_clientes"), {"q": "Juan"})
+        clientes = response.json()["clientes"]
+        self.assertEqual(len(clientes), 1)
+        self.assertEqual(clientes[0]["mascotas"][0]["nombre"], "Firulais")
+
+        response = await cliente.get(
+            reverse("turnos:mascotas_por_cliente", args=[self.cliente.pk])
+        )
+        self.assertEqual(response.json()["cliente"]["id"], self.cliente.pk)
+        response = await cliente.get(
+            reverse("turnos:mascotas_por_cliente", args=[self.admin.pk])
+        )
+        self.assertEqual(response.status_code, 404)
+
+        response = await cliente.get(
+            reverse("mascotas:cargar_razas"), {"especie_id": self.especie.pk}
+        )
+        self.assertEqual(response.json(), [])
+
+
+class MedirCalendarioTest(TurnoReservadoMixin, TransactionTestCase):
+    """Tests para el benchmark del calendario (usa hilos, sin transacción)"""
+
+    def test_medir_calendario(self):
+        """Test: El benchmark compara ambos modos"""
+        salida = StringIO()
+        call_command(
+            "medir_calendario",
+            veterinario=self.veterinario.pk,
+            solicitudes=5,
+            hilos=2,
+            stdout=salida,
+        )
+        self.assertIn("sync: 5 consultas", salida.getvalue())
+        self.assertIn("async: 5 consultas", salida.getvalue())
+
+
+class DisponibilidadClienteTest(DatosClinicaMixin, PlanConsultaMixin, TestCase):
+    """Tests para el mapa de calor y los próximos turnos libres"""
+
+    def setUp(self):
+        super().setUp()
+        self.otro_vet = CustomUser.objects.create_user(
+            username="vet_2",
+            email="vet2@test.com",
+            password="testpass123",
+            first_name="Laura",
+            last_name="Vet",
+            rol="veterinario",
+            clinica=self.clinica,
+        )
+        hoy = timezone.localdate()
+        self.mes = (hoy.replace(day=1) + timedelta(days=32)).replace(day=1)
+        self.dia_1 = self.mes + timedelta(days=2)
+        self.dia_2 = self.mes + timedelta(days=5)
+
+        for veterinario, fecha, hora, reservado in [
+            (self.veterinario, self.dia_1, time(10, 0), False),
+            (self.veterinario, self.dia_1, time(10, 30), False),
+            (self.otro_vet, self.dia_1, time(9, 0), False),
+            (self.otro_vet, self.dia_2, time(11, 0), False),
+            (self.veterinario, self.dia_2, time(9, 0), True),
+            # Hoy a medianoche: ya pasó
+            (self.veterinario, hoy, time(0, 0), False),
+        ]:
+            Turno.objects.create(
+                clinica=self.clinica,
+                veterinario=veterinario,
+                fecha=fecha,
+                hora_inicio=hora,
+                estado=self.estado_pendiente,
+                reservado=reservado,
+            )
+        self.client_http.login(username="cli_test", password="testpass123")
+
+    def test_libres_por_dia_y_veterinario(self):
+        """Test: Un mes agregado por día y por veterinario"""
+        response = self.client_http.get(
+            reverse("turnos:disponibilidad_mes"), {"mes": self.mes.strftime("%Y-%m")}
+        )
+        datos = response.json()
+        self.assertEqual(datos["mes"], self.mes.strftime("%Y-%m"))
+        self.assertEqual(
+            datos["dias"],
+            {
+                self.dia_1.isoformat(): {
+                    "libres": 3,
+                    "veterinarios": {
+                        str(self.veterinario.pk): 2,
+                        str(self.otro_vet.pk): 1,
+                    },
+                },
+                self.dia_2.isoformat(): {
+                    "libres": 1,
+                    "veterinarios": {str(self.otro_vet.pk): 1},
+                },
+            },
+        )
+
+        response = self.client_http.get(
+            reverse("turnos:disponibilidad_mes"),
+            {"mes": self.mes.strftime("%Y-%m"), "veterinario": self.veterinario.pk},
+        )
+        self.assertEqual(list(response.json()["dias"]), [self.dia_1.isoformat()])
+
+        # Un mes inválido cae en el actual, sin los turnos ya pasados de hoy
+        response = self.client_http.get(
+            reverse("turnos:disponibilidad_mes"), {"mes": "x"}
+        )
+        self.assertNotIn(
+            timezone.localdate().isoformat(), response.json()["dias"]
+        )
+
+    def test_proximos_turnos_libres(self):
+        """Test: Los próximos N libres, en orden y por veterinario"""
+        url = reverse("turnos:proximos_libres")
+        turnos = self.client_http.get(url, {"n": 3}).json()["turnos"]
+        self.assertEqual(
+            [(t["fecha"], t["hora"]) for t in turnos],
+            [
+                (self.dia_1.isoformat(), "09:00"),
+                (self.dia_1.isoformat(), "10:00"),
+                (self.dia_1.isoformat(), "10:30"),
+            ],
+        )
+        self.assertEqual(turnos[0]["veterinario"], "Laura Vet")
+        self.assertEqual(
+            turnos[0]["url"],
+            f"{reverse('turnos:turnos_disponibles')}?veterinario={self.otro_vet.pk}"
+            f"&fecha={self.dia_1.isoformat()}",
+        )
+
+        turnos = self.client_http.get(
+            url, {"n": 5, "veterinario": self.otro_vet.pk}
+        ).json()["turnos"]
+        self.assertEqual(
+            [t["fecha"] for t in turnos],
+            [self.dia_1.isoformat(), self.dia_2.isoformat()],
+        )
+
+    def test_solo_clientes(self):
+        """Test: Otros roles no usan las APIs de disponibilidad"""
+        self.client_http.login(username="vet_test", password="testpass123")
+        response = self.client_http.get(reverse("turnos:proximos_libres"))
+        self.assertRedirects(
+            response, reverse("core:dashboard"), fetch_redirect_response=False
+        )
+
+    def test_proximos_usa_el_indice_de_libres(self):
+        """Test: La búsqueda del próximo libre es una búsqueda en el índice"""
+        libres = Turno.objects.filter(clinica_id=1, reservado=False).order_by(
+            "fecha", "hora_inicio"
+        )
+        self.assertUsaIndice(
+            libres.filter(fecha__gt=date.today())[:5],
+            "turnos_turno",
+            "turno_libres_clinica_idx",
+        )
+        self.assertUsaIndice(
+            libres.filter(fecha=date.today(), hora_inicio__gte=time(12, 0))[:5],
+            "turnos_turno",
+            "turno_libres_clinica_idx",
+        )
+        self.assertUsaIndice(
+            Turno.objects.filter(
+                clinica_id=1, reservado=False, fecha__gte=date.today()
+            )
+            .values("fecha", "veterinario_id")
+            .annotate(libres=Count("id")),
+            "turnos_turno",
+            "turno_libres_clinica_idx",
+        )
+
+
+class EstadisticasTurnosTest(TurnoLibreMixin, PlanConsultaMixin, TestCase):
+    """Tests para los resúmenes diarios y las estadísticas de ocupación"""
+
+    def setUp(self):
+        super().setUp()
+        self.estado_completado = EstadoTurno.objects.create(
+            nombre="Completado", codigo=EstadoTurno.COMPLETADO
+        )
+        self.estado_no_asistio = EstadoTurno.objects.create(
+            nombre="No asistió", codigo=EstadoTurno.NO_ASISTIO
+        )
+        self.ayer = timezone.localdate() - timedelta(days=1)
+
+    def tearDown(self):
+        cache.clear()
+
+    def crear(self, hora, reservado=True, fecha=None):
+        return Turno.objects.create(
+            clinica=self.clinica,
+            veterinario=self.veterinario,
+            cliente=self.cliente if reservado else None,
+            mascota=self.mascota if reservado else None,
+            fecha=fecha or self.ayer,
+            hora_inicio=time(hora, 0),
+            estado=self.estado_confirmado if reservado else self.estado_pendiente,
+            reservado=reservado,
+        )
+
+    def hechos(self, fecha):
+        return set(
+            ResumenDiarioTurnos.objects.filter(fecha=fecha).values_list(
+                "estado", "reservado", "turnos", "minutos"
+            )
+        )
+
+    def marcar(self, *acciones):
+        vet = Client()
+        vet.login(username="vet_test", password="testpass123")
+        for accion, turno in acciones:
+            with self.captureOnCommitCallbacks(execute=True):
+                vet.post(reverse(f"turnos:{accion}", args=[turno.pk]))
+
+    def estadisticas(self, **parametros):
+        self.client_http.login(username="admin_test", password="test")
+        return self.client_http.get(reverse("turnos:estadisticas_turnos"), parametros)
+
+    def test_reserva_y_cancelacion_actualizan_resumen(self):
+        """Test: Reservar y cancelar recalculan el día del turno, después del commit"""
+        with self.captureOnCommitCallbacks() as callbacks:
+            self.reservar()
+        self.assertFalse(ResumenDiarioTurnos.objects.exists())
+        for callback in callbacks:
+            callback()
+        self.assertEqual(
+            self.hechos(self.turno.fecha), {(EstadoTurno.CONFIRMADO, True, 1, 30)}
+        )
+        hecho = ResumenDiarioTurnos.objects.get()
+        self.assertEqual(hecho.con_anticipacion, 1)
+        self.assertGreater(hecho.anticipacion_minutos, 0)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client_http.post(
+                reverse("turnos:cancelar_turno_cliente", args=[self.turno.pk])
+            )
+        self.assertEqual(
+            self.hechos(self.turno.fecha), {(EstadoTurno.PENDIENTE, False, 1, 30)}
+        )
+
+    def test_purga_conserva_turnos_libres_del_dia(self):
+        """Test: Los turnos libres purgados siguen contando como capacidad"""
+        libre = self.crear(9, reservado=False)
+        atendido, ausente = self.crear(10), self.crear(11)
+
+        self.assertEqual(purgar_vencidos(), 1)
+        self.assertFalse(Turno.objects.filter(pk=libre.pk).exists())
+        self.marcar(("turno_completar", atendido), ("turno_no_asistio", ausente))
+
+        self.assertEqual(
+            self.hechos(self.ayer),
+            {
+                (EstadoTurno.PENDIENTE, False, 1, 30),
+                (EstadoTurno.COMPLETADO, True, 1, 30),
+                (EstadoTurno.NO_ASISTIO, True, 1, 30),
+            },
+        )
+        datos = self.estadisticas(
+            periodo="dia", desde=self.ayer.isoformat(), hasta=self.ayer.isoformat()
+        ).json()
+        self.assertEqual(datos["periodos"], [self.ayer.isoformat()])
+        self.assertEqual(datos["capacidad_minutos"], [90])
+        self.assertEqual(datos["ocupacion"], [round(60 / 90, 4)])
+        self.assertEqual(datos["ausentismo"], [0.5])
+        self.assertEqual(datos["por_tipo_consulta"], {"consulta": 2})
+
+    def test_comando_recalcula_turnos_y_archivo(self):
+        """Test: recalcular_estadisticas reconstruye desde Turno y TurnoArchivado"""
+        viejo = self.crear(10, fecha=self.ayer - timedelta(days=400))
+        Turno.objects.filter(pk=viejo.pk).update(estado=self.estado_completado)
+        self.crear(10)
+        archivar(self.ayer - timedelta(days=300))
+        self.assertTrue(TurnoArchivado.objects.filter(pk=viejo.pk).exists())
+
+        call_command("recalcular_estadisticas", stdout=StringIO())
+        self.assertEqual(
+            self.hechos(viejo.fecha), {(EstadoTurno.COMPLETADO, True, 1, 30)}
+        )
+        self.assertEqual(
+            self.hechos(self.ayer), {(EstadoTurno.CONFIRMADO, True, 1, 30)}
+        )
+        self.assertEqual(
+            self.hechos(self.turno.fecha), {(EstadoTurno.PENDIENTE, False, 1, 30)}
+        )
+
+        datos = self.estadisticas(periodo="mes", desde=viejo.fecha.isoformat()).json()
+        self.assertEqual(sum(datos["reservados"]), 2)
+        self.assertEqual(datos["periodos"][0][8:], "01")
+
+    def test_estadisticas_leen_solo_resumenes(self):
+        """Test: La API consulta los resúmenes por índice y no la tabla de turnos"""
+        with CaptureQueriesContext(connection) as consultas:
+            response = self.estadisticas()
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse([q for q in consultas if '"turnos_turno"' in q["sql"]])
+        self.assertUsaIndice(
+            ResumenDiarioTurnos.objects.filter(
+                clinica=self.clinica, fecha__range=(self.ayer, self.ayer)
+            ),
+            "turnos_resumendiarioturnos",
+        )
+
+        self.client_http.login(username="cli_test", password="testpass123")
+        response = self.client_http.get(reverse("turnos:estadisticas_turnos"))
+        self.assertRedirects(
+            response, reverse("core:dashboard"), fetch_redirect_response=False
+        )
+
+
+class IndicesTurnoTest(PlanConsultaMixin, TestCase):
+    """Tests: las consultas frecuentes sobre Turno usan un índice (EXPLAIN)"""
+
+    def setUp(self):
+        self.hoy = timezone.localdate()
+
+    def test_turnos_libres_de_la_clinica(self):
+        """Test: TurnosDisponiblesListView"""
+        self.assertUsaIndice(
+            Turno.objects.filter(clinica_id=1, reservado=False, fecha__gte=self.hoy)
+            .order_by("fecha", "hora_inicio"),
+            "turnos_turno",
+            "turno_libres_clinica_idx",
+        )
+
+    def test_agenda_de_la_clinica(self):
+        """Test: AgendaClinicaView / TurnosClinicaJSONView"""
+        self.assertUsaIndice(
+            Turno.objects.filter(clinica_id=1, reservado=True, fecha__gte=self.hoy)
+            .order_by("fecha", "hora_inicio"),
+            "turnos_turno",
+            "turno_reservados_clinica_idx",
+        )
+
+    def test_agenda_del_veterinario(self):
+        """Test: AgendaVeterinarioView y turnos atendidos por estado"""
+        self.assertUsaIndice(
+            Turno.objects.filter(
+                veterinario_id=1, reservado=True, cliente__isnull=False, fecha__gte=self.hoy
+            ),
+            "turnos_turno",
+        )
+        self.assertUsaIndice(
+            Turno.objects.filter(veterinario_id=1, estado__codigo="completado")
+            .order_by("-fecha", "-hora_inicio"),
+            "turnos_turno",
+        )
+
+    def test_turnos_del_cliente(self):
+        """Test: MisTurnosListView"""
+        self.assertUsaIndice(
+            Turno.objects.filter(cliente_id=1).order_by("-fecha", "-hora_inicio"),
+            "turnos_turno",
+            "turno_cliente_fecha_idx",
+        )
+
+    def test_purga_de_libres_vencidos(self):
+        """Test: purgar_vencidos"""
+        self.assertUsaIndice(
+            Turno.objects.filter(reservado=False, fecha__lt=self.hoy).values_list(
+                "pk", flat=True
+            ),
+            "turnos_turno",
+            "turno_libres_fecha_idx",
+        )
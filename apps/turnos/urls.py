@@ -5,6 +5,10 @@ from .views import (
     DisponibilidadListView,
     DisponibilidadCreateView,
     DisponibilidadDeleteView,
+    ReglaDisponibilidadCreateView,
+    ReglaDisponibilidadDeleteView,
+    ExcepcionDisponibilidadCreateView,
+    ExcepcionDisponibilidadDeleteView,
     # Veterinario - Agenda
     AgendaVeterinarioView,
     TurnoDetalleVeterinarioView,
@@ -14,7 +18,12 @@ from .views import (
     TurnosJSONView,
     # Cliente
     TurnosDisponiblesListView,
+    DisponibilidadMesAPIView,
+    ProximosTurnosAPIView,
+    RetenerTurnoView,
     TurnoReservarView,
+    ListaEsperaView,
+    ListaEsperaCancelarView,
     MisTurnosListView,
     TurnoDetalleClienteView,
     TurnoCancelarClienteView,
@@ -23,7 +32,10 @@ from .views import (
     TurnoDetalleAdminView,
     TurnoCancelarAdminView,
     TurnoCrearAdminView,
+    ReservarSerieAPIView,
+    EstadisticasTurnosAPIView,
     TurnosClinicaJSONView,
+    ExportarTurnosView,
     # APIs
     BuscarClientesAPIView,
     MascotasPorClienteAPIView,
@@ -47,6 +59,27 @@ urlpatterns = [
         DisponibilidadDeleteView.as_view(),
         name="eliminar_disponibilidad",
     ),
+    # Reglas semanales y ausencias
+    path(
+        "disponibilidad/regla/crear/",
+        ReglaDisponibilidadCreateView.as_view(),
+        name="crear_regla",
+    ),
+    path(
+        "disponibilidad/regla/<int:pk>/eliminar/",
+        ReglaDisponibilidadDeleteView.as_view(),
+        name="eliminar_regla",
+    ),
+    path(
+        "disponibilidad/ausencia/crear/",
+        ExcepcionDisponibilidadCreateView.as_view(),
+        name="crear_excepcion",
+    ),
+    path(
+        "disponibilidad/ausencia/<int:pk>/eliminar/",
+        ExcepcionDisponibilidadDeleteView.as_view(),
+        name="eliminar_excepcion",
+    ),
     # Agenda
     path("agenda/", AgendaVeterinarioView.as_view(), name="agenda_vet"),
     path(
@@ -75,7 +108,24 @@ urlpatterns = [
     path(
         "disponibles/", TurnosDisponiblesListView.as_view(), name="turnos_disponibles"
     ),
+    path(
+        "api/disponibilidad-mes/",
+        DisponibilidadMesAPIView.as_view(),
+        name="disponibilidad_mes",
+    ),
+    path(
+        "api/proximos-libres/",
+        ProximosTurnosAPIView.as_view(),
+        name="proximos_libres",
+    ),
+    path("retener/<int:pk>/", RetenerTurnoView.as_view(), name="retener_turno"),
     path("reservar/<int:pk>/", TurnoReservarView.as_view(), name="reservar_turno"),
+    path("lista-espera/", ListaEsperaView.as_view(), name="lista_espera"),
+    path(
+        "lista-espera/<int:pk>/cancelar/",
+        ListaEsperaCancelarView.as_view(),
+        name="cancelar_espera",
+    ),
     path("mis-turnos/", MisTurnosListView.as_view(), name="mis_turnos"),
     path(
         "mis-turnos/<int:pk>/",
@@ -100,6 +150,15 @@ urlpatterns = [
         name="cancelar_turno_admin",
     ),
     path("admin/turno/crear/", TurnoCrearAdminView.as_view(), name="crear_turno_admin"),
+    path(
+        "admin/turnos/serie/", ReservarSerieAPIView.as_view(), name="reservar_serie"
+    ),
+    path(
+        "admin/estadisticas/",
+        EstadisticasTurnosAPIView.as_view(),
+        name="estadisticas_turnos",
+    ),
+    path("admin/exportar/", ExportarTurnosView.as_view(), name="exportar_turnos"),
     # JSON para calendario clínica
     path(
         "api/turnos-clinica-json/",
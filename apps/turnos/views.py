@@ -1,18 +1,70 @@
+import json
+
 from django.contrib import messages
 from django.utils import timezone
+from django.utils.dateparse import parse_date
 from django.urls import reverse_lazy, reverse
-from django.http import JsonResponse
-from django.db import transaction
-from datetime import datetime
-from django.db.models import Q
+from django.http import Http404, JsonResponse
+from django.db import IntegrityError, transaction
+from datetime import date, datetime, timedelta
+from itertools import chain
+from collections import defaultdict
+from django.db.models import Count, Q, prefetch_related_objects
 from django.shortcuts import get_object_or_404, redirect
 from django.views.generic import ListView, CreateView, DetailView, View, DeleteView
 from django.contrib.auth.mixins import LoginRequiredMixin, UserPassesTestMixin
 
+from apps.accounts.principal import tiene_rol
+
 from apps.accounts.models import CustomUser
 from apps.mascotas.models import Mascota
-from .forms import TurnoCrearAdminForm
-from .models import Turno, DisponibilidadVeterinario, EstadoTurno
+from apps.core.exportar import CHUNK_SIZE, ExportacionMixin
+from apps.core.idempotencia import IdempotenciaMixin, nueva_clave
+from apps.core.permisos import ObjetoPermisoMixin, RolAsyncMixin
+from .agenda import (
+    eliminar_libres,
+    fecha_horizonte,
+    horizonte_dias,
+    materializar,
+    regenerar_desde,
+)
+from .calendario import (
+    horarios_iso,
+    nombre_completo,
+    plantilla_url,
+    rango_fechas,
+    respuesta_eventos,
+)
+from .forms import (
+    TurnoCrearAdminForm,
+    ReglaDisponibilidadForm,
+    ExcepcionDisponibilidadForm,
+    EsperaTurnoForm,
+    SerieTurnosForm,
+)
+from .archivo import restar_meses
+from .estadisticas import PERIODOS, registrar, resumen
+from .lista_espera import cerrar_espera, ofrecer_turno
+from .models import (
+    Turno,
+    DisponibilidadVeterinario,
+    EstadoTurno,
+    ReglaDisponibilidad,
+    ExcepcionDisponibilidad,
+    TurnoArchivado,
+    EsperaTurno,
+    RetencionTurno,
+)
+from .retenciones import (
+    liberar,
+    retener,
+    retenido_por_otro,
+    segundos_retencion,
+    sin_retencion_ajena,
+    soltar,
+)
+from .notificaciones import encolar_reserva, encolar_cancelacion
+from .series import CONFLICTO, fechas_serie, reservar_serie
 
 
 # ==================== MIXINS PERSONALIZADOS ====================
@@ -22,10 +74,7 @@ class VeterinarioRequiredMixin(UserPassesTestMixin):
     """Mixin que verifica que el usuario sea veterinario"""
 
     def test_func(self):
-        return (
-            self.request.user.is_authenticated
-            and self.request.user.rol == "veterinario"
-        )
+        return tiene_rol(self.request, "veterinario")
 
     def handle_no_permission(self):
         messages.error(self.request, "No tienes permiso para acceder a esta página.")
@@ -36,10 +85,7 @@ class AdminVeterinariaRequiredMixin(UserPassesTestMixin):
     """Mixin que verifica que el usuario sea admin de veterinaria"""
 
     def test_func(self):
-        return (
-            self.request.user.is_authenticated
-            and self.request.user.rol == "admin_veterinaria"
-        )
+        return tiene_rol(self.request, "admin_veterinaria")
 
     def handle_no_permission(self):
         messages.error(self.request, "No tienes permiso para acceder a esta página.")
@@ -50,7 +96,7 @@ class ClienteRequiredMixin(UserPassesTestMixin):
     """Mixin que verifica que el usuario sea cliente"""
 
     def test_func(self):
-        return self.request.user.is_authenticated and self.request.user.rol == "cliente"
+        return tiene_rol(self.request, "cliente")
 
     def handle_no_permission(self):
         messages.error(self.request, "No tienes permiso para acceder a esta página.")
@@ -61,16 +107,37 @@ class VetOrAdminMixin(UserPassesTestMixin):
     """Mixin que permite acceso a veterinarios y admins"""
 
     def test_func(self):
-        return self.request.user.is_authenticated and self.request.user.rol in [
-            "veterinario",
-            "admin_veterinaria",
-        ]
+        return tiene_rol(self.request, "veterinario", "admin_veterinaria")
 
     def handle_no_permission(self):
         messages.error(self.request, "No tienes permiso para acceder a esta página.")
         return redirect("core:dashboard")
 
 
+class TurnoConArchivoMixin:
+    """DetailView de Turno que también encuentra turnos ya archivados"""
+
+    relaciones = (
+        "clinica",
+        "estado",
+        "cliente",
+        "veterinario__perfilveterinario",
+        "mascota__especie",
+        "mascota__raza",
+    )
+
+    def get_queryset(self):
+        return Turno.objects.select_related(*self.relaciones)
+
+    def get_object(self, queryset=None):
+        try:
+            return super().get_object(queryset)
+        except Http404:
+            return get_object_or_404(
+                TurnoArchivado.objects.select_related(*self.relaciones), pk=self.kwargs["pk"]
+            )
+
+
 # ==================== VETERINARIO - DISPONIBILIDAD ====================
 
 
@@ -112,6 +179,12 @@ class DisponibilidadListView(LoginRequiredMixin, VetOrAdminMixin, ListView):
         context = super().get_context_data(**kwargs)
         context["today"] = timezone.now().date()
         context["filtro_actual"] = self.request.GET.get("filtro", "futuras")
+        context["reglas"] = ReglaDisponibilidad.objects.filter(
+            veterinario=self.request.user
+        ).filter(Q(vigente_hasta__isnull=True) | Q(vigente_hasta__gte=context["today"]))
+        context["excepciones"] = ExcepcionDisponibilidad.objects.filter(
+            veterinario=self.request.user, fecha__gte=context["today"]
+        )
         return context
 
 
@@ -157,28 +230,32 @@ class DisponibilidadCreateView(
         form.instance.clinica = clinica
         response = super().form_valid(form)
 
-        # Generar turnos automáticamente
+        # Generar turnos hasta el horizonte; el resto lo agrega generar_agenda cada noche
         form.instance.generar_turnos_rango()
 
-        messages.success(
-            self.request, "Disponibilidad creada y turnos generados correctamente."
-        )
+        mensaje = "Disponibilidad creada y turnos generados correctamente."
+        if fecha_fin > fecha_horizonte():
+            mensaje += (
+                f" Por ahora se publican los próximos {horizonte_dias()} días; "
+                f"los siguientes se agregan automáticamente."
+            )
+        messages.success(self.request, mensaje)
         return response
 
 
-class DisponibilidadDeleteView(LoginRequiredMixin, DeleteView):
+class DisponibilidadDeleteView(LoginRequiredMixin, ObjetoPermisoMixin, DeleteView):
     """Eliminar disponibilidad (y sus turnos no reservados)"""
 
     model = DisponibilidadVeterinario
     template_name = "turnos/disponibilidad_confirm_delete.html"
     success_url = reverse_lazy("turnos:disponibilidades")
 
-    def test_func(self):
-        disp = self.get_object()
-        return self.request.user == disp.veterinario
+    def tiene_permiso(self, disp):
+        return disp.veterinario_id == self.request.user.pk
 
-    def delete(self, request, *args, **kwargs):
-        disp = self.get_object()
+    def form_valid(self, form):
+        request = self.request
+        disp = self.object
 
         # Validar fechas válidas
         if not disp.fecha_inicio or not disp.fecha_fin:
@@ -202,22 +279,130 @@ class DisponibilidadDeleteView(LoginRequiredMixin, DeleteView):
             )
             return redirect("turnos:disponibilidades")
 
-        # Eliminar los turnos disponibles (no reservados)
-        turnos_eliminados = Turno.objects.filter(
-            veterinario=disp.veterinario,
-            clinica=disp.clinica,
-            fecha__range=(disp.fecha_inicio, disp.fecha_fin),
-            hora_inicio__gte=disp.hora_inicio,
-            hora_inicio__lt=disp.hora_fin,
-            reservado=False,
-        ).delete()[0]
+        # Eliminar los turnos disponibles (no reservados) y el bloque
+        with transaction.atomic():
+            turnos_eliminados = eliminar_libres(
+                Turno.objects.filter(
+                    veterinario=disp.veterinario,
+                    clinica=disp.clinica,
+                    fecha__range=(disp.fecha_inicio, disp.fecha_fin),
+                    hora_inicio__gte=disp.hora_inicio,
+                    hora_inicio__lt=disp.hora_fin,
+                    reservado=False,
+                )
+            )
+            response = super().form_valid(form)
 
         messages.success(
             request,
             f"Disponibilidad eliminada. {turnos_eliminados} turno(s) disponible(s) eliminado(s).",
         )
+        return response
+
+
+# ==================== VETERINARIO - REGLAS RECURRENTES ====================
+
+
+class ReglaDisponibilidadCreateView(
+    LoginRequiredMixin, VeterinarioRequiredMixin, CreateView
+):
+    """Crear una franja semanal recurrente y generar sus turnos del horizonte"""
+
+    model = ReglaDisponibilidad
+    form_class = ReglaDisponibilidadForm
+    template_name = "turnos/regla_disponibilidad_form.html"
+    success_url = reverse_lazy("turnos:disponibilidades")
+
+    def form_valid(self, form):
+        user = self.request.user
+        clinica = user.clinica
+
+        inicio = form.cleaned_data["hora_inicio"]
+        fin = form.cleaned_data["hora_fin"]
+        if inicio < clinica.hora_apertura or fin > clinica.hora_cierre:
+            messages.error(
+                self.request,
+                f"El horario está fuera del horario de atención de la clínica "
+                f"({clinica.hora_apertura.strftime('%H:%M')} - {clinica.hora_cierre.strftime('%H:%M')}).",
+            )
+            return self.form_invalid(form)
+
+        form.instance.veterinario = user
+        form.instance.clinica = clinica
+        response = super().form_valid(form)
+
+        generados = materializar(fecha_horizonte(), veterinario=user)
+        messages.success(
+            self.request,
+            f"Regla creada. {generados} turno(s) generado(s) para los próximos "
+            f"{horizonte_dias()} días; el resto se genera automáticamente.",
+        )
+        return response
+
+
+class ReglaDisponibilidadDeleteView(LoginRequiredMixin, VeterinarioRequiredMixin, View):
+    """Eliminar una regla y sus turnos libres futuros (los reservados se mantienen)"""
+
+    def post(self, request, pk):
+        regla = get_object_or_404(ReglaDisponibilidad, pk=pk, veterinario=request.user)
+        with transaction.atomic():
+            eliminados = eliminar_libres(regla.turnos_libres_futuros())
+            regla.delete()
+        messages.success(
+            request,
+            f"Regla eliminada. {eliminados} turno(s) disponible(s) eliminado(s).",
+        )
+        return redirect("turnos:disponibilidades")
+
+
+class ExcepcionDisponibilidadCreateView(
+    LoginRequiredMixin, VeterinarioRequiredMixin, CreateView
+):
+    """Registrar una ausencia: se quitan los turnos libres que caen en ella"""
+
+    model = ExcepcionDisponibilidad
+    form_class = ExcepcionDisponibilidadForm
+    template_name = "turnos/excepcion_disponibilidad_form.html"
+    success_url = reverse_lazy("turnos:disponibilidades")
+
+    def form_valid(self, form):
+        form.instance.veterinario = self.request.user
+        response = super().form_valid(form)
+
+        reservados = Turno.objects.filter(
+            veterinario=self.request.user, fecha=self.object.fecha, reservado=True
+        )
+        if not self.object.todo_el_dia:
+            reservados = reservados.filter(
+                hora_inicio__lt=self.object.hora_fin,
+                hora_fin__gt=self.object.hora_inicio,
+            )
+        cantidad = reservados.count()
+        if cantidad:
+            messages.warning(
+                self.request,
+                f"Ausencia registrada. Hay {cantidad} turno(s) ya reservado(s) en ese "
+                f"horario que siguen vigentes.",
+            )
+        else:
+            messages.success(self.request, "Ausencia registrada.")
+        return response
+
+
+class ExcepcionDisponibilidadDeleteView(
+    LoginRequiredMixin, VeterinarioRequiredMixin, View
+):
+    """Quitar una ausencia y volver a generar los turnos de ese día"""
 
-        return super().delete(request, *args, **kwargs)
+    def post(self, request, pk):
+        excepcion = get_object_or_404(
+            ExcepcionDisponibilidad, pk=pk, veterinario=request.user
+        )
+        with transaction.atomic():
+            excepcion.delete()
+            regenerar_desde(request.user, excepcion.fecha)
+        messages.success(request, "Ausencia eliminada.")
+        return redirect("turnos:disponibilidades")
 
 
 # ==================== VETERINARIO - AGENDA ====================
@@ -254,16 +439,17 @@ class AgendaVeterinarioView(LoginRequiredMixin, VeterinarioRequiredMixin, ListVi
         return context
 
 
-class TurnoDetalleVeterinarioView(LoginRequiredMixin, DetailView):
+class TurnoDetalleVeterinarioView(
+    LoginRequiredMixin, ObjetoPermisoMixin, TurnoConArchivoMixin, DetailView
+):
     """Ver detalle de un turno (veterinario)"""
 
     model = Turno
     template_name = "turnos/turno_detalle_veterinario.html"
     context_object_name = "turno"
 
-    def test_func(self):
-        turno = self.get_object()
-        return self.request.user == turno.veterinario
+    def tiene_permiso(self, turno):
+        return turno.veterinario_id == self.request.user.pk
 
 
 # ==================== VETERINARIO - ACCIONES DE TURNO ====================
@@ -314,7 +500,9 @@ class TurnoIniciarAtencionView(BaseTurnoAccionView):
         if turno.estado.codigo == EstadoTurno.CONFIRMADO:
             estado_en_curso = EstadoTurno.objects.get(codigo=EstadoTurno.EN_CURSO)
             turno.estado = estado_en_curso
-            turno.save()
+            with transaction.atomic():
+                turno.save()
+                registrar(turno)
 
         url_historia = reverse(
             "historias:crear_historia", kwargs={"mascota_id": turno.mascota.id}
@@ -335,7 +523,9 @@ class TurnoCompletarView(BaseTurnoAccionView):
 
         estado_completado = EstadoTurno.objects.get(codigo=EstadoTurno.COMPLETADO)
         turno.estado = estado_completado
-        turno.save()
+        with transaction.atomic():
+            turno.save()
+            registrar(turno)
 
         messages.success(
             request, f"Turno de {turno.mascota.nombre} marcado como completado."
@@ -357,7 +547,9 @@ class TurnoNoAsistioView(BaseTurnoAccionView):
 
         estado_no_asistio = EstadoTurno.objects.get(codigo=EstadoTurno.NO_ASISTIO)
         turno.estado = estado_no_asistio
-        turno.save()
+        with transaction.atomic():
+            turno.save()
+            registrar(turno)
 
         messages.warning(
             request, f"Turno de {turno.mascota.nombre} marcado como 'No asistió'."
@@ -365,44 +557,58 @@ class TurnoNoAsistioView(BaseTurnoAccionView):
         return redirect("turnos:agenda_vet")
 
 
-class TurnosJSONView(LoginRequiredMixin, VeterinarioRequiredMixin, View):
+class TurnosJSONView(RolAsyncMixin, View):
     """Endpoint JSON para calendario del veterinario"""
 
-    def get(self, request, *args, **kwargs):
+    roles = ("veterinario",)
+
+    async def get(self, request, *args, **kwargs):
         # Filtrar solo turnos reservados
-        turnos = Turno.objects.filter(
-            veterinario=request.user,
+        filas = Turno.objects.filter(
+            veterinario_id=request.principal.user_id,
             reservado=True,
             cliente__isnull=False,
-        ).select_related("estado", "mascota", "cliente")
+            **rango_fechas(request),
+        ).values(
+            "id",
+            "fecha",
+            "hora_inicio",
+            "hora_fin",
+            "reservado",
+            "estado__color",
+            "estado__nombre",
+            "mascota__nombre",
+            "cliente__first_name",
+            "cliente__last_name",
+        )
 
+        iso = horarios_iso()
         eventos = []
-        for turno in turnos:
-            start = timezone.datetime.combine(turno.fecha, turno.hora_inicio)
-            end = timezone.datetime.combine(turno.fecha, turno.hora_fin)
-            titulo = f"{turno.mascota.nombre} - {turno.cliente.get_full_name()}"
-
+        async for fila in filas.aiterator(chunk_size=CHUNK_SIZE):
+            mascota = fila["mascota__nombre"] or ""
+            cliente = nombre_completo(
+                fila["cliente__first_name"], fila["cliente__last_name"]
+            )
             eventos.append(
-                {
-                    "id": turno.id,
-                    "title": titulo,
-                    "start": start.isoformat(),
-                    "end": end.isoformat(),
-                    "color": turno.estado.color if turno.estado else "#6c757d",
-                    # ⬇️ AGREGA ESTA LÍNEA ⬇️
-                    "url": reverse("turnos:turno_detalle_vet", kwargs={"pk": turno.pk}),
-                    "extendedProps": {
-                        "estado": turno.estado.nombre if turno.estado else "Sin estado",
-                        "reservado": turno.reservado,
-                        "mascota": turno.mascota.nombre if turno.mascota else "",
-                        "cliente": (
-                            turno.cliente.get_full_name() if turno.cliente else ""
-                        ),
-                    },
-                }
+                (
+                    fila["id"],
+                    f"{mascota} - {cliente}",
+                    iso(fila["fecha"], fila["hora_inicio"]),
+                    iso(fila["fecha"], fila["hora_fin"]),
+                    fila["estado__color"] or "#6c757d",
+                    fila["estado__nombre"] or "Sin estado",
+                    fila["reservado"],
+                    mascota,
+                    cliente,
+                )
             )
 
-        return JsonResponse(eventos, safe=False)
+        return respuesta_eventos(
+            eventos,
+            ("estado", "reservado", "mascota", "cliente"),
+            request.GET.get("formato"),
+            url=plantilla_url("turnos:turno_detalle_vet"),
+        )
 
 
 # ==================== CLIENTE - TURNOS DISPONIBLES ====================
@@ -419,13 +625,15 @@ class TurnosDisponiblesListView(LoginRequiredMixin, ClienteRequiredMixin, ListVi
     def get_queryset(self):
         queryset = (
             Turno.objects.filter(
-                clinica=self.request.user.clinica,
+                clinica_id=self.request.principal.clinica_id,
                 reservado=False,
                 fecha__gte=timezone.now().date(),
             )
             .select_related("veterinario", "estado")
             .order_by("fecha", "hora_inicio")
         )
+        # Los turnos que otro cliente está reservando no se muestran
+        queryset = sin_retencion_ajena(queryset, self.request.user)
 
         # Filtro por veterinario
         veterinario_id = self.request.GET.get("veterinario")
@@ -444,7 +652,9 @@ class TurnosDisponiblesListView(LoginRequiredMixin, ClienteRequiredMixin, ListVi
 
         # Veterinarios activos en la clínica
         context["veterinarios"] = CustomUser.objects.filter(
-            rol="veterinario", clinica=self.request.user.clinica, is_active=True
+            rol="veterinario",
+            clinica_id=self.request.principal.clinica_id,
+            is_active=True,
         )
 
         # Mascotas activas del cliente
@@ -454,7 +664,7 @@ class TurnosDisponiblesListView(LoginRequiredMixin, ClienteRequiredMixin, ListVi
 
         # Fechas con turnos disponibles
         fechas_queryset = Turno.objects.filter(
-            clinica=self.request.user.clinica,
+            clinica_id=self.request.principal.clinica_id,
             reservado=False,
             fecha__gte=timezone.now().date(),
         )
@@ -468,13 +678,171 @@ class TurnosDisponiblesListView(LoginRequiredMixin, ClienteRequiredMixin, ListVi
         context["fechas_disponibles"] = (
             fechas_queryset.values_list("fecha", flat=True).distinct().order_by("fecha")
         )
+        context["clave_idempotencia"] = nueva_clave()
 
         return context
 
 
-class TurnoReservarView(LoginRequiredMixin, ClienteRequiredMixin, View):
+class DisponibilidadMesAPIView(RolAsyncMixin, View):
+    """Turnos libres por día y por veterinario de un mes (mapa de calor)"""
+
+    roles = ("cliente",)
+
+    async def get(self, request):
+        ahora = timezone.localtime()
+        hoy = ahora.date()
+        try:
+            anio, mes = map(int, request.GET.get("mes", "").split("-"))
+            inicio = date(anio, mes, 1)
+        except ValueError:
+            inicio = hoy.replace(day=1)
+        fin = (inicio + timedelta(days=32)).replace(day=1)
+
+        libres = Turno.objects.filter(
+            clinica_id=request.principal.clinica_id,
+            reservado=False,
+            fecha__gte=max(inicio, hoy),
+            fecha__lt=fin,
+        ).exclude(fecha=hoy, hora_inicio__lt=ahora.time())
+        libres = sin_retencion_ajena(libres, request.principal.user_id)
+
+        veterinario_id = request.GET.get("veterinario", "")
+        if veterinario_id.isdigit():
+            libres = libres.filter(veterinario_id=veterinario_id)
+
+        # Una sola consulta agrupada por día y veterinario
+        dias = {}
+        async for fila in (
+            libres.order_by()
+            .values("fecha", "veterinario_id")
+            .annotate(libres=Count("id"))
+        ):
+            dia = dias.setdefault(
+                fila["fecha"].isoformat(), {"libres": 0, "veterinarios": {}}
+            )
+            dia["libres"] += fila["libres"]
+            dia["veterinarios"][fila["veterinario_id"]] = fila["libres"]
+
+        return JsonResponse({"mes": inicio.strftime("%Y-%m"), "dias": dias})
+
+
+class ProximosTurnosAPIView(RolAsyncMixin, View):
+    """Próximos N turnos libres de un veterinario o de cualquiera de la clínica"""
+
+    roles = ("cliente",)
+    maximo = 20
+
+    async def get(self, request):
+        try:
+            n = max(1, min(int(request.GET.get("n", 5)), self.maximo))
+        except ValueError:
+            n = 5
+        ahora = timezone.localtime()
+
+        libres = (
+            Turno.objects.filter(
+                clinica_id=request.principal.clinica_id, reservado=False
+            )
+            .order_by("fecha", "hora_inicio")
+            .values(
+                "id",
+                "fecha",
+                "hora_inicio",
+                "duracion_minutos",
+                "veterinario_id",
+                "veterinario__first_name",
+                "veterinario__last_name",
+            )
+        )
+        veterinario_id = request.GET.get("veterinario", "")
+        if veterinario_id.isdigit():
+            libres = libres.filter(veterinario_id=veterinario_id)
+        libres = sin_retencion_ajena(libres, request.principal.user_id)
+
+        # Dos búsquedas por rango en el índice, en orden: lo que queda de hoy
+        # y después los días siguientes. Se cortan apenas hay N turnos.
+        turnos = [
+            fila
+            async for fila in libres.filter(
+                fecha=ahora.date(), hora_inicio__gte=ahora.time()
+            )[:n]
+        ]
+        if len(turnos) < n:
+            turnos += [
+                fila
+                async for fila in libres.filter(fecha__gt=ahora.date())[
+                    : n - len(turnos)
+                ]
+            ]
+
+        url = reverse("turnos:turnos_disponibles")
+        return JsonResponse(
+            {
+                "turnos": [
+                    {
+                        "id": fila["id"],
+                        "fecha": fila["fecha"].isoformat(),
+                        "hora": fila["hora_inicio"].strftime("%H:%M"),
+                        "duracion": fila["duracion_minutos"],
+                        "veterinario_id": fila["veterinario_id"],
+                        "veterinario": nombre_completo(
+                            fila["veterinario__first_name"],
+                            fila["veterinario__last_name"],
+                        ),
+                        "url": f"{url}?veterinario={fila['veterinario_id']}"
+                        f"&fecha={fila['fecha'].isoformat()}",
+                    }
+                    for fila in turnos
+                ]
+            }
+        )
+
+
+class RetenerTurnoView(LoginRequiredMixin, ClienteRequiredMixin, View):
+    """
+    Retiene un turno libre (RETENCION_TURNO_SEGUNDOS) mientras el cliente
+    confirma la reserva; DELETE lo suelta al cerrar la confirmación.
+    """
+
+    def post(self, request, pk):
+        ocupado = JsonResponse(
+            {"retenido": False, "error": "Otro cliente está reservando este turno."},
+            status=409,
+        )
+        if retenido_por_otro(pk, request.user.pk):
+            return ocupado
+
+        if not Turno.objects.filter(
+            pk=pk, clinica_id=request.principal.clinica_id, reservado=False
+        ).exists():
+            return JsonResponse(
+                {"retenido": False, "error": "El turno ya no está disponible."},
+                status=404,
+            )
+
+        vence = retener(pk, request.user.pk)
+        if vence is None:
+            return ocupado
+        return JsonResponse(
+            {
+                "retenido": True,
+                "vence": vence.isoformat(),
+                "segundos": segundos_retencion(),
+            }
+        )
+
+    def delete(self, request, pk):
+        soltar(pk, request.user.pk)
+        return JsonResponse({"retenido": False})
+
+
+class TurnoReservarView(
+    LoginRequiredMixin, ClienteRequiredMixin, IdempotenciaMixin, View
+):
     """Reservar turno - Confirmación AUTOMÁTICA"""
 
+    url_en_curso = "turnos:mis_turnos"
+
     def post(self, request, pk):
         mascota_id = request.POST.get("mascota")
         motivo = request.POST.get("motivo", "")
@@ -483,15 +851,25 @@ class TurnoReservarView(LoginRequiredMixin, ClienteRequiredMixin, View):
             Mascota, id=mascota_id, dueno=request.user, activo=True
         )
 
+        # Otro cliente lo tiene retenido: se responde sin intentar escribir
+        if retenido_por_otro(pk, request.user.pk):
+            messages.error(request, "Otro cliente está reservando este turno.")
+            return redirect("turnos:turnos_disponibles")
+
         try:
             with transaction.atomic():
                 turno = Turno.objects.select_for_update().get(pk=pk, reservado=False)
                 turno.reservar(request.user, mascota)
+                cerrar_espera(turno, request.user)
+                liberar(turno.pk)
 
                 if motivo:
                     turno.motivo = motivo
                     turno.save()
 
+                # El email sale del outbox; la reserva no espera al servidor de correo
+                encolar_reserva(turno)
+
             messages.success(
                 request,
                 f"✅ Turno reservado exitosamente para {mascota.nombre} el "
@@ -507,6 +885,64 @@ class TurnoReservarView(LoginRequiredMixin, ClienteRequiredMixin, View):
         return redirect("turnos:mis_turnos")
 
 
+# ==================== CLIENTE - LISTA DE ESPERA ====================
+
+
+class ListaEsperaView(LoginRequiredMixin, ClienteRequiredMixin, CreateView):
+    """Anotarse en la lista de espera y ver las esperas activas"""
+
+    model = EsperaTurno
+    form_class = EsperaTurnoForm
+    template_name = "turnos/lista_espera.html"
+    success_url = reverse_lazy("turnos:lista_espera")
+
+    def get_form_kwargs(self):
+        kwargs = super().get_form_kwargs()
+        kwargs["clinica_id"] = self.request.principal.clinica_id
+        return kwargs
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        context["esperas"] = (
+            EsperaTurno.objects.filter(cliente=self.request.user, activa=True)
+            .select_related("veterinario", "turno_ofrecido__veterinario")
+            .order_by("fecha_desde")
+        )
+        return context
+
+    def form_valid(self, form):
+        form.instance.cliente = self.request.user
+        form.instance.clinica_id = self.request.principal.clinica_id
+        messages.success(
+            self.request, "Te avisaremos por email si se libera un turno."
+        )
+        return super().form_valid(form)
+
+
+class ListaEsperaCancelarView(LoginRequiredMixin, ClienteRequiredMixin, View):
+    """Salir de la lista de espera (libera el turno ofrecido, si lo hay)"""
+
+    def post(self, request, pk):
+        espera = get_object_or_404(
+            EsperaTurno, pk=pk, cliente=request.user, activa=True
+        )
+        with transaction.atomic():
+            espera.activa = False
+            espera.save(update_fields=["activa"])
+            if espera.turno_ofrecido_id:
+                if RetencionTurno.objects.filter(
+                    turno_id=espera.turno_ofrecido_id, cliente=request.user
+                ).exists():
+                    liberar(espera.turno_ofrecido_id)
+                turno = Turno.objects.filter(
+                    pk=espera.turno_ofrecido_id, reservado=False
+                ).first()
+                if turno:
+                    ofrecer_turno(turno)
+        messages.success(request, "Saliste de la lista de espera.")
+        return redirect("turnos:lista_espera")
+
+
 # ==================== CLIENTE - MIS TURNOS ====================
 
 
@@ -528,37 +964,48 @@ class MisTurnosListView(LoginRequiredMixin, ClienteRequiredMixin, ListView):
         context = super().get_context_data(**kwargs)
         context["today"] = timezone.now().date()
 
-        # Separar próximos y pasados
+        # Separar próximos y pasados (estos incluyen los turnos archivados)
         context["turnos_proximos"] = self.get_queryset().filter(
             fecha__gte=timezone.now().date()
         )
-        context["turnos_pasados"] = self.get_queryset().filter(
-            fecha__lt=timezone.now().date()
+        pasados = list(
+            Turno.historial.filtrar(
+                cliente=self.request.user, fecha__lt=timezone.now().date()
+            ).order_by("-fecha", "-hora_inicio")
         )
+        prefetch_related_objects(pasados, "veterinario", "estado", "mascota")
+        context["turnos_pasados"] = pasados
+        context["clave_idempotencia"] = nueva_clave()
 
         return context
 
 
-class TurnoDetalleClienteView(LoginRequiredMixin, DetailView):
+class TurnoDetalleClienteView(
+    LoginRequiredMixin, ObjetoPermisoMixin, TurnoConArchivoMixin, DetailView
+):
     """Ver detalle de un turno (cliente)"""
 
     model = Turno
     template_name = "turnos/turno_detalle_cliente.html"
     context_object_name = "turno"
 
-    def test_func(self):
-        turno = self.get_object()
-        return self.request.user == turno.cliente
+    def tiene_permiso(self, turno):
+        return turno.cliente_id == self.request.user.pk
 
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
         context["today"] = timezone.now().date()
+        context["clave_idempotencia"] = nueva_clave()
         return context
 
 
-class TurnoCancelarClienteView(LoginRequiredMixin, ClienteRequiredMixin, View):
+class TurnoCancelarClienteView(
+    LoginRequiredMixin, ClienteRequiredMixin, IdempotenciaMixin, View
+):
     """Cancelar turno por cliente"""
 
+    url_en_curso = "turnos:mis_turnos"
+
     def post(self, request, pk):
         turno = get_object_or_404(Turno, pk=pk, cliente=request.user)
 
@@ -583,7 +1030,12 @@ class TurnoCancelarClienteView(LoginRequiredMixin, ClienteRequiredMixin, View):
             messages.error(request, "No puedes cancelar un turno completado.")
             return redirect("turnos:mis_turnos")
 
-        turno.cancelar()
+        with transaction.atomic():
+            cliente, mascota = turno.cliente, turno.mascota
+            turno.cancelar()
+            encolar_cancelacion(turno, cliente, mascota)
+            # El turno liberado se ofrece a la lista de espera
+            ofrecer_turno(turno)
         messages.success(request, "Turno cancelado exitosamente.")
 
         return redirect("turnos:mis_turnos")
@@ -602,7 +1054,7 @@ class AgendaClinicaView(LoginRequiredMixin, AdminVeterinariaRequiredMixin, ListV
     def get_queryset(self):
         return (
             Turno.objects.filter(
-                clinica=self.request.user.clinica,
+                clinica_id=self.request.principal.clinica_id,
                 reservado=True,
                 fecha__gte=timezone.now().date(),
             )
@@ -614,40 +1066,48 @@ class AgendaClinicaView(LoginRequiredMixin, AdminVeterinariaRequiredMixin, ListV
         context = super().get_context_data(**kwargs)
         context["estados"] = EstadoTurno.objects.filter(activo=True)
         context["veterinarios"] = CustomUser.objects.filter(
-            rol="veterinario", clinica=self.request.user.clinica, is_active=True
+            rol="veterinario",
+            clinica_id=self.request.principal.clinica_id,
+            is_active=True,
         )
         return context
 
 
-class TurnoDetalleAdminView(LoginRequiredMixin, DetailView):
+class TurnoDetalleAdminView(
+    LoginRequiredMixin, ObjetoPermisoMixin, TurnoConArchivoMixin, DetailView
+):
     """Ver detalle de un turno (admin)"""
 
     model = Turno
     template_name = "turnos/turno_detalle_admin.html"
     context_object_name = "turno"
 
-    def test_func(self):
-        turno = self.get_object()
-        return self.request.user.clinica == turno.clinica
+    def tiene_permiso(self, turno):
+        return turno.clinica_id == self.request.user.clinica_id
 
 
 class TurnoCancelarAdminView(LoginRequiredMixin, AdminVeterinariaRequiredMixin, View):
     """Cancelar cualquier turno (admin)"""
 
     def post(self, request, pk):
-        turno = get_object_or_404(Turno, pk=pk, clinica=request.user.clinica)
+        turno = get_object_or_404(Turno, pk=pk, clinica_id=request.principal.clinica_id)
         motivo = request.POST.get("motivo", "Cancelado por administración")
 
         if turno.reservado:
             estado_cancelado = EstadoTurno.objects.get(codigo=EstadoTurno.CANCELADO)
             turno.estado = estado_cancelado
             turno.motivo_cancelacion = motivo
-            turno.save()
+            with transaction.atomic():
+                turno.save()
+                registrar(turno)
+                encolar_cancelacion(turno, turno.cliente, turno.mascota)
             messages.success(
                 request, f"Turno de {turno.cliente.get_full_name()} cancelado."
             )
         else:
-            turno.delete()
+            with transaction.atomic():
+                turno.delete()
+                registrar(turno)
             messages.success(request, "Turno disponible eliminado.")
 
         return redirect("turnos:agenda_clinica")
@@ -675,7 +1135,9 @@ class TurnoCrearAdminView(
 
         try:
             cliente = CustomUser.objects.get(
-                id=cliente_id, rol="cliente", clinica=self.request.user.clinica
+                id=cliente_id,
+                rol="cliente",
+                clinica_id=self.request.principal.clinica_id,
             )
             mascota = Mascota.objects.get(id=mascota_id, dueno=cliente, activo=True)
         except (CustomUser.DoesNotExist, Mascota.DoesNotExist):
@@ -683,12 +1145,13 @@ class TurnoCrearAdminView(
             return self.form_invalid(form)
 
         # Configurar el turno
-        form.instance.clinica = self.request.user.clinica
+        form.instance.clinica_id = self.request.principal.clinica_id
         form.instance.creado_por = self.request.user
         form.instance.cliente = cliente
         form.instance.mascota = mascota
         form.instance.reservado = True
         form.instance.estado = EstadoTurno.objects.get(codigo=EstadoTurno.CONFIRMADO)
+        form.instance.fecha_reserva = timezone.now()
 
         # Validar solapamiento
         inicio = form.instance.hora_inicio
@@ -715,20 +1178,213 @@ class TurnoCrearAdminView(
             f"Turno creado para {cliente.get_full_name()} - {mascota.nombre} el "
             f"{form.instance.fecha.strftime('%d/%m/%Y')} a las {inicio.strftime('%H:%M')}",
         )
-        return super().form_valid(form)
+        with transaction.atomic():
+            response = super().form_valid(form)
+            registrar(self.object)
+            encolar_reserva(self.object)
+        return response
+
+
+class ReservarSerieAPIView(LoginRequiredMixin, AdminVeterinariaRequiredMixin, View):
+    """
+    Reserva una serie de turnos (tratamientos recurrentes). Recibe los campos
+    de SerieTurnosForm como formulario o como JSON y responde, fecha por
+    fecha, si el turno se creó, se reservó o quedó en conflicto.
+    """
+
+    def post(self, request):
+        if request.content_type == "application/json":
+            try:
+                datos = json.loads(request.body)
+            except ValueError:
+                return JsonResponse({"errores": {"__all__": ["JSON inválido."]}}, status=400)
+        else:
+            datos = request.POST
+        form = SerieTurnosForm(datos, clinica_id=request.principal.clinica_id)
+        if not form.is_valid():
+            return JsonResponse({"errores": form.errors}, status=400)
+
+        datos = form.cleaned_data
+        cliente = CustomUser.objects.filter(
+            id=datos["cliente_id"],
+            rol="cliente",
+            clinica_id=request.principal.clinica_id,
+        ).first()
+        mascota = (
+            Mascota.objects.filter(
+                id=datos["mascota_id"], dueno=cliente, activo=True
+            ).first()
+            if cliente
+            else None
+        )
+        if mascota is None:
+            return JsonResponse(
+                {"errores": {"__all__": ["Cliente o mascota no válidos"]}}, status=400
+            )
+
+        try:
+            informe = reservar_serie(
+                clinica_id=request.principal.clinica_id,
+                veterinario_id=datos["veterinario"].pk,
+                cliente=cliente,
+                mascota=mascota,
+                fechas=fechas_serie(
+                    datos["fecha_inicio"],
+                    datos["frecuencia"],
+                    datos["intervalo"],
+                    datos["repeticiones"],
+                ),
+                hora_inicio=datos["hora_inicio"],
+                duracion_minutos=datos["duracion_minutos"],
+                motivo=datos["motivo"],
+                creado_por=request.user,
+                todo_o_nada=datos["todo_o_nada"],
+            )
+        except ValueError as e:
+            return JsonResponse({"errores": {"__all__": [str(e)]}}, status=400)
+        except IntegrityError:
+            return JsonResponse(
+                {
+                    "errores": {
+                        "__all__": [
+                            "Otro turno se creó en el mismo horario. Volvé a intentarlo."
+                        ]
+                    }
+                },
+                status=409,
+            )
+
+        conflictos = sum(1 for item in informe if item["resultado"] == CONFLICTO)
+        guardado = not (conflictos and datos["todo_o_nada"])
+        for item in informe:
+            item["fecha"] = item["fecha"].isoformat()
+        return JsonResponse(
+            {
+                "guardado": guardado,
+                "reservados": len(informe) - conflictos if guardado else 0,
+                "conflictos": conflictos,
+                "fechas": informe,
+            },
+            status=200 if guardado else 409,
+        )
+
+
+class EstadisticasTurnosAPIView(
+    LoginRequiredMixin, AdminVeterinariaRequiredMixin, View
+):
+    """
+    Ocupación, ausentismo y anticipación de las reservas por día, semana o
+    mes, para los gráficos (parámetros: periodo, desde, hasta, veterinario).
+    Lee solo los resúmenes diarios, no la tabla de turnos.
+    """
+
+    def get(self, request):
+        periodo = request.GET.get("periodo", "semana")
+        if periodo not in PERIODOS:
+            periodo = "semana"
+
+        hasta = parse_date(request.GET.get("hasta", "")) or timezone.localdate()
+        desde = parse_date(request.GET.get("desde", ""))
+        if desde is None:
+            if periodo == "dia":
+                desde = hasta - timedelta(days=30)
+            elif periodo == "semana":
+                desde = hasta - timedelta(weeks=11)
+            else:
+                desde = restar_meses(hasta, 11)
+        # Que el primer período no quede cortado
+        if periodo == "semana":
+            desde -= timedelta(days=desde.weekday())
+        elif periodo == "mes":
+            desde = desde.replace(day=1)
+
+        veterinario_id = request.GET.get("veterinario", "")
+        datos = resumen(
+            request.principal.clinica_id,
+            desde,
+            hasta,
+            periodo,
+            veterinario_id=int(veterinario_id) if veterinario_id.isdigit() else None,
+        )
+        return JsonResponse(datos)
+
+
+class ExportarTurnosView(
+    LoginRequiredMixin, AdminVeterinariaRequiredMixin, ExportacionMixin, View
+):
+    """Exporta los turnos de la clínica (filtros: desde, hasta, veterinario, estado)"""
+
+    nombre_archivo = "turnos"
+    columnas = [
+        ("Fecha", "fecha"),
+        ("Hora inicio", "hora_inicio"),
+        ("Hora fin", "hora_fin"),
+        ("Veterinario - Nombre", "veterinario__first_name"),
+        ("Veterinario - Apellido", "veterinario__last_name"),
+        ("Estado", "estado__nombre"),
+        ("Reservado", "reservado"),
+        ("Tipo de consulta", "tipo_consulta"),
+        ("Cliente - Nombre", "cliente__first_name"),
+        ("Cliente - Apellido", "cliente__last_name"),
+        ("Cliente - Email", "cliente__email"),
+        ("Mascota", "mascota__nombre"),
+        ("Motivo", "motivo"),
+    ]
+
+    def get_queryset_exportacion(self, modelo=Turno):
+        queryset = modelo.objects.filter(
+            clinica_id=self.request.principal.clinica_id
+        ).order_by(
+            "fecha", "hora_inicio"
+        )
+        queryset = self.filtrar_periodo(queryset, "fecha")
+
+        estado = self.request.GET.get("estado")
+        if estado:
+            queryset = queryset.filter(estado__codigo=estado)
+        return queryset
+
+    def get_filas(self):
+        # Los archivados son todos anteriores a los vigentes: se exportan primero
+        campos = [campo for _, campo in self.columnas]
+        archivados = (
+            self.get_queryset_exportacion(TurnoArchivado)
+            .values_list(*campos)
+            .iterator(chunk_size=CHUNK_SIZE)
+        )
+        return chain(archivados, super().get_filas())
 
 
-class TurnosClinicaJSONView(LoginRequiredMixin, AdminVeterinariaRequiredMixin, View):
+class TurnosClinicaJSONView(RolAsyncMixin, View):
     """Endpoint JSON para calendario de toda la clínica"""
 
-    def get(self, request, *args, **kwargs):
-        clinica = request.user.clinica
+    roles = ("admin_veterinaria",)
+
+    # Colores por veterinario
+    colores = [
+        "#87bef8",
+        "#28a745",
+        "#ffc107",
+        "#dc3545",
+        "#6f42c1",
+        "#20c997",
+        "#e83e8c",
+        "#539aa5",
+        "#6610f2",
+        "#fd7e14",
+    ]
+
+    async def get(self, request, *args, **kwargs):
+        clinica_id = request.principal.clinica_id
         veterinario_id = request.GET.get("veterinario")
         estado_codigo = request.GET.get("estado")
 
         # Base queryset
         turnos = Turno.objects.filter(
-            clinica=clinica, reservado=True, fecha__gte=timezone.now().date()
+            clinica_id=clinica_id,
+            reservado=True,
+            fecha__gte=timezone.now().date(),
+            **rango_fechas(request),
         )
 
         # Aplicar filtros
@@ -737,143 +1393,146 @@ class TurnosClinicaJSONView(LoginRequiredMixin, AdminVeterinariaRequiredMixin, V
         if estado_codigo:
             turnos = turnos.filter(estado__codigo=estado_codigo)
 
-        turnos = turnos.select_related("veterinario", "estado", "mascota", "cliente")
-
-        # Colores por veterinario
-        colores = [
-            "#87bef8",
-            "#28a745",
-            "#ffc107",
-            "#dc3545",
-            "#6f42c1",
-            "#20c997",
-            "#e83e8c",
-            "#539aa5",
-            "#6610f2",
-            "#fd7e14",
-        ]
+        filas = turnos.values(
+            "id",
+            "fecha",
+            "hora_inicio",
+            "hora_fin",
+            "reservado",
+            "veterinario_id",
+            "veterinario__first_name",
+            "veterinario__last_name",
+            "estado__nombre",
+            "cliente__first_name",
+            "cliente__last_name",
+            "mascota__nombre",
+        )
+
+        iso = horarios_iso(con_zona=True)
         colores_por_vet = {}
         eventos = []
 
-        for turno in turnos:
-            vet_id = turno.veterinario.id
+        async for fila in filas.aiterator(chunk_size=CHUNK_SIZE):
+            vet_id = fila["veterinario_id"]
             if vet_id not in colores_por_vet:
-                colores_por_vet[vet_id] = colores[len(colores_por_vet) % len(colores)]
-
-            start = timezone.make_aware(
-                timezone.datetime.combine(turno.fecha, turno.hora_inicio)
-            )
-            end = timezone.make_aware(
-                timezone.datetime.combine(turno.fecha, turno.hora_fin)
-            )
-
-            titulo = f"{turno.veterinario.get_full_name()} - {turno.mascota.nombre}"
+                colores_por_vet[vet_id] = (
+                    self.colores[len(colores_por_vet) % len(self.colores)],
+                    nombre_completo(
+                        fila["veterinario__first_name"], fila["veterinario__last_name"]
+                    ),
+                )
+            color, veterinario = colores_por_vet[vet_id]
+            mascota = fila["mascota__nombre"] or ""
 
             eventos.append(
-                {
-                    "id": turno.id,
-                    "title": titulo,
-                    "start": start.isoformat(),
-                    "end": end.isoformat(),
-                    "color": colores_por_vet[vet_id],
-                    "extendedProps": {
-                        "veterinario": turno.veterinario.get_full_name(),
-                        "estado": turno.estado.nombre if turno.estado else "",
-                        "cliente": turno.cliente.get_full_name(),
-                        "mascota": turno.mascota.nombre,
-                        "reservado": turno.reservado,
-                    },
-                }
+                (
+                    fila["id"],
+                    f"{veterinario} - {mascota}",
+                    iso(fila["fecha"], fila["hora_inicio"]),
+                    iso(fila["fecha"], fila["hora_fin"]),
+                    color,
+                    veterinario,
+                    fila["estado__nombre"] or "",
+                    nombre_completo(
+                        fila["cliente__first_name"], fila["cliente__last_name"]
+                    ),
+                    mascota,
+                    fila["reservado"],
+                )
             )
 
-        return JsonResponse(eventos, safe=False)
+        return respuesta_eventos(
+            eventos,
+            ("veterinario", "estado", "cliente", "mascota", "reservado"),
+            request.GET.get("formato"),
+        )
 
 
 # ==================== APIS PARA ADMIN ====================
 
 
-class BuscarClientesAPIView(LoginRequiredMixin, AdminVeterinariaRequiredMixin, View):
+def _mascota_json(mascota):
+    return {
+        "id": mascota.id,
+        "nombre": mascota.nombre,
+        "especie": str(mascota.especie) if mascota.especie else "Sin especie",
+        "raza": str(mascota.raza) if mascota.raza else "Sin raza",
+    }
+
+
+class BuscarClientesAPIView(RolAsyncMixin, View):
     """API para buscar clientes y obtener sus mascotas"""
 
-    def get(self, request):
+    roles = ("admin_veterinaria",)
+
+    async def get(self, request):
         query = request.GET.get("q", "").strip()
 
         if len(query) < 2:
             return JsonResponse({"clientes": []})
 
-        clientes = CustomUser.objects.filter(
-            Q(first_name__icontains=query)
-            | Q(last_name__icontains=query)
-            | Q(email__icontains=query)
-            | Q(username__icontains=query),
-            rol="cliente",
-            clinica=request.user.clinica,
-            is_active=True,
-        )[:10]
-
-        resultados = []
-        for cliente in clientes:
-            mascotas = Mascota.objects.filter(
-                dueno=cliente, activo=True
-            ).select_related("raza", "especie")
+        clientes = [
+            cliente
+            async for cliente in CustomUser.objects.filter(
+                Q(first_name__icontains=query)
+                | Q(last_name__icontains=query)
+                | Q(email__icontains=query)
+                | Q(username__icontains=query),
+                rol="cliente",
+                clinica_id=request.principal.clinica_id,
+                is_active=True,
+            )[:10]
+        ]
 
-            resultados.append(
-                {
-                    "id": cliente.id,
-                    "nombre_completo": cliente.get_full_name(),
-                    "email": cliente.email or "No registrado",
-                    "telefono": getattr(cliente, "telefono", "No registrado"),
-                    "mascotas": [
-                        {
-                            "id": m.id,
-                            "nombre": m.nombre,
-                            "especie": str(m.especie) if m.especie else "Sin especie",
-                            "raza": str(m.raza) if m.raza else "Sin raza",
-                        }
-                        for m in mascotas
-                    ],
-                }
-            )
+        # Las mascotas de los 10 clientes en una sola consulta
+        mascotas = defaultdict(list)
+        async for m in Mascota.objects.filter(
+            dueno__in=clientes, activo=True
+        ).select_related("raza__especie", "especie"):
+            mascotas[m.dueno_id].append(_mascota_json(m))
+
+        resultados = [
+            {
+                "id": cliente.id,
+                "nombre_completo": cliente.get_full_name(),
+                "email": cliente.email or "No registrado",
+                "telefono": getattr(cliente, "telefono", "No registrado"),
+                "mascotas": mascotas[cliente.id],
+            }
+            for cliente in clientes
+        ]
 
         return JsonResponse({"clientes": resultados})
 
 
-class MascotasPorClienteAPIView(
-    LoginRequiredMixin, AdminVeterinariaRequiredMixin, View
-):
+class MascotasPorClienteAPIView(RolAsyncMixin, View):
     """API para obtener mascotas de un cliente específico"""
 
-    def get(self, request, cliente_id):
-        try:
-            cliente = CustomUser.objects.get(
-                id=cliente_id, rol="cliente", clinica=request.user.clinica
-            )
-
-            mascotas = Mascota.objects.filter(
-                dueno=cliente, activo=True
-            ).select_related("raza", "especie")
+    roles = ("admin_veterinaria",)
 
-            return JsonResponse(
-                {
-                    "success": True,
-                    "cliente": {
-                        "id": cliente.id,
-                        "nombre_completo": cliente.get_full_name(),
-                        "email": cliente.email or "No registrado",
-                        "telefono": getattr(cliente, "telefono", "No registrado"),
-                    },
-                    "mascotas": [
-                        {
-                            "id": m.id,
-                            "nombre": m.nombre,
-                            "especie": str(m.especie) if m.especie else "Sin especie",
-                            "raza": str(m.raza) if m.raza else "Sin raza",
-                        }
-                        for m in mascotas
-                    ],
-                }
+    async def get(self, request, cliente_id):
+        try:
+            cliente = await CustomUser.objects.aget(
+                id=cliente_id, rol="cliente", clinica_id=request.principal.clinica_id
             )
         except CustomUser.DoesNotExist:
             return JsonResponse(
                 {"success": False, "error": "Cliente no encontrado"}, status=404
             )
+
+        mascotas = Mascota.objects.filter(dueno=cliente, activo=True).select_related(
+            "raza__especie", "especie"
+        )
+
+        return JsonResponse(
+            {
+                "success": True,
+                "cliente": {
+                    "id": cliente.id,
+                    "nombre_completo": cliente.get_full_name(),
+                    "email": cliente.email or "No registrado",
+                    "telefono": getattr(cliente, "telefono", "No registrado"),
+                },
+                "mascotas": [_mascota_json(m) async for m in mascotas],
+            }
+        )
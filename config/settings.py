@@ -10,6 +10,8 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/5.2/ref/settings/
 """
 
+import os
+from importlib.util import find_spec
 from pathlib import Path
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -59,6 +61,7 @@ MIDDLEWARE = [
     "django.middleware.common.CommonMiddleware",
     "django.middleware.csrf.CsrfViewMiddleware",
     "django.contrib.auth.middleware.AuthenticationMiddleware",
+    "apps.accounts.middleware.PrincipalMiddleware",
     "django.contrib.messages.middleware.MessageMiddleware",
     "django.middleware.clickjacking.XFrameOptionsMiddleware",
 ]
@@ -113,6 +116,35 @@ AUTH_PASSWORD_VALIDATORS = [
     },
 ]
 
+# Hashers de contraseñas. El primero se usa para las contraseñas nuevas; los
+# demás solo verifican hashes viejos, que se re-hashean solos en el próximo login.
+#   "seguro": Argon2 (si está instalado argon2-cffi) o scrypt
+#   "rapido": MD5, solo para tests (crear miles de usuarios sin pagar el costo)
+# Se elige con la variable de entorno HASHERS_PERFIL; config.settings_test
+# usa "rapido".
+HASHERS_PERFIL = os.environ.get("HASHERS_PERFIL", "seguro")
+PERFILES_HASHERS = {
+    "seguro": [
+        *(
+            ["django.contrib.auth.hashers.Argon2PasswordHasher"]
+            if find_spec("argon2")
+            else []
+        ),
+        "django.contrib.auth.hashers.ScryptPasswordHasher",
+        "django.contrib.auth.hashers.PBKDF2PasswordHasher",
+        "django.contrib.auth.hashers.PBKDF2SHA1PasswordHasher",
+    ],
+    "rapido": [
+        "django.contrib.auth.hashers.MD5PasswordHasher",
+        "django.contrib.auth.hashers.ScryptPasswordHasher",
+        "django.contrib.auth.hashers.PBKDF2PasswordHasher",
+    ],
+}
+PASSWORD_HASHERS = PERFILES_HASHERS[HASHERS_PERFIL]
+
+# El usuario de la sesión se carga con su clínica y perfiles (request.principal)
+AUTHENTICATION_BACKENDS = ["apps.accounts.backends.PrincipalBackend"]
+
 
 # Internationalization
 LANGUAGE_CODE = "es-ar"
@@ -131,6 +163,17 @@ STATIC_ROOT = BASE_DIR / "staticfiles"
 MEDIA_URL = "/media/"
 MEDIA_ROOT = BASE_DIR / "media"
 
+# Descarga de archivos adjuntos: None (Django transmite por bloques),
+# "x-accel-redirect" (nginx) o "x-sendfile" (apache / lighttpd)
+ARCHIVOS_OFFLOAD = None
+# Location "internal" de nginx que apunta a MEDIA_ROOT
+ARCHIVOS_PROTEGIDOS_PREFIJO = "/protected-media/"
+
+# Subidas por partes de archivos adjuntos
+SUBIDAS_TMP_DIR = BASE_DIR / "subidas_tmp"
+SUBIDAS_TAMANO_PARTE = 1024 * 1024  # 1 MB por parte
+SUBIDAS_TAMANO_MAXIMO = 500 * 1024 * 1024
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.2/ref/settings/#default-auto-field
 
@@ -143,3 +186,52 @@ LOGOUT_REDIRECT_URL = "accounts:login"
 
 # Email configuration (para desarrollo)
 EMAIL_BACKEND = "django.core.mail.backends.console.EmailBackend"
+
+# Backend usado por los envíos masivos (recordatorios); None usa EMAIL_BACKEND
+RECORDATORIOS_EMAIL_BACKEND = None
+
+# Outbox de emails (comando despachar_emails): límite de envíos por minuto, 0 = sin límite
+OUTBOX_MAX_POR_MINUTO = 0
+
+# Agenda (comando generar_agenda): días hacia adelante con turnos libres generados
+AGENDA_HORIZONTE_DIAS = 60
+
+# Archivo de turnos (comando archivar_turnos): meses que quedan en la tabla activa
+TURNOS_ARCHIVO_MESES = 12
+
+# Cache (retenciones de turnos, idempotencia y, si se habilitan, sesiones). Con varios procesos en producción tiene que ser un
+# backend común (Redis / Memcached) en lugar de locmem.
+CACHES = {
+    "default": {
+        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+        "LOCATION": "veterinaria",
+    }
+}
+
+# Perfil de sesiones:
+#   "db":        cada request autenticado lee django_session
+#   "cached_db": lee del cache y solo va a la base si no está (o al cambiar la sesión)
+#   "cache":     no usa la base; las sesiones se pierden si se reinicia el cache
+#   "firmada":   cookie firmada, sin estado en el servidor
+# "cached_db" y "cache" solo con un CACHES compartido: con locmem cada proceso
+# tiene su copia y un logout en uno no cierra la sesión en los demás.
+SESIONES_PERFIL = "db"
+SESSION_ENGINE = {
+    "db": "django.contrib.sessions.backends.db",
+    "cached_db": "django.contrib.sessions.backends.cached_db",
+    "cache": "django.contrib.sessions.backends.cache",
+    "firmada": "django.contrib.sessions.backends.signed_cookies",
+}[SESIONES_PERFIL]
+
+# Lista de espera: minutos que un turno liberado queda retenido para el cliente
+# al que se le ofrece (despachar_emails --lista-espera vence las ofertas)
+LISTA_ESPERA_OFERTA_MINUTOS = 30
+
+# Segundos (3 minutos) que un turno queda retenido mientras el cliente confirma
+# la reserva; cada cliente retiene un turno a la vez (comando
+# purgar_retenciones borra las vencidas)
+RETENCION_TURNO_SEGUNDOS = 180
+
+# Segundos que se recuerda el resultado de un POST con clave de idempotencia
+# (reservar / cancelar turno): los reintentos con la misma clave lo repiten
+IDEMPOTENCIA_SEGUNDOS = 900
@@ -0,0 +1,12 @@
+"""
+Settings para correr los tests:
+
+    python manage.py test --settings=config.settings_test
+"""
+
+from .settings import *  # noqa: F401,F403
+from .settings import PERFILES_HASHERS
+
+# Crear usuarios en los tests sin pagar el costo de Argon2 / scrypt
+HASHERS_PERFIL = "rapido"
+PASSWORD_HASHERS = PERFILES_HASHERS[HASHERS_PERFIL]
@@ -1,3 +1,25 @@
+// Expande la respuesta por columnas (?formato=columnas) a eventos de FullCalendar
+function expandirEventos(datos) {
+    if (Array.isArray(datos)) return datos;
+
+    const props = Object.keys(datos.extendedProps);
+    const eventos = new Array(datos.id.length);
+    for (let i = 0; i < datos.id.length; i++) {
+        const extendedProps = {};
+        for (const prop of props) extendedProps[prop] = datos.extendedProps[prop][i];
+        eventos[i] = {
+            id: datos.id[i],
+            title: datos.title[i],
+            start: datos.start[i],
+            end: datos.end[i],
+            color: datos.color[i],
+            extendedProps: extendedProps
+        };
+        if (datos.url) eventos[i].url = datos.url.replace('{id}', datos.id[i]);
+    }
+    return eventos;
+}
+
 document.addEventListener('DOMContentLoaded', function() {
     var calendarEl = document.getElementById('calendar');
     var calendar = new FullCalendar.Calendar(calendarEl, {
@@ -13,14 +35,18 @@ document.addEventListener('DOMContentLoaded', function() {
             const estadoCodigo = document.getElementById('filtroEstado').value;
             
             let url = TURNOS_JSON_URL;
-            const params = new URLSearchParams();
+            const params = new URLSearchParams({
+                formato: 'columnas',
+                start: info.startStr,
+                end: info.endStr
+            });
             if (veterinarioId) params.append('veterinario', veterinarioId);
             if (estadoCodigo) params.append('estado', estadoCodigo);
-            if (params.toString()) url += '?' + params.toString();
+            url += '?' + params.toString();
             
             fetch(url)
                 .then(response => response.json())
-                .then(data => successCallback(data))
+                .then(data => successCallback(expandirEventos(data)))
                 .catch(error => failureCallback(error));
         },
         eventClick: function(info) {
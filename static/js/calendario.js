@@ -1,3 +1,25 @@
+// Expande la respuesta por columnas (?formato=columnas) a eventos de FullCalendar
+function expandirEventos(datos) {
+    if (Array.isArray(datos)) return datos;
+
+    const props = Object.keys(datos.extendedProps);
+    const eventos = new Array(datos.id.length);
+    for (let i = 0; i < datos.id.length; i++) {
+        const extendedProps = {};
+        for (const prop of props) extendedProps[prop] = datos.extendedProps[prop][i];
+        eventos[i] = {
+            id: datos.id[i],
+            title: datos.title[i],
+            start: datos.start[i],
+            end: datos.end[i],
+            color: datos.color[i],
+            extendedProps: extendedProps
+        };
+        if (datos.url) eventos[i].url = datos.url.replace('{id}', datos.id[i]);
+    }
+    return eventos;
+}
+
 document.addEventListener('DOMContentLoaded', function() {
     const calendarEl = document.getElementById('calendar');
     if (!calendarEl) return;
@@ -17,7 +39,17 @@ document.addEventListener('DOMContentLoaded', function() {
             right: 'dayGridMonth,timeGridWeek,timeGridDay'
         },
         
-        events: TURNOS_JSON_URL,
+        events: function(info, successCallback, failureCallback) {
+            const params = new URLSearchParams({
+                formato: 'columnas',
+                start: info.startStr,
+                end: info.endStr
+            });
+            fetch(TURNOS_JSON_URL + '?' + params.toString())
+                .then(response => response.json())
+                .then(data => successCallback(expandirEventos(data)))
+                .catch(error => failureCallback(error));
+        },
     
         eventClick: function(info) {
             info.jsEvent.preventDefault();
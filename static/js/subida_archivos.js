@@ -0,0 +1,118 @@
+// Subida por partes (reanudable) de archivos adjuntos grandes.
+// Cada archivo se sube antes de guardar la consulta; el formulario solo
+// envía los tokens de las subidas completadas.
+document.addEventListener('DOMContentLoaded', function() {
+    const input = document.getElementById('subida-archivo');
+    const descripcionInput = document.getElementById('subida-descripcion');
+    const lista = document.getElementById('subidas-lista');
+    const form = input ? input.closest('form') : null;
+
+    if (!input || !form) {
+        return;
+    }
+
+    const csrfToken = form.querySelector('[name=csrfmiddlewaretoken]').value;
+    let subidasEnCurso = 0;
+
+    function getJSON(response) {
+        return response.json().then(data => ({ status: response.status, data }));
+    }
+
+    async function subirParte(token, archivo, offset, tamanoParte) {
+        const parte = archivo.slice(offset, offset + tamanoParte);
+        const response = await fetch(`${SUBIDAS_URL}${token}/`, {
+            method: 'POST',
+            headers: {
+                'X-CSRFToken': csrfToken,
+                'Upload-Offset': String(offset),
+                'Content-Type': 'application/octet-stream',
+            },
+            body: parte,
+        });
+        return getJSON(response);
+    }
+
+    async function subirArchivo(archivo, descripcion, fila) {
+        const barra = fila.querySelector('.progress-bar');
+        const body = new FormData();
+        body.append('nombre', archivo.name);
+        body.append('tamano', archivo.size);
+        body.append('descripcion', descripcion);
+
+        const inicio = await fetch(SUBIDAS_URL, {
+            method: 'POST',
+            headers: { 'X-CSRFToken': csrfToken },
+            body,
+        }).then(getJSON);
+
+        if (inicio.status !== 201) {
+            throw new Error(inicio.data.error || 'No se pudo iniciar la subida');
+        }
+
+        const token = inicio.data.token;
+        const tamanoParte = inicio.data.tamano_parte;
+        let offset = 0;
+        let reintentos = 0;
+
+        while (offset < archivo.size) {
+            try {
+                const { status, data } = await subirParte(token, archivo, offset, tamanoParte);
+                if (status === 200 || status === 409) {
+                    // 409: el servidor indica desde dónde reanudar
+                    offset = data.recibido;
+                    reintentos = 0;
+                } else {
+                    throw new Error(data.error || 'Error en la subida');
+                }
+            } catch (error) {
+                if (++reintentos > 5) {
+                    throw error;
+                }
+                await new Promise(r => setTimeout(r, 1000 * reintentos));
+                const estado = await fetch(`${SUBIDAS_URL}${token}/`).then(getJSON);
+                offset = estado.data.recibido;
+            }
+            barra.style.width = `${Math.round((offset / archivo.size) * 100)}%`;
+        }
+
+        const hidden = document.createElement('input');
+        hidden.type = 'hidden';
+        hidden.name = 'subidas';
+        hidden.value = token;
+        form.appendChild(hidden);
+    }
+
+    input.addEventListener('change', function() {
+        Array.from(this.files).forEach(archivo => {
+            const fila = document.createElement('div');
+            fila.className = 'formset-row bg-white';
+            fila.innerHTML = `
+                <div class="small fw-bold mb-2"></div>
+                <div class="progress" style="height: 6px;">
+                    <div class="progress-bar bg-success" style="width: 0%"></div>
+                </div>`;
+            // El nombre lo elige el usuario: como texto, nunca como HTML
+            fila.firstElementChild.textContent = archivo.name;
+            lista.appendChild(fila);
+
+            subidasEnCurso++;
+            subirArchivo(archivo, descripcionInput.value, fila)
+                .catch(error => {
+                    const aviso = document.createElement('div');
+                    aviso.className = 'text-danger small mt-2';
+                    aviso.textContent = error.message;
+                    fila.appendChild(aviso);
+                })
+                .finally(() => subidasEnCurso--);
+        });
+        this.value = '';
+        descripcionInput.value = '';
+    });
+
+    form.addEventListener('submit', function(event) {
+        if (subidasEnCurso > 0) {
+            event.preventDefault();
+            alert('Espera a que terminen de subirse los archivos.');
+        }
+    });
+});
@@ -0,0 +1,149 @@
+// Mapa de calor de turnos libres del mes, salto al primer turno libre y
+// retención del turno mientras se confirma la reserva
+document.addEventListener('DOMContentLoaded', function() {
+    // Al abrir el modal de reserva se retiene el turno unos minutos
+    document.querySelectorAll('[data-retener-url]').forEach(function(modal) {
+        let reservando = false;
+        modal.querySelector('form').addEventListener('submit', function() {
+            reservando = true;
+        });
+
+        // Al cerrar sin reservar, el turno vuelve a quedar libre para los demás
+        modal.addEventListener('hide.bs.modal', function() {
+            if (reservando) return;
+            fetch(modal.dataset.retenerUrl, {
+                method: 'DELETE',
+                headers: {
+                    'X-CSRFToken': modal.querySelector('[name=csrfmiddlewaretoken]').value
+                },
+                keepalive: true
+            }).catch(() => {});
+        });
+
+        modal.addEventListener('show.bs.modal', function() {
+            const token = modal.querySelector('[name=csrfmiddlewaretoken]').value;
+            const errorEl = modal.querySelector('.retencion-error');
+            const infoEl = modal.querySelector('.retencion-info');
+            const confirmar = modal.querySelector('button[type=submit]');
+
+            fetch(modal.dataset.retenerUrl, {
+                method: 'POST',
+                headers: { 'X-CSRFToken': token }
+            })
+                .then(response => response.json())
+                .then(data => {
+                    if (data.retenido) {
+                        const minutos = Math.round(data.segundos / 60);
+                        infoEl.textContent = 'Guardamos este turno para vos durante ' + minutos + ' minutos.';
+                        infoEl.classList.remove('d-none');
+                    } else {
+                        errorEl.textContent = data.error;
+                        errorEl.classList.remove('d-none');
+                        confirmar.disabled = true;
+                    }
+                })
+                .catch(() => {});
+        });
+    });
+
+    const mapaEl = document.getElementById('mapa-mes');
+    if (!mapaEl) return;
+
+    const veterinarioSelect = document.getElementById('veterinario-select');
+    const tituloEl = document.getElementById('mes-titulo');
+    const infoEl = document.getElementById('primer-libre-info');
+    const diasSemana = ['Lun', 'Mar', 'Mié', 'Jue', 'Vie', 'Sáb', 'Dom'];
+
+    const hoy = new Date();
+    let anio = hoy.getFullYear();
+    let mes = hoy.getMonth();
+
+    function dosDigitos(n) {
+        return String(n).padStart(2, '0');
+    }
+
+    function irAFecha(fecha, veterinarioId) {
+        const params = new URLSearchParams({ fecha: fecha });
+        if (veterinarioId) params.append('veterinario', veterinarioId);
+        window.location.href = TURNOS_DISPONIBLES_URL + '?' + params.toString();
+    }
+
+    function dibujar(dias) {
+        mapaEl.innerHTML = '';
+        diasSemana.forEach(function(nombre) {
+            const celda = document.createElement('div');
+            celda.className = 'dia-semana';
+            celda.textContent = nombre;
+            mapaEl.appendChild(celda);
+        });
+
+        // Lunes = 0
+        const primerDia = (new Date(anio, mes, 1).getDay() + 6) % 7;
+        for (let i = 0; i < primerDia; i++) {
+            mapaEl.appendChild(document.createElement('div'));
+        }
+
+        const maximo = Math.max(1, ...Object.values(dias).map(d => d.libres));
+        const cantidadDias = new Date(anio, mes + 1, 0).getDate();
+        for (let dia = 1; dia <= cantidadDias; dia++) {
+            const fecha = anio + '-' + dosDigitos(mes + 1) + '-' + dosDigitos(dia);
+            const datos = dias[fecha];
+            const celda = document.createElement('div');
+            celda.className = 'dia';
+            celda.innerHTML = '<div class="fw-bold">' + dia + '</div>';
+            if (datos) {
+                celda.classList.add('con-libres');
+                celda.style.setProperty('--intensidad', 0.15 + 0.85 * datos.libres / maximo);
+                celda.innerHTML += '<div class="small">' + datos.libres + ' libres</div>';
+                celda.addEventListener('click', function() {
+                    irAFecha(fecha, veterinarioSelect.value);
+                });
+            }
+            mapaEl.appendChild(celda);
+        }
+    }
+
+    function cargarMes() {
+        tituloEl.textContent = new Date(anio, mes, 1).toLocaleDateString('es', {
+            month: 'long',
+            year: 'numeric'
+        });
+        const params = new URLSearchParams({ mes: anio + '-' + dosDigitos(mes + 1) });
+        if (veterinarioSelect.value) params.append('veterinario', veterinarioSelect.value);
+
+        fetch(DISPONIBILIDAD_MES_URL + '?' + params.toString())
+            .then(response => response.json())
+            .then(data => dibujar(data.dias))
+            .catch(() => { mapaEl.innerHTML = ''; });
+    }
+
+    document.getElementById('mes-anterior').addEventListener('click', function() {
+        if (anio === hoy.getFullYear() && mes === hoy.getMonth()) return;
+        mes -= 1;
+        if (mes < 0) { mes = 11; anio -= 1; }
+        cargarMes();
+    });
+
+    document.getElementById('mes-siguiente').addEventListener('click', function() {
+        mes += 1;
+        if (mes > 11) { mes = 0; anio += 1; }
+        cargarMes();
+    });
+
+    document.getElementById('primer-libre').addEventListener('click', function() {
+        const params = new URLSearchParams({ n: 1 });
+        if (veterinarioSelect.value) params.append('veterinario', veterinarioSelect.value);
+
+        fetch(PROXIMOS_LIBRES_URL + '?' + params.toString())
+            .then(response => response.json())
+            .then(data => {
+                if (data.turnos.length) {
+                    window.location.href = data.turnos[0].url;
+                } else {
+                    infoEl.textContent = 'No hay turnos libres por ahora.';
+                }
+            });
+    });
+
+    cargarMes();
+});